@@ -3,8 +3,23 @@ from tkinter import ttk, messagebox
 import datetime
 import requests
 import json
-import re
-from triage_logic import assess_triage as logic_assess_triage
+import queue
+from rule_set import RemoteRules
+from triage_logic import determine_opd as logic_determine_opd
+from complaint_matcher import ComplaintMatcher, HTML_TAG_RE
+from patient_index import PatientIndex, normalize_id
+from vitals_history import VitalsHistory
+from early_warning import EarlyWarningScore
+from audit_log import AuditLog
+from waiting_room import WaitingRoom
+from dashboard import DashboardAggregates
+from diagnosis_index import DiagnosisIndex
+from feed_client import FeedSubscriber
+from local_journal import LocalJournal, JournalSyncer
+from validation import ValidationError, validate_patient
+
+# Shared backend: other triage stations see this desk's patients through its /events feed
+BACKEND_URL = "http://127.0.0.1:5000"
 
 class TriageSystem:
     def __init__(self, root):
@@ -79,6 +94,30 @@ class TriageSystem:
         self.ambulance_var = tk.BooleanVar()
         ttk.Checkbutton(patient_frame, variable=self.ambulance_var).grid(row=2, column=1, sticky="w", padx=5, pady=5)
         
+        # Free-text chief complaint; Enter ticks the matching symptom checkboxes
+        ttk.Label(patient_frame, text="Chief Complaint:").grid(row=2, column=2, sticky="w", padx=5, pady=5)
+        self.chief_complaint = ttk.Entry(patient_frame, width=40)
+        self.chief_complaint.grid(row=2, column=3, sticky="w", padx=5, pady=5)
+        self.chief_complaint.bind("<Return>", self.apply_chief_complaint)
+        self.complaint_matcher = ComplaintMatcher()
+        
+        # Autocomplete over patients seen this shift, for re-triage of returning/waiting patients
+        self.patient_index = PatientIndex()
+        self.audit_log = AuditLog()
+        # Every triage/discharge is journalled locally first; the syncer forwards it when the backend is reachable
+        self.journal = LocalJournal()
+        self.syncer = JournalSyncer(self.journal, BACKEND_URL + "/sync")
+        self.syncer.start()
+        # Same rules as the backend (hot-reloaded there); the built-in ones until it has been reached
+        self.rules = RemoteRules(BACKEND_URL + "/rules")
+        self.rules.start()
+        self.suggestions = tk.Listbox(patient_frame, height=5, width=60)
+        self.suggestion_records = []
+        self.suggestions.bind("<Double-Button-1>", self.load_suggestion)
+        self.suggestions.bind("<Return>", self.load_suggestion)
+        self.patient_id.bind("<KeyRelease>", lambda e: self.update_suggestions(self.patient_id.get()))
+        self.patient_name.bind("<KeyRelease>", lambda e: self.update_suggestions(self.patient_name.get()))
+        
         # Vitals frame
         vitals_frame = ttk.LabelFrame(main_frame, text="Vital Signs", padding="10")
         vitals_frame.grid(row=2, column=0, sticky="nsew", padx=(0, 10), pady=(0, 20))
@@ -117,6 +156,14 @@ class TriageSystem:
         self.heart_rate = ttk.Entry(vitals_frame, width=10)
         self.heart_rate.grid(row=6, column=1, sticky="w", padx=5, pady=5)
         
+        # Trend arrows from this patient's earlier readings (re-triage)
+        self.vitals_history = VitalsHistory()
+        self.trend_labels = {}
+        for vital, row in (("o2_saturation", 0), ("gcs_score", 1), ("temperature", 4),
+                           ("systolic_bp", 5), ("heart_rate", 6)):
+            self.trend_labels[vital] = ttk.Label(vitals_frame, text="", width=12)
+            self.trend_labels[vital].grid(row=row, column=2, sticky="w", padx=5, pady=5)
+        
         # Symptoms frame
         symptoms_frame = ttk.LabelFrame(main_frame, text="Symptoms & Conditions", padding="10")
         symptoms_frame.grid(row=2, column=1, sticky="nsew", padx=(10, 0), pady=(0, 20))
@@ -264,6 +311,16 @@ class TriageSystem:
             row=0, column=1, padx=10, pady=10)
         ttk.Button(buttons_frame, text="Clear Form", command=self.clear_form, width=15).grid(
             row=0, column=2, padx=10, pady=10)
+        ttk.Button(buttons_frame, text="Discharge", command=self.discharge_patient, width=15).grid(
+            row=0, column=3, padx=10, pady=10, sticky="w")
+        
+        # Live waiting-room counts for the charge nurse
+        self.waiting_room = WaitingRoom()
+        self.dashboard = DashboardAggregates()
+        self.waiting_room.subscribe(self.dashboard)
+        self.dashboard_label = ttk.Label(buttons_frame, text="", font=("Arial", 11))
+        self.dashboard_label.grid(row=1, column=0, columnspan=4, pady=(0, 5))
+        self.refresh_dashboard()
         
         # Results frame
         results_frame = ttk.LabelFrame(main_frame, text="Triage Results", padding="10")
@@ -283,6 +340,10 @@ class TriageSystem:
         self.time_label = ttk.Label(results_content, text="", font=("Arial", 12))
         self.time_label.pack(fill=tk.X, padx=10, pady=5)
         
+        # Aggregate early-warning score (all vitals, including glucose and pain)
+        self.ews_label = ttk.Label(results_content, text="", font=("Arial", 12))
+        self.ews_label.pack(fill=tk.X, padx=10, pady=5)
+        
         # Reason for triage level
         self.reason_label = ttk.Label(results_content, text="", font=("Arial", 12), wraplength=800)
         self.reason_label.pack(fill=tk.X, padx=10, pady=5)
@@ -295,6 +356,38 @@ class TriageSystem:
         self.diagnosis_label = ttk.Label(results_content, text="", font=("Arial", 12), 
                                        wraplength=800, justify=tk.LEFT)
         self.diagnosis_label.pack(fill=tk.X, padx=10, pady=(5, 10))
+        
+        # Shared waiting room, kept current from the backend's event feed
+        board_frame = ttk.LabelFrame(main_frame, text="Shared Waiting Room (all stations)", padding="10")
+        board_frame.grid(row=5, column=0, columnspan=2, sticky="ew", pady=(0, 20))
+        # Filter the board by diagnosis, rule, symptom or tag, e.g. "sepsis OR chest_pain" (see diagnosis_index.py)
+        filter_frame = ttk.Frame(board_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.board_filter = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.board_filter, width=50).pack(side=tk.LEFT, padx=(5, 0))
+        self.board_filter_status = ttk.Label(filter_frame, text="e.g. sepsis AND tag:RED OR symptom:chest_pain")
+        self.board_filter_status.pack(side=tk.LEFT, padx=(10, 0))
+        columns = ("name", "tag", "waiting_since", "reason")
+        self.board = ttk.Treeview(board_frame, columns=columns, show="headings", height=8)
+        for column, heading, width in zip(columns, ("Name", "Tag", "Tagged At", "Reason"), (180, 80, 90, 450)):
+            self.board.heading(column, text=heading)
+            self.board.column(column, width=width, anchor="w")
+        for tag, colour in (("RED", "#ffcccc"), ("YELLOW", "#fff5bf"), ("GREEN", "#d9f2d9")):
+            self.board.tag_configure(tag, background=colour)
+        self.board.pack(fill=tk.X)
+        self.board_tagged_at = {}
+        self.board_entries = {}
+        self.board_index = DiagnosisIndex()
+        self.board_filter.trace_add("write", lambda *args: self.refresh_board())
+        self.feed_status = ttk.Label(board_frame, text="Connecting to shared waiting room...")
+        self.feed_status.pack(anchor="w", pady=(5, 0))
+        self.feed_queue = queue.Queue()
+        self.feed = FeedSubscriber(BACKEND_URL + "/events",
+                                   lambda entries, seq: self.feed_queue.put(("snapshot", entries)),
+                                   lambda delta: self.feed_queue.put(("delta", delta)))
+        self.feed.start()
+        self.poll_feed()
     
     def assess_triage(self):
         try:
@@ -307,17 +400,214 @@ class TriageSystem:
                 "systolic_bp": self.systolic_bp.get(),
                 "diastolic_bp": self.diastolic_bp.get(),
                 "heart_rate": self.heart_rate.get(),
+                "blood_glucose": self.blood_glucose.get(),
+                "pain_score": self.pain_score.get(),
                 "symptoms": [symptom_id for symptom_id, var in self.symptom_vars.items() if var.get()]
             }
-            # Use the extracted logic
-            result = logic_assess_triage(patient_data)
+            # Checked and normalized as the backend will on /sync, so both give the same tag
+            try:
+                patient_data = validate_patient(patient_data)
+                validate_patient({"age": self.patient_age.get(), "gender": self.patient_gender.get()})
+            except ValidationError as e:
+                messagebox.showerror("Check the form", "\n".join(f"{err['field']}: {err['message']}"
+                                                                 for err in e.errors))
+                return
+            result = self.rules.current.assess(patient_data)
             self.display_result(result["tag"], result["time"], result["reason"], result["diagnoses"])
+            ews = EarlyWarningScore(patient_data)
+            self.audit_log.append(normalize_id(self.patient_id.get()), patient_data, result, ews.total)
+            if self.patient_id.get().strip():
+                self.waiting_room.triage(normalize_id(self.patient_id.get()),
+                                         dict(patient_data, name=self.patient_name.get(),
+                                              age=self.patient_age.get(), gender=self.patient_gender.get()),
+                                         dict(result, ews=ews.as_dict()))
+                self.refresh_dashboard(reschedule=False)
+                self.journal_event("triage", dict(patient_data, patient_id=self.patient_id.get(),
+                                                  name=self.patient_name.get(), age=self.patient_age.get(),
+                                                  gender=self.patient_gender.get()))
+            self.ews_label.configure(text=f"Early warning score: {ews.total} ({ews.band} risk)")
+            if self.patient_id.get().strip():
+                self.vitals_history.add(normalize_id(self.patient_id.get()), patient_data)
+                self.update_trends(normalize_id(self.patient_id.get()))
+                self.patient_index.upsert({
+                    "patient_id": self.patient_id.get(),
+                    "name": self.patient_name.get(),
+                    "age": self.patient_age.get(),
+                    "gender": self.patient_gender.get(),
+                    "patient": patient_data,
+                    "tag": result["tag"],
+                    "triaged_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                })
         except Exception as e:
             self.display_result("ERROR", "N/A", 
                               f"Assessment failed: {str(e)}",
                               ["System Error - Please reassess manually"])
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
+    def discharge_patient(self):
+        """Remove the patient in the form from the waiting room"""
+        patient_id = normalize_id(self.patient_id.get())
+        if not patient_id or self.waiting_room.discharge(patient_id) is None:
+            messagebox.showinfo("Discharge", "This patient is not in the waiting room.")
+            return
+        self.vitals_history.discard(patient_id)
+        self.journal_event("discharge", {"patient_id": patient_id})
+        self.clear_form()
+        self.refresh_dashboard(reschedule=False)
+
+    def journal_event(self, kind, payload):
+        """Commit a change to the local journal (a fast local write) and wake the background syncer"""
+        self.journal.record(kind, payload)
+        self.syncer.notify()
+
+    def poll_feed(self):
+        """Apply snapshots and deltas received by the feed thread; Tk widgets are only touched here"""
+        filtering = bool(self.board_filter.get().strip())
+        changed = False
+        while True:
+            try:
+                kind, data = self.feed_queue.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if kind == "snapshot":
+                self.board_entries = {entry["patient_id"]: entry for entry in data}
+                self.board_index.reset(data)
+                if not filtering:
+                    self.board.delete(*self.board.get_children())
+                    self.board_tagged_at.clear()
+                    for entry in data:
+                        self.board_upsert(entry)
+            elif data["entry"] is None:
+                self.board_entries.pop(data["patient_id"], None)
+                self.board_index.update(data["patient_id"], None)
+                if self.board.exists(data["patient_id"]):
+                    self.board.delete(data["patient_id"])
+                self.board_tagged_at.pop(data["patient_id"], None)
+            else:
+                self.board_entries[data["patient_id"]] = data["entry"]
+                self.board_index.update(data["patient_id"], data["entry"])
+                if not filtering:
+                    self.board_upsert(data["entry"])
+        if changed and filtering:
+            self.refresh_board()
+        status = "Live" if self.feed.connected else "Offline - reconnecting..."
+        if self.syncer.backlog:
+            status += f" | {self.syncer.backlog} local change(s) waiting to sync"
+        self.feed_status.configure(text=status)
+        self.root.after(200, self.poll_feed)
+
+    def board_values(self, entry):
+        return (entry["name"], entry["tag"],
+                datetime.datetime.fromtimestamp(entry["tagged_at"]).strftime("%H:%M"), entry["reason"])
+
+    def refresh_board(self):
+        """Redraw the board from the feed's entries, showing only patients that match the filter"""
+        query = self.board_filter.get().strip()
+        try:
+            shown = self.board_index.search(query) if query else set(self.board_entries)
+        except ValueError as e:
+            self.board_filter_status.configure(text=f"Filter not understood: {e}")
+            return
+        self.board_filter_status.configure(
+            text=f"{len(shown)} of {len(self.board_entries)} waiting patients" if query else "")
+        self.board.delete(*self.board.get_children())
+        self.board_tagged_at.clear()
+        order = {"RED": 0, "YELLOW": 1, "GREEN": 2}
+        for entry in sorted((self.board_entries[pid] for pid in shown if pid in self.board_entries),
+                            key=lambda e: (order[e["tag"]], e["tagged_at"])):
+            self.board.insert("", tk.END, iid=entry["patient_id"], values=self.board_values(entry),
+                              tags=(entry["tag"],))
+            self.board_tagged_at[entry["patient_id"]] = entry["tagged_at"]
+
+    def board_upsert(self, entry):
+        """Insert or update one row, keeping RED above YELLOW above GREEN and the longest-waiting first"""
+        values = self.board_values(entry)
+        row = entry["patient_id"]
+        if self.board.exists(row):
+            self.board.item(row, values=values, tags=(entry["tag"],))
+        else:
+            self.board.insert("", tk.END, iid=row, values=values, tags=(entry["tag"],))
+        order = {"RED": 0, "YELLOW": 1, "GREEN": 2}
+        key = (order[entry["tag"]], entry["tagged_at"])
+        index = 0
+        for other in self.board.get_children():
+            if other == row:
+                continue
+            tag = self.board.set(other, "tag")
+            if (order[tag], self.board_tagged_at.get(other, 0)) > key:
+                break
+            index += 1
+        self.board_tagged_at[row] = entry["tagged_at"]
+        self.board.move(row, "", index)
+
+    def refresh_dashboard(self, reschedule=True):
+        """Redraw the waiting-room summary; also runs every 30 s so overdue counts tick over"""
+        snap = self.dashboard.snapshot()
+        parts = []
+        for tag in ("RED", "YELLOW", "GREEN"):
+            oldest = snap["oldest_wait_seconds"][tag]
+            oldest_text = f", oldest {int(oldest // 60)} min" if oldest is not None else ""
+            parts.append(f"{tag}: {snap['waiting'][tag]}{oldest_text}")
+        backlog = ", ".join(f"{opd} {n}" for opd, n in sorted(snap["opd_backlog"].items()))
+        self.dashboard_label.configure(
+            text=f"Waiting - {' | '.join(parts)} | Overdue: {snap['total_overdue']}"
+                 + (f" | OPD backlog: {backlog}" if backlog else ""))
+        if reschedule:
+            self.root.after(30000, self.refresh_dashboard)
+
+    def update_trends(self, patient_id):
+        """Show trend arrows, in red when a vital is worsening"""
+        summary = self.vitals_history.summary(patient_id) or {}
+        for vital, label in self.trend_labels.items():
+            trend = summary.get(vital)
+            if trend is None or trend["count"] < 2:
+                label.configure(text="", foreground="")
+            else:
+                label.configure(text=f"{trend['trend']} ({trend['delta']:+g})",
+                                foreground="#cc0000" if trend["worsening"] else "")
+
+    def update_suggestions(self, query):
+        """Show patients whose ID or name starts with what has been typed"""
+        self.suggestion_records = self.patient_index.search(query, limit=5) if query.strip() else []
+        self.suggestions.delete(0, tk.END)
+        for record in self.suggestion_records:
+            self.suggestions.insert(tk.END, f"{record['patient_id']} - {record.get('name', '')} "
+                                            f"({record.get('tag', '')} at {record.get('triaged_at', '')})")
+        if self.suggestion_records:
+            self.suggestions.grid(row=3, column=0, columnspan=4, sticky="w", padx=5, pady=5)
+        else:
+            self.suggestions.grid_remove()
+
+    def load_suggestion(self, event=None):
+        """Fill the form with the selected patient's last triage for re-assessment"""
+        selection = self.suggestions.curselection()
+        if not selection:
+            return
+        record = self.suggestion_records[selection[0]]
+        patient = record.get("patient", {})
+        self.clear_form()
+        self.patient_id.insert(0, record["patient_id"])
+        self.patient_name.insert(0, record.get("name", ""))
+        self.patient_age.insert(0, record.get("age", ""))
+        self.patient_gender.set(record.get("gender", ""))
+        self.ambulance_var.set(bool(patient.get("ambulance_arrival")))
+        for field in ("o2_saturation", "temperature", "systolic_bp", "diastolic_bp", "heart_rate", "blood_glucose"):
+            getattr(self, field).insert(0, patient.get(field, ""))
+        self.gcs_score.set(patient.get("gcs_score", ""))
+        self.pain_score.set(patient.get("pain_score", ""))
+        for symptom_id in patient.get("symptoms", []):
+            if symptom_id in self.symptom_vars:
+                self.symptom_vars[symptom_id].set(True)
+        self.update_trends(record["patient_id"])
+
+    def apply_chief_complaint(self, event=None):
+        """Tick the symptoms matched from the free-text chief complaint"""
+        for match in self.complaint_matcher.match(self.chief_complaint.get()):
+            # Only confident matches; weaker ones are left for the triage nurse to pick
+            if match["score"] >= 0.9:
+                self.symptom_vars[match["symptom"]].set(True)
+
     def check_vital_signs(self):
         """Check vital signs for RED tag conditions"""
         result = {"is_red": False, "reason": "", "diagnoses": []}
@@ -456,46 +746,11 @@ class TriageSystem:
 
     def determine_opd(self):
         """Determine appropriate OPD based on patient characteristics and symptoms"""
-        try:
-            age = int(self.patient_age.get() or 0)
-            gender = self.patient_gender.get()
-            
-            # Check pediatric cases first
-            if age < 18 and age > 0:
-                return "Pediatrics"
-            
-            # Check symptoms against each department
-            for symptom_id, symptom_data in self.green_symptoms.items():
-                if self.symptom_vars[symptom_id].get():
-                    symptom_name = symptom_data["name"].lower()
-                    
-                    # Check OB/GYN cases
-                    if gender == "Female" and (
-                        symptom_id == "gynecological" or
-                        "gynecological" in symptom_name or
-                        "pregnancy" in symptom_name or
-                        "menstrual" in symptom_name or
-                        "vaginal" in symptom_name
-                    ):
-                        return "OB/GYN"
-                    
-                    # Check ophthalmology cases
-                    if symptom_id == "eye_problems" or "eye" in symptom_name or "vision" in symptom_name:
-                        return "Ophthalmology"
-                    
-                    # Check orthopedic cases
-                    if symptom_id == "joint_pain" or any(word in symptom_name for word in ["joint", "bone", "fracture", "sprain"]):
-                        return "Orthopedics"
-                    
-                    # Check psychiatric cases
-                    if symptom_id == "psychiatric_issues" or any(word in symptom_name for word in ["mental", "psychiatric", "anxiety", "depression"]):
-                        return "Psychiatry"
-            
-            # Default to internal medicine
-            return "Internal Medicine"
-            
-        except ValueError:
-            return "Internal Medicine"  # Default if age is not properly set
+        return logic_determine_opd({
+            "age": self.patient_age.get(),
+            "gender": self.patient_gender.get(),
+            "symptoms": [symptom_id for symptom_id, var in self.symptom_vars.items() if var.get()]
+        })
 
     def display_result(self, tag, time, reason, diagnoses):
         # Set colors
@@ -539,6 +794,8 @@ class TriageSystem:
         self.patient_age.delete(0, tk.END)
         self.patient_gender.set("")
         self.ambulance_var.set(False)
+        self.chief_complaint.delete(0, tk.END)
+        self.suggestions.grid_remove()
         
         # Clear vitals
         self.o2_saturation.delete(0, tk.END)
@@ -549,6 +806,8 @@ class TriageSystem:
         self.systolic_bp.delete(0, tk.END)
         self.diastolic_bp.delete(0, tk.END)
         self.heart_rate.delete(0, tk.END)
+        for label in self.trend_labels.values():
+            label.configure(text="", foreground="")
         
         # Clear symptoms
         for var in self.symptom_vars.values():
@@ -557,6 +816,7 @@ class TriageSystem:
         # Clear results including diagnosis section
         self.tag_label.configure(text="", background=self.root["background"])
         self.time_label.configure(text="")
+        self.ews_label.configure(text="")
         self.reason_label.configure(text="")
         self.diagnosis_header.pack_forget()
         self.diagnosis_label.configure(text="")
@@ -581,8 +841,7 @@ class TriageSystem:
         self.canvas.yview_moveto(current_scroll[0])
 
     def strip_html_tags(self, text):
-        clean = re.compile('<.*?>')
-        return re.sub(clean, '', text)
+        return HTML_TAG_RE.sub('', text)
 
 # Main function to run the application
 def main():
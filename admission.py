@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from triage_logic import RED_SYMPTOMS, vital_value
+
+# Served strictly in this order when a slot frees up
+LANES = ("critical", "routine")
+
+# Red-tag vital limits from assess_triage: (field, low, high); outside (low, high) looks critical
+CRITICAL_VITALS = (
+    ("o2_saturation", 90, None),
+    ("gcs_score", 10, None),
+    ("temperature", 35, 40),
+    ("systolic_bp", 80, 220),
+    ("diastolic_bp", None, 120),
+    ("heart_rate", 40, 150),
+)
+
+
+def prescreen(payload) -> str:
+    """
+    Cheap lane choice from the decoded request body, before any real work.
+    Ambulance arrivals, red-flag symptoms and red-range vitals go to the critical
+    lane; anything else (or a body we cannot read) is routine. A batch is
+    critical when any patient in it is.
+    """
+    if isinstance(payload, list):
+        return "critical" if any(prescreen(patient) == "critical" for patient in payload) else "routine"
+    if not isinstance(payload, dict):
+        return "routine"
+    if payload.get("ambulance_arrival"):
+        return "critical"
+    symptoms = payload.get("symptoms")
+    if isinstance(symptoms, list) and any(s in RED_SYMPTOMS for s in symptoms if isinstance(s, str)):
+        return "critical"
+    for field, low, high in CRITICAL_VITALS:
+        value = vital_value(payload, field)
+        # Blank/zero readings mean "not measured", as in assess_triage
+        if value > 0 and ((low is not None and value < low) or (high is not None and value > high)):
+            return "critical"
+    return "routine"
+
+
+class Overloaded(Exception):
+    """The lane's queue is full; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"{lane} lane is full")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class LaneStats:
+    """Admission counters and a window of recent latencies for one lane."""
+
+    def __init__(self, window: int):
+        self.admitted = 0
+        self.shed = 0
+        self.waits = deque(maxlen=window)      # seconds spent queued
+        self.latencies = deque(maxlen=window)  # seconds from arrival to completion
+
+    def as_dict(self) -> Dict:
+        def percentiles(values):
+            if not values:
+                return {"p50_ms": None, "p99_ms": None}
+            ordered = sorted(values)
+            return {"p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                    "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3)}
+        return {"admitted": self.admitted, "shed": self.shed,
+                "queue_wait": percentiles(self.waits), "latency": percentiles(self.latencies)}
+
+
+class AdmissionGate:
+    """
+    Bounded, prioritised admission for request handlers.
+    At most `capacity` requests run at once. Waiting requests queue per lane
+    (FIFO) and a freed slot always goes to the highest-priority lane with a
+    waiter. `reserved` slots can only be used by the critical lane, so a
+    saturating routine load never holds every slot. When a lane's queue already
+    holds `max_queue[lane]` requests, new ones are shed with Overloaded.
+    """
+
+    def __init__(self, capacity: int = 8, reserved: int = 2, max_queue: Optional[Dict[str, int]] = None,
+                 queue_timeout: float = 10.0, window: int = 4096):
+        if not 0 <= reserved < capacity:
+            raise ValueError("reserved must leave at least one slot for routine traffic")
+        self.capacity = capacity
+        self.reserved = reserved
+        self.max_queue = dict({"critical": 256, "routine": 64}, **(max_queue or {}))
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.stats = {lane: LaneStats(window) for lane in LANES}
+        self._queues = {lane: deque() for lane in LANES}
+        self._cond = threading.Condition()
+
+    def _limit(self, lane: str) -> int:
+        return self.capacity if lane == "critical" else self.capacity - self.reserved
+
+    def _may_run(self, lane: str, ticket: object) -> bool:
+        if self.running >= self._limit(lane) or self._queues[lane][0] is not ticket:
+            return False
+        # Higher-priority waiters go first
+        return not any(self._queues[other] for other in LANES[:LANES.index(lane)])
+
+    def retry_after(self, lane: str) -> int:
+        """Rough seconds until the lane drains, from its recent latency."""
+        stats = self.stats[lane]
+        typical = sorted(stats.latencies)[len(stats.latencies) // 2] if stats.latencies else 0.1
+        return max(1, round(len(self._queues[lane]) * typical / max(1, self._limit(lane))))
+
+    @contextmanager
+    def admit(self, lane: str) -> Iterator[None]:
+        """Hold a slot for the duration of the block; raises Overloaded when shed."""
+        arrived = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            queue = self._queues[lane]
+            if len(queue) >= self.max_queue[lane]:
+                self.stats[lane].shed += 1
+                raise Overloaded(lane, self.retry_after(lane))
+            queue.append(ticket)
+            admitted = self._cond.wait_for(lambda: self._may_run(lane, ticket), self.queue_timeout)
+            if not admitted:
+                queue.remove(ticket)
+                self.stats[lane].shed += 1
+                # Our departure may unblock the next waiter
+                self._cond.notify_all()
+                raise Overloaded(lane, self.retry_after(lane))
+            queue.popleft()
+            self.running += 1
+            self.stats[lane].admitted += 1
+            self.stats[lane].waits.append(time.perf_counter() - arrived)
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.running -= 1
+                self.stats[lane].latencies.append(time.perf_counter() - arrived)
+                self._cond.notify_all()
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "reserved": self.reserved,
+                "running": self.running,
+                "queued": {lane: len(q) for lane, q in self._queues.items()},
+                "lanes": {lane: stats.as_dict() for lane, stats in self.stats.items()},
+            }
@@ -0,0 +1,261 @@
+"""
+Append-only audit trail of triage decisions.
+
+Records are fixed-size (72 bytes) and written into preallocated, memory-mapped
+segment files. Every writer owns its own segment files and an append costs one
+memory copy: the body is written first and its CRC last, which lets a reader
+recover everything up to the last completed record after a crash. Full
+segments are rotated. AuditLog shares a fixed set of writers between threads
+(see AuditLog.append), so a server that starts a thread per request still
+keeps only that many segments open.
+
+    python audit_log.py scan audit --tag RED --since 2026-10-01
+    python audit_log.py bench --records 1000000
+"""
+import argparse
+import datetime
+import glob
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from triage_logic import RULES, TAGS, VITAL_FIELDS, rule_of, symptom_mask, vital_value
+
+MAGIC = b"TTSAUD01"
+HEADER = struct.Struct("<8sIIIQ36x")  # magic, record size, capacity, writer, first seq
+BODY = struct.Struct("<QdHBBBB16s6fI")  # seq, ts, writer, tag, rule, ews, flags, patient id, vitals, symptoms
+CRC = struct.Struct("<I")
+RECORD_SIZE = 72
+assert HEADER.size == 64 and BODY.size + CRC.size + 2 == RECORD_SIZE
+
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"), ("ts", "<f8"), ("writer", "<u2"), ("tag", "u1"), ("rule", "u1"),
+    ("ews", "u1"), ("flags", "u1"), ("patient_id", "S16"), ("vitals", "<f4", (6,)),
+    ("symptoms", "<u4"), ("crc", "<u4"), ("pad", "V2"),
+])
+assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+FLAG_AMBULANCE = 1
+NO_EWS = 255
+_TAG_CODES = {tag: i for i, tag in enumerate(TAGS)}
+_RULE_CODES = {rule: i for i, rule in enumerate(RULES)}
+_writer_ids = itertools.count(1)
+
+
+class AuditWriter:
+    """Single-owner writer over its own rotating segment files. Not thread-safe by design."""
+
+    def __init__(self, directory: str, segment_records: int = 65536):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.capacity = segment_records
+        self.writer_id = next(_writer_ids) & 0xFFFF
+        # Unique across processes and restarts; segments of one writer sort by name
+        self._prefix = f"{int(time.time() * 1000):012x}-{os.getpid()}-{self.writer_id}"
+        self._segment = -1
+        self._seq = 0
+        self._mm = None
+        self._file = None
+        self._rotate()
+
+    def _rotate(self) -> None:
+        self.close()
+        self._segment += 1
+        path = os.path.join(self.directory, f"{self._prefix}-{self._segment:06d}.aud")
+        self._file = open(path, "w+b")
+        self._file.truncate(HEADER.size + self.capacity * RECORD_SIZE)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        HEADER.pack_into(self._mm, 0, MAGIC, RECORD_SIZE, self.capacity, self.writer_id, self._seq + 1)
+        self._cursor = 0
+
+    def append(self, patient_id: str, patient: Dict, result: Dict, ews: Optional[int] = None,
+               ts: Optional[float] = None) -> int:
+        """Record one triage decision; returns its sequence number within this writer."""
+        if self._cursor == self.capacity:
+            self._rotate()
+        self._seq += 1
+        body = BODY.pack(
+            self._seq, time.time() if ts is None else ts, self.writer_id,
+            _TAG_CODES.get(result["tag"], 255), _RULE_CODES.get(rule_of(result), 255),
+            NO_EWS if ews is None else min(ews, 254),
+            FLAG_AMBULANCE if patient.get("ambulance_arrival") else 0,
+            str(patient_id or "").encode("utf-8")[:16],
+            *[vital_value(patient, field) for field in VITAL_FIELDS],
+            symptom_mask(patient.get("symptoms")),
+        )
+        offset = HEADER.size + self._cursor * RECORD_SIZE
+        self._mm[offset:offset + BODY.size] = body
+        # CRC goes in last: a record is only complete once it matches
+        CRC.pack_into(self._mm, offset + BODY.size, zlib.crc32(body))
+        self._cursor += 1
+        return self._seq
+
+    def flush(self) -> None:
+        """Force written records to disk (mmap writes already survive a process crash)."""
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+
+class AuditLog:
+    """
+    Audit directory shared by many threads through `stripes` writers, each behind
+    its own lock. Threads are spread over the stripes round-robin as they first
+    append, so locks are rarely contended, and the number of open segments (files,
+    maps, preallocated disk) stays fixed however many threads come and go.
+    """
+
+    def __init__(self, directory: str = "audit", segment_records: int = 65536, stripes: int = 4):
+        self.directory = directory
+        self.segment_records = segment_records
+        self._writers = [None] * stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._local = threading.local()
+        self._next_stripe = itertools.count()
+
+    def append(self, patient_id: str, patient: Dict, result: Dict, ews: Optional[int] = None,
+               ts: Optional[float] = None) -> int:
+        stripe = getattr(self._local, "stripe", None)
+        if stripe is None:
+            stripe = self._local.stripe = next(self._next_stripe) % len(self._writers)
+        with self._locks[stripe]:
+            writer = self._writers[stripe]
+            if writer is None:
+                writer = self._writers[stripe] = AuditWriter(self.directory, self.segment_records)
+            return writer.append(patient_id, patient, result, ews, ts)
+
+    def flush(self) -> None:
+        for stripe, lock in enumerate(self._locks):
+            with lock:
+                if self._writers[stripe] is not None:
+                    self._writers[stripe].flush()
+
+    def close(self) -> None:
+        for stripe, lock in enumerate(self._locks):
+            with lock:
+                if self._writers[stripe] is not None:
+                    self._writers[stripe].close()
+                    self._writers[stripe] = None
+
+
+def read_segment(path: str) -> np.ndarray:
+    """Completed records of one segment as a structured array (a view on the mapped file)."""
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, record_size, capacity, _, first_seq = HEADER.unpack_from(raw, 0)
+    if magic != MAGIC or record_size != RECORD_SIZE:
+        raise ValueError(f"{path} is not an audit segment")
+    records = raw[HEADER.size:HEADER.size + capacity * RECORD_SIZE].view(RECORD_DTYPE)
+    # Records are written in order, so the valid ones are the leading run of consecutive sequence numbers
+    expected = np.arange(first_seq, first_seq + len(records), dtype=np.uint64)
+    broken = np.flatnonzero(records["seq"] != expected)
+    count = int(broken[0]) if len(broken) else len(records)
+    # Only the last record can have been torn by a crash
+    if count:
+        last = records[count - 1].tobytes()
+        if zlib.crc32(last[:BODY.size]) != CRC.unpack_from(last, BODY.size)[0]:
+            count -= 1
+    return records[:count]
+
+
+def scan(directory: str, tag: str = None, rule: str = None, patient_id: str = None,
+         since: float = None, until: float = None) -> Iterator[np.ndarray]:
+    """Yield filtered records segment by segment; filters are vectorized over each segment."""
+    for path in sorted(glob.glob(os.path.join(directory, "*.aud"))):
+        records = read_segment(path)
+        mask = np.ones(len(records), dtype=bool)
+        if tag is not None:
+            mask &= records["tag"] == _TAG_CODES[tag]
+        if rule is not None:
+            mask &= records["rule"] == _RULE_CODES[rule]
+        if patient_id is not None:
+            mask &= records["patient_id"] == patient_id.encode("utf-8")[:16]
+        if since is not None:
+            mask &= records["ts"] >= since
+        if until is not None:
+            mask &= records["ts"] < until
+        if mask.any():
+            yield records[mask]
+
+
+def format_record(record) -> str:
+    ts = datetime.datetime.fromtimestamp(float(record["ts"])).isoformat(timespec="seconds")
+    tag = TAGS[record["tag"]] if record["tag"] < len(TAGS) else "?"
+    rule = RULES[record["rule"]] if record["rule"] < len(RULES) else "?"
+    vitals = " ".join(f"{f}={v:g}" for f, v in zip(VITAL_FIELDS, record["vitals"]) if v == v)
+    return f"{ts} {record['patient_id'].decode('utf-8', 'replace')} {tag} {rule} {vitals}"
+
+
+def _timestamp(text: str) -> float:
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+
+def benchmark(directory: str, records: int) -> Dict:
+    log = AuditWriter(directory, segment_records=min(records, 1 << 20))
+    patient = {"o2_saturation": "92", "heart_rate": "118", "temperature": "38.4", "symptoms": ["headache_moderate"]}
+    result = {"tag": "YELLOW", "reason": "Concerning O₂ saturation: 92.0%"}
+    latencies = np.empty(records)
+    clock = time.perf_counter
+    for i in range(records):
+        start = clock()
+        log.append(f"TH{i:08d}", patient, result, 3)
+        latencies[i] = clock() - start
+    log.close()
+    start = clock()
+    scanned = sum(len(batch) for batch in scan(directory, tag="YELLOW"))
+    elapsed = clock() - start
+    return {
+        "records": records,
+        "append_p50_us": float(np.percentile(latencies, 50) * 1e6),
+        "append_p99_us": float(np.percentile(latencies, 99) * 1e6),
+        "scan_records_per_s": scanned / elapsed,
+        "scan_mb_per_s": scanned * RECORD_SIZE / elapsed / 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan_cmd = commands.add_parser("scan", help="filter audit records")
+    scan_cmd.add_argument("directory")
+    scan_cmd.add_argument("--tag", choices=TAGS)
+    scan_cmd.add_argument("--rule", choices=RULES)
+    scan_cmd.add_argument("--patient")
+    scan_cmd.add_argument("--since", type=_timestamp, help="ISO date/time")
+    scan_cmd.add_argument("--until", type=_timestamp, help="ISO date/time")
+    scan_cmd.add_argument("--count", action="store_true", help="only print the number of matches")
+    bench_cmd = commands.add_parser("bench", help="append latency and scan throughput")
+    bench_cmd.add_argument("--records", type=int, default=1_000_000)
+    bench_cmd.add_argument("--directory", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "scan":
+        batches = scan(args.directory, args.tag, args.rule, args.patient, args.since, args.until)
+        if args.count:
+            print(sum(len(batch) for batch in batches))
+        else:
+            for batch in batches:
+                for record in batch:
+                    print(format_record(record))
+    else:
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            stats = benchmark(args.directory or tmp, args.records)
+        print(f"{stats['records']} appends: p50 {stats['append_p50_us']:.2f} us, p99 {stats['append_p99_us']:.2f} us")
+        print(f"scan: {stats['scan_records_per_s'] / 1e6:.1f} M records/s ({stats['scan_mb_per_s']:.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
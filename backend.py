@@ -1,17 +1,546 @@
-from flask import Flask, request, jsonify
+import argparse
+import atexit
+import functools
+import hmac
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from complaint_matcher import ComplaintMatcher
+from patient_index import PatientIndex, normalize_id
+from vitals_history import VitalsHistory
+from early_warning import score_patients, rank_by_risk
+from audit_log import AuditLog
+from triage_archive import ArchiveFlusher, ArchiveWriter, encounter_row
+from waiting_room import WaitingRoom
+from dashboard import DashboardAggregates
+from event_feed import EventFeed
+from diagnosis_index import KINDS, DiagnosisIndex, parse_query
+from admission import AdmissionGate, Overloaded, prescreen
+from local_journal import SeenEntries
+from batch_triage import assess_batch
+from triage_logic import TAGS, assess_triage
+from worker_pool import TriagePool
+from recovery import Checkpointer, LiveState, StateLog
+from single_flight import SingleFlight, triage_key
+from rule_set import RuleStore
+from regional import RegionalAggregator, SiteReporter, http_transport, site_summary
+from validation import (ValidationError, ValidationStats, journal_entries, validate_batch, validate_patient,
+                        validate_records)
+from validation import loads as decode_json
+from wire_format import (MSGPACK, RECORD, WireFormatError, as_records, decode_patients, dumps, encode_results, loads,
+                         negotiate)
 
 app = Flask(__name__)
-CORS(app)
+# Browser clients may call anything but the admin routes from another origin
+CORS(app, resources={r'/(?!admin/).*': {}})
+
+complaint_matcher = ComplaintMatcher()
+# Triage rules, hot-reloadable from TRIAGE_RULES_FILE (loaded by start()) or POST /admin/rules/reload (see rule_set.py)
+rule_store = RuleStore()
+patient_index = PatientIndex()
+vitals_history = VitalsHistory()
+# Opened by start(): see there
+audit_log = None
+archive_writer = None
+archive_flusher = None
+state_log = None
+checkpointer = None
+started = False
+start_lock = threading.Lock()
+# A patient is archived once per visit: the waiting-room check and the discharge happen under this lock
+discharge_lock = threading.Lock()
+waiting_room = WaitingRoom()
+dashboard = DashboardAggregates()
+waiting_room.subscribe(dashboard)
+diagnosis_index = DiagnosisIndex()
+waiting_room.subscribe(diagnosis_index)
+event_feed = EventFeed(waiting_room)
+live_state = LiveState(waiting_room, patient_index, vitals_history)
+admission = AdmissionGate(capacity=int(os.environ.get('TRIAGE_MAX_CONCURRENT', 8)))
+synced_entries = SeenEntries()
+validation_stats = ValidationStats()
+# Identical forms in flight at once (desk retries, two desks) share one evaluation and one set of records
+triage_flight = SingleFlight()
+# Batches at least this large go to the shared-memory worker pool (started on first use; 0 workers disables it)
+POOL_MIN_BATCH = int(os.environ.get('TRIAGE_POOL_MIN_BATCH', 50000))
+POOL_WORKERS = int(os.environ.get('TRIAGE_WORKERS', os.cpu_count() or 1))
+triage_pool = None
+triage_pool_lock = threading.Lock()
+# site: a hospital's triage service, pushing summaries to TRIAGE_REGIONAL_URL if set; regional: also merges
+# the pushes of the district sites (see regional.py)
+MODE = os.environ.get('TRIAGE_MODE', 'site')
+regional_view = RegionalAggregator(stale_after=float(os.environ.get('TRIAGE_SITE_STALE_AFTER', 120)))
+site_reporter = None
+
+def start(audit_dir=None, archive_dir=None, state_dir=None, rules_file=None):
+    """
+    Open everything the backend keeps on disk and start its background threads: the rules file and its
+    watcher, the audit log, the encounter archive and its flusher, and the waiting room, patient index and vitals trends
+    recovered from the state directory (snapshot + write-ahead log, see recovery.py) with their checkpointer.
+    Only the serving process calls this: importing the module (spawn pool workers re-run the main script,
+    the debug reloader's parent, tests) opens no files and starts no threads. Directories default to the
+    TRIAGE_*_DIR variables; calls after the first do nothing.
+    """
+    global rule_store, audit_log, archive_writer, archive_flusher, state_log, checkpointer, started
+    with start_lock:
+        if started:
+            return
+        rules_file = rules_file or os.environ.get('TRIAGE_RULES_FILE')
+        if rules_file:
+            rule_store = RuleStore(rules_file)
+            rule_store.watch()
+        audit_log = AuditLog(audit_dir or os.environ.get('TRIAGE_AUDIT_DIR', 'audit'))
+        atexit.register(audit_log.close)
+        archive_writer = ArchiveWriter(archive_dir or os.environ.get('TRIAGE_ARCHIVE_DIR', 'archive'))
+        atexit.register(archive_writer.flush)
+        archive_flusher = ArchiveFlusher(archive_writer, float(os.environ.get('TRIAGE_ARCHIVE_FLUSH_INTERVAL', 60)))
+        archive_flusher.start()
+        state_log = StateLog(state_dir or os.environ.get('TRIAGE_STATE_DIR', 'state'), live_state.capture)
+        state_log.recover(live_state.restore, live_state.apply)
+        checkpointer = Checkpointer(state_log)
+        checkpointer.start()
+        atexit.register(state_log.close)
+        started = True
+
+def create_app(**dirs):
+    # WSGI entry point, e.g. gunicorn 'backend:create_app()'; dirs as for start(). The site reporter is
+    # configured from TRIAGE_REGIONAL_URL, TRIAGE_SITE_ID and TRIAGE_PUSH_INTERVAL here
+    start(**dirs)
+    if MODE == 'site' and os.environ.get('TRIAGE_REGIONAL_URL'):
+        start_site_reporter(os.environ['TRIAGE_REGIONAL_URL'], os.environ.get('TRIAGE_SITE_ID', socket.gethostname()),
+                            float(os.environ.get('TRIAGE_PUSH_INTERVAL', 5)))
+    return app
+
+def current_summary():
+    now = time.time()
+    return site_summary(dashboard.snapshot(now), now)
+
+def start_site_reporter(regional_url, site_id, interval):
+    # Serving process only (see start()): a second reporter would push under its own, newer epoch and the
+    # regional node would then drop this site's real pushes as stale
+    global site_reporter
+    with start_lock:
+        if site_reporter is None:
+            site_reporter = SiteReporter(site_id, current_summary, http_transport(regional_url), interval=interval)
+            site_reporter.start()
+
+def get_triage_pool():
+    global triage_pool
+    with triage_pool_lock:
+        if triage_pool is None:
+            triage_pool = TriagePool(POOL_WORKERS)
+            atexit.register(triage_pool.close)
+        return triage_pool
+
+def request_payload():
+    # Body decoded by Content-Type (JSON, fixed binary records or MessagePack), once per request
+    if 'payload' not in g:
+        started = time.perf_counter_ns()
+        if request.content_encoding:
+            # Compressed bodies (station journal batches) are decoded by their own endpoint
+            g.payload = None
+        elif request.mimetype == RECORD:
+            g.payload = decode_patients(request.get_data())
+        elif request.mimetype == MSGPACK:
+            g.payload = loads(request.get_data(), MSGPACK)
+        else:
+            g.payload = decode_json(request.get_data()) if request.is_json else None
+        g.parse_ns = time.perf_counter_ns() - started
+    return g.payload
+
+def validated(check):
+    # check(payload) -> normalized form(s), timed together with the decode for /validation/metrics
+    payload = request_payload()
+    started = time.perf_counter_ns()
+    try:
+        data = check(payload)
+    except ValidationError:
+        validation_stats.record(g.parse_ns, time.perf_counter_ns() - started, 0, rejected=True)
+        raise
+    validation_stats.record(g.parse_ns, time.perf_counter_ns() - started, len(data) if isinstance(data, list) else 1)
+    return data
+
+def validated_patient():
+    return validated(validate_patient)
+
+def validated_batch():
+    # Decoded binary records are forms like any other and get the same checks
+    return validated(validate_batch)
+
+def respond(document, results=None):
+    # Encode for the client's Accept header; binary records carry only the results
+    media_type = negotiate(request.headers.get('Accept'))
+    if media_type == RECORD and results is not None:
+        return Response(encode_results(results), mimetype=RECORD)
+    if media_type == MSGPACK:
+        return Response(dumps(document, MSGPACK), mimetype=MSGPACK)
+    return jsonify(document)
+
+@app.errorhandler(WireFormatError)
+def bad_wire_format(e):
+    return jsonify({'error': str(e)}), 400
+
+@app.errorhandler(ValidationError)
+def invalid_input(e):
+    return jsonify(e.as_dict()), 400
+
+def admitted(view=None, lane=None):
+    # Queue the request in its pre-screened (or fixed) lane; shed with 503 when the lane is full
+    if view is None:
+        return functools.partial(admitted, lane=lane)
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            with admission.admit(lane or prescreen(request_payload())):
+                return view(*args, **kwargs)
+        except Overloaded as e:
+            response = jsonify({'error': 'Triage service is busy, please retry', 'lane': e.lane})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+    return wrapper
 
 @app.route('/triage', methods=['POST'])
+@admitted
 def triage():
-    data = request.get_json()
+    if request.mimetype == RECORD:
+        if len(request_payload()) != 1:
+            raise WireFormatError('/triage takes exactly one record; use /triage/batch')
+        data = validated(lambda patients: validate_patient(patients[0]))
+    else:
+        data = validated_patient()
     symptoms = data.get('symptoms', '')
     medications = data.get('medications', [])
     # Hardcoded logic: just echo the symptoms and medications
     answer = f"Diagnosis based on symptoms: {symptoms}. Medications: {', '.join(medications) if medications else 'None'}."
-    return jsonify({'answer': answer})
+    result = dict(coalesced_triage(data), patient_id=normalize_id(data.get('patient_id')))
+    return respond(dict(result, answer=answer), [result])
+
+@app.route('/triage/batch', methods=['POST'])
+@admitted
+def triage_batch():
+    # Every patient is checked before any is recorded
+    patients = validated_batch()
+    results = [dict(coalesced_triage(patient), patient_id=normalize_id(patient.get('patient_id')))
+               for patient in patients]
+    return respond({'results': results}, results)
+
+def coalesced_triage(data):
+    # Callers share the result object; each response is built from its own copy. Keyed by rule
+    # version too, so nobody joins an evaluation made under rules that have since been replaced
+    rules = rule_store.current
+    key = triage_key(data)
+    if key is None:
+        # No patient id: identical forms may be different walk-ins, so each is recorded
+        return dict(record_triage(data, rules=rules))
+    result, _ = triage_flight.do((rules.version,) + key, functools.partial(record_triage, data, rules=rules))
+    return dict(result)
+
+def record_triage(data, now=None, rules=None):
+    # Shared by /triage and journal entries synced from stations (now = when the station recorded it)
+    result = (rules or rule_store.current).assess_with_score(data)
+    patient_id = normalize_id(data.get('patient_id'))
+    audit_log.append(patient_id, data, result, result['ews']['score'], ts=now)
+    if patient_id:
+        now = time.time() if now is None else now
+        change = LiveState.triage_change(patient_id, data, result, now)
+        result['deterioration'] = state_log.record('triage', change, live_state.apply)
+    return result
+
+@app.route('/triage/classify', methods=['POST'])
+@admitted(lane='routine')
+def triage_classify():
+    # Tag and rule id only, for screening large lists; nothing is recorded
+    rules = rule_store.current
+    # Pool workers run the built-in rules
+    use_pool = POOL_WORKERS and rules.default
+    if request.mimetype == RECORD:
+        body = request.get_data()
+        records = as_records(body)
+        if use_pool and len(records) >= POOL_MIN_BATCH:
+            validate_records(records)
+            return respond({'results': get_triage_pool().assess_records(body), 'rules_version': rules.version})
+    patients = validated_batch()
+    if use_pool and len(patients) >= POOL_MIN_BATCH:
+        return respond({'results': get_triage_pool().assess(patients), 'rules_version': rules.version})
+    results = assess_batch(patients) if rules.default else rules.assess_batch(patients)
+    return respond({'results': results, 'rules_version': rules.version})
+
+@app.route('/ews/batch', methods=['POST'])
+@admitted
+def ews_batch():
+    patients = validated_batch()
+    # One vectorized pass over the whole observation round
+    scored = score_patients(patients)
+    return respond({
+        'scores': scored['score'].tolist(),
+        'bands': scored['band'].tolist(),
+        'order': rank_by_risk(scored['score']).tolist(),
+    })
+
+@app.route('/admission/metrics', methods=['GET'])
+def admission_metrics():
+    return jsonify(admission.metrics())
+
+@app.route('/validation/metrics', methods=['GET'])
+def validation_metrics():
+    return jsonify(validation_stats.metrics())
+
+@app.route('/coalescing/metrics', methods=['GET'])
+def coalescing_metrics():
+    return jsonify(triage_flight.metrics())
+
+def admin_allowed():
+    # Admin routes are closed unless a token is configured
+    token = os.environ.get('TRIAGE_ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+@app.route('/rules', methods=['GET'])
+def current_rules():
+    # Read-only, for stations that triage locally with the same rules (TTS_V1.py)
+    rules = rule_store.current
+    return jsonify(dict(rules.describe(), rules=rules.document))
+
+@app.route('/admin/rules', methods=['GET'])
+def get_rules():
+    if not admin_allowed():
+        return jsonify({'error': 'Admin token required'}), 403
+    return current_rules()
+
+@app.route('/admin/rules/reload', methods=['POST'])
+def reload_rules():
+    # Body: a rules document to install; empty body: re-read TRIAGE_RULES_FILE
+    if not admin_allowed():
+        return jsonify({'error': 'Admin token required'}), 403
+    document = request.get_json(silent=True) if request.get_data() else None
+    if request.get_data() and document is None:
+        return jsonify({'error': 'Body must be a JSON rules document'}), 400
+    previous = rule_store.current.version
+    try:
+        rules = rule_store.reload(document).result()
+    except (OSError, ValueError) as e:
+        return jsonify({'error': str(e), 'version': rule_store.current.version}), 400
+    return jsonify(dict(rules.describe(), previous_version=previous, changed=rules.version != previous))
+
+@app.route('/regional/push', methods=['POST'])
+def regional_push():
+    if MODE != 'regional':
+        return jsonify({'error': 'Not a regional node'}), 404
+    body = request.get_data()
+    media_type = MSGPACK if request.mimetype == MSGPACK else 'application/json'
+    try:
+        push = loads(body, media_type)
+    except (WireFormatError, ValueError):
+        return jsonify({'error': 'Unreadable push'}), 400
+    status, ack = regional_view.merge(push if isinstance(push, dict) else {}, len(body))
+    return Response(dumps(ack, media_type), status=status, mimetype=media_type)
+
+@app.route('/regional/view', methods=['GET'])
+def regional_overview():
+    if MODE != 'regional':
+        return jsonify({'error': 'Not a regional node'}), 404
+    return jsonify(regional_view.view())
+
+@app.route('/regional/metrics', methods=['GET'])
+def regional_metrics():
+    if MODE == 'regional':
+        return jsonify(dict(regional_view.metrics, sites=len(regional_view.view()['sites'])))
+    return jsonify(dict(site_reporter.metrics, seq=site_reporter.seq, last_error=site_reporter.last_error)
+                   if site_reporter else {'reporting': False})
+
+@app.route('/dashboard', methods=['GET'])
+def dashboard_snapshot():
+    return jsonify(dashboard.snapshot())
+
+@app.route('/dashboard/deltas', methods=['GET'])
+def dashboard_deltas():
+    since = int(request.args.get('since', 0))
+    deltas = dashboard.deltas_since(since)
+    if deltas is None:
+        # Too far behind for the delta history; start again from a snapshot
+        return jsonify({'deltas': None, 'snapshot': dashboard.snapshot()})
+    return jsonify({'deltas': deltas, 'version': dashboard.version})
+
+@app.route('/events', methods=['GET'])
+def events():
+    # Reconnecting EventSource clients send the last id they applied; an id from before a restart gets a snapshot
+    last = request.headers.get('Last-Event-ID') or request.args.get('since')
+    stream = event_feed.stream(event_feed.resume_seq(last))
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/events/poll', methods=['GET'])
+def events_poll():
+    # Long-poll fallback for clients that cannot keep a stream open; since is the id of the last answer
+    since = event_feed.resume_seq(request.args.get('since'))
+    timeout = min(float(request.args.get('timeout', 25)), 60)
+    events = event_feed.wait(since, timeout) if since is not None else None
+    if events is None:
+        seq, entries = event_feed.snapshot()
+        return jsonify({'id': event_feed.event_id(seq), 'seq': seq, 'snapshot': entries})
+    seq = events[-1][0] if events else since
+    return jsonify({'id': event_feed.event_id(seq), 'seq': seq, 'deltas': [json.loads(data) for _, data in events]})
+
+@app.route('/waiting/search', methods=['GET'])
+def search_waiting():
+    # e.g. ?q=sepsis AND tag:RED OR rule:red_o2 (see diagnosis_index.py); most urgent, longest waiting first
+    try:
+        groups = parse_query(request.args.get('q', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = int(request.args.get('limit', 100))
+    entries = waiting_room.consistent(
+        lambda: [waiting_room.patients[pid] for pid in diagnosis_index.search(groups)])
+    entries.sort(key=lambda entry: (TAGS.index(entry['tag']), entry['tagged_at']))
+    return jsonify({'total': len(entries), 'patients': entries[:limit]})
+
+@app.route('/waiting/terms', methods=['GET'])
+def waiting_terms():
+    kind = request.args.get('kind', 'diagnosis')
+    if kind not in KINDS:
+        return jsonify({'error': f'kind must be one of {", ".join(KINDS)}'}), 400
+    return jsonify({'kind': kind, 'counts': diagnosis_index.counts(kind)})
+
+@app.route('/patients/search', methods=['GET'])
+def search_patients():
+    query = request.args.get('q', '')
+    limit = int(request.args.get('limit', 10))
+    return jsonify({'patients': patient_index.search(query, limit)})
+
+@app.route('/patients/<patient_id>/vitals', methods=['GET'])
+def get_patient_vitals(patient_id):
+    summary = vitals_history.summary(normalize_id(patient_id))
+    if summary is None:
+        return jsonify({'error': f'No vitals recorded for patient: {patient_id}'}), 404
+    return jsonify({'patient_id': normalize_id(patient_id), 'vitals': summary})
+
+@app.route('/patients/<patient_id>/discharge', methods=['POST'])
+def discharge_patient(patient_id):
+    data = request.get_json(silent=True) or {}
+    seen = data.get('seen', True)
+    if not isinstance(seen, bool):
+        return jsonify(ValidationError([{'field': 'seen', 'message': 'must be true or false',
+                                         'value': seen}]).as_dict()), 400
+    record = record_discharge(patient_id, seen)
+    if record is None:
+        if patient_index.get(patient_id) is None:
+            return jsonify({'error': f'Unknown patient: {patient_id}'}), 404
+        return jsonify({'error': f'Patient is not in the waiting room: {patient_id}'}), 409
+    return jsonify({'patient_id': record['patient_id'], 'seen_at': record['seen_at']})
+
+def record_discharge(patient_id, seen=True, now=None):
+    # None unless the patient is waiting: the index keeps discharged patients, the archive gets one row per visit
+    with discharge_lock:
+        record = patient_index.get(patient_id)
+        if record is None or record['patient_id'] not in waiting_room.patients:
+            return None
+        # Left without being seen unless the physician saw them
+        seen_at = (time.time() if now is None else now) if seen else None
+        patient = record['patient']
+        # Archive the tag and rule the patient was given; only records from before results were kept are re-scored
+        result = record.get('result') or assess_triage(patient)
+        archive_writer.append(encounter_row(record['patient_id'], patient, result,
+                                            record['triaged_at'], record['arrived_at'], seen_at, record['ews']))
+        state_log.record('discharge', LiveState.discharge_change(record['patient_id']), live_state.apply)
+        return dict(record, seen_at=seen_at)
+
+@app.route('/sync', methods=['POST'])
+@admitted(lane='routine')
+def sync():
+    # Journal batches from triage stations: zlib-compressed JSON, applied once per entry id
+    body = request.get_data()
+    if request.headers.get('Content-Encoding') == 'deflate':
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise WireFormatError(f'malformed deflate body: {e}') from None
+    entries = journal_entries(decode_json(body))
+    applied = 0
+    rejected = []
+    for entry in entries:
+        entry_id = entry['entry_id']
+        if not synced_entries.claim(entry_id):
+            continue
+        try:
+            errors = apply_entry(entry)
+        except BaseException:
+            # Not applied: the request fails and the station's resend must not be skipped as a duplicate
+            synced_entries.release(entry_id)
+            raise
+        if errors:
+            rejected.append({'entry_id': entry_id, 'errors': errors})
+        else:
+            applied += 1
+    return jsonify({'acknowledged': [entry['entry_id'] for entry in entries], 'applied': applied,
+                    'rejected': rejected})
+
+def apply_entry(entry):
+    # Validation errors for one journal entry, or None once it is applied. A bad entry is acknowledged anyway
+    # (resending it cannot fix it) and reported back, so it never blocks the rest of the station's journal
+    if entry['kind'] == 'triage':
+        # Same checks and normalization as /triage
+        try:
+            payload = validate_patient(entry['payload'])
+        except ValidationError as e:
+            return e.errors
+        record_triage(payload, entry.get('recorded_at'))
+    else:
+        seen = entry['payload'].get('seen', True)
+        if not isinstance(seen, bool):
+            return [{'field': 'seen', 'message': 'must be true or false', 'value': seen}]
+        record_discharge(entry['payload']['patient_id'], seen, entry.get('recorded_at'))
+    return None
+
+@app.route('/patients/<patient_id>', methods=['GET'])
+def get_patient(patient_id):
+    record = patient_index.get(patient_id)
+    if record is None:
+        return jsonify({'error': f'Unknown patient: {patient_id}'}), 404
+    return jsonify(record)
+
+@app.route('/complaints/match', methods=['POST'])
+def match_complaints():
+    data = decode_json(request.get_data())
+    if not isinstance(data, dict):
+        raise ValidationError([{'field': '', 'message': 'must be an object'}])
+    complaints = data.get('complaints', [])
+    limit = data.get('limit', 3)
+    errors = []
+    if not isinstance(complaints, list):
+        errors.append({'field': 'complaints', 'message': 'must be a list of strings'})
+    else:
+        errors += [{'field': f'complaints[{i}]', 'message': 'must be a string', 'value': text}
+                   for i, text in enumerate(complaints) if not isinstance(text, str)][:1]
+    if type(limit) is not int or limit < 1:
+        errors.append({'field': 'limit', 'message': 'must be a whole number of at least 1', 'value': limit})
+    if errors:
+        raise ValidationError(errors)
+    # Registration queues arrive as one list; map them all in a single call
+    matches = complaint_matcher.match_batch(complaints, limit)
+    return jsonify({'matches': matches})
 
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=5000, debug=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Triage backend')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--no-debug', dest='debug', action='store_false')
+    parser.add_argument('--mode', choices=('site', 'regional'), default=MODE)
+    parser.add_argument('--site-id', default=os.environ.get('TRIAGE_SITE_ID', socket.gethostname()))
+    parser.add_argument('--regional-url', default=os.environ.get('TRIAGE_REGIONAL_URL'))
+    parser.add_argument('--push-interval', type=float, default=float(os.environ.get('TRIAGE_PUSH_INTERVAL', 5)))
+    args = parser.parse_args()
+    MODE = args.mode
+    # With the debug reloader this process only watches the sources; the serving one is its child
+    serving = not args.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    if serving:
+        start()
+    if MODE == 'site' and args.regional_url and serving:
+        start_site_reporter(args.regional_url, args.site_id, args.push_interval)
+    # threaded: every /events subscriber holds its own connection
+    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True) 
\ No newline at end of file
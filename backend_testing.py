@@ -0,0 +1,38 @@
+"""
+The backend as the test suites use it: started once per test process on a
+throwaway directory for its audit log, archive and state, which is removed
+again at exit.
+
+    backend = started_backend()
+    client = backend.app.test_client()
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+
+_lock = threading.Lock()
+_scratch = None
+
+
+def started_backend():
+    """backend, started on this process's scratch directories (the first call starts it)."""
+    global _scratch
+    import backend
+    with _lock:
+        if _scratch is None:
+            _scratch = tempfile.mkdtemp(prefix="triage-test-")
+            # Registered before start() adds its own handlers, so it runs after they have closed the files
+            atexit.register(_cleanup, backend, _scratch)
+            backend.start(audit_dir=os.path.join(_scratch, "audit"), archive_dir=os.path.join(_scratch, "archive"),
+                          state_dir=os.path.join(_scratch, "state"))
+    return backend
+
+
+def _cleanup(backend, scratch: str) -> None:
+    for thread in (backend.checkpointer, backend.archive_flusher):
+        if thread is not None:
+            thread.stop()
+            thread.join(5)
+    shutil.rmtree(scratch, ignore_errors=True)
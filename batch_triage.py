@@ -0,0 +1,180 @@
+"""
+assess_triage over whole columns of patients at once.
+
+Patients are converted once into numeric columns (see COLUMNS); the rule
+cascade then runs as a handful of numpy comparisons per rule over the whole
+batch and yields a tag and rule id per patient, identical to what
+assess_triage returns for the same dict. That includes its parsing quirks: a
+vital that float()/int() cannot convert aborts the rest of that vitals block,
+so each column keeps a per-field "invalid" bit next to the converted value.
+
+Rows that assess_triage itself would reject (e.g. symptoms that are not a list)
+are flagged as `fallback`; callers run assess_triage on those directly. Binary
+wire_format records fill the columns without any per-patient Python at all.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from triage_logic import (GREEN_SYMPTOMS, RED_SYMPTOMS, RULES, SYMPTOM_IDS, TAGS, VITAL_RULES, YELLOW_SYMPTOMS,
+                          assess_triage, in_interval, rule_of, symptom_mask)
+from wire_format import VITALS as WIRE_VITALS
+
+# Conversion order inside assess_triage's vitals blocks, with each field's default when absent
+BLOCK_FIELDS = ("o2_saturation", "gcs_score", "temperature", "systolic_bp", "diastolic_bp", "heart_rate")
+DEFAULTS = {"o2_saturation": 0.0, "gcs_score": 15.0, "temperature": 0.0, "systolic_bp": 0.0, "diastolic_bp": 0.0,
+            "heart_rate": 0.0}
+
+# name -> (dtype, per-row shape)
+COLUMNS = {
+    "vitals": (np.float64, (len(BLOCK_FIELDS),)),
+    "invalid": (np.uint8, ()),      # bit i: BLOCK_FIELDS[i] raises on conversion
+    "ambulance": (np.uint8, ()),
+    "symptoms": (np.uint32, ()),
+    "fallback": (np.uint8, ()),
+    "tag": (np.uint8, ()),          # output: index into TAGS
+    "rule": (np.uint8, ()),         # output: index into RULES
+}
+
+RED_MASK = symptom_mask(RED_SYMPTOMS)
+YELLOW_MASK = symptom_mask(YELLOW_SYMPTOMS)
+GREEN_MASK = symptom_mask(GREEN_SYMPTOMS)
+_RULE = {rule: i for i, rule in enumerate(RULES)}
+_TAG = {tag: i for i, tag in enumerate(TAGS)}
+_GCS = BLOCK_FIELDS.index("gcs_score")
+_MISSING = object()
+_SYMPTOM_BITS = {sid: 1 << i for i, sid in enumerate(SYMPTOM_IDS)}
+# Where each block field sits in a wire_format record's vitals
+_RECORD_FIELDS = [WIRE_VITALS.index(field) for field in BLOCK_FIELDS]
+# Tag index for each rule id
+RULE_TAGS = np.array([_TAG["RED" if r == "ambulance" or r.startswith("red_") else
+                           "YELLOW" if r.startswith("yellow_") else "GREEN"] for r in RULES], np.uint8)
+
+
+def allocate(rows: int) -> Dict[str, np.ndarray]:
+    return {name: np.zeros((rows,) + shape, dtype) for name, (dtype, shape) in COLUMNS.items()}
+
+
+def fill(patients: List[Dict], columns: Dict[str, np.ndarray], offset: int = 0) -> None:
+    """Write the input columns for `patients` into rows offset.. of `columns`."""
+    if not patients:
+        return
+    vitals, invalid, ambulance, masks, fallback = [], [], [], [], []
+    defaults = [DEFAULTS[field] for field in BLOCK_FIELDS]
+    bits_of = _SYMPTOM_BITS
+    for patient in patients:
+        try:
+            # Iterating the symptoms fails exactly when assess_triage's own loop would
+            mask = 0
+            for s in patient.get("symptoms", ()):
+                mask |= bits_of.get(s, 0)
+        except (AttributeError, TypeError):
+            fallback.append(1)
+            vitals.append(defaults)
+            invalid.append(0)
+            ambulance.append(0)
+            masks.append(0)
+            continue
+        row, bits = [], 0
+        for i, field in enumerate(BLOCK_FIELDS):
+            raw = patient.get(field, _MISSING)
+            if raw is _MISSING:
+                row.append(defaults[i])
+            elif raw == "":
+                # A blank form field: float("") raises, so skip the exception round trip
+                row.append(0.0)
+                bits |= 1 << i
+            else:
+                try:
+                    # GCS goes through int(): "14" and 14.7 convert, "14.0" does not
+                    row.append(float(int(raw)) if i == _GCS else float(raw))
+                except Exception:
+                    row.append(0.0)
+                    bits |= 1 << i
+        vitals.append(row)
+        invalid.append(bits)
+        ambulance.append(1 if patient.get("ambulance_arrival") else 0)
+        masks.append(mask)
+        fallback.append(0)
+    rows = slice(offset, offset + len(patients))
+    columns["vitals"][rows] = vitals
+    columns["invalid"][rows] = invalid
+    columns["ambulance"][rows] = ambulance
+    columns["symptoms"][rows] = masks
+    columns["fallback"][rows] = fallback
+
+
+def fill_records(records: np.ndarray, columns: Dict[str, np.ndarray], offset: int = 0) -> None:
+    """
+    Input columns straight from wire_format.PATIENT_DTYPE records, with no per-patient
+    Python: the same as fill(wire_format.decode_patients(...)) would produce.
+    """
+    rows = slice(offset, offset + len(records))
+    values = np.round(records["vitals"][:, _RECORD_FIELDS].astype(np.float64), 3)
+    missing = np.isnan(values)
+    # decode_patients turns a non-integral GCS into text like "14.5", which int() rejects
+    gcs = values[:, _GCS]
+    bad_gcs = ~missing[:, _GCS] & (gcs != np.floor(gcs))
+    values[bad_gcs, _GCS] = 0.0
+    columns["vitals"][rows] = np.where(missing, [DEFAULTS[field] for field in BLOCK_FIELDS], values)
+    columns["invalid"][rows] = np.where(bad_gcs, 1 << _GCS, 0)
+    columns["ambulance"][rows] = records["flags"] & 1
+    columns["symptoms"][rows] = records["symptoms"]
+    columns["fallback"][rows] = 0
+
+
+def assess_columns(columns: Dict[str, np.ndarray], rules: Dict = VITAL_RULES) -> None:
+    """
+    Set columns["tag"] and columns["rule"] for every row (fallback rows are left to the caller).
+    `rules` replaces the vital thresholds (see triage_logic.VITAL_RULES), e.g. to compare versions.
+    """
+    v = columns["vitals"]
+    invalid = columns["invalid"]
+    # A block stops at the first field that fails to convert; bp checks need both pressures
+    ok_o2 = invalid & 1 == 0
+    ok_gcs = ok_o2 & (invalid & 2 == 0)
+    ok_temp = ok_gcs & (invalid & 4 == 0)
+    ok_bp = ok_temp & (invalid & 24 == 0)
+    ok_hr = ok_bp & (invalid & 32 == 0)
+    ok = dict(zip(BLOCK_FIELDS, (ok_o2, ok_gcs, ok_temp, ok_bp, ok_bp, ok_hr)))
+    symptoms = columns["symptoms"]
+    special = {
+        "ambulance": columns["ambulance"] != 0,
+        "red_symptom": symptoms & RED_MASK != 0,
+        "yellow_symptoms": symptoms & YELLOW_MASK != 0,
+        "green_symptoms": symptoms & GREEN_MASK != 0,
+    }
+    rule = np.full(len(symptoms), _RULE["default"], np.uint8)
+    # Same order as assess_triage, applied in reverse so earlier (higher-priority) rules overwrite later ones
+    for name in reversed(RULES[:-1]):
+        if name in special:
+            hit = special[name]
+        else:
+            hit = np.zeros(len(symptoms), bool)
+            for vital, low, high, bounds in rules.get(name, ()):
+                i = BLOCK_FIELDS.index(vital)
+                hit |= ok[vital] & in_interval(v[:, i], low, high, bounds)
+        rule[hit] = _RULE[name]
+    columns["rule"][:] = rule
+    columns["tag"][:] = RULE_TAGS[rule]
+
+
+def assess_batch(patients: List[Dict]) -> List[Dict]:
+    """[{"tag", "rule"}] per patient, in one process; the reference for the worker pool."""
+    columns = allocate(len(patients))
+    fill(patients, columns)
+    assess_columns(columns)
+    return results_from(columns, len(patients), patients)
+
+
+def results_from(columns: Dict[str, np.ndarray], n: int, patients: List[Dict] = None) -> List[Dict]:
+    """Results for the first n rows; fallback rows are assessed from `patients` with assess_triage."""
+    results = [{"tag": TAGS[tag], "rule": RULES[rule]}
+               for tag, rule in zip(columns["tag"][:n].tolist(), columns["rule"][:n].tolist())]
+    for row in np.flatnonzero(columns["fallback"][:n]).tolist():
+        try:
+            result = assess_triage(patients[row])
+            results[row] = {"tag": result["tag"], "rule": rule_of(result)}
+        except Exception as e:
+            results[row] = {"tag": None, "rule": None, "error": str(e)}
+    return results
@@ -0,0 +1,125 @@
+"""
+Load test for the backend's admission lanes.
+
+Runs the backend on a free local port and measures critical-lane latency
+(ambulance / red-range vitals) on its own, then while a pool of routine clients
+floods the service, first without and then with admission lanes. Each triage is given a simulated service
+time (--service-ms) standing in for a busy host, so slots are actually scarce.
+
+    python bench_admission.py --routine-clients 32 --duration 5
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("TRIAGE_AUDIT_DIR", tempfile.mkdtemp(prefix="bench-audit-"))
+os.environ.setdefault("TRIAGE_ARCHIVE_DIR", tempfile.mkdtemp(prefix="bench-archive-"))
+# Benchmark patients must never reach the real waiting room's write-ahead log
+os.environ.setdefault("TRIAGE_STATE_DIR", tempfile.mkdtemp(prefix="bench-state-"))
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import backend  # noqa: E402
+from admission import AdmissionGate  # noqa: E402
+
+CRITICAL = {"ambulance_arrival": True, "symptoms": []}
+ROUTINE = {"heart_rate": "80", "symptoms": ["eye_problems"]}
+
+
+def post(port, payload):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        started = time.perf_counter()
+        conn.request("POST", "/triage", json.dumps(payload), {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def critical_client(port, rate, stop, latencies):
+    while not stop.is_set():
+        status, elapsed = post(port, CRITICAL)
+        if status == 200:
+            latencies.append(elapsed)
+        stop.wait(1 / rate)
+
+
+def routine_client(port, stop, counts):
+    while not stop.is_set():
+        status, _ = post(port, ROUTINE)
+        counts[status] = counts.get(status, 0) + 1
+        if status == 503:
+            stop.wait(0.01)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+
+def run_phase(port, args, routine_clients):
+    stop = threading.Event()
+    latencies, counts = [], {}
+    threads = [threading.Thread(target=critical_client, args=(port, args.critical_rate, stop, latencies))]
+    threads += [threading.Thread(target=routine_client, args=(port, stop, counts)) for _ in range(routine_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Admission-lane load test")
+    parser.add_argument("--routine-clients", type=int, default=32)
+    parser.add_argument("--critical-rate", type=float, default=20, help="critical requests per second")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--service-ms", type=float, default=20, help="simulated work per triage")
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--reserved", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    record_triage = backend.record_triage
+
+    def slow_record_triage(*a, **kw):
+        time.sleep(args.service_ms / 1000)
+        return record_triage(*a, **kw)
+    backend.record_triage = slow_record_triage
+
+    server = make_server("127.0.0.1", 0, backend.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def lanes():
+        return AdmissionGate(capacity=args.capacity, reserved=args.reserved,
+                             max_queue={"routine": args.capacity * 4})
+
+    def unlimited():
+        # No admission control: every request runs as soon as a server thread picks it up
+        return AdmissionGate(capacity=10000, reserved=0, max_queue={"routine": 10000})
+
+    flood = args.routine_clients
+    for label, clients, gate in (("critical only", 0, lanes()),
+                                 (f"+ {flood} routine, no lanes", flood, unlimited()),
+                                 (f"+ {flood} routine, with lanes", flood, lanes())):
+        backend.admission = gate
+        latencies, counts = run_phase(server.server_port, args, clients)
+        served = gate.metrics()["lanes"]["critical"]["latency"]
+        line = (f"{label:>28}: critical n={len(latencies)} client p50 {statistics.median(latencies) * 1000:.1f}"
+                f" p99 {percentile(latencies, 0.99):.1f} ms, in-server p99 {served['p99_ms']:.1f} ms")
+        if counts:
+            line += f" | routine 200={counts.get(200, 0)} 503={counts.get(503, 0)}"
+        print(line)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Multi-client benchmark for the backend's /events feed.
+
+Starts the backend on a free local port, connects N SSE subscribers, posts
+triage events and reports fan-out latency (publish -> received by each
+subscriber) and the CPU the whole process burns while subscribers sit idle.
+
+    python bench_event_feed.py --subscribers 50 --events 200
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("TRIAGE_AUDIT_DIR", tempfile.mkdtemp(prefix="bench-audit-"))
+os.environ.setdefault("TRIAGE_ARCHIVE_DIR", tempfile.mkdtemp(prefix="bench-archive-"))
+# Benchmark patients must never reach the real waiting room's write-ahead log
+os.environ.setdefault("TRIAGE_STATE_DIR", tempfile.mkdtemp(prefix="bench-state-"))
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import backend  # noqa: E402
+from feed_client import FeedSubscriber  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SSE fan-out benchmark")
+    parser.add_argument("--subscribers", type=int, default=50)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between published events")
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds to measure idle CPU")
+    args = parser.parse_args(argv)
+
+    server = make_server("127.0.0.1", 0, backend.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    published = {}
+    backend.waiting_room.subscribe(lambda *_: published.__setitem__(backend.event_feed.seq, time.perf_counter()))
+
+    received = [dict() for _ in range(args.subscribers)]
+    ready = threading.Semaphore(0)
+    subscribers = []
+    for i in range(args.subscribers):
+        def on_delta(delta, seen=received[i]):
+            seen[delta["seq"]] = time.perf_counter()
+        sub = FeedSubscriber(f"http://127.0.0.1:{port}/events", lambda entries, seq: ready.release(), on_delta)
+        sub.start()
+        subscribers.append(sub)
+    for _ in subscribers:
+        ready.acquire()
+
+    cpu = time.process_time()
+    time.sleep(args.idle)
+    idle_cpu = (time.process_time() - cpu) / args.idle
+
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    first_seq = backend.event_feed.seq + 1
+    for n in range(args.events):
+        body = json.dumps({"patient_id": f"B{n % 500}", "heart_rate": str(60 + n % 120), "symptoms": []})
+        conn.request("POST", "/triage", body, {"Content-Type": "application/json"})
+        conn.getresponse().read()
+        time.sleep(args.interval)
+    last_seq = backend.event_feed.seq
+
+    deadline = time.time() + 10
+    while time.time() < deadline and any(len(r) < last_seq - first_seq + 1 for r in received):
+        time.sleep(0.05)
+
+    latencies = [(seen[seq] - published[seq]) * 1000
+                 for seen in received for seq in range(first_seq, last_seq + 1) if seq in seen]
+    delivered = len(latencies)
+    expected = args.subscribers * (last_seq - first_seq + 1)
+    latencies.sort()
+    print(f"{args.subscribers} subscribers, {last_seq - first_seq + 1} events: delivered {delivered}/{expected}")
+    if latencies:
+        print(f"fan-out latency ms: p50 {statistics.median(latencies):.2f}, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}, max {latencies[-1]:.2f}")
+    print(f"idle CPU with {args.subscribers} subscribers connected: {idle_cpu:.1%} of one core")
+
+    for sub in subscribers:
+        sub.stop()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Speed of the triage engine, with a stored baseline to catch regressions.
+
+Three groups of benchmarks:
+  rule/<id>     one assess_triage call whose decision comes from rule <id>
+                (one fixed patient per rule path, checked to hit that rule)
+  batch/<path>  per-patient cost over a batch of synthetic patients:
+                assess_triage in a loop, batch_triage.assess_batch on the
+                dicts, and assess_columns on binary wire records
+  opd/<dept>    determine_opd for each department it can route to
+
+Each benchmark is calibrated to run ~10 ms per sample and warmed up; then
+--repeats rounds take one sample of every benchmark each. The report gives the
+median and inter-quartile range in ns per call. `save` writes the results, with
+the interpreter, platform and engine source they came from, to
+triage_bench_baseline.json next to triage_test_report.csv; `compare` re-runs
+and flags every benchmark whose median is more than --tolerance slower than
+the baseline (and slower by more than the noise), exiting 1 if any is.
+
+    python bench_triage.py run
+    python bench_triage.py save
+    python bench_triage.py compare --tolerance 0.15
+    python bench_triage.py compare --only rule/ --repeats 31
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import triage_logic
+from batch_triage import allocate, assess_batch, assess_columns, fill_records
+from bench_wire_format import synthetic_patients
+from triage_logic import RULES, assess_triage, determine_opd, rule_of
+from wire_format import as_records, encode_patients
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_bench_baseline.json")
+BASELINE_FORMAT = 1
+SAMPLE_SECONDS = 0.01
+
+_NORMAL = {"o2_saturation": "98", "gcs_score": "15", "temperature": "37", "systolic_bp": "120",
+           "diastolic_bp": "80", "heart_rate": "75", "symptoms": []}
+# One patient per rule path; later rules need every earlier check to pass
+RULE_CASES = {
+    "ambulance": {"ambulance_arrival": True},
+    "red_o2": {"o2_saturation": "85"},
+    "red_gcs": {"gcs_score": "8"},
+    "red_temp_high": {"temperature": "40.5"},
+    "red_temp_low": {"temperature": "34"},
+    "red_bp_high": {"systolic_bp": "230"},
+    "red_bp_low": {"systolic_bp": "75"},
+    "red_hr_low": {"heart_rate": "35"},
+    "red_hr_high": {"heart_rate": "160"},
+    "red_symptom": {"symptoms": ["joint_pain", "chest_pain"]},
+    "yellow_o2": {"o2_saturation": "92"},
+    "yellow_gcs": {"gcs_score": "12"},
+    "yellow_temp_low": {"temperature": "35.5"},
+    "yellow_temp_high": {"temperature": "38.5"},
+    "yellow_bp_low": {"systolic_bp": "85"},
+    "yellow_bp_high": {"systolic_bp": "180"},
+    "yellow_hr_low": {"heart_rate": "45"},
+    "yellow_hr_high": {"heart_rate": "120"},
+    "yellow_symptoms": {"symptoms": ["joint_pain", "vomiting_nausea", "headache_moderate"]},
+    "green_symptoms": {"symptoms": ["eye_problems", "constipation"]},
+    "default": {},
+}
+OPD_CASES = {
+    "Pediatrics": {"age": "7", "symptoms": ["pediatric_routine"]},
+    "OB/GYN": {"age": "29", "gender": "Female", "symptoms": ["gynecological"]},
+    "Ophthalmology": {"age": "45", "gender": "Male", "symptoms": ["eye_problems"]},
+    "Orthopedics": {"age": "60", "gender": "Female", "symptoms": ["joint_pain"]},
+    "Psychiatry": {"age": "33", "gender": "Male", "symptoms": ["psychiatric_issues"]},
+    "Internal Medicine": {"age": "50", "gender": "Male", "symptoms": ["constipation", "medication_request"]},
+}
+
+
+def rule_patient(rule: str) -> Dict:
+    return dict(_NORMAL, **RULE_CASES[rule])
+
+
+def benchmarks(batch_size: int = 1000) -> Dict[str, Callable[[], None]]:
+    """name -> zero-argument call to time (batch/* calls process `batch_size` patients)."""
+    cases = {}
+    for rule in RULES:
+        patient = rule_patient(rule)
+        if rule_of(assess_triage(patient)) != rule:
+            raise AssertionError(f"RULE_CASES[{rule!r}] does not reach {rule}")
+        cases[f"rule/{rule}"] = lambda patient=patient: assess_triage(patient)
+    patients = synthetic_patients(batch_size)
+    records = as_records(encode_patients(patients))
+    columns = allocate(batch_size)
+
+    def records_path():
+        fill_records(records, columns)
+        assess_columns(columns)
+
+    cases["batch/assess_triage"] = lambda: [assess_triage(p) for p in patients]
+    cases["batch/assess_batch"] = lambda: assess_batch(patients)
+    cases["batch/records"] = records_path
+    for department, patient in OPD_CASES.items():
+        if determine_opd(patient) != department:
+            raise AssertionError(f"OPD_CASES[{department!r}] routes to {determine_opd(patient)}")
+        cases[f"opd/{department}"] = lambda patient=patient: determine_opd(patient)
+    return cases
+
+
+def calibrate(fn: Callable[[], None]) -> int:
+    """Loop count that makes one sample take about SAMPLE_SECONDS."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= SAMPLE_SECONDS / 5:
+            return max(1, int(number * SAMPLE_SECONDS / elapsed))
+        number *= 10
+
+
+def sample(fn: Callable[[], None], number: int) -> float:
+    """Seconds per call over `number` calls."""
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - started) / number
+
+
+def summarize(samples: List[float], per: int = 1) -> Dict:
+    """Median and inter-quartile range in ns per call (per item for batch benchmarks)."""
+    ns = sorted(s * 1e9 / per for s in samples)
+    q1, _, q3 = statistics.quantiles(ns, n=4) if len(ns) > 1 else (ns[0], None, ns[0])
+    return {"median_ns": round(statistics.median(ns), 1), "iqr_ns": round(q3 - q1, 1), "repeats": len(ns)}
+
+
+def run(only: str = None, repeats: int = 15, warmup: float = 0.05, batch_size: int = 1000) -> Dict[str, Dict]:
+    """
+    Median/IQR per benchmark. Samples are taken round-robin (one of each benchmark per
+    round) so that drift in machine load spreads over all of them instead of a few.
+    """
+    cases = {name: fn for name, fn in benchmarks(batch_size).items() if not only or name.startswith(only)}
+    numbers = {}
+    for name, fn in cases.items():
+        numbers[name] = calibrate(fn)
+        deadline = time.perf_counter() + warmup
+        while time.perf_counter() < deadline:
+            fn()
+    samples = {name: [] for name in cases}
+    for _ in range(repeats):
+        for name, fn in cases.items():
+            samples[name].append(sample(fn, numbers[name]))
+    return {name: summarize(samples[name], batch_size if name.startswith("batch/") else 1) for name in cases}
+
+
+def engine_digest() -> str:
+    """Short hash of the engine source, so a baseline says which rules it timed."""
+    source = inspect.getsource(triage_logic).encode("utf-8")
+    return hashlib.sha256(source).hexdigest()[:12]
+
+
+def environment() -> Dict:
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "platform": platform.platform(), "numpy": np.__version__}
+
+
+def save(results: Dict[str, Dict], path: str = BASELINE) -> Dict:
+    baseline = {"format": BASELINE_FORMAT, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "engine": engine_digest(), "environment": environment(), "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+    return baseline
+
+
+def load(path: str = BASELINE) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"{path}: baseline format {baseline.get('format')}, expected {BASELINE_FORMAT}")
+    return baseline
+
+
+def compare(baseline: Dict[str, Dict], current: Dict[str, Dict], tolerance: float = 0.10) -> List[Dict]:
+    """
+    One row per benchmark in both runs. `regressed` when the median is more than
+    `tolerance` slower and the slowdown exceeds the larger of the two IQRs.
+    """
+    rows = []
+    for name in current:
+        if name not in baseline:
+            continue
+        old, new = baseline[name], current[name]
+        ratio = new["median_ns"] / old["median_ns"] if old["median_ns"] else 1.0
+        slower = new["median_ns"] - old["median_ns"]
+        rows.append({"name": name, "baseline_ns": old["median_ns"], "current_ns": new["median_ns"],
+                     "ratio": round(ratio, 3),
+                     "regressed": ratio > 1 + tolerance and slower > max(old["iqr_ns"], new["iqr_ns"])})
+    return rows
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    print(f"{'benchmark':<28} {'median ns':>11} {'IQR ns':>9}  (batch/*: per patient)")
+    for name, row in results.items():
+        print(f"{name:<28} {row['median_ns']:>11.1f} {row['iqr_ns']:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triage engine benchmarks with a stored baseline")
+    parser.add_argument("command", choices=("run", "save", "compare"))
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--only", help="benchmark name prefix, e.g. rule/ or batch/assess")
+    parser.add_argument("--repeats", type=int, default=15)
+    parser.add_argument("--warmup", type=float, default=0.05, help="seconds per benchmark")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown, e.g. 0.10 = 10%%")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    baseline = load(args.baseline) if args.command == "compare" else None
+    results = run(args.only, args.repeats, args.warmup, args.batch_size)
+    if args.command == "run":
+        print(json.dumps(results, indent=2)) if args.json else print_results(results)
+    elif args.command == "save":
+        save(results, args.baseline)
+        print_results(results)
+        print(f"\nBaseline written to {args.baseline}")
+    else:
+        rows = compare(baseline["results"], results, args.tolerance)
+        regressed = [row for row in rows if row["regressed"]]
+        if args.json:
+            print(json.dumps({"baseline_engine": baseline["engine"], "engine": engine_digest(), "rows": rows},
+                             indent=2))
+        else:
+            if baseline["environment"] != environment():
+                print("note: baseline was recorded on a different interpreter/platform:", baseline["environment"])
+            if baseline["engine"] != engine_digest():
+                print(f"note: baseline was recorded on other engine source ({baseline['engine']}, now "
+                      f"{engine_digest()}); re-save it once the change is accepted")
+            print(f"{'benchmark':<28} {'baseline ns':>12} {'current ns':>11} {'ratio':>7}")
+            for row in rows:
+                print(f"{row['name']:<28} {row['baseline_ns']:>12.1f} {row['current_ns']:>11.1f}"
+                      f" {row['ratio']:>7.3f}" + ("  SLOWER" if row["regressed"] else ""))
+            print(f"\n{len(regressed)} of {len(rows)} benchmarks slower than the baseline by more than"
+                  f" {args.tolerance:.0%}")
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
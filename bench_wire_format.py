@@ -0,0 +1,87 @@
+"""
+Serialization cost of the /triage wire formats.
+
+For each batch size, times the server's share of the encoding work (decode
+the request, encode the response) and the client's (the reverse) for JSON,
+fixed binary records and, if installed, MessagePack, and reports bytes per
+patient on the wire.
+
+    python bench_wire_format.py --sizes 1 10 100 1000 10000
+"""
+import argparse
+import random
+import time
+
+from early_warning import assess_with_score
+from triage_logic import SYMPTOM_IDS
+from wire_format import (RECORD, available_types, decode_patients, decode_results, dumps, encode_patients,
+                         encode_results, loads)
+
+
+def synthetic_patients(n, seed=1):
+    rng = random.Random(seed)
+    patients = []
+    for i in range(n):
+        patients.append({
+            "patient_id": f"P{i:07d}",
+            "ambulance_arrival": rng.random() < 0.05,
+            "o2_saturation": str(rng.randint(84, 100)),
+            "gcs_score": str(rng.choice([15, 15, 15, 14, 12, 9])),
+            "temperature": f"{rng.uniform(35, 40.5):.1f}",
+            "systolic_bp": str(rng.randint(85, 200)),
+            "diastolic_bp": str(rng.randint(50, 115)),
+            "heart_rate": str(rng.randint(45, 140)),
+            "blood_glucose": "" if rng.random() < 0.5 else str(rng.randint(60, 250)),
+            "pain_score": str(rng.randint(0, 10)),
+            "age": str(rng.randint(1, 90)),
+            "gender": rng.choice(["Male", "Female"]),
+            "symptoms": rng.sample(SYMPTOM_IDS, rng.randint(0, 3)),
+        })
+    return patients
+
+
+def codec(media_type):
+    """(encode patients, decode patients, encode results, decode results) for one media type."""
+    if media_type == RECORD:
+        return encode_patients, decode_patients, encode_results, decode_results
+    return (lambda patients: dumps({"patients": patients}, media_type),
+            lambda body: loads(body, media_type)["patients"],
+            lambda results: dumps({"results": results}, media_type),
+            lambda body: loads(body, media_type)["results"])
+
+
+def best_of(fn, arg, budget):
+    """Fastest single call (seconds) over roughly `budget` seconds of repeats."""
+    best, deadline = float("inf"), time.perf_counter() + budget
+    while time.perf_counter() < deadline or best == float("inf"):
+        started = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wire-format serialization benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--budget", type=float, default=0.2, help="seconds of timing per measurement")
+    args = parser.parse_args(argv)
+
+    print("us per patient; server = decode request + encode response, client = the reverse")
+    print(f"{'batch':>6} {'format':<28} {'server':>8} {'client':>8} {'req B/pt':>9} {'resp B/pt':>10}")
+    for size in args.sizes:
+        patients = synthetic_patients(size)
+        results = [dict(assess_with_score(p), patient_id=p["patient_id"]) for p in patients]
+        for media_type in available_types():
+            encode_req, decode_req, encode_resp, decode_resp = codec(media_type)
+            request, response = encode_req(patients), encode_resp(results)
+            server = best_of(decode_req, request, args.budget) + best_of(encode_resp, results, args.budget)
+            client = best_of(encode_req, patients, args.budget) + best_of(decode_resp, response, args.budget)
+            print(f"{size:>6} {media_type:<28} {server / size * 1e6:>8.2f} {client / size * 1e6:>8.2f}"
+                  f" {len(request) / size:>9.1f} {len(response) / size:>10.1f}")
+        # The triage rules themselves, for scale
+        assess = best_of(lambda batch: [assess_with_score(p) for p in batch], patients, args.budget)
+        print(f"{size:>6} {'(assess_with_score)':<28} {assess / size * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
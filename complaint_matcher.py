@@ -0,0 +1,213 @@
+import html
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from triage_logic import SYMPTOM_NAMES, RED_SYMPTOMS, YELLOW_SYMPTOMS
+
+# Precompiled once; strip_html_tags used to rebuild this on every call
+HTML_TAG_RE = re.compile('<.*?>')
+TOKEN_RE = re.compile(r"[a-z]+")
+
+NEGATIONS = {"no", "not", "non", "without", "denies"}
+STOPWORDS = {"a", "an", "and", "or", "of", "the", "with", "to", "in", "on",
+             "at", "for", "is", "has", "have", "since", "from", "pt", "patient", "c", "o", "hr",
+             "cha", "chha", "ma", "ko", "le", "ra"}
+
+# Free-text phrasings seen at registration, including common Nepali transliterations.
+# Display names from SYMPTOM_NAMES are indexed as well, so only add wording that differs.
+# Phrases go through tokenize() like queries do, so avoid negations: "no stool" would index nothing.
+SYNONYMS = {
+    "shortness_of_breath_severe": ["cannot breathe", "can't breathe", "severe breathlessness", "gasping",
+                                   "respiratory distress", "sas pherna garo", "saas ferna sakdaina",
+                                   "sas rokiyo", "dam badhyo"],
+    "vomiting_blood": ["hematemesis", "blood vomiting", "vomited blood", "ragat banta", "ragat ulti",
+                       "ragat bantha"],
+    "hypertension_with_symptoms": ["high bp with headache", "high blood pressure with chest pain",
+                                   "pressure high with blurred vision", "high pressure ringata"],
+    "chest_pain": ["chest tightness", "heart pain", "angina", "chhati dukhyo", "chati dukhne",
+                   "chhati ma dukhai", "mutu dukhyo"],
+    "severe_headache": ["severe headache", "worst headache", "thunderclap headache", "sudden headache",
+                        "tauko dherai dukhyo", "tauko fatla jasto"],
+    "major_trauma": ["road traffic accident", "rta", "fall from height", "accident", "bike accident",
+                     "durghatana", "lado", "khasyo", "chot"],
+    "abdominal_pain_severe": ["severe stomach pain", "acute abdomen", "pet dherai dukhyo",
+                              "pet ma kadha dukhai"],
+    "shortness_of_breath_mild": ["breathless", "breathlessness", "wheeze", "wheezing", "cough with breathlessness",
+                                 "sas phulne", "saas phulyo", "khoki"],
+    "hypertension_without_symptoms": ["high bp", "raised bp", "bp high", "high blood pressure",
+                                      "pressure badhyo", "pressure high"],
+    "vomiting_nausea": ["nausea", "vomiting", "ulti", "banta", "bantha", "wakwak", "ulti aaune"],
+    "headache_moderate": ["headache", "migraine", "tauko dukhyo", "tauko dukhne", "tauko dukhai"],
+    "bloody_diarrhea": ["blood in stool", "bloody stool", "dysentery", "ragat disa", "ragat aaune pakhala",
+                        "aau ragat", "diarrhea with blood", "diarrhoea with blood"],
+    "unexplained_tachycardia": ["palpitations", "racing heart", "fast heartbeat", "mutu dhadkan badhyo",
+                                "dhadkan chito", "mutu dhukdhuk"],
+    "eye_problems": ["red eye", "eye pain", "itchy eyes", "blurred vision", "aankha dukhyo", "aankha rato",
+                     "aankha chilaune"],
+    "psychiatric_issues": ["anxiety", "depression", "stress", "insomnia", "tanab", "chinta", "nidra naparne",
+                           "man dukhyo"],
+    "joint_pain": ["back pain", "knee pain", "arthritis", "sprain", "jorni dukhyo", "jornee dukhne",
+                   "kammar dukhyo", "ghunda dukhyo", "haad dukhyo"],
+    "gynecological": ["menstrual pain", "irregular periods", "vaginal discharge", "pregnancy check",
+                      "mahinawari", "mahinabari", "garbhawati", "sweta pradar"],
+    "pediatric_routine": ["child checkup", "vaccination", "immunization", "growth check", "bachha jach",
+                          "khop", "baccha"],
+    "general_symptoms": ["fever", "cold", "weakness", "body ache", "follow up", "jwaro", "jaro",
+                         "rugha", "kamjori", "jiu dukhyo"],
+    "constipation": ["unable to pass stool", "difficulty passing stool", "hard stool", "kabjiyat", "disa naune", "disa nahune"],
+    "medication_request": ["refill", "prescription", "medicine finished", "dawai", "aushadhi", "dabai sakiyo"],
+    "dressing_change": ["wound dressing", "dressing", "wound care", "suture removal", "ghau", "patti"],
+    "mild_diarrhea": ["loose motion", "loose stools", "diarrhea", "diarrhoea", "pakhala", "disa patlo",
+                      "chheparo"],
+}
+
+
+def strip_html_tags(text: str) -> str:
+    return HTML_TAG_RE.sub('', text)
+
+
+def normalize(text: str) -> str:
+    """Lower-case free text and drop HTML tags/entities pasted from web forms."""
+    return html.unescape(strip_html_tags(text)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Content tokens of a text; the word after a negation ("no blood") is dropped."""
+    tokens = []
+    negated = False
+    for t in TOKEN_RE.findall(normalize(text)):
+        if t in NEGATIONS:
+            negated = True
+        elif t not in STOPWORDS:
+            if not negated:
+                tokens.append(t)
+            negated = False
+    return tokens
+
+
+def trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _urgency(symptom_id: str) -> int:
+    if symptom_id in RED_SYMPTOMS:
+        return 0
+    if symptom_id in YELLOW_SYMPTOMS:
+        return 1
+    return 2
+
+
+class ComplaintMatcher:
+    """
+    Maps free-text chief complaints to ranked symptom ids.
+    Every display name and synonym is a phrase; a query scores each phrase by the
+    share of its (rarity-weighted) tokens it contains and a symptom keeps its best
+    phrase. Unknown query tokens fall back to a trigram index over the vocabulary
+    so typos and spelling variants ("diarhoea", "chhati") still resolve.
+    """
+
+    def __init__(self, names: Dict[str, str] = None, synonyms: Dict[str, List[str]] = None,
+                 min_score: float = 0.5, fuzzy_threshold: float = 0.45):
+        names = SYMPTOM_NAMES if names is None else names
+        synonyms = SYNONYMS if synonyms is None else synonyms
+        self.min_score = min_score
+        self.fuzzy_threshold = fuzzy_threshold
+
+        phrases: List[Tuple[str, List[str]]] = []
+        for symptom_id, name in names.items():
+            for text in [name] + list(synonyms.get(symptom_id, [])):
+                tokens = list(dict.fromkeys(tokenize(text)))
+                if not tokens:
+                    # Would never match anything (all stopwords, or negated away)
+                    raise ValueError(f"phrase {text!r} for {symptom_id} has no content tokens")
+                phrases.append((symptom_id, tokens))
+
+        # Rare tokens say more about the symptom than ones shared by many phrases
+        document_freq: Dict[str, int] = {}
+        for _, tokens in phrases:
+            for t in tokens:
+                document_freq[t] = document_freq.get(t, 0) + 1
+        self._weights = {t: 1.0 / df for t, df in document_freq.items()}
+
+        self._phrase_symptom = [symptom_id for symptom_id, _ in phrases]
+        self._phrase_total = [sum(self._weights[t] for t in tokens) for _, tokens in phrases]
+        self._token_index: Dict[str, List[int]] = {}
+        for i, (_, tokens) in enumerate(phrases):
+            for t in tokens:
+                self._token_index.setdefault(t, []).append(i)
+
+        self._trigram_index: Dict[str, List[str]] = {}
+        self._trigram_counts: Dict[str, int] = {}
+        for t in self._token_index:
+            grams = trigrams(t)
+            self._trigram_counts[t] = len(grams)
+            for g in grams:
+                self._trigram_index.setdefault(g, []).append(t)
+        self._fuzzy_cache: Dict[str, Tuple[str, float]] = {}
+
+    def _resolve(self, token: str) -> Tuple[str, float]:
+        """Return the vocabulary token for a query token and how confident the match is."""
+        if token in self._token_index:
+            return token, 1.0
+        cached = self._fuzzy_cache.get(token)
+        if cached is not None:
+            return cached
+        grams = trigrams(token)
+        shared: Dict[str, int] = {}
+        for g in grams:
+            for candidate in self._trigram_index.get(g, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best, best_sim = None, 0.0
+        for candidate, n in shared.items():
+            sim = n / (len(grams) + self._trigram_counts[candidate] - n)
+            if sim > best_sim:
+                best, best_sim = candidate, sim
+        resolved = (best, best_sim) if best_sim >= self.fuzzy_threshold else (None, 0.0)
+        if len(self._fuzzy_cache) < 10000:
+            self._fuzzy_cache[token] = resolved
+        return resolved
+
+    def match(self, text: str, limit: int = 3) -> List[Dict]:
+        """Rank symptom ids for one complaint. Returns [{"symptom": id, "score": 0..1}, ...]."""
+        hits: Dict[int, float] = {}
+        for token in set(tokenize(text or "")):
+            vocab, confidence = self._resolve(token)
+            if vocab is None:
+                continue
+            weight = self._weights[vocab] * confidence
+            for phrase in self._token_index[vocab]:
+                hits[phrase] = hits.get(phrase, 0.0) + weight
+
+        best: Dict[str, Tuple[float, float]] = {}
+        for phrase, matched in hits.items():
+            score = (matched / self._phrase_total[phrase], matched)
+            symptom_id = self._phrase_symptom[phrase]
+            if score > best.get(symptom_id, (0.0, 0.0)):
+                best[symptom_id] = score
+
+        # Ties go to the more specific phrase, then to the more urgent symptom
+        ranked = sorted(((score, matched, sid) for sid, (score, matched) in best.items()
+                         if score >= self.min_score),
+                        key=lambda item: (-item[0], -item[1], _urgency(item[2])))
+        return [{"symptom": sid, "score": round(min(score, 1.0), 3)} for score, _, sid in ranked[:limit]]
+
+    def match_batch(self, texts: Iterable[str], limit: int = 3) -> List[List[Dict]]:
+        """Map a queue of complaints in one call, in input order."""
+        return [self.match(text, limit) for text in texts]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    matcher = ComplaintMatcher()
+    queries = sys.argv[1:] or ["chhati dukhyo since morning", "<b>Loose motion</b> x3 days",
+                               "sas pherna garo, blue lips", "diarhoea with blood", "BP high, no complaints"]
+    start = time.perf_counter()
+    results = matcher.match_batch(queries * 1000)
+    elapsed = time.perf_counter() - start
+    for query, matches in zip(queries, results):
+        print(f"{query!r}: {matches}")
+    print(f"\n{len(queries) * 1000} queries in {elapsed * 1000:.1f} ms "
+          f"({elapsed * 1e6 / (len(queries) * 1000):.1f} us/query)")
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from triage_logic import TAGS
+
+
+class _Node:
+    __slots__ = ("patient_id", "tagged_at", "deadline", "overdue", "prev", "next")
+
+    def __init__(self, patient_id, tagged_at, deadline):
+        self.patient_id = patient_id
+        self.tagged_at = tagged_at
+        self.deadline = deadline
+        self.overdue = False
+        self.prev = self.next = None
+
+
+class _Lane:
+    """
+    Waiting patients of one tag as a linked list in tag order (oldest first).
+    Patients of a tag share one target, so deadlines are in list order too and a
+    cursor marks the first patient not yet overdue: advancing it past newly
+    overdue patients is amortized O(1), and so is every add and remove. A
+    backdated add (a /sync entry tagged offline) walks back from the tail to its
+    place, so it costs the number of patients tagged after it.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, _Node] = {}
+        self.head = self.tail = self.cursor = None
+        self.overdue = 0
+
+    def add(self, patient_id: str, tagged_at: float, deadline: float) -> None:
+        node = _Node(patient_id, tagged_at, deadline)
+        self.nodes[patient_id] = node
+        before = self.tail
+        behind_cursor = False
+        while before is not None and before.tagged_at > tagged_at:
+            behind_cursor = behind_cursor or before is self.cursor
+            before = before.prev
+        node.prev = before
+        node.next = self.head if before is None else before.next
+        if before is None:
+            self.head = node
+        else:
+            before.next = node
+        if node.next is None:
+            self.tail = node
+        else:
+            node.next.prev = node
+        # Landing ahead of the cursor (or of every overdue patient) makes it the next one to check
+        if self.cursor is None or behind_cursor:
+            self.cursor = node
+
+    def remove(self, patient_id: str) -> None:
+        node = self.nodes.pop(patient_id)
+        if node.overdue:
+            self.overdue -= 1
+        if self.cursor is node:
+            self.cursor = node.next
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+
+    def advance(self, now: float) -> None:
+        while self.cursor is not None and self.cursor.deadline <= now:
+            # Patients after a backdated one may already have been counted
+            if not self.cursor.overdue:
+                self.cursor.overdue = True
+                self.overdue += 1
+            self.cursor = self.cursor.next
+
+
+class DashboardAggregates:
+    """
+    Live charge-nurse counts, kept up to date in O(1) per waiting-room event:
+    patients waiting per tag, oldest wait per tag, overdue count and GREEN
+    patients per OPD. snapshot() costs the same for 10 or 10,000 waiting
+    patients; deltas_since() feeds clients the count changes since a version.
+    Subscribe an instance to a WaitingRoom to receive its events.
+    """
+
+    def __init__(self, history: int = 1024):
+        self._lanes = {tag: _Lane() for tag in TAGS}
+        self._opd: Dict[str, int] = {}
+        self.version = 0
+        self._deltas = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def __call__(self, event: str, entry: Optional[Dict], previous: Optional[Dict]) -> None:
+        with self._lock:
+            changed_tags = set()
+            changed_opds = set()
+            moved = entry is None or previous is None or previous["tag"] != entry["tag"] \
+                or previous["tagged_at"] != entry["tagged_at"]
+            if previous is not None and moved:
+                self._lanes[previous["tag"]].remove(previous["patient_id"])
+                changed_tags.add(previous["tag"])
+            if entry is not None and moved:
+                self._lanes[entry["tag"]].add(entry["patient_id"], entry["tagged_at"], entry["deadline"])
+                changed_tags.add(entry["tag"])
+            old_opd = previous.get("opd") if previous else None
+            new_opd = entry.get("opd") if entry else None
+            if old_opd != new_opd:
+                if old_opd:
+                    self._opd[old_opd] -= 1
+                    changed_opds.add(old_opd)
+                if new_opd:
+                    self._opd[new_opd] = self._opd.get(new_opd, 0) + 1
+                    changed_opds.add(new_opd)
+            if changed_tags or changed_opds:
+                self.version += 1
+                self._deltas.append({
+                    "version": self.version,
+                    "event": event,
+                    "waiting": {tag: len(self._lanes[tag].nodes) for tag in changed_tags},
+                    "opd_backlog": {opd: self._opd[opd] for opd in changed_opds},
+                })
+
+    def snapshot(self, now: float = None) -> Dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            waiting, oldest, overdue = {}, {}, {}
+            for tag, lane in self._lanes.items():
+                lane.advance(now)
+                waiting[tag] = len(lane.nodes)
+                oldest[tag] = now - lane.head.tagged_at if lane.head is not None else None
+                overdue[tag] = lane.overdue
+            return {
+                "version": self.version,
+                "waiting": waiting,
+                "total_waiting": sum(waiting.values()),
+                "oldest_wait_seconds": oldest,
+                "overdue": overdue,
+                "total_overdue": sum(overdue.values()),
+                "opd_backlog": {opd: n for opd, n in self._opd.items() if n},
+            }
+
+    def deltas_since(self, version: int) -> Optional[List[Dict]]:
+        """Count changes after `version`, or None if they are no longer kept (take a snapshot instead)."""
+        with self._lock:
+            if version >= self.version:
+                return []
+            if not self._deltas or self._deltas[0]["version"] > version + 1:
+                return None
+            return [d for d in self._deltas if d["version"] > version]
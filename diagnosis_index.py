@@ -0,0 +1,201 @@
+"""
+Inverted index of the live waiting room: diagnosis, rule, symptom, tag and OPD
+terms -> waiting patient ids.
+
+Subscribe an instance to a WaitingRoom; every triage, re-triage and discharge
+updates only the postings of the terms that changed for that patient. Queries
+are OR-of-AND groups, written as text:
+
+    sepsis                          any diagnosis with the word "sepsis"
+    diagnosis:"early sepsis"        that exact diagnosis
+    rule:red_o2 OR symptom:chest_pain
+    tag:RED AND pulmonary embolism  AND binds tighter than OR
+
+A bare term matches a diagnosis containing all its words, or a rule, symptom,
+tag or OPD of that name. Answering is set intersection/union over the
+postings, smallest set first, so it does not scan the waiting room.
+
+    python diagnosis_index.py bench --patients 5000
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+KINDS = ("diagnosis", "rule", "symptom", "tag", "opd")
+_WORD = re.compile(r"[a-z0-9]+")
+_TERM = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|([^"]+))')
+
+
+def normalize(text) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def entry_terms(entry: Dict) -> Set[str]:
+    """"kind:value" terms of one waiting-room entry."""
+    terms = {f"diagnosis:{normalize(d)}" for d in entry.get("diagnoses") or ()}
+    terms.update(f"symptom:{normalize(s)}" for s in entry.get("symptoms") or ())
+    for kind in ("rule", "tag", "opd"):
+        if entry.get(kind):
+            terms.add(f"{kind}:{normalize(entry[kind])}")
+    return terms
+
+
+def parse_query(text: str) -> List[List[tuple]]:
+    """Query text -> OR list of AND groups of (kind or None, normalized value)."""
+    groups = []
+    for part in re.split(r"\s+OR\s+", text.strip(), flags=re.IGNORECASE):
+        group = []
+        for clause in re.split(r"\s+AND\s+", part.strip(), flags=re.IGNORECASE):
+            if not clause.strip():
+                continue
+            match = _TERM.fullmatch(clause.strip())
+            if match is None:
+                raise ValueError(f"cannot parse {clause!r}")
+            kind, quoted, bare = match.groups()
+            kind = kind.lower() if kind else None
+            if kind is not None and kind not in KINDS:
+                raise ValueError(f"unknown term kind {kind!r} (one of {', '.join(KINDS)})")
+            group.append((kind, normalize(quoted if quoted is not None else bare)))
+        if group:
+            groups.append(group)
+    return groups
+
+
+class DiagnosisIndex:
+    """Postings per term, kept current from waiting-room events in time proportional to the terms changed."""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._terms: Dict[str, Set[str]] = {}
+        # Word -> diagnosis terms containing it, for "sepsis" -> "diagnosis:early sepsis", ...
+        self._words: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __call__(self, event: str, entry: Optional[Dict], previous: Optional[Dict]) -> None:
+        patient_id = (entry or previous)["patient_id"]
+        self.update(patient_id, entry)
+
+    def update(self, patient_id: str, entry: Optional[Dict]) -> None:
+        """Index `entry` for the patient, or drop the patient when entry is None."""
+        new = entry_terms(entry) if entry is not None else set()
+        with self._lock:
+            old = self._terms.get(patient_id, set())
+            for term in old - new:
+                ids = self._postings[term]
+                ids.discard(patient_id)
+                if not ids:
+                    del self._postings[term]
+                    if term.startswith("diagnosis:"):
+                        for word in _WORD.findall(term[10:]):
+                            self._words[word].discard(term)
+                            if not self._words[word]:
+                                del self._words[word]
+            for term in new - old:
+                if term not in self._postings:
+                    self._postings[term] = set()
+                    if term.startswith("diagnosis:"):
+                        for word in _WORD.findall(term[10:]):
+                            self._words.setdefault(word, set()).add(term)
+                self._postings[term].add(patient_id)
+            if new:
+                self._terms[patient_id] = new
+            else:
+                self._terms.pop(patient_id, None)
+
+    def reset(self, entries: Iterable[Dict]) -> None:
+        """Replace the whole index (e.g. from a feed snapshot)."""
+        with self._lock:
+            self._postings, self._terms, self._words = {}, {}, {}
+        for entry in entries:
+            self.update(entry["patient_id"], entry)
+
+    def _matching(self, kind: Optional[str], value: str) -> Set[str]:
+        """Patient ids for one term (caller holds the lock). May return a posting set itself: do not modify."""
+        if kind not in (None, "diagnosis"):
+            return self._postings.get(f"{kind}:{value}", set())
+        exact = self._postings.get(f"diagnosis:{value}")
+        if kind == "diagnosis" and exact is not None:
+            return exact
+        words = _WORD.findall(value)
+        names = set.intersection(*(self._words.get(w, set()) for w in words)) if words else set()
+        found = [self._postings[name] for name in names]
+        if kind is None:
+            found += [self._postings[f"{k}:{value}"] for k in KINDS[1:] if f"{k}:{value}" in self._postings]
+        if len(found) == 1:
+            return found[0]
+        return set().union(*found)
+
+    def search(self, query) -> Set[str]:
+        """Patient ids matching a query (text, or the groups parse_query returns)."""
+        groups = parse_query(query) if isinstance(query, str) else query
+        matched: Set[str] = set()
+        with self._lock:
+            for group in groups:
+                sets = sorted((self._matching(kind, value) for kind, value in group), key=len)
+                if not sets[0]:
+                    continue
+                hits = set(sets[0])
+                for other in sets[1:]:
+                    hits &= other
+                    if not hits:
+                        break
+                matched |= hits
+        return matched
+
+    def counts(self, kind: str = "diagnosis") -> Dict[str, int]:
+        """Waiting patients per term of one kind, e.g. for a filter drop-down."""
+        prefix = f"{kind}:"
+        with self._lock:
+            return {term[len(prefix):]: len(ids) for term, ids in self._postings.items() if term.startswith(prefix)}
+
+
+def bench(patients: int, queries: int, seed: int = 1) -> None:
+    from early_warning import assess_with_score
+    from mci_simulator import PatientGenerator
+    from waiting_room import WaitingRoom
+
+    room = WaitingRoom()
+    index = DiagnosisIndex()
+    room.subscribe(index)
+    generator = PatientGenerator(random.Random(seed))
+    forms = [generator.patient() for _ in range(patients)]
+    results = [assess_with_score(form) for form in forms]
+    started = time.perf_counter()
+    for i, (form, result) in enumerate(zip(forms, results)):
+        room.triage(f"P{i:06d}", form, result)
+    indexed = time.perf_counter() - started
+    print(f"{patients} patients triaged with the index subscribed in {indexed:.3f} s,"
+          f" {len(index.counts())} distinct diagnoses")
+    for text in ("sepsis", "pulmonary embolism OR symptom:chest_pain", "tag:red AND sepsis",
+                 'diagnosis:"early sepsis" AND rule:yellow_temp_high', "anxiety AND tag:green"):
+        groups = parse_query(text)
+        started = time.perf_counter()
+        for _ in range(queries):
+            hits = index.search(groups)
+        per_query = (time.perf_counter() - started) / queries
+        started = time.perf_counter()
+        scanned = [e for e in room.entries() if any("sepsis" in d.lower() for d in e["diagnoses"])]
+        scan = time.perf_counter() - started
+        print(f"  {text:<52} {len(hits):>6} hits  {per_query * 1e6:8.1f} us"
+              + (f"  (linear scan for 'sepsis': {scan * 1e6:.0f} us, {len(scanned)} hits)" if text == "sepsis" else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Waiting-room diagnosis index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="index a synthetic waiting room and time queries")
+    bench_parser.add_argument("--patients", type=int, default=5000)
+    bench_parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        bench(args.patients, args.queries)
+
+
+if __name__ == "__main__":
+    main()
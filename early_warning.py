@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from triage_logic import assess_triage
+
+# NEWS2-style bands: (inclusive upper bound, points), checked in order.
+# Respiratory rate and supplemental O2 are not collected on the triage form;
+# blood glucose and pain are local additions so that every vital on the form counts.
+BANDS = {
+    "o2_saturation": [(91, 3), (93, 2), (95, 1), (float("inf"), 0)],
+    "systolic_bp": [(90, 3), (100, 2), (110, 1), (219, 0), (float("inf"), 3)],
+    "heart_rate": [(40, 3), (50, 1), (90, 0), (110, 1), (130, 2), (float("inf"), 3)],
+    "gcs_score": [(14, 3), (float("inf"), 0)],  # anything below alert (GCS 15) scores like new confusion
+    "temperature": [(35.0, 3), (36.0, 1), (38.0, 0), (39.0, 1), (float("inf"), 2)],
+    "blood_glucose": [(2.9, 3), (3.9, 2), (11.0, 0), (20.0, 1), (float("inf"), 2)],
+    "pain_score": [(3, 0), (6, 1), (float("inf"), 2)],
+}
+PARAMETERS = tuple(BANDS)
+
+# Sorted bounds/points for np.searchsorted
+_BOUNDS = {p: np.array([b for b, _ in bands]) for p, bands in BANDS.items()}
+_POINTS = {p: np.array([s for _, s in bands], dtype=np.int8) for p, bands in BANDS.items()}
+
+
+def parse_value(parameter: str, raw) -> Optional[float]:
+    """Form value as a float, or None when blank/unparseable/non-positive (not measured)."""
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if value != value:
+        return None
+    # Pain 0 is a real answer; for every other vital 0 means "not entered", as in assess_triage
+    if value < 0 or (value == 0 and parameter != "pain_score"):
+        return None
+    return value
+
+
+def parameter_score(parameter: str, value: Optional[float]) -> int:
+    if value is None:
+        return 0
+    for bound, points in BANDS[parameter]:
+        if value <= bound:
+            return points
+    return 0
+
+
+def risk_band(total: int, any_three: bool) -> str:
+    if total >= 7:
+        return "high"
+    if total >= 5:
+        return "medium"
+    if any_three:
+        return "low-medium"
+    return "low"
+
+
+class EarlyWarningScore:
+    """
+    Aggregate early-warning score kept per patient.
+    Sub-scores are stored per parameter, so a single re-measured vital updates
+    the total in O(1) without re-scoring the rest of the form.
+    """
+
+    def __init__(self, patient: Dict = None):
+        self.values: Dict[str, Optional[float]] = dict.fromkeys(PARAMETERS)
+        self.points: Dict[str, int] = dict.fromkeys(PARAMETERS, 0)
+        self.total = 0
+        self._threes = 0
+        for parameter in PARAMETERS:
+            if patient and parameter in patient:
+                self.update(parameter, patient[parameter])
+
+    def update(self, parameter: str, raw) -> int:
+        """Set one vital (raw form value) and return the new total."""
+        value = parse_value(parameter, raw)
+        points = parameter_score(parameter, value)
+        old = self.points[parameter]
+        self.total += points - old
+        self._threes += (points == 3) - (old == 3)
+        self.values[parameter] = value
+        self.points[parameter] = points
+        return self.total
+
+    @property
+    def band(self) -> str:
+        return risk_band(self.total, self._threes > 0)
+
+    def as_dict(self) -> Dict:
+        return {"score": self.total, "band": self.band, "points": dict(self.points)}
+
+
+def assess_with_score(patient: Dict) -> Dict:
+    """assess_triage result with the aggregate early-warning score attached as "ews"."""
+    result = assess_triage(patient)
+    result["ews"] = EarlyWarningScore(patient).as_dict()
+    return result
+
+
+def to_columns(patients: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    """Parse a list of triage forms into one float column per parameter (NaN = not measured)."""
+    patients = list(patients)
+    columns = {}
+    for parameter in PARAMETERS:
+        column = np.full(len(patients), np.nan)
+        for i, patient in enumerate(patients):
+            value = parse_value(parameter, patient.get(parameter))
+            if value is not None:
+                column[i] = value
+        columns[parameter] = column
+    return columns
+
+
+def score_columns(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized scoring of a whole waiting room.
+    columns: parameter -> float array (NaN = not measured); missing parameters score 0.
+    Returns "score" (int array), "any_three" (bool array) and "band" (str array).
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    total = np.zeros(n, dtype=np.int16)
+    any_three = np.zeros(n, dtype=bool)
+    for parameter in PARAMETERS:
+        values = columns.get(parameter)
+        if values is None:
+            continue
+        values = np.asarray(values, dtype=float)
+        points = _POINTS[parameter][np.minimum(np.searchsorted(_BOUNDS[parameter], values, side="left"),
+                                               len(_BOUNDS[parameter]) - 1)]
+        points = np.where(np.isnan(values), 0, points)
+        total += points
+        any_three |= points == 3
+    band = np.where(total >= 7, "high", np.where(total >= 5, "medium",
+                    np.where(any_three, "low-medium", "low")))
+    return {"score": total, "any_three": any_three, "band": band}
+
+
+def score_patients(patients: Iterable[Dict]) -> Dict[str, np.ndarray]:
+    return score_columns(to_columns(patients))
+
+
+def rank_by_risk(scores: np.ndarray, arrival: np.ndarray = None) -> np.ndarray:
+    """Queue order (indices) by descending score; ties keep arrival order."""
+    scores = np.asarray(scores)
+    arrival = np.arange(len(scores)) if arrival is None else np.asarray(arrival)
+    return np.lexsort((arrival, -scores.astype(np.int32)))
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n = 100_000
+    columns = {
+        "o2_saturation": rng.normal(95, 3, n), "systolic_bp": rng.normal(125, 25, n),
+        "heart_rate": rng.normal(90, 20, n), "gcs_score": rng.choice([15, 15, 15, 14, 12, 8], n).astype(float),
+        "temperature": rng.normal(37.2, 0.9, n), "blood_glucose": rng.normal(7, 3, n),
+        "pain_score": rng.integers(0, 11, n).astype(float),
+    }
+    start = time.perf_counter()
+    scored = score_columns(columns)
+    order = rank_by_risk(scored["score"])
+    elapsed = time.perf_counter() - start
+    print(f"Scored and ranked {n} patients in {elapsed * 1000:.1f} ms; "
+          f"top score {scored['score'][order[0]]}, high risk {int((scored['band'] == 'high').sum())}")
@@ -0,0 +1,409 @@
+"""
+Differential check that a triage engine decides exactly like a reference.
+
+An engine takes a list of patient dicts and returns one result dict per patient
+with a "tag" and either a "rule" id or assess_triage's "reason" text; outcomes
+are compared as (tag, rule), with an exception on either side counting as the
+outcome "ERROR". References:
+
+  assess_triage  triage_logic.assess_triage on the raw form (the default)
+  backend        what /triage does: validation.validate_patient, then
+                 assess_triage on the normalized form (invalid forms are ERROR)
+
+Built-in engines:
+
+  batch      batch_triage.assess_batch (the columns used by the worker pool)
+  records    the worker pool's binary path: encode_patients, validate_records,
+             then fill_records and assess_columns. It models the backend, not
+             raw assess_triage: against --reference assess_triage a large
+             share of ordinary boundary and random forms mismatch, because validation reads "9.0" as GCS 9 where
+             assess_triage's int() fails, and drops a blank O2 where
+             assess_triage's vitals block stops at it. Against --reference
+             backend the only differences are values the record encoding
+             cannot carry, which validation rejects but the records read as
+             not measured: unparseable text ("abc", "0x10", also among the
+             boundary values), non-list symptoms and the like
+  module:fn  any importable function with that signature
+
+Case families, each deterministic for a given --seed:
+
+  boundary   every threshold in triage_logic.VITAL_RULES, just below, on and
+             just above it, as text, int and float, plus blank, missing, zero
+             and unparseable values; all pairs of vitals, under each symptom
+             mix (so the ordering between rules is exercised too)
+  random     dense random forms, values clustered around the thresholds
+  malformed  random forms full of inputs assess_triage treats oddly: zero as
+             missing, a blank GCS (int("") fails and aborts the vitals block),
+             "14.0" as GCS, "nan", " 92 ", "1e2", None, bools, non-list
+             symptoms and ambulance flags like "no"
+
+Chunks of cases run in parallel across --processes; each mismatch found is
+shrunk (keys dropped, values simplified) while it still mismatches, and the
+run is written as a CSV report in the same columns as triage_test_report.csv.
+
+    python equivalence.py --engine batch --random 2000000 --malformed 1000000
+    python equivalence.py --engine records --reference backend --families boundary random --out records_report.csv
+"""
+import argparse
+import csv
+import importlib
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from triage_logic import (GREEN_SYMPTOMS, RED_SYMPTOMS, SYMPTOM_IDS, VITAL_FIELDS, VITAL_RULES, YELLOW_SYMPTOMS,
+                          assess_triage, rule_of)
+
+REPORT = "triage_equivalence_report.csv"
+# Same columns as CSVTestResult.write_csv in test_triage_logic.py
+REPORT_HEADER = ["Test Name", "Input", "Expected Tag", "Actual Tag", "Result", "Reason"]
+FAMILIES = ("boundary", "random", "malformed")
+REFERENCES = ("assess_triage", "backend")
+CHUNK = 5000
+SUB_BATCH = 256
+ERROR = ("ERROR", "")
+_MISSING = object()
+
+NORMAL = {"o2_saturation": "98", "gcs_score": "15", "temperature": "37", "systolic_bp": "120",
+          "diastolic_bp": "80", "heart_rate": "75"}
+SYMPTOM_MIXES = ([], [next(iter(RED_SYMPTOMS))], [next(iter(YELLOW_SYMPTOMS))], [next(iter(GREEN_SYMPTOMS))],
+                 [next(iter(GREEN_SYMPTOMS)), next(iter(YELLOW_SYMPTOMS))], ["not_a_symptom"])
+GARBAGE = ("", " ", "abc", "nan", "NaN", "inf", "-inf", "1e2", " 92 ", "9_2", "0x10", "--5", "٩٢", None,
+           True, False, [], {}, "0", 0, 0.0, -1, "-1")
+
+
+def thresholds(vital: str) -> List[float]:
+    return sorted({bound for conditions in VITAL_RULES.values() for v, low, high, _ in conditions if v == vital
+                   for bound in (low, high) if bound is not None})
+
+
+def _forms(x: float) -> List:
+    """The ways a form or client might send value x."""
+    forms = [repr(float(x)), float(x)]
+    if float(x).is_integer():
+        forms += [str(int(x)), int(x)]
+    return forms
+
+
+def boundary_values(vital: str) -> List:
+    values = [_MISSING, "", "0", 0, "-5", "abc", NORMAL[vital]]
+    for t in thresholds(vital):
+        for offset in (-1, -0.1, -0.001, 0, 0.001, 0.1, 1):
+            values.extend(_forms(round(t + offset, 3)))
+    return values
+
+
+class BoundarySpace:
+    """All pairs of vitals x their boundary values x symptom mixes, addressable by index."""
+
+    def __init__(self):
+        self.values = {vital: boundary_values(vital) for vital in VITAL_FIELDS}
+        self.blocks = []
+        start = 0
+        for a, b in itertools.combinations(VITAL_FIELDS, 2):
+            size = len(self.values[a]) * len(self.values[b]) * len(SYMPTOM_MIXES)
+            self.blocks.append((start, a, b))
+            start += size
+        self.size = start
+
+    def __len__(self):
+        return self.size
+
+    def case(self, i: int) -> Dict:
+        for start, a, b in reversed(self.blocks):
+            if i >= start:
+                break
+        i -= start
+        i, mix = divmod(i, len(SYMPTOM_MIXES))
+        i, vb = divmod(i, len(self.values[b]))
+        va = i
+        patient = dict(NORMAL, symptoms=list(SYMPTOM_MIXES[mix]))
+        for vital, value in ((a, self.values[a][va]), (b, self.values[b][vb])):
+            if value is _MISSING:
+                del patient[vital]
+            else:
+                patient[vital] = value
+        return patient
+
+
+def _near_threshold(rng: random.Random, vital: str) -> float:
+    t = rng.choice(thresholds(vital))
+    return round(t + rng.choice((0, 0, rng.uniform(-2, 2), rng.uniform(-0.2, 0.2), rng.uniform(-15, 15))),
+                 rng.choice((0, 1, 1, 3)))
+
+
+def random_case(rng: random.Random) -> Dict:
+    patient = {}
+    for vital in VITAL_FIELDS:
+        draw = rng.random()
+        if draw < 0.05:
+            continue
+        if draw < 0.1:
+            patient[vital] = ""
+        elif draw < 0.7:
+            x = _near_threshold(rng, vital)
+            patient[vital] = rng.choice(_forms(x))
+        else:
+            patient[vital] = NORMAL[vital]
+    gcs = patient.get("gcs_score")
+    if isinstance(gcs, str) and "." in gcs and rng.random() < 0.9:
+        # Forms send GCS as a whole number (int() rejects "12.0"); keep most of them that way
+        patient["gcs_score"] = gcs.split(".")[0]
+    patient["symptoms"] = rng.sample(SYMPTOM_IDS, rng.choice((0, 0, 1, 1, 2, 3)))
+    if rng.random() < 0.03:
+        patient["ambulance_arrival"] = True
+    return patient
+
+
+def malformed_case(rng: random.Random) -> Dict:
+    patient = random_case(rng)
+    for vital in VITAL_FIELDS:
+        if rng.random() < 0.25:
+            patient[vital] = rng.choice(GARBAGE)
+    if rng.random() < 0.2:
+        patient["gcs_score"] = rng.choice(("14.0", "12.5", 12.5, "9.99", " 13 ", "13\n", ""))
+    draw = rng.random()
+    if draw < 0.03:
+        del patient["symptoms"]
+    elif draw < 0.06:
+        patient["symptoms"] = rng.choice((None, "chest_pain", ("joint_pain",), {"chest_pain": 1}, 5,
+                                          [["chest_pain"]], ["eye_problems", None]))
+    elif draw < 0.1:
+        patient["symptoms"] = patient["symptoms"] + patient["symptoms"] + ["CHEST_PAIN", ""]
+    if rng.random() < 0.05:
+        patient["ambulance_arrival"] = rng.choice(("no", "", 0, "false", None, [], 1))
+    return patient
+
+
+def family_size(family: str, count: int) -> int:
+    return len(BoundarySpace()) if family == "boundary" else count
+
+
+def generate(family: str, start: int, count: int, seed: int) -> List[Dict]:
+    """Cases start..start+count of a family (the same cases every time for a given seed)."""
+    if family == "boundary":
+        space = BoundarySpace()
+        return [space.case(i) for i in range(start, min(start + count, len(space)))]
+    make = random_case if family == "random" else malformed_case
+    rng = random.Random(f"{family}:{seed}:{start}")
+    return [make(rng) for _ in range(count)]
+
+
+def _assess_records(patients: List[Dict]) -> List[Dict]:
+    from batch_triage import allocate, assess_columns, fill_records, results_from
+    from validation import validate_records
+    from wire_format import as_records, encode_patients
+    records = as_records(encode_patients(patients))
+    validate_records(records)
+    columns = allocate(len(records))
+    fill_records(records, columns)
+    assess_columns(columns)
+    return results_from(columns, len(records))
+
+
+def load_engine(spec: str) -> Callable[[List[Dict]], List[Dict]]:
+    if spec == "batch":
+        from batch_triage import assess_batch
+        return assess_batch
+    if spec == "records":
+        return _assess_records
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"engine must be batch, records or module:function, not {spec!r}")
+    return getattr(importlib.import_module(module), name)
+
+
+def outcome(result) -> Tuple[str, str]:
+    if not isinstance(result, dict) or result.get("error") or result.get("tag") is None:
+        return ERROR
+    return result["tag"], result.get("rule") or rule_of(result)
+
+
+def reference(patient: Dict, spec: str = "assess_triage") -> Tuple[str, str]:
+    try:
+        if spec == "backend":
+            from validation import validate_patient
+            patient = validate_patient(patient)
+        return outcome(assess_triage(patient))
+    except Exception:
+        return ERROR
+
+
+def candidate(engine: Callable, patients: List[Dict]) -> List[Tuple[str, str]]:
+    """Outcomes per patient; a batch that raises is re-run one patient at a time."""
+    outcomes = []
+    for i in range(0, len(patients), SUB_BATCH):
+        part = patients[i:i + SUB_BATCH]
+        try:
+            outcomes.extend(outcome(r) for r in engine(part))
+        except Exception:
+            for patient in part:
+                try:
+                    outcomes.append(outcome(engine([patient])[0]))
+                except Exception:
+                    outcomes.append(ERROR)
+    return outcomes
+
+
+def check_chunk(task) -> Dict:
+    """Worker: run one chunk through the reference and every engine."""
+    family, start, count, seed, specs, keep, reference_spec = task
+    patients = generate(family, start, count, seed)
+    expected = [reference(p, reference_spec) for p in patients]
+    report = {"family": family, "cases": len(patients), "mismatches": {}, "examples": {}}
+    for spec in specs:
+        actual = candidate(load_engine(spec), patients)
+        bad = [i for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+        report["mismatches"][spec] = len(bad)
+        report["examples"][spec] = [patients[i] for i in bad[:keep]]
+    return report
+
+
+def differs(engine: Callable, patient: Dict, reference_spec: str = "assess_triage") -> bool:
+    return reference(patient, reference_spec) != candidate(engine, [patient])[0]
+
+
+def _simpler(patient: Dict):
+    """Candidate one-step simplifications of a case, simplest first."""
+    for key in list(patient):
+        yield {k: v for k, v in patient.items() if k != key}
+    symptoms = patient.get("symptoms")
+    if isinstance(symptoms, list):
+        for i in range(len(symptoms)):
+            yield dict(patient, symptoms=symptoms[:i] + symptoms[i + 1:])
+    for key, value in patient.items():
+        if key == "symptoms":
+            continue
+        if value != NORMAL.get(key, _MISSING) and key in NORMAL:
+            yield dict(patient, **{key: NORMAL[key]})
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield dict(patient, **{key: str(value)})
+        if isinstance(value, str):
+            try:
+                x = float(value)
+            except ValueError:
+                continue
+            if x != x or abs(x) == float("inf"):
+                continue
+            for shorter in (str(int(round(x))), repr(round(x, 1))):
+                if shorter != value:
+                    yield dict(patient, **{key: shorter})
+
+
+def minimize(engine: Callable, patient: Dict, limit: int = 500, reference_spec: str = "assess_triage") -> Dict:
+    """Greedily shrink a mismatching case while it still mismatches."""
+    steps = 0
+    progress = True
+    while progress and steps < limit:
+        progress = False
+        for simpler in _simpler(patient):
+            steps += 1
+            if differs(engine, simpler, reference_spec):
+                patient, progress = simpler, True
+                break
+    return patient
+
+
+def run(specs: List[str], families=FAMILIES, random_cases: int = 200000, malformed_cases: int = 100000,
+        seed: int = 1, processes: int = None, keep: int = 5, progress: bool = False,
+        reference_spec: str = "assess_triage") -> Dict:
+    """Summary per (engine, family) plus minimized mismatches per engine."""
+    counts = {"random": random_cases, "malformed": malformed_cases}
+    tasks = []
+    for family in families:
+        size = family_size(family, counts.get(family, 0))
+        tasks += [(family, start, min(CHUNK, size - start), seed, specs, keep, reference_spec)
+                  for start in range(0, size, CHUNK)]
+    summary = {(spec, family): {"cases": 0, "mismatches": 0} for spec in specs for family in families}
+    examples = {spec: [] for spec in specs}
+    processes = processes or os.cpu_count() or 1
+    started = time.perf_counter()
+    if processes > 1:
+        executor = ProcessPoolExecutor(processes)
+        reports = executor.map(check_chunk, tasks, chunksize=1)
+    else:
+        executor, reports = None, map(check_chunk, tasks)
+    try:
+        for done, report in enumerate(reports, 1):
+            for spec in specs:
+                row = summary[(spec, report["family"])]
+                row["cases"] += report["cases"]
+                row["mismatches"] += report["mismatches"][spec]
+                examples[spec] += [(report["family"], p) for p in report["examples"][spec]]
+            if progress:
+                print(f"\r{done}/{len(tasks)} chunks", end="", file=sys.stderr, flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if progress:
+        print(file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    mismatches = {}
+    for spec in specs:
+        engine = load_engine(spec)
+        seen, shrunk = set(), []
+        for family, patient in examples[spec]:
+            small = minimize(engine, patient, reference_spec=reference_spec)
+            key = repr(sorted(small.items(), key=lambda item: item[0]))
+            if key in seen:
+                continue
+            seen.add(key)
+            shrunk.append({"family": family, "input": small, "original": patient,
+                           "expected": reference(small, reference_spec),
+                           "actual": candidate(engine, [small])[0]})
+        mismatches[spec] = shrunk
+    return {"summary": summary, "mismatches": mismatches, "seconds": elapsed, "seed": seed,
+            "reference": reference_spec}
+
+
+def write_report(result: Dict, path: str = REPORT) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_HEADER)
+        for (spec, family), row in result["summary"].items():
+            writer.writerow([f"equivalence_{spec}_{family}", f"{row['cases']} generated cases (seed {result['seed']})",
+                             "", "", "FAIL" if row["mismatches"] else "PASS",
+                             f"{row['mismatches']} mismatches with {result.get('reference', 'assess_triage')}"])
+        for spec, cases in result["mismatches"].items():
+            for i, case in enumerate(cases, 1):
+                (expected_tag, expected_rule), (actual_tag, actual_rule) = case["expected"], case["actual"]
+                writer.writerow([f"mismatch_{spec}_{case['family']}_{i}", repr(case["input"]), expected_tag,
+                                 actual_tag, "FAIL",
+                                 f"{result.get('reference', 'assess_triage')} rule {expected_rule or 'error'}, "
+                                 f"{spec} rule {actual_rule or 'error'}"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a triage engine against assess_triage or the backend")
+    parser.add_argument("--engine", action="append", help="batch, records or module:function (repeatable)")
+    parser.add_argument("--reference", choices=REFERENCES, default="assess_triage")
+    parser.add_argument("--families", nargs="+", choices=FAMILIES, default=list(FAMILIES))
+    parser.add_argument("--random", type=int, default=200000, help="random cases")
+    parser.add_argument("--malformed", type=int, default=100000, help="malformed cases")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--keep", type=int, default=5, help="mismatches to minimize per chunk and engine")
+    parser.add_argument("--out", default=REPORT)
+    args = parser.parse_args(argv)
+
+    specs = args.engine or ["batch"]
+    result = run(specs, args.families, args.random, args.malformed, args.seed, args.processes, args.keep,
+                 progress=True, reference_spec=args.reference)
+    write_report(result, args.out)
+    total = sum(row["cases"] for (spec, _), row in result["summary"].items() if spec == specs[0])
+    print(f"{total} cases x {len(specs)} engine(s) in {result['seconds']:.1f} s ({total / result['seconds']:,.0f}/s)")
+    for (spec, family), row in result["summary"].items():
+        print(f"  {spec:<12} {family:<10} {row['cases']:>9} cases  {row['mismatches']:>7} mismatches")
+    for spec, cases in result["mismatches"].items():
+        for case in cases[:10]:
+            print(f"  {spec}: {case['input']!r}: {args.reference} {case['expected']}, {spec} {case['actual']}")
+    print(f"Report written to {args.out}")
+    sys.exit(1 if any(row["mismatches"] for row in result["summary"].values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class EventFeed:
+    """
+    Sequence-numbered waiting-room deltas for many subscribers (SSE or long-poll).
+    Subscribe an instance to a WaitingRoom. Each event is JSON-encoded once when
+    published and the same text is handed to every subscriber; waiting
+    subscribers block on a condition variable, so idle clients cost nothing.
+    A client that reconnects with its last sequence number receives only what
+    it missed, or a fresh snapshot if that is older than the kept history.
+    Sequence numbers restart with the process, so event ids carry the boot
+    epoch ("<epoch>-<seq>") and an id from an earlier run always resumes from a
+    snapshot, even when the new run has already reached the same number.
+    """
+
+    def __init__(self, room, history: int = 4096, epoch: Optional[str] = None):
+        self.room = room
+        self.epoch = epoch or f"{int(time.time() * 1000):x}"
+        self.seq = 0
+        self._events = deque(maxlen=history)  # (seq, json text)
+        self._cond = threading.Condition()
+        room.subscribe(self)
+
+    def __call__(self, event: str, entry: Optional[Dict], previous: Optional[Dict]) -> None:
+        patient_id = (entry or previous)["patient_id"]
+        with self._cond:
+            self.seq += 1
+            data = json.dumps({"seq": self.seq, "event": event, "patient_id": patient_id, "entry": entry})
+            self._events.append((self.seq, data))
+            self._cond.notify_all()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def resume_seq(self, event_id: Optional[str]) -> Optional[int]:
+        """The sequence number to resume after, or None (send a snapshot) for an id of another run."""
+        if not event_id:
+            return None
+        epoch, _, seq = event_id.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq: int) -> Optional[List[Tuple[int, str]]]:
+        """Events after `seq`, or None when some of them have already been dropped (or never existed)."""
+        with self._cond:
+            if seq == self.seq:
+                return []
+            if seq > self.seq:
+                return None
+            if not self._events or self._events[0][0] > seq + 1:
+                return None
+            # Sequence numbers are contiguous, so the start position is arithmetic
+            start = seq + 1 - self._events[0][0]
+            return [self._events[i] for i in range(start, len(self._events))]
+
+    def wait(self, seq: int, timeout: float) -> Optional[List[Tuple[int, str]]]:
+        """Block until there is something after `seq` (or timeout); see since()."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != seq, timeout)
+        return self.since(seq)
+
+    def snapshot(self) -> Tuple[int, List[Dict]]:
+        """Current entries and the sequence number they correspond to."""
+        return self.room.consistent(lambda: (self.seq, self.room.entries()))
+
+    def stream(self, last_seq: Optional[int] = None, heartbeat: float = 15.0) -> Iterator[str]:
+        """Server-Sent Events text: a snapshot if needed, then deltas as they happen."""
+        if last_seq is None or self.since(last_seq) is None:
+            last_seq, entries = self.snapshot()
+            yield self._snapshot_message(last_seq, entries)
+        while True:
+            events = self.wait(last_seq, heartbeat)
+            if events is None:
+                # Fell behind the history while blocked; resynchronise
+                last_seq, entries = self.snapshot()
+                yield self._snapshot_message(last_seq, entries)
+                continue
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            yield "".join(f"id: {self.event_id(seq)}\nevent: delta\ndata: {data}\n\n" for seq, data in events)
+            last_seq = events[-1][0]
+
+    def _snapshot_message(self, seq: int, entries: List[Dict]) -> str:
+        data = json.dumps({"seq": seq, "epoch": self.epoch, "entries": entries})
+        return f"id: {self.event_id(seq)}\nevent: snapshot\ndata: {data}\n\n"
@@ -0,0 +1,87 @@
+import http.client
+import json
+import threading
+import urllib.parse
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def iter_events(url: str, last_event_id: Optional[str] = None, timeout: float = 60.0) -> Iterator[Tuple[str, str, Dict]]:
+    """Yield (event, id, data) from a Server-Sent Events endpoint until the server closes it."""
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache"}
+    if last_event_id is not None:
+        headers["Last-Event-ID"] = last_event_id
+    try:
+        conn.request("GET", parts.path + (f"?{parts.query}" if parts.query else ""), headers=headers)
+        response = conn.getresponse()
+        if response.status != 200:
+            raise ConnectionError(f"{url} answered {response.status}")
+        event, event_id, data = "message", None, []
+        while True:
+            line = response.readline()
+            if not line:
+                return
+            line = line.decode("utf-8").rstrip("\r\n")
+            if not line:
+                if data:
+                    yield event, event_id, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith(":"):
+                continue
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                elif field == "id":
+                    event_id = value
+    finally:
+        conn.close()
+
+
+class FeedSubscriber(threading.Thread):
+    """
+    Follows the backend's /events feed in a background thread.
+    Reconnects with exponential backoff and resumes from the last event id it
+    applied, so only missed deltas are re-sent (a snapshot if the backend has
+    restarted since). Callbacks run on this
+    thread: on_snapshot(entries, seq) replaces the board, on_delta(delta) applies
+    one change ({"seq", "event", "patient_id", "entry"}).
+    """
+
+    def __init__(self, url: str, on_snapshot: Callable[[List[Dict], int], None],
+                 on_delta: Callable[[Dict], None], max_backoff: float = 30.0):
+        super().__init__(daemon=True)
+        self.url = url
+        self.on_snapshot = on_snapshot
+        self.on_delta = on_delta
+        self.max_backoff = max_backoff
+        self.last_event_id: Optional[str] = None
+        self.connected = False
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self) -> None:
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                for event, event_id, data in iter_events(self.url, self.last_event_id):
+                    self.connected = True
+                    backoff = 0.5
+                    if event == "snapshot":
+                        self.on_snapshot(data["entries"], data["seq"])
+                    elif event == "delta":
+                        self.on_delta(data)
+                    self.last_event_id = event_id
+                    if self._stopping.is_set():
+                        return
+            except (OSError, http.client.HTTPException, ValueError):
+                pass
+            self.connected = False
+            self._stopping.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
@@ -0,0 +1,432 @@
+"""
+Local load generator and latency report for backend.py.
+
+One asyncio event loop drives many keep-alive HTTP/1.1 connections (stdlib
+only). Two modes:
+
+  closed  --connections clients each send a request, wait for the answer,
+          optionally think, and repeat: measures capacity.
+  open    requests are scheduled at --rate per second (Poisson arrivals)
+          whatever the server does, and latency is measured from the
+          scheduled time, so queueing behind a slow server is counted rather
+          than hidden (no coordinated omission).
+
+Payloads come from the test corpus (the Input column of
+triage_test_report.csv), each given a fresh patient id, and are spread over
+endpoints with --mix. A warm-up phase runs first and is not recorded. The
+report (throughput, p50/p90/p99/p99.9 latency, error rates per status and
+exception, and an HDR-style log-linear histogram) is printed and can be saved
+as JSON for run-to-run comparison.
+
+    python loadtest.py serve --port 5001 --threads
+    python loadtest.py run --url http://127.0.0.1:5001 --mode open --rate 200 --duration 30 --out open.json
+    python loadtest.py run --spawn-server --server-mode processes:4 --mode closed --connections 64 --out p4.json
+    python loadtest.py compare threaded.json p4.json
+"""
+import argparse
+import ast
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_test_report.csv")
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+DEFAULT_MIX = "triage=8,batch=1,dashboard=1"
+
+
+def load_corpus(path: str = CORPUS) -> List[Dict]:
+    """Triage forms from the Input column of a test report (Python dict literals)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [ast.literal_eval(row["Input"]) for row in csv.DictReader(f)]
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HdrHistogram-style) latency histogram in microseconds: exact below
+    128 us, then 64 sub-buckets per power of two, i.e. within 1.6% everywhere with
+    a fixed, small number of buckets however long the run.
+    """
+
+    SUB_BITS = 7
+    HALF = 1 << (SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.SUB_BITS
+        if shift <= 0:
+            return value
+        return (1 << self.SUB_BITS) + (shift - 1) * self.HALF + (value >> shift) - self.HALF
+
+    def _lower(self, index: int) -> int:
+        if index < 1 << self.SUB_BITS:
+            return index
+        shift, offset = divmod(index - (1 << self.SUB_BITS), self.HALF)
+        return (offset + self.HALF) << (shift + 1)
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1e6))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """Latency in ms at percentile p (the upper edge of its bucket, capped at the maximum)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._lower(index + 1) - 1, self.max) / 1000.0
+        return self.max / 1000.0
+
+    def to_dict(self) -> Dict:
+        return {"unit": "us", "buckets": [[self._lower(i), self.counts[i]] for i in sorted(self.counts)]}
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection; reopens after the server closes it."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      content_type: str = "application/json") -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: application/json\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode("latin-1") + body)
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("server closed the connection")
+        version, status = status_line.split(b" ", 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            payload = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            payload = b"".join(chunks)
+        else:
+            payload = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close" or version == b"HTTP/1.0" \
+                and headers.get("connection", "").lower() != "keep-alive":
+            self.close()
+        return int(status), payload
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Workload:
+    """Request builders per endpoint, picked with the --mix weights."""
+
+    def __init__(self, corpus: List[Dict], mix: str = DEFAULT_MIX, batch_size: int = 20, seed: int = 1):
+        self.corpus = corpus
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.issued = 0
+        builders = {"triage": self._triage, "batch": self._batch, "ews": self._ews, "classify": self._classify,
+                    "dashboard": self._dashboard, "search": self._search}
+        self.names, self.builders, self.weights = [], [], []
+        for part in mix.split(","):
+            name, _, weight = part.partition("=")
+            if name.strip() not in builders:
+                raise ValueError(f"unknown endpoint {name!r} in --mix (known: {', '.join(builders)})")
+            self.names.append(name.strip())
+            self.builders.append(builders[name.strip()])
+            self.weights.append(float(weight or 1))
+
+    def _patient(self) -> Dict:
+        self.issued += 1
+        return dict(self.rng.choice(self.corpus), patient_id=f"LT{self.issued:07d}")
+
+    def _triage(self):
+        return "POST", "/triage", json.dumps(self._patient()).encode()
+
+    def _batch(self):
+        return "POST", "/triage/batch", json.dumps([self._patient() for _ in range(self.batch_size)]).encode()
+
+    def _ews(self):
+        return "POST", "/ews/batch", json.dumps({"patients": [self._patient() for _ in range(self.batch_size)]}).encode()
+
+    def _classify(self):
+        return "POST", "/triage/classify", json.dumps([self._patient() for _ in range(self.batch_size)]).encode()
+
+    def _dashboard(self):
+        return "GET", "/dashboard", b""
+
+    def _search(self):
+        return "GET", f"/patients/search?q=LT{self.rng.randint(0, max(1, self.issued // 1000)):04d}", b""
+
+    def next(self) -> Tuple[str, str, str, bytes]:
+        i = self.rng.choices(range(len(self.builders)), self.weights)[0]
+        return (self.names[i],) + self.builders[i]()
+
+
+class Recorder:
+    """Outcomes of the measured phase, overall and per endpoint."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.endpoints: Dict[str, LatencyHistogram] = {}
+        self.statuses: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, endpoint: str, seconds: float, status: Optional[int], error: Optional[str]) -> None:
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        self.histogram.record(seconds)
+        self.endpoints.setdefault(endpoint, LatencyHistogram()).record(seconds)
+
+
+async def _send(connection: HttpConnection, request, timeout: float) -> Tuple[Optional[int], Optional[str]]:
+    _, method, path, body = request
+    try:
+        status, _ = await asyncio.wait_for(connection.request(method, path, body), timeout)
+        return status, None
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+        connection.close()
+        return None, type(e).__name__
+
+
+async def _closed_loop(host, port, workload, recorder, connections, warmup, duration, think, timeout):
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    stop_at = measure_from + duration
+
+    async def client():
+        connection = HttpConnection(host, port)
+        while loop.time() < stop_at:
+            request = workload.next()
+            started = loop.time()
+            status, error = await _send(connection, request, timeout)
+            if started >= measure_from:
+                recorder.add(request[0], loop.time() - started, status, error)
+            if think:
+                await asyncio.sleep(random.expovariate(1.0 / think))
+        connection.close()
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+
+
+async def _open_loop(host, port, workload, recorder, connections, warmup, duration, rate, timeout):
+    loop = asyncio.get_running_loop()
+    pool: asyncio.Queue = asyncio.Queue()
+    for _ in range(connections):
+        pool.put_nowait(HttpConnection(host, port))
+    start = loop.time()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+    rng = random.Random(workload.rng.random())
+    tasks = set()
+
+    async def one(request, scheduled):
+        connection = await pool.get()
+        try:
+            status, error = await _send(connection, request, timeout)
+        finally:
+            pool.put_nowait(connection)
+        if scheduled >= measure_from:
+            # From the scheduled send time: waiting for a free connection counts
+            recorder.add(request[0], loop.time() - scheduled, status, error)
+
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled >= stop_at:
+            break
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.ensure_future(one(workload.next(), scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+    while not pool.empty():
+        pool.get_nowait().close()
+
+
+def run(url: str, mode: str = "closed", connections: int = 16, rate: float = 100.0, duration: float = 10.0,
+        warmup: float = 2.0, think: float = 0.0, mix: str = DEFAULT_MIX, batch_size: int = 20,
+        timeout: float = 30.0, seed: int = 1, corpus: List[Dict] = None) -> Dict:
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname or "127.0.0.1", parsed.port or 80
+    workload = Workload(corpus or load_corpus(), mix, batch_size, seed)
+    recorder = Recorder()
+    if mode == "closed":
+        phase = _closed_loop(host, port, workload, recorder, connections, warmup, duration, think, timeout)
+    elif mode == "open":
+        phase = _open_loop(host, port, workload, recorder, connections, warmup, duration, rate, timeout)
+    else:
+        raise ValueError(f"mode must be 'open' or 'closed', not {mode!r}")
+    started = time.time()
+    asyncio.run(phase)
+    completed = recorder.histogram.count
+    failed = sum(recorder.errors.values()) + sum(n for s, n in recorder.statuses.items() if int(s) >= 400)
+    attempted = completed + sum(recorder.errors.values())
+    return {
+        "config": {"url": url, "mode": mode, "connections": connections, "rate": rate if mode == "open" else None,
+                   "duration": duration, "warmup": warmup, "think": think, "mix": mix, "batch_size": batch_size,
+                   "seed": seed, "started_at": started},
+        "requests": attempted,
+        "throughput_rps": round(completed / duration, 1),
+        "error_rate": round(failed / attempted, 5) if attempted else 0.0,
+        "statuses": recorder.statuses,
+        "errors": recorder.errors,
+        "latency_ms": _latency(recorder.histogram),
+        "endpoints": {name: dict(_latency(h), requests=h.count) for name, h in sorted(recorder.endpoints.items())},
+        "histogram": recorder.histogram.to_dict(),
+    }
+
+
+def _latency(histogram: LatencyHistogram) -> Dict:
+    latency = {f"p{p:g}": round(histogram.percentile(p), 3) for p in PERCENTILES}
+    latency["mean"] = round(histogram.total / histogram.count / 1000.0, 3) if histogram.count else 0.0
+    latency["max"] = round(histogram.max / 1000.0, 3)
+    return latency
+
+
+def serve(port: int, mode: str) -> None:
+    """Run backend.py's app on `port`: "threads" or "processes:N" (werkzeug, as app.run would)."""
+    from werkzeug.serving import run_simple
+    import backend
+    backend.start()
+    if mode.startswith("processes"):
+        run_simple("127.0.0.1", port, backend.app, processes=int(mode.partition(":")[2] or 2), threaded=False)
+    else:
+        run_simple("127.0.0.1", port, backend.app, threaded=True)
+
+
+def spawn_server(mode: str) -> Tuple[subprocess.Popen, str]:
+    """backend.py in a child process on a free port, with throwaway data directories."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(os.environ, TRIAGE_AUDIT_DIR=os.path.join(scratch, "audit"),
+               TRIAGE_ARCHIVE_DIR=os.path.join(scratch, "archive"), TRIAGE_STATE_DIR=os.path.join(scratch, "state"))
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", str(port),
+                                "--mode", mode], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("backend did not start")
+
+
+def print_report(report: Dict) -> None:
+    config, latency = report["config"], report["latency_ms"]
+    load = f"rate {config['rate']}/s" if config["mode"] == "open" else f"{config['connections']} connections"
+    print(f"{config['mode']} loop, {load}, {config['duration']:g} s after {config['warmup']:g} s warm-up"
+          + (f" [{report['label']}]" if report.get("label") else ""))
+    print(f"  {report['requests']} requests, {report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}")
+    print("  latency ms  " + "  ".join(f"{name} {value}" for name, value in latency.items()))
+    for name, row in report["endpoints"].items():
+        print(f"  {name:<10} n={row['requests']:<7} p50 {row['p50']}  p99 {row['p99']}  max {row['max']}")
+    if report["errors"] or any(int(s) >= 400 for s in report["statuses"]):
+        print("  statuses", report["statuses"], "errors", report["errors"])
+
+
+def compare(paths: List[str]) -> None:
+    reports = [json.load(open(path, encoding="utf-8")) for path in paths]
+    rows = [("label", lambda r: r.get("label") or "-"), ("mode", lambda r: r["config"]["mode"]),
+            ("req/s", lambda r: r["throughput_rps"]), ("error rate", lambda r: f"{r['error_rate']:.2%}")]
+    rows += [(name, lambda r, name=name: r["latency_ms"][name]) for name in ("p50", "p90", "p99", "p99.9", "max")]
+    width = max(12, *(len(os.path.basename(p)) for p in paths)) + 2
+    print(f"{'':<12}" + "".join(f"{os.path.basename(p):>{width}}" for p in paths))
+    for name, value in rows:
+        print(f"{name:<12}" + "".join(f"{str(value(r)):>{width}}" for r in reports))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for backend.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="generate load and report latency")
+    run_parser.add_argument("--url", default="http://127.0.0.1:5000")
+    run_parser.add_argument("--spawn-server", action="store_true", help="start backend.py locally for this run")
+    run_parser.add_argument("--server-mode", default="threads", help="with --spawn-server: threads or processes:N")
+    run_parser.add_argument("--mode", choices=("open", "closed"), default="closed")
+    run_parser.add_argument("--connections", type=int, default=16)
+    run_parser.add_argument("--rate", type=float, default=100.0, help="open loop: requests per second")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="unrecorded seconds first")
+    run_parser.add_argument("--think", type=float, default=0.0, help="closed loop: mean seconds between requests")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. triage=8,batch=1,dashboard=1")
+    run_parser.add_argument("--batch-size", type=int, default=20)
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--label", help="name for this run in saved results (e.g. the server mode)")
+    run_parser.add_argument("--out", help="save the report as JSON")
+    serve_parser = sub.add_parser("serve", help="run backend.py's app for load testing")
+    serve_parser.add_argument("--port", type=int, default=5000)
+    serve_parser.add_argument("--mode", default="threads", help="threads or processes:N")
+    compare_parser = sub.add_parser("compare", help="side-by-side table of saved reports")
+    compare_parser.add_argument("reports", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.port, args.mode)
+    elif args.command == "compare":
+        compare(args.reports)
+    elif args.command == "run":
+        server, url = (spawn_server(args.server_mode) if args.spawn_server else (None, args.url))
+        try:
+            report = run(url, args.mode, args.connections, args.rate, args.duration, args.warmup, args.think,
+                         args.mix, args.batch_size, args.timeout, args.seed)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(10)
+        report["label"] = args.label or (f"spawned {args.server_mode}" if server else None)
+        print_report(report)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
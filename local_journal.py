@@ -0,0 +1,172 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+
+class LocalJournal:
+    """
+    Write-ahead journal of this station's triage events, in SQLite.
+    Every triage/discharge is committed here first, so the station keeps working
+    when the backend is unreachable; the JournalSyncer forwards entries later.
+    Entries carry a random id so the backend can apply each one exactly once.
+    """
+
+    def __init__(self, path: str = "triage_journal.sqlite3"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL stays durable across application crashes and avoids an fsync per entry
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " entry_id TEXT NOT NULL UNIQUE,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " recorded_at REAL NOT NULL,"
+            " synced_at REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS journal_pending ON journal (seq) WHERE synced_at IS NULL")
+
+    def record(self, kind: str, payload: Dict, recorded_at: float = None) -> str:
+        entry_id = uuid.uuid4().hex
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        with self._lock:
+            self._db.execute("INSERT INTO journal (entry_id, kind, payload, recorded_at) VALUES (?, ?, ?, ?)",
+                             (entry_id, kind, json.dumps(payload), recorded_at))
+        return entry_id
+
+    def pending(self, limit: int = 1000) -> List[Dict]:
+        """Oldest unsynced entries, in the order they were recorded."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, entry_id, kind, payload, recorded_at FROM journal"
+                " WHERE synced_at IS NULL ORDER BY seq LIMIT ?", (limit,)).fetchall()
+        return [{"seq": seq, "entry_id": entry_id, "kind": kind, "payload": json.loads(payload),
+                 "recorded_at": recorded_at} for seq, entry_id, kind, payload, recorded_at in rows]
+
+    def mark_synced(self, entry_ids: List[str], synced_at: float = None) -> None:
+        synced_at = time.time() if synced_at is None else synced_at
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE journal SET synced_at = ? WHERE entry_id = ?",
+                                 [(synced_at, entry_id) for entry_id in entry_ids])
+            self._db.execute("COMMIT")
+
+    def backlog(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM journal WHERE synced_at IS NULL").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def encode_batch(entries: List[Dict]) -> bytes:
+    """zlib-compressed JSON list of {"entry_id", "kind", "payload", "recorded_at"}."""
+    body = [{key: entry[key] for key in ("entry_id", "kind", "payload", "recorded_at")} for entry in entries]
+    return zlib.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_batch(body: bytes) -> List[Dict]:
+    return json.loads(zlib.decompress(body))
+
+
+class JournalSyncer(threading.Thread):
+    """
+    Background thread that forwards the journal to the backend's /sync endpoint.
+    Sends up to `batch_size` entries per request, so a backlog of thousands
+    drains in a few round trips, and retries with exponential backoff (plus
+    jitter, so stations do not reconnect in lockstep) while the backend is down.
+    Never touches Tk: the GUI reads `backlog` and `online` when it redraws.
+    """
+
+    def __init__(self, journal: LocalJournal, url: str, batch_size: int = 2000,
+                 idle_interval: float = 5.0, max_backoff: float = 60.0,
+                 post: Optional[Callable] = None):
+        super().__init__(daemon=True)
+        self.journal = journal
+        self.url = url
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.max_backoff = max_backoff
+        self.post = post or requests.post
+        self.online = False
+        self.backlog = journal.backlog()
+        self.last_error: Optional[str] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self) -> None:
+        """Something new was journalled; send it now rather than at the next interval."""
+        self.backlog += 1
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+
+    def sync_once(self) -> Tuple[int, int]:
+        """Send one batch; returns (sent, still pending). Raises on transport/server errors."""
+        entries = self.journal.pending(self.batch_size)
+        if not entries:
+            self.backlog = 0
+            return 0, 0
+        response = self.post(self.url, data=encode_batch(entries), timeout=30,
+                             headers={"Content-Type": "application/json", "Content-Encoding": "deflate"})
+        response.raise_for_status()
+        # The backend acknowledges applied and already-seen ids alike
+        self.journal.mark_synced(response.json()["acknowledged"])
+        self.backlog = self.journal.backlog()
+        return len(entries), self.backlog
+
+    def run(self) -> None:
+        backoff = min(1.0, self.max_backoff)
+        while not self._stopping.is_set():
+            # Cleared before reading the journal, so a notify() during the send is not lost
+            self._wake.clear()
+            try:
+                _, remaining = self.sync_once()
+                self.online = True
+                self.last_error = None
+                backoff = min(1.0, self.max_backoff)
+                if remaining:
+                    continue
+            except (requests.RequestException, ValueError, KeyError) as e:
+                self.online = False
+                self.last_error = str(e)
+                self._stopping.wait(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self._wake.wait(self.idle_interval)
+
+
+class SeenEntries:
+    """Backend side of the idempotent sync: remembers the most recent `capacity` applied entry ids."""
+
+    def __init__(self, capacity: int = 200_000):
+        self.capacity = capacity
+        self._ids: Dict[str, None] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, entry_id: str) -> bool:
+        """True the first time an id is seen, False for a retransmission."""
+        with self._lock:
+            if entry_id in self._ids:
+                return False
+            self._ids[entry_id] = None
+            if len(self._ids) > self.capacity:
+                # dicts keep insertion order: drop the oldest id
+                del self._ids[next(iter(self._ids))]
+            return True
+
+    def release(self, entry_id: str) -> None:
+        """Forget a claimed id whose entry could not be applied, so the station's resend is."""
+        with self._lock:
+            self._ids.pop(entry_id, None)
@@ -0,0 +1,310 @@
+"""
+Seeded discrete-event simulation of a mass-casualty surge through the triage stack.
+
+Synthetic patients arrive as a Poisson process (a base rate plus an optional
+surge window). Each belongs to an acuity class with its own vital-sign
+distributions (centred around the triage_logic thresholds, with some fields
+left blank) and symptom mix (ids from triage_logic). Arrivals go through the
+real engine: assess_with_score, the WaitingRoom (with its OPD routing for
+GREEN) and the live DashboardAggregates. Waiting patients are re-measured and
+re-triaged while they wait, and physicians see them highest tag first, oldest
+first.
+
+The same seed always produces the same patients and the same outcomes, so a
+run doubles as an end-to-end benchmark: --speed 0 runs as fast as possible and
+the report's "engine" section gives the CPU time spent in the triage stack.
+
+    python mci_simulator.py --hours 2 --rate 30 --surge-rate 300 --surge-start 0.5 --surge-hours 0.5
+    python mci_simulator.py --speed 0 --json > run.json
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from dashboard import DashboardAggregates
+from early_warning import assess_with_score
+from triage_logic import GREEN_SYMPTOMS, RED_SYMPTOMS, TAGS, YELLOW_SYMPTOMS
+from waiting_room import TARGET_SECONDS, WaitingRoom
+
+# Acuity class -> share of arrivals, chance of arriving by ambulance, and per-vital (mean, sd)
+ACUITY = {
+    "critical": {"share": 0.12, "ambulance": 0.35, "o2_saturation": (88, 5), "temperature": (37.8, 1.8),
+                 "systolic_bp": (115, 50), "heart_rate": (122, 32), "gcs": ([15, 14, 12, 9, 6, 3],
+                                                                         [.45, .15, .15, .1, .1, .05])},
+    "urgent": {"share": 0.33, "ambulance": 0.04, "o2_saturation": (93.5, 2.5), "temperature": (37.9, 1.0),
+               "systolic_bp": (150, 28), "heart_rate": (104, 18), "gcs": ([15, 14, 13, 12], [.7, .15, .1, .05])},
+    "minor": {"share": 0.55, "ambulance": 0.005, "o2_saturation": (97.5, 1.5), "temperature": (36.9, 0.5),
+              "systolic_bp": (126, 16), "heart_rate": (82, 12), "gcs": ([15], [1.0])},
+}
+# Symptom pools per acuity class: (ids, how many to pick)
+SYMPTOM_MIX = {
+    "critical": [(list(RED_SYMPTOMS), (1, 2)), (list(YELLOW_SYMPTOMS), (0, 1))],
+    "urgent": [(list(YELLOW_SYMPTOMS), (1, 2)), (list(GREEN_SYMPTOMS), (0, 1))],
+    "minor": [(list(GREEN_SYMPTOMS), (0, 2))],
+}
+BLANK_FIELD = 0.05  # chance a vital is not measured at the station
+# Mean physician assessment time per tag, in minutes
+SERVICE_MINUTES = {"RED": 25.0, "YELLOW": 15.0, "GREEN": 8.0}
+_TAG_RANK = {tag: i for i, tag in enumerate(TAGS)}
+
+
+class PatientGenerator:
+    """Synthetic triage forms; the same seed gives the same sequence."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.count = 0
+        self._classes = list(ACUITY)
+        self._shares = [ACUITY[c]["share"] for c in self._classes]
+
+    def _vital(self, mean_sd, digits: int, low: float, high: float) -> str:
+        if self.rng.random() < BLANK_FIELD:
+            return ""
+        value = min(high, max(low, self.rng.gauss(*mean_sd)))
+        return f"{value:.{digits}f}"
+
+    def vitals(self, acuity: str) -> Dict:
+        profile = ACUITY[acuity]
+        form = {
+            "o2_saturation": self._vital(profile["o2_saturation"], 0, 60, 100),
+            "temperature": self._vital(profile["temperature"], 1, 32, 42.5),
+            "systolic_bp": self._vital(profile["systolic_bp"], 0, 50, 260),
+            "heart_rate": self._vital(profile["heart_rate"], 0, 25, 210),
+            "gcs_score": str(self.rng.choices(*profile["gcs"])[0]),
+        }
+        systolic = form["systolic_bp"]
+        form["diastolic_bp"] = "" if not systolic else f"{float(systolic) * 0.62 + self.rng.gauss(0, 9):.0f}"
+        return form
+
+    def patient(self) -> Dict:
+        self.count += 1
+        acuity = self.rng.choices(self._classes, self._shares)[0]
+        symptoms = []
+        for pool, (low, high) in SYMPTOM_MIX[acuity]:
+            symptoms.extend(self.rng.sample(pool, self.rng.randint(low, high)))
+        age = self.rng.randint(1, 17) if self.rng.random() < 0.15 else self.rng.randint(18, 92)
+        patient = {
+            "patient_id": f"MCI{self.count:06d}",
+            "name": f"Casualty {self.count}",
+            "age": str(age),
+            "gender": self.rng.choice(["Male", "Female"]),
+            "symptoms": symptoms,
+            "ambulance_arrival": self.rng.random() < ACUITY[acuity]["ambulance"],
+            "acuity": acuity,
+        }
+        patient.update(self.vitals(acuity))
+        return patient
+
+    def remeasure(self, patient: Dict) -> Dict:
+        """The same patient measured again: vitals drift, sicker patients more so."""
+        drift = {"critical": 1.0, "urgent": 0.6, "minor": 0.3}[patient["acuity"]]
+        again = dict(patient, ambulance_arrival=False)
+        for field, sd, digits in (("o2_saturation", 2.0, 0), ("temperature", 0.3, 1), ("systolic_bp", 12.0, 0),
+                                  ("diastolic_bp", 8.0, 0), ("heart_rate", 10.0, 0)):
+            if patient.get(field):
+                again[field] = f"{float(patient[field]) + self.rng.gauss(0, sd * drift):.{digits}f}"
+        return again
+
+
+def _summary(values: List[float]) -> Dict:
+    if not values:
+        return {"n": 0}
+    array = np.asarray(values)
+    return {"n": len(values), "mean": round(float(array.mean()), 2), "p50": round(float(np.percentile(array, 50)), 2),
+            "p90": round(float(np.percentile(array, 90)), 2), "max": round(float(array.max()), 2)}
+
+
+class Simulation:
+    """
+    One run. Simulated time is seconds from `epoch`; events are (time, sequence, kind,
+    patient id) on a heap. The engine is called with explicit timestamps, so pacing
+    (speed) only decides how long the run takes, never what happens.
+    """
+
+    def __init__(self, seed: int = 1, hours: float = 2.0, rate: float = 30.0, surge_rate: float = 0.0,
+                 surge_start: float = 0.5, surge_hours: float = 0.5, physicians: int = 6,
+                 remeasure_minutes: float = 30.0, speed: float = 100.0, epoch: float = 1_790_000_000.0):
+        self.rng = random.Random(seed)
+        self.generator = PatientGenerator(random.Random(seed + 1))
+        self.duration = hours * 3600.0
+        self.rate, self.surge_rate = rate, surge_rate
+        self.surge = (surge_start * 3600.0, (surge_start + surge_hours) * 3600.0)
+        self.physicians = physicians
+        self.remeasure = remeasure_minutes * 60.0
+        self.speed = speed
+        self.epoch = epoch
+        self.room = WaitingRoom()
+        self.dashboard = DashboardAggregates()
+        self.room.subscribe(self.dashboard)
+        self.patients: Dict[str, Dict] = {}
+        self._events = []
+        self._sequence = 0
+        # Physician queue: (tag rank, tagged_at, sequence, patient id), stale entries skipped on pop
+        self._queue = []
+        self._free = physicians
+        self.engine_cpu = 0.0
+        self.engine_calls = 0
+        self.retagged = 0
+        self.waits = {tag: [] for tag in TAGS}
+        self.missed = {tag: 0 for tag in TAGS}
+        self.opd: Dict[str, int] = {}
+        self.queue_samples = {tag: [] for tag in TAGS}
+        self.outcomes = hashlib.sha256()
+
+    def _at(self, t: float, kind: str, patient_id: Optional[str] = None) -> None:
+        self._sequence += 1
+        heapq.heappush(self._events, (t, self._sequence, kind, patient_id))
+
+    def _rate_at(self, t: float) -> float:
+        return self.surge_rate if self.surge[0] <= t < self.surge[1] and self.surge_rate else self.rate
+
+    def _triage(self, patient: Dict, t: float) -> Dict:
+        """The engine: rules + early warning score, then the waiting room and its listeners."""
+        started = time.process_time()
+        result = assess_with_score(patient)
+        entry = self.room.triage(patient["patient_id"], patient, result, self.epoch + t)
+        self.engine_cpu += time.process_time() - started
+        self.engine_calls += 1
+        self.outcomes.update(f"{patient['patient_id']}:{entry['tag']}:{entry['rule']};".encode())
+        heapq.heappush(self._queue, (_TAG_RANK[entry["tag"]], entry["tagged_at"], self._sequence, entry["patient_id"]))
+        self._sequence += 1
+        return entry
+
+    def _next_patient(self) -> Optional[Dict]:
+        while self._queue:
+            rank, tagged_at, _, patient_id = heapq.heappop(self._queue)
+            entry = self.room.patients.get(patient_id)
+            if entry is not None and _TAG_RANK[entry["tag"]] == rank and entry["tagged_at"] == tagged_at:
+                return entry
+        return None
+
+    def _start_assessments(self, t: float) -> None:
+        while self._free:
+            entry = self._next_patient()
+            if entry is None:
+                return
+            self._free -= 1
+            now = self.epoch + t
+            wait = now - entry["tagged_at"]
+            self.waits[entry["tag"]].append(wait / 60.0)
+            if now > entry["deadline"]:
+                self.missed[entry["tag"]] += 1
+            if entry["opd"]:
+                self.opd[entry["opd"]] = self.opd.get(entry["opd"], 0) + 1
+            started = time.process_time()
+            self.room.discharge(entry["patient_id"])
+            self.engine_cpu += time.process_time() - started
+            self.patients.pop(entry["patient_id"], None)
+            self._at(t + self.rng.expovariate(1.0 / (SERVICE_MINUTES[entry["tag"]] * 60.0)), "free")
+
+    def _pace(self, t: float, wall_start: float) -> None:
+        if self.speed > 0:
+            ahead = wall_start + t / self.speed - time.perf_counter()
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def run(self) -> Dict:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._at(self.rng.expovariate(self._rate_at(0.0) / 3600.0), "arrival")
+        self._at(60.0, "sample")
+        while self._events:
+            t, _, kind, patient_id = heapq.heappop(self._events)
+            if t > self.duration:
+                break
+            self._pace(t, wall_start)
+            if kind == "arrival":
+                patient = self.generator.patient()
+                self.patients[patient["patient_id"]] = patient
+                self._triage(patient, t)
+                self._at(t + self.remeasure, "remeasure", patient["patient_id"])
+                self._at(t + self.rng.expovariate(self._rate_at(t) / 3600.0), "arrival")
+            elif kind == "remeasure" and patient_id in self.patients:
+                previous = self.room.patients[patient_id]["tag"]
+                patient = self.patients[patient_id] = self.generator.remeasure(self.patients[patient_id])
+                if self._triage(patient, t)["tag"] != previous:
+                    self.retagged += 1
+                self._at(t + self.remeasure, "remeasure", patient_id)
+            elif kind == "free":
+                self._free += 1
+            elif kind == "sample":
+                waiting = self.dashboard.snapshot(self.epoch + t)["waiting"]
+                for tag in TAGS:
+                    self.queue_samples[tag].append(waiting[tag])
+                self._at(t + 60.0, "sample")
+            self._start_assessments(t)
+        return self.report(time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def report(self, wall: float, cpu: float) -> Dict:
+        end = self.epoch + self.duration
+        still_waiting = self.room.entries()
+        arrivals = self.generator.count
+        return {
+            "simulated_hours": self.duration / 3600.0,
+            "arrivals": arrivals,
+            "throughput_per_hour": round(sum(len(w) for w in self.waits.values()) / (self.duration / 3600.0), 1),
+            "seen": {tag: len(self.waits[tag]) for tag in TAGS},
+            "still_waiting": {tag: sum(1 for e in still_waiting if e["tag"] == tag) for tag in TAGS},
+            "retagged_while_waiting": self.retagged,
+            "wait_minutes": {tag: _summary(self.waits[tag]) for tag in TAGS},
+            "deadline_misses": {
+                tag: {"seen_late": self.missed[tag],
+                      "overdue_at_end": sum(1 for e in still_waiting if e["tag"] == tag and e["deadline"] < end),
+                      "target_minutes": TARGET_SECONDS[tag] // 60}
+                for tag in TAGS},
+            "queue_length": {tag: _summary(self.queue_samples[tag]) for tag in TAGS},
+            "opd": dict(sorted(self.opd.items())),
+            "engine": {
+                "calls": self.engine_calls,
+                "cpu_seconds": round(self.engine_cpu, 4),
+                "cpu_us_per_call": round(self.engine_cpu / max(1, self.engine_calls) * 1e6, 1),
+                "process_cpu_seconds": round(cpu, 3),
+                "wall_seconds": round(wall, 3),
+                "speedup": round(self.duration / wall, 1) if wall else math.inf,
+            },
+            # Same seed and settings -> same digest, whatever the machine or speed
+            "outcome_digest": self.outcomes.hexdigest()[:16],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mass-casualty surge simulator for the triage stack")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--hours", type=float, default=2.0, help="simulated duration")
+    parser.add_argument("--rate", type=float, default=30.0, help="arrivals per hour outside the surge")
+    parser.add_argument("--surge-rate", type=float, default=240.0, help="arrivals per hour during the surge (0: none)")
+    parser.add_argument("--surge-start", type=float, default=0.5, help="hours into the run")
+    parser.add_argument("--surge-hours", type=float, default=0.5)
+    parser.add_argument("--physicians", type=int, default=6)
+    parser.add_argument("--remeasure", type=float, default=30.0, help="minutes between re-measurements while waiting")
+    parser.add_argument("--speed", type=float, default=100.0, help="simulated seconds per wall second (0: unpaced)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = Simulation(args.seed, args.hours, args.rate, args.surge_rate, args.surge_start, args.surge_hours,
+                        args.physicians, args.remeasure, args.speed).run()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    engine = report["engine"]
+    print(f"{report['arrivals']} arrivals over {report['simulated_hours']:g} h, {report['throughput_per_hour']} seen/h, "
+          f"{report['retagged_while_waiting']} re-tagged while waiting (digest {report['outcome_digest']})")
+    print(f"{'tag':<7}{'seen':>6}{'waiting':>9}{'late':>6}{'overdue':>9}{'wait p50':>10}{'p90':>8}{'queue max':>11}")
+    for tag in TAGS:
+        waits, queue, misses = report["wait_minutes"][tag], report["queue_length"][tag], report["deadline_misses"][tag]
+        print(f"{tag:<7}{report['seen'][tag]:>6}{report['still_waiting'][tag]:>9}{misses['seen_late']:>6}"
+              f"{misses['overdue_at_end']:>9}{waits.get('p50', 0):>10}{waits.get('p90', 0):>8}{queue.get('max', 0):>11}")
+    print("OPD:", ", ".join(f"{opd} {n}" for opd, n in report["opd"].items()) or "none")
+    print(f"Engine: {engine['calls']} calls, {engine['cpu_seconds']} s CPU ({engine['cpu_us_per_call']} us/call); "
+          f"run took {engine['wall_seconds']} s wall, {engine['speedup']}x real time")
+
+
+if __name__ == "__main__":
+    main()
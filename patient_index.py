@@ -0,0 +1,118 @@
+import bisect
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9 ]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of a name ("Ram  Bahadur-Thapa" -> "ram bahadur thapa")."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = _NON_ALNUM_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def normalize_id(patient_id) -> str:
+    return str(patient_id or "").strip().upper()
+
+
+class PatientIndex:
+    """
+    In-memory index over every patient seen this shift.
+    Records are hashed on patient ID; prefix search runs on sorted arrays with
+    bisect, one over IDs and one over every word-start suffix of the normalized
+    name, so "tha" finds "Ram Thapa". Both arrays are updated incrementally.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[str, Dict] = {}
+        self._ids: List[str] = []
+        self._names: List[tuple] = []  # (name suffix, patient id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    @staticmethod
+    def _name_keys(name: str) -> List[str]:
+        words = normalize_name(name).split(" ")
+        return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+    def upsert(self, record: Dict) -> Dict:
+        """Add or update a patient. record needs "patient_id"; other keys are kept as-is."""
+        patient_id = normalize_id(record.get("patient_id"))
+        if not patient_id:
+            raise ValueError("patient_id is required")
+        with self._lock:
+            previous = self._by_id.get(patient_id)
+            if previous is None:
+                bisect.insort(self._ids, patient_id)
+                merged = dict(record)
+            else:
+                merged = dict(previous)
+                merged.update(record)
+                if normalize_name(previous.get("name", "")) != normalize_name(merged.get("name", "")):
+                    for key in self._name_keys(previous.get("name", "")):
+                        i = bisect.bisect_left(self._names, (key, patient_id))
+                        if i < len(self._names) and self._names[i] == (key, patient_id):
+                            del self._names[i]
+                    previous = None
+            merged["patient_id"] = patient_id
+            if previous is None:
+                for key in self._name_keys(merged.get("name", "")):
+                    bisect.insort(self._names, (key, patient_id))
+            self._by_id[patient_id] = merged
+            return merged
+
+    def export(self) -> Dict:
+        """Records plus the name array, so restore() needs no name normalization."""
+        with self._lock:
+            return {"records": list(self._by_id.values()), "names": list(self._names)}
+
+    def restore(self, exported: Dict) -> None:
+        """Replace the contents with an export() (e.g. after a restart)."""
+        with self._lock:
+            self._by_id = {record["patient_id"]: record for record in exported["records"]}
+            self._ids = sorted(self._by_id)
+            self._names = [tuple(pair) for pair in exported["names"]]
+
+    def get(self, patient_id) -> Optional[Dict]:
+        return self._by_id.get(normalize_id(patient_id))
+
+    def search_id(self, prefix: str, limit: int = 10) -> List[Dict]:
+        prefix = normalize_id(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            i = bisect.bisect_left(self._ids, prefix)
+            found = []
+            while i < len(self._ids) and len(found) < limit and self._ids[i].startswith(prefix):
+                found.append(self._by_id[self._ids[i]])
+                i += 1
+            return found
+
+    def search_name(self, prefix: str, limit: int = 10) -> List[Dict]:
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            i = bisect.bisect_left(self._names, (prefix,))
+            seen = {}
+            while i < len(self._names) and len(seen) < limit and self._names[i][0].startswith(prefix):
+                patient_id = self._names[i][1]
+                seen.setdefault(patient_id, self._by_id[patient_id])
+                i += 1
+            return list(seen.values())
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """ID prefix matches first, then name prefix matches."""
+        results = {r["patient_id"]: r for r in self.search_id(query, limit)}
+        for record in self.search_name(query, limit):
+            if len(results) >= limit:
+                break
+            results.setdefault(record["patient_id"], record)
+        return list(results.values())
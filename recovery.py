@@ -0,0 +1,376 @@
+"""
+Fast restart for the backend's in-memory state: snapshots plus a write-ahead log.
+
+Every change to the live state (a triage or a discharge, with what is needed to
+apply it again) is appended to the current WAL segment before it is applied.
+A checkpoint captures the live state -- waiting room order and deadlines, the
+patient index with each patient's latest vitals, and the vitals trends -- into
+one compressed snapshot and starts a new segment; older segments are deleted
+once the snapshot is on disk. Recovery loads the newest snapshot and replays
+only the segments written after it, so a restart costs time proportional to
+the live state and the tail, not to the length of the shift. Dashboard
+aggregates and the event feed are rebuilt on the way in by the waiting room's
+listeners.
+
+    python recovery.py bench --waiting 10000 --tail 2000
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from dashboard import DashboardAggregates
+from early_warning import assess_with_score
+from patient_index import PatientIndex
+from triage_logic import SYMPTOM_IDS
+from vitals_history import VitalsHistory
+from waiting_room import WaitingRoom
+
+SNAPSHOT_MAGIC = b"TTSSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQdII")  # magic, first WAL segment not included, taken at, body length, body crc
+FRAME = struct.Struct("<II")  # WAL record: body length, body crc; body is JSON [kind, change]
+SECTION = struct.Struct("<I")  # snapshot body: length-prefixed sections, JSON first, then raw bytes values
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _pack_state(state: Dict) -> bytes:
+    """Captured state as one JSON section plus a raw section per bytes value (e.g. numpy records)."""
+    binary = [key for key, value in state.items() if isinstance(value, bytes)]
+    document = {key: value for key, value in state.items() if key not in binary}
+    document["_binary"] = binary
+    return b"".join(SECTION.pack(len(part)) + part for part in [_encode(document)] + [state[key] for key in binary])
+
+
+def _unpack_state(body: bytes) -> Dict:
+    parts, offset = [], 0
+    while offset < len(body):
+        (length,) = SECTION.unpack_from(body, offset)
+        offset += SECTION.size
+        parts.append(body[offset:offset + length])
+        offset += length
+    state = json.loads(parts[0])
+    state.update(zip(state.pop("_binary"), parts[1:]))
+    return state
+
+
+class StateLog:
+    """
+    WAL segments and snapshots in one directory:
+        wal-00000007.log        changes, as CRC-framed records (a torn last record is ignored)
+        snapshot-00000007.snap  state as of the start of wal-00000007.log
+    Call recover() once at startup, before the first record().
+    """
+
+    def __init__(self, directory: str, capture: Callable[[], Dict], snapshot_every: int = 2000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.capture = capture
+        self.snapshot_every = snapshot_every
+        self.since_snapshot = 0
+        self.last_snapshot: Optional[float] = None
+        # Set once snapshot_every changes are logged; the Checkpointer waits on it
+        self.due = threading.Event()
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._file = None
+        # Never append to a segment from before a restart: its last record may be torn
+        self._segment = max(self._segments("wal") + self._segments("snapshot"), default=0) + 1
+
+    def _path(self, kind: str, segment: int) -> str:
+        return os.path.join(self.directory, f"{kind}-{segment:08d}.{'log' if kind == 'wal' else 'snap'}")
+
+    def _segments(self, kind: str) -> List[int]:
+        pattern = os.path.join(self.directory, f"{kind}-*.{'log' if kind == 'wal' else 'snap'}")
+        return sorted(int(os.path.basename(path).split("-")[1].split(".")[0]) for path in glob.glob(pattern))
+
+    def record(self, kind: str, change: Dict, apply: Callable[[str, Dict], object]):
+        """
+        Log the change, then return apply(kind, change). Both happen under one lock,
+        so a checkpoint never captures a change that is missing from the log or
+        the other way round.
+        """
+        body = _encode([kind, change])
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path("wal", self._segment), "ab", buffering=0)
+            # One write per record: after a crash the segment ends at a record boundary or a torn record
+            self._file.write(FRAME.pack(len(body), zlib.crc32(body)) + body)
+            self.since_snapshot += 1
+            if self.since_snapshot >= self.snapshot_every:
+                self.due.set()
+            return apply(kind, change)
+
+    def checkpoint(self) -> str:
+        """Snapshot the live state and drop the segments it covers; returns the snapshot path."""
+        with self._checkpoint_lock:
+            with self._lock:
+                state = self.capture()
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._segment += 1
+                segment = self._segment
+                self.since_snapshot = 0
+                self.due.clear()
+            # Encoding and writing happen outside the lock; triage carries on into the new segment
+            taken_at = time.time()
+            body = zlib.compress(_pack_state(state), 1)
+            path = self._path("snapshot", segment)
+            with open(path + ".tmp", "wb") as f:
+                f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, segment, taken_at, len(body), zlib.crc32(body)))
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self.last_snapshot = taken_at
+            for kind in ("wal", "snapshot"):
+                for old in self._segments(kind):
+                    if old < segment:
+                        os.remove(self._path(kind, old))
+            return path
+
+    def _read_snapshot(self, segment: int) -> Optional[Dict]:
+        with open(self._path("snapshot", segment), "rb") as f:
+            data = f.read()
+        if len(data) < SNAPSHOT_HEADER.size:
+            return None
+        magic, covered, taken_at, length, crc = SNAPSHOT_HEADER.unpack_from(data)
+        body = data[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length]
+        if magic != SNAPSHOT_MAGIC or covered != segment or len(body) != length or zlib.crc32(body) != crc:
+            return None
+        self.last_snapshot = taken_at
+        return _unpack_state(zlib.decompress(body))
+
+    def _read_wal(self, segment: int) -> Iterator[Tuple[str, Dict]]:
+        with open(self._path("wal", segment), "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            body = data[offset + FRAME.size:offset + FRAME.size + length]
+            if len(body) != length or zlib.crc32(body) != crc:
+                break  # torn by a crash mid-write; nothing after it was acknowledged
+            kind, change = json.loads(body)
+            yield kind, change
+            offset += FRAME.size + length
+
+    def recover(self, restore: Callable[[Dict], None], replay: Callable[[str, Dict], object]) -> Dict:
+        """restore(state) from the newest valid snapshot, then replay(kind, change) for each change after it."""
+        started = time.perf_counter()
+        base, state = 0, None
+        for segment in reversed(self._segments("snapshot")):
+            state = self._read_snapshot(segment)
+            if state is not None:
+                base = segment
+                break
+        if state is not None:
+            restore(state)
+        replayed = 0
+        for segment in self._segments("wal"):
+            if segment >= base:
+                for kind, change in self._read_wal(segment):
+                    replay(kind, change)
+                    replayed += 1
+        self.since_snapshot = replayed
+        return {"snapshot": self._path("snapshot", base) if state is not None else None,
+                "replayed": replayed, "seconds": time.perf_counter() - started}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Checkpointer(threading.Thread):
+    """Background thread that checkpoints a StateLog every `interval` seconds, or sooner when it is due."""
+
+    def __init__(self, log: StateLog, interval: float = 60.0):
+        super().__init__(daemon=True)
+        self.log = log
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self.log.due.set()
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            self.log.due.wait(self.interval)
+            if self._stopping.is_set():
+                break
+            if not self.log.since_snapshot:
+                self.log.due.clear()
+                continue
+            try:
+                self.log.checkpoint()
+                self.last_error = None
+            except OSError as e:
+                # Keep logging; the WAL alone still recovers everything, only more slowly
+                self.last_error = str(e)
+                self.log.due.clear()
+
+
+class LiveState:
+    """
+    The backend's recoverable in-memory state and the changes applied to it.
+    apply() is used for live requests and for WAL replay alike, so both paths
+    build exactly the same state.
+    """
+
+    def __init__(self, waiting_room: WaitingRoom, patient_index: PatientIndex, vitals_history: VitalsHistory):
+        self.waiting_room = waiting_room
+        self.patient_index = patient_index
+        self.vitals_history = vitals_history
+
+    @staticmethod
+    def triage_change(patient_id: str, patient: Dict, result: Dict, at: float) -> Dict:
+        return {"patient_id": patient_id, "patient": patient, "result": result, "at": at}
+
+    @staticmethod
+    def discharge_change(patient_id: str) -> Dict:
+        return {"patient_id": patient_id}
+
+    def apply(self, kind: str, change: Dict):
+        """Apply one change; a triage returns its deterioration alerts."""
+        patient_id = change["patient_id"]
+        if kind == "triage":
+            patient, result, now = change["patient"], change["result"], change["at"]
+            # Re-measurements of a waiting patient extend their trend
+            deterioration = self.vitals_history.add(patient_id, patient, now)
+            previous = self.patient_index.get(patient_id)
+            self.patient_index.upsert({
+                "patient_id": patient_id,
+                "name": patient.get("name", ""),
+                "age": patient.get("age", ""),
+                "gender": patient.get("gender", ""),
+                "patient": patient,
+                "tag": result["tag"],
+                "ews": result["ews"]["score"],
+                # The assessment as given, archived at discharge (the rules may have been reloaded since)
+                "result": {key: result[key] for key in ("tag", "time", "reason", "diagnoses", "rules_version")
+                           if key in result},
+                "triaged_at": now,
+                # A patient coming back after discharge starts a new visit
+                "arrived_at": previous["arrived_at"] if previous and "arrived_at" in previous
+                and patient_id in self.waiting_room.patients else now,
+            })
+            self.waiting_room.triage(patient_id, patient, result, now)
+            return deterioration
+        if kind == "discharge":
+            self.vitals_history.discard(patient_id)
+            self.waiting_room.discharge(patient_id)
+            return None
+        raise ValueError(f"Unknown state change: {kind!r}")
+
+    def capture(self) -> Dict:
+        vitals_ids, vitals = self.vitals_history.export()
+        return {
+            "waiting": self.waiting_room.entries(),
+            "patients": self.patient_index.export(),
+            "vitals_ids": vitals_ids,
+            "vitals": vitals,
+        }
+
+    def restore(self, state: Dict) -> None:
+        self.patient_index.restore(state["patients"])
+        self.vitals_history.restore(state["vitals_ids"], state["vitals"])
+        self.waiting_room.restore(state["waiting"])
+
+
+def _synthetic_triage(rng: random.Random, i: int) -> Dict:
+    return {
+        "patient_id": f"P{i:07d}",
+        "name": f"{rng.choice(['Ram', 'Sita', 'Hari', 'Gita', 'Bikash'])} {rng.choice(['Thapa', 'Gurung', 'Rai'])}",
+        "age": str(rng.randint(1, 90)),
+        "gender": rng.choice(["Male", "Female"]),
+        "o2_saturation": str(rng.randint(86, 100)),
+        "gcs_score": str(rng.choice([15, 15, 14, 12])),
+        "temperature": f"{rng.uniform(35.5, 40.2):.1f}",
+        "systolic_bp": str(rng.randint(85, 200)),
+        "diastolic_bp": str(rng.randint(50, 115)),
+        "heart_rate": str(rng.randint(45, 140)),
+        "symptoms": rng.sample(SYMPTOM_IDS, rng.randint(0, 3)),
+    }
+
+
+def _fresh_state() -> Tuple[LiveState, DashboardAggregates]:
+    room = WaitingRoom()
+    dashboard = DashboardAggregates()
+    room.subscribe(dashboard)
+    return LiveState(room, PatientIndex(), VitalsHistory()), dashboard
+
+
+def bench(waiting: int, tail: int, directory: Optional[str] = None) -> Dict:
+    """Fill a state log with `waiting` patients, checkpoint, log `tail` more changes, then time recovery."""
+    directory = directory or tempfile.mkdtemp(prefix="tts-recovery-")
+    rng = random.Random(1)
+    state, dashboard = _fresh_state()
+    log = StateLog(directory, state.capture)
+    log.recover(state.restore, state.apply)
+    now = time.time() - 3600
+    for i in range(waiting):
+        patient = _synthetic_triage(rng, i)
+        log.record("triage", LiveState.triage_change(patient["patient_id"], patient, assess_with_score(patient),
+                                                     now + i * 0.1), state.apply)
+    started = time.perf_counter()
+    path = log.checkpoint()
+    checkpoint_seconds = time.perf_counter() - started
+    # The tail: re-measurements, discharges and new arrivals since the snapshot
+    for i in range(tail):
+        roll = rng.random()
+        if roll < 0.4:
+            patient = _synthetic_triage(rng, rng.randrange(waiting))
+            log.record("triage", LiveState.triage_change(patient["patient_id"], patient, assess_with_score(patient),
+                                                         now + waiting * 0.1 + i), state.apply)
+        elif roll < 0.7:
+            log.record("discharge", LiveState.discharge_change(f"P{rng.randrange(waiting):07d}"), state.apply)
+        else:
+            patient = _synthetic_triage(rng, waiting + i)
+            log.record("triage", LiveState.triage_change(patient["patient_id"], patient, assess_with_score(patient),
+                                                         now + waiting * 0.1 + i), state.apply)
+    log.close()
+    expected = dashboard.snapshot(now + waiting)
+
+    recovered_state, recovered_dashboard = _fresh_state()
+    stats = StateLog(directory, recovered_state.capture).recover(recovered_state.restore, recovered_state.apply)
+    assert recovered_dashboard.snapshot(now + waiting) == expected
+    assert recovered_state.waiting_room.entries() == state.waiting_room.entries()
+    report = {
+        "waiting": len(recovered_state.waiting_room), "tail": tail, "recovery_seconds": stats["seconds"],
+        "replayed": stats["replayed"], "checkpoint_seconds": checkpoint_seconds,
+        "snapshot_bytes": os.path.getsize(path),
+    }
+    shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot + WAL recovery of the live triage state")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="time a restart with a full waiting room")
+    bench_parser.add_argument("--waiting", type=int, default=10000)
+    bench_parser.add_argument("--tail", type=int, default=2000, help="changes logged after the last snapshot")
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        report = bench(args.waiting, args.tail)
+        print(f"{report['waiting']} waiting patients recovered in {report['recovery_seconds'] * 1000:.0f} ms "
+              f"(snapshot {report['snapshot_bytes'] / 1e6:.1f} MB written in {report['checkpoint_seconds'] * 1000:.0f} ms,"
+              f" {report['replayed']} WAL records replayed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Regional view of RED/YELLOW/GREEN load across district sites.
+
+Each site runs backend.py in site mode with a SiteReporter, which turns the
+local dashboard into a flat summary (patients waiting and overdue per tag,
+when the longest-waiting patient of each tag was tagged, GREEN backlog per OPD)
+and pushes only the keys that changed since the last summary the regional node
+acknowledged. The regional node (backend.py --mode regional) merges pushes into
+one view with RegionalAggregator. A push is
+
+    {"site": "dhulikhel", "epoch": 1791..., "seq": 42, "base": 41,
+     "changes": {"waiting.RED": 3, "opd.ENT": null}}
+
+epoch   the site process start (ns); a new epoch starts a new sequence
+seq     this push; base = the acknowledged seq the changes apply to
+changes absolute values, null = key gone; base 0 means "the whole summary"
+
+Merges are idempotent: a push the node has already applied (same epoch, seq
+not newer) is acknowledged again without being re-applied, so a site may
+resend after a lost response. A push on a base the node does not hold is
+answered 409 and the site resends its full summary. Nothing is sent while the
+summary is unchanged except a small heartbeat, so bytes on the link follow the
+number of changed keys, not the length of the queues. Bodies are MessagePack
+when msgpack is installed, compact JSON otherwise.
+
+    python backend.py --mode regional --port 5100 --no-debug
+    python backend.py --mode site --site-id dhulikhel --regional-url http://127.0.0.1:5100 --port 5101 --no-debug
+    python regional.py simulate --sites 3 --patients 2000
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Dict, Optional, Tuple
+
+from triage_logic import TAGS
+from wire_format import JSON, MSGPACK, dumps, loads, msgpack
+
+PUSH_TYPE = MSGPACK if msgpack else JSON
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend.py")
+
+
+def site_summary(snapshot: Dict, now: float) -> Dict[str, int]:
+    """Flat key -> int summary of a DashboardAggregates.snapshot(now)."""
+    summary = {}
+    for tag in TAGS:
+        summary[f"waiting.{tag}"] = snapshot["waiting"][tag]
+        summary[f"overdue.{tag}"] = snapshot["overdue"][tag]
+        # The tag time of the longest-waiting patient, which only changes when that patient leaves;
+        # the wait itself grows every second and would make every summary differ
+        if snapshot["oldest_wait_seconds"][tag] is not None:
+            summary[f"oldest.{tag}"] = round(now - snapshot["oldest_wait_seconds"][tag])
+    for opd, waiting in snapshot["opd_backlog"].items():
+        summary[f"opd.{opd}"] = waiting
+    return summary
+
+
+def diff(old: Dict, new: Dict) -> Dict:
+    """Changed and new keys with their values, removed keys as None."""
+    changes = {key: value for key, value in new.items() if old.get(key) != value}
+    changes.update((key, None) for key in old if key not in new)
+    return changes
+
+
+def apply(state: Dict, changes: Dict) -> Dict:
+    merged = dict(state)
+    for key, value in changes.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+class RegionalAggregator:
+    """Latest acknowledged summary per site, and their combined view."""
+
+    def __init__(self, stale_after: float = 120.0):
+        self.stale_after = stale_after
+        self._sites: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.metrics = {"pushes": 0, "applied": 0, "duplicates": 0, "resyncs": 0, "bytes": 0}
+
+    def merge(self, push: Dict, size: int = 0, now: float = None) -> Tuple[int, Dict]:
+        """Apply one push; (HTTP status, acknowledgement) for the site."""
+        now = time.time() if now is None else now
+        try:
+            site, epoch, seq, base = str(push["site"]), int(push["epoch"]), int(push["seq"]), int(push["base"])
+            changes = push["changes"]
+            if not isinstance(changes, dict) or not 0 <= base < seq:
+                raise ValueError
+        except (KeyError, TypeError, ValueError):
+            return 400, {"error": "push needs site, epoch, seq > base >= 0 and a changes object"}
+        with self._lock:
+            self.metrics["pushes"] += 1
+            self.metrics["bytes"] += size
+            held = self._sites.get(site)
+            if held is not None and epoch < held["epoch"]:
+                # A delayed push from before the site restarted
+                self.metrics["duplicates"] += 1
+                return 200, {"epoch": held["epoch"], "seq": held["seq"], "stale": True}
+            if held is not None and epoch == held["epoch"] and seq <= held["seq"]:
+                self.metrics["duplicates"] += 1
+                held["last_seen"] = now
+                return 200, {"epoch": epoch, "seq": held["seq"], "duplicate": True}
+            if base == 0:
+                state = apply({}, changes)
+            elif held is not None and epoch == held["epoch"] and base == held["seq"]:
+                state = apply(held["state"], changes)
+            else:
+                self.metrics["resyncs"] += 1
+                return 409, {"error": "unknown base, send the full summary",
+                             "epoch": held["epoch"] if held else None, "seq": held["seq"] if held else 0}
+            self._sites[site] = {"epoch": epoch, "seq": seq, "state": state, "last_seen": now}
+            self.metrics["applied"] += 1
+            return 200, {"epoch": epoch, "seq": seq}
+
+    def view(self, now: float = None) -> Dict:
+        """Per-site summaries and the regional totals."""
+        now = time.time() if now is None else now
+        with self._lock:
+            sites = {site: dict(held, state=dict(held["state"])) for site, held in self._sites.items()}
+        waiting = {tag: 0 for tag in TAGS}
+        overdue = {tag: 0 for tag in TAGS}
+        oldest = {tag: None for tag in TAGS}
+        opd: Dict[str, int] = {}
+        per_site = {}
+        for site, held in sorted(sites.items()):
+            state = held["state"]
+            for tag in TAGS:
+                waiting[tag] += state.get(f"waiting.{tag}", 0)
+                overdue[tag] += state.get(f"overdue.{tag}", 0)
+                if f"oldest.{tag}" in state:
+                    oldest[tag] = min(oldest[tag] or state[f"oldest.{tag}"], state[f"oldest.{tag}"])
+            for key, value in state.items():
+                if key.startswith("opd."):
+                    opd[key[4:]] = opd.get(key[4:], 0) + value
+            per_site[site] = {
+                "waiting": {tag: state.get(f"waiting.{tag}", 0) for tag in TAGS},
+                "overdue": {tag: state.get(f"overdue.{tag}", 0) for tag in TAGS},
+                "seq": held["seq"],
+                "age_seconds": round(now - held["last_seen"], 1),
+                "stale": now - held["last_seen"] > self.stale_after,
+            }
+        return {
+            "sites": per_site,
+            "waiting": waiting,
+            "total_waiting": sum(waiting.values()),
+            "overdue": overdue,
+            "oldest_wait_seconds": {tag: None if t is None else max(0, round(now - t)) for tag, t in oldest.items()},
+            "opd_backlog": opd,
+        }
+
+
+def http_transport(url: str, timeout: float = 10.0) -> Callable[[bytes, str], Tuple[int, bytes]]:
+    def send(body: bytes, media_type: str) -> Tuple[int, bytes]:
+        request = urllib.request.Request(url.rstrip("/") + "/regional/push", data=body,
+                                         headers={"Content-Type": media_type, "Accept": media_type})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+    return send
+
+
+class SiteReporter:
+    """
+    Pushes this site's summary to the regional node: the keys changed since the
+    last acknowledged summary, every `interval` seconds, or a heartbeat with no
+    changes after `heartbeat` seconds of quiet.
+    """
+
+    def __init__(self, site: str, summarize: Callable[[], Dict], transport: Callable[[bytes, str], Tuple[int, bytes]],
+                 interval: float = 5.0, heartbeat: float = 60.0, media_type: str = PUSH_TYPE):
+        self.site = site
+        self.summarize = summarize
+        self.transport = transport
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.media_type = media_type
+        self.epoch = time.time_ns()
+        self.seq = 0
+        self._acked, self._acked_seq = {}, 0
+        self._last_push = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_error: Optional[str] = None
+        self.metrics = {"pushes": 0, "bytes_sent": 0, "failures": 0, "resyncs": 0, "last_bytes": 0}
+
+    def push(self, force: bool = False) -> Optional[int]:
+        """One push if anything changed (or a heartbeat is due); the HTTP status, or None if nothing was sent."""
+        with self._lock:
+            summary = self.summarize()
+            for _ in range(2):
+                changes = diff(self._acked, summary)
+                if not changes and not force and time.monotonic() - self._last_push < self.heartbeat:
+                    return None
+                self.seq += 1
+                body = dumps({"site": self.site, "epoch": self.epoch, "seq": self.seq, "base": self._acked_seq,
+                              "changes": changes}, self.media_type)
+                self.metrics["pushes"] += 1
+                self.metrics["bytes_sent"] += len(body)
+                self.metrics["last_bytes"] = len(body)
+                try:
+                    status, reply = self.transport(body, self.media_type)
+                except OSError:
+                    self.metrics["failures"] += 1
+                    return None  # retried from the same acknowledged base next time
+                self._last_push = time.monotonic()
+                if status == 200:
+                    if loads(reply, self.media_type).get("seq") == self.seq:
+                        self._acked, self._acked_seq = summary, self.seq
+                    return status
+                if status != 409:
+                    self.metrics["failures"] += 1
+                    return status
+                # The node lost our base (restart, or it applied a push whose answer we never got)
+                self.metrics["resyncs"] += 1
+                self._acked, self._acked_seq = {}, 0
+                force = True
+            return status
+
+    def start(self) -> threading.Thread:
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    self.push()
+                except Exception as e:
+                    # An undecodable reply (a proxy's error page, another media type) must not end reporting
+                    self.metrics["failures"] += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+        thread = threading.Thread(target=run, name="site-reporter", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(args, scratch: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, TRIAGE_AUDIT_DIR=os.path.join(scratch, "audit"),
+               TRIAGE_ARCHIVE_DIR=os.path.join(scratch, "archive"), TRIAGE_STATE_DIR=os.path.join(scratch, "state"))
+    process = subprocess.Popen([sys.executable, BACKEND, "--port", str(port), "--no-debug"] + args, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("backend did not start")
+
+
+def spawn_region(sites: int, interval: float = 0.5) -> Tuple[list, str, Dict[str, str]]:
+    """A regional node and `sites` site nodes pushing to it, each a backend.py process with its own data dirs."""
+    scratch = tempfile.mkdtemp(prefix="regional-")
+    processes = []
+    try:
+        process, regional_url = _start(["--mode", "regional"], os.path.join(scratch, "regional"))
+        processes.append(process)
+        site_urls = {}
+        for i in range(sites):
+            name = f"site{i + 1}"
+            process, site_urls[name] = _start(["--mode", "site", "--site-id", name, "--regional-url", regional_url,
+                                               "--push-interval", str(interval)], os.path.join(scratch, name))
+            processes.append(process)
+    except Exception:
+        for process in processes:
+            process.kill()
+        raise
+    return processes, regional_url, site_urls
+
+
+def get_json(url: str) -> Dict:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+def post_json(url: str, document) -> Dict:
+    request = urllib.request.Request(url, data=json.dumps(document).encode("utf-8"),
+                                     headers={"Content-Type": JSON})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.load(response)
+
+
+def simulate(sites: int, patients: int, interval: float, seed: int = 1) -> None:
+    from mci_simulator import PatientGenerator
+    generator = PatientGenerator(random.Random(seed))
+    processes, regional_url, site_urls = spawn_region(sites, interval)
+    try:
+        expected = {tag: 0 for tag in TAGS}
+        for name, url in site_urls.items():
+            forms = [dict(generator.patient(), patient_id=f"{name}-{i}") for i in range(patients)]
+            for result in post_json(url + "/triage/batch", {"patients": forms})["results"]:
+                expected[result["tag"]] += 1
+        time.sleep(interval * 4)
+        before = get_json(regional_url + "/regional/metrics")
+        # One more patient at one site: the next push carries a handful of keys
+        first = next(iter(site_urls.values()))
+        post_json(first + "/triage", {"patient_id": "late-arrival", "symptoms": ["chest_pain"]})
+        expected["RED"] += 1
+        time.sleep(interval * 4)
+        after = get_json(regional_url + "/regional/metrics")
+        view = get_json(regional_url + "/regional/view")
+        print(f"{sites} sites x {patients} patients, push interval {interval:g} s, {PUSH_TYPE}")
+        print(f"  regional waiting {view['waiting']} (expected {expected})")
+        for site, row in view["sites"].items():
+            print(f"  {site:<8} seq {row['seq']:<4} waiting {row['waiting']}")
+        print(f"  initial sync: {before['bytes']} bytes in {before['applied']} pushes")
+        print(f"  one new patient: {after['bytes'] - before['bytes']} bytes in"
+              f" {after['pushes'] - before['pushes']} pushes")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-site regional aggregation")
+    sub = parser.add_subparsers(dest="command", required=True)
+    simulate_parser = sub.add_parser("simulate", help="run a regional node and site nodes as local processes")
+    simulate_parser.add_argument("--sites", type=int, default=3)
+    simulate_parser.add_argument("--patients", type=int, default=2000, help="patients triaged per site")
+    simulate_parser.add_argument("--interval", type=float, default=0.5, help="site push interval, seconds")
+    args = parser.parse_args(argv)
+    if args.command == "simulate":
+        simulate(args.sites, args.patients, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Which archived assessments change outcome when the vital thresholds change.
+
+A rule version is triage_logic.VITAL_RULES with some rules replaced, given as a
+JSON file of {rule id: [[vital, low, high, bounds], ...]}. The diff first works
+out, per vital, the value ranges where the two versions disagree about which
+rules a value satisfies: only records with a vital in one of those ranges can
+move. It finds them with per-day sorted value indexes of the archive (built on
+first use, see triage_archive.value_index), re-scores just those records under
+both versions with batch_triage and reports the ones whose tag or rule moved.
+
+Archived vitals do not distinguish a blank field from a missing one, so both
+are scored as missing (assess_triage's default for that vital).
+
+    python rule_diff.py archive --new rules.json
+    python rule_diff.py archive --old last_month.json --new rules.json --from 2026-09-01 --json
+"""
+import argparse
+import json
+import math
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from batch_triage import BLOCK_FIELDS, DEFAULTS, allocate, assess_columns
+from triage_archive import days, open_chunk, value_index
+from triage_logic import RULES, TAGS, VITAL_FIELDS, VITAL_RULES, in_interval, validate_rules
+
+# Archived vitals are float32; re-scoring rounds them to 3 decimals, so widen index lookups by this much
+LOOKUP_MARGIN = 1e-3
+RESCORE_COLUMNS = ["tag", "rule", "flags", "symptoms", "patient_id", "assessed_at"] + list(VITAL_FIELDS)
+
+
+def load_rules(path: str = None) -> Dict:
+    """VITAL_RULES with the rules in a JSON file (if any) replaced."""
+    rules = dict(VITAL_RULES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        rules.update({rule: tuple(tuple(condition) for condition in conditions)
+                      for rule, conditions in overrides.items()})
+    validate_rules(rules)
+    return rules
+
+
+def _satisfied(rules: Dict, vital: str, x: float) -> frozenset:
+    """Rules with a condition on `vital` that holds for value x."""
+    return frozenset(rule for rule, conditions in rules.items()
+                     if any(v == vital and in_interval(x, low, high, bounds) for v, low, high, bounds in conditions))
+
+
+def changed_regions(old: Dict, new: Dict) -> Dict[str, List[Tuple[float, float]]]:
+    """
+    {vital: [(low, high), ...]}: closed value ranges where the two versions disagree on
+    which rules hold. A record none of whose vitals is in these ranges scores the same.
+    """
+    regions = {}
+    for vital in VITAL_FIELDS:
+        points = sorted({bound for rules in (old, new) for conditions in rules.values()
+                         for v, low, high, _ in conditions if v == vital
+                         for bound in (low, high) if bound is not None})
+        # Membership is constant on each breakpoint and on each open gap between breakpoints
+        edges = [-math.inf] + points + [math.inf]
+        pieces = []
+        for low, high in zip(edges, edges[1:]):
+            if math.isinf(low) and math.isinf(high):
+                sample = 0.0
+            elif math.isinf(low):
+                sample = high - 1
+            elif math.isinf(high):
+                sample = low + 1
+            else:
+                sample = (low + high) / 2
+            pieces.append((low, high, sample))
+            if not math.isinf(high):
+                pieces.append((high, high, high))
+        merged = []
+        for low, high, sample in pieces:
+            if _satisfied(old, vital, sample) == _satisfied(new, vital, sample):
+                continue
+            if merged and merged[-1][1] == low:
+                merged[-1] = (merged[-1][0], high)
+            else:
+                merged.append((low, high))
+        if merged:
+            regions[vital] = merged
+    return regions
+
+
+def candidate_rows(root: str, day: str, regions: Dict, rows: int) -> np.ndarray:
+    """Sorted row numbers of one day with a vital in a changed region (missing vitals count as the default)."""
+    found = []
+    for vital, ranges in regions.items():
+        values, order = value_index(root, day, vital)
+        finite = int(np.searchsorted(values, np.inf, side="right"))  # NaNs sort after +inf
+        for low, high in ranges:
+            start = np.searchsorted(values[:finite], low - LOOKUP_MARGIN, side="left")
+            stop = np.searchsorted(values[:finite], high + LOOKUP_MARGIN, side="right")
+            found.append(order[start:stop])
+            if low <= DEFAULTS[vital] <= high:
+                found.append(order[finite:])
+    if not found:
+        return np.empty(0, np.int64)
+    candidates = np.unique(np.concatenate(found).astype(np.int64))
+    # An interrupted flush can leave one column longer than the rest
+    return candidates[candidates < rows]
+
+
+def rescore(chunk: Dict[str, np.ndarray], rows: np.ndarray, rules: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """(tag, rule) codes for the given rows of an archive chunk under `rules`."""
+    columns = allocate(len(rows))
+    for i, field in enumerate(BLOCK_FIELDS):
+        values = np.round(np.asarray(chunk[field][rows], dtype=np.float64), 3)
+        columns["vitals"][:, i] = np.where(np.isnan(values), DEFAULTS[field], values)
+    columns["ambulance"][:] = chunk["flags"][rows] & 1
+    columns["symptoms"][:] = chunk["symptoms"][rows]
+    assess_columns(columns, rules)
+    return columns["tag"].copy(), columns["rule"].copy()
+
+
+def _count_moves(counts: Dict[str, int], names, old: np.ndarray, new: np.ndarray) -> None:
+    pairs, n = np.unique(np.stack([old, new]), axis=1, return_counts=True)
+    for (a, b), count in zip(pairs.T.tolist(), n.tolist()):
+        key = f"{names[a]}->{names[b]}"
+        counts[key] = counts.get(key, 0) + count
+
+
+def diff_archive(root: str, old: Dict, new: Dict, start: str = None, end: str = None,
+                 examples: int = 20, full: bool = False) -> Dict:
+    """Change report for the archive between two rule versions (full=True re-scores every record)."""
+    regions = changed_regions(old, new)
+    report = {
+        # None for an unbounded end (JSON has no infinity)
+        "regions": {vital: [[None if math.isinf(bound) else bound for bound in region] for region in ranges]
+                    for vital, ranges in regions.items()},
+        "records": 0, "rescored": 0, "moved": 0, "stored_disagreements": 0,
+        "tags": {}, "rules": {}, "days": {}, "examples": [],
+    }
+    for day in days(root, start, end):
+        chunk = open_chunk(root, day, RESCORE_COLUMNS)
+        n = len(chunk["tag"])
+        report["records"] += n
+        if full:
+            rows = np.arange(n)
+        elif regions:
+            rows = candidate_rows(root, day, regions, n)
+        else:
+            continue
+        if not len(rows):
+            continue
+        report["rescored"] += len(rows)
+        old_tag, old_rule = rescore(chunk, rows, old)
+        new_tag, new_rule = rescore(chunk, rows, new)
+        report["stored_disagreements"] += int(np.count_nonzero(old_rule != chunk["rule"][rows]))
+        moved = np.flatnonzero((old_tag != new_tag) | (old_rule != new_rule))
+        if not len(moved):
+            continue
+        report["moved"] += len(moved)
+        report["days"][day] = len(moved)
+        _count_moves(report["tags"], TAGS, old_tag[moved], new_tag[moved])
+        _count_moves(report["rules"], RULES, old_rule[moved], new_rule[moved])
+        for i in moved[:max(0, examples - len(report["examples"]))].tolist():
+            row = int(rows[i])
+            report["examples"].append({
+                "day": day, "row": row, "patient_id": chunk["patient_id"][row].decode("utf-8", "replace"),
+                "assessed_at": float(chunk["assessed_at"][row]),
+                "vitals": {field: None if np.isnan(chunk[field][row]) else round(float(chunk[field][row]), 3)
+                           for field in VITAL_FIELDS},
+                "old": {"tag": TAGS[old_tag[i]], "rule": RULES[old_rule[i]]},
+                "new": {"tag": TAGS[new_tag[i]], "rule": RULES[new_rule[i]]},
+            })
+    report["fraction_rescored"] = report["rescored"] / report["records"] if report["records"] else 0.0
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score archived assessments affected by a threshold change")
+    parser.add_argument("root")
+    parser.add_argument("--old", help="rule overrides JSON for the old version (default: the current rules)")
+    parser.add_argument("--new", required=True, help="rule overrides JSON for the new version")
+    parser.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    parser.add_argument("--examples", type=int, default=20)
+    parser.add_argument("--full", action="store_true", help="re-score every record (to check the selective diff)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    report = diff_archive(args.root, load_rules(args.old), load_rules(args.new), args.start, args.end,
+                          args.examples, args.full)
+    elapsed = time.perf_counter() - began
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    regions = "; ".join(f"{vital} " + ", ".join(f"[{'-inf' if low is None else low}, {'inf' if high is None else high}]"
+                                                 for low, high in ranges)
+                        for vital, ranges in report["regions"].items())
+    print(f"Changed regions: {regions or 'none'}")
+    print(f"Re-scored {report['rescored']} of {report['records']} records ({report['fraction_rescored']:.1%})"
+          f" in {elapsed:.2f} s; {report['moved']} changed outcome")
+    for key, count in sorted(report["tags"].items(), key=lambda item: -item[1]):
+        print(f"  {key:<14} {count}")
+    if report["rules"]:
+        print("By rule:")
+        for key, count in sorted(report["rules"].items(), key=lambda item: -item[1]):
+            print(f"  {key:<34} {count}")
+    for example in report["examples"]:
+        print(f"  {example['day']} {example['patient_id']:<16} {example['old']['tag']:>6} -> {example['new']['tag']:<6}"
+              f" ({example['old']['rule']} -> {example['new']['rule']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Versioned triage rules that can be replaced while the service runs.
+
+A RuleSet is one immutable version of the rules: the vital thresholds
+(triage_logic.VITAL_RULES with overrides) and the RED/YELLOW/GREEN symptom
+groups. Building one compiles the rules into a single Python function with the
+thresholds inlined, with the same behaviour as assess_triage (parsing quirks
+included) when the rules are the defaults. Every result it returns carries
+"rules_version".
+
+A RuleStore holds the current RuleSet. Readers take `store.current` once per
+request and use that object throughout, with no lock. reload() validates and
+compiles the new version on a background thread and then publishes it by
+rebinding `current` (one reference swap), so requests already in flight finish
+on the version they started with. Listeners registered with subscribe() are
+called after each swap, to drop anything cached for the old version.
+
+A rules file is JSON, every key optional:
+
+    {"label": "winter protocol",
+     "vital_rules": {"yellow_o2": [["o2_saturation", 90, 95, "[)"]]},
+     "symptoms": {"RED": {"stridor": ["Airway Obstruction", "Epiglottitis"]},
+                  "GREEN": {"dressing_change": null}}}
+
+vital_rules replaces whole rules; a symptom mapped to null is removed.
+
+Stations that triage locally (TTS_V1.py) follow the backend's rules with a
+RemoteRules, which polls GET /rules and rebuilds the RuleSet when the
+published version changes, keeping the last one it had while offline.
+
+    python rule_set.py check rules.json
+"""
+import argparse
+import concurrent.futures
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+from early_warning import EarlyWarningScore
+from triage_logic import GREEN_SYMPTOMS, RED_SYMPTOMS, TAGS, VITAL_RULES, YELLOW_SYMPTOMS, validate_rules
+
+DEFAULT_SYMPTOMS = {"RED": RED_SYMPTOMS, "YELLOW": YELLOW_SYMPTOMS, "GREEN": GREEN_SYMPTOMS}
+TIMES = {"RED": "15 minutes", "YELLOW": "30 minutes", "GREEN": "60 minutes"}
+
+# Variable, form field and default in assess_triage's vitals blocks, in conversion order
+_FIELDS = (("o2", "o2_saturation", "float", 0), ("gcs", "gcs_score", "int", 15),
+           ("temp", "temperature", "float", 0), ("sbp", "systolic_bp", "float", 0),
+           ("dbp", "diastolic_bp", "float", 0), ("hr", "heart_rate", "float", 0))
+_VARIABLE = {field: variable for variable, field, _, _ in _FIELDS}
+# How many conversions must have succeeded before a check on the field runs (both pressures
+# are converted before any blood-pressure check)
+_LEVEL = {"o2": 1, "gcs": 2, "temp": 3, "sbp": 5, "dbp": 5, "hr": 6}
+
+# rule id -> (reason template over the variables above, diagnoses), as in assess_triage
+RULE_TEXT = {
+    "red_o2": ("Critical O₂ saturation: {o2}%", ["Respiratory Failure", "Severe Pneumonia", "Pulmonary Embolism"]),
+    "red_gcs": ("Critical GCS Score: {gcs}", ["Altered Mental Status", "Intracranial Event",
+                                               "Metabolic Encephalopathy"]),
+    "red_temp_high": ("Critical High Temperature: {temp}°C", ["Severe Sepsis", "Malignant Hyperthermia",
+                                                              "Heat Stroke"]),
+    "red_temp_low": ("Critical Low Temperature: {temp}°C", ["Severe Hypothermia", "Septic Shock",
+                                                            "Environmental Exposure"]),
+    "red_bp_high": ("Critical High Blood Pressure: {sbp}/{dbp}", ["Hypertensive Emergency", "Malignant Hypertension",
+                                                                  "End Organ Damage"]),
+    "red_bp_low": ("Critical Low Blood Pressure: {sbp}/{dbp}", ["Hypotensive Shock", "Sepsis", "Severe Dehydration"]),
+    "red_hr_low": ("Critical Low Heart Rate: {hr} bpm", ["Severe Bradycardia", "Heart Block", "Sick Sinus Syndrome"]),
+    "red_hr_high": ("Critical High Heart Rate: {hr} bpm", ["Severe Tachycardia", "Atrial Fibrillation",
+                                                           "Ventricular Tachycardia"]),
+    "yellow_o2": ("Concerning O₂ saturation: {o2}%", ["COPD Exacerbation", "Asthma", "Pneumonia"]),
+    "yellow_gcs": ("Concerning GCS Score: {gcs}", ["Concussion", "Medication Effect", "Metabolic Disorder"]),
+    "yellow_temp_low": ("Concerning Low Temperature: {temp}°C", ["Mild Hypothermia", "Poor Circulation",
+                                                                 "Environmental Exposure"]),
+    "yellow_temp_high": ("Concerning High Temperature: {temp}°C", ["Infection", "Inflammatory Condition",
+                                                                   "Early Sepsis"]),
+    "yellow_bp_low": ("Concerning Low Blood Pressure: {sbp}/{dbp}", ["Early Shock", "Dehydration",
+                                                                     "Medication Effect"]),
+    "yellow_bp_high": ("Concerning High Blood Pressure: {sbp}/{dbp}", ["Hypertension", "Anxiety", "Pain"]),
+    "yellow_hr_low": ("Concerning Low Heart Rate: {hr} bpm", ["Bradycardia", "Beta Blocker Effect", "Athletic Heart"]),
+    "yellow_hr_high": ("Concerning High Heart Rate: {hr} bpm", ["Tachycardia", "Anxiety", "Fever"]),
+}
+AMBULANCE_DIAGNOSES = ["Trauma", "Acute Medical Emergency", "Critical Condition"]
+DEFAULT_DIAGNOSES = ["Routine Check-up", "Minor Ailment"]
+
+
+def _condition(vital: str, low, high, bounds: str) -> str:
+    variable = _VARIABLE[vital]
+    parts = []
+    if low is not None:
+        parts.append(f"{variable} {'>=' if bounds[0] == '[' else '>'} {low!r}")
+    if high is not None:
+        parts.append(f"{variable} {'<=' if bounds[1] == ']' else '<'} {high!r}")
+    return " and ".join(parts)
+
+
+def _vital_checks(rules: Dict, tag: str, indent: str) -> List[str]:
+    lines = []
+    for rule, conditions in rules.items():
+        if not rule.startswith(tag.lower() + "_") or not conditions:
+            continue
+        reason, diagnoses = RULE_TEXT[rule]
+        used = {_VARIABLE[vital] for vital, *_ in conditions}
+        used.update(variable for variable in _LEVEL if "{" + variable + "}" in reason)
+        level = max(_LEVEL[variable] for variable in used)
+        test = " or ".join(f"({_condition(*condition)})" for condition in conditions)
+        lines += [f"{indent}if level >= {level} and ({test}):",
+                  f"{indent}    return {{'tag': {tag!r}, 'time': {TIMES[tag]!r}, 'reason': f{reason!r}, "
+                  f"'diagnoses': {diagnoses!r}, 'rules_version': VERSION}}"]
+    return lines
+
+
+def compile_rules(vital_rules: Dict, symptoms: Dict, version: int) -> Callable[[Dict], Dict]:
+    """
+    One assess(patient) function for these rules. The vitals are converted once
+    (stopping at the first failure, as assess_triage's blocks do); a check runs
+    only if every conversion up to its fields succeeded.
+    """
+    ordered = {rule: vital_rules.get(rule, ()) for rule in VITAL_RULES}
+    lines = ["def assess(patient):",
+             "    if patient.get('ambulance_arrival'):",
+             f"        return {{'tag': 'RED', 'time': {TIMES['RED']!r}, 'reason': 'Patient arrived by ambulance', "
+             f"'diagnoses': {AMBULANCE_DIAGNOSES!r}, 'rules_version': VERSION}}",
+             "    level = 0",
+             "    try:"]
+    for i, (variable, field, convert, default) in enumerate(_FIELDS, 1):
+        lines += [f"        {variable} = {convert}(patient.get({field!r}, {default!r}))", f"        level = {i}"]
+    lines += ["    except Exception:", "        pass"]
+    lines += _vital_checks(ordered, "RED", "    ")
+    lines += ["    for s in patient.get('symptoms', []):",
+              "        if s in RED:",
+              f"            return {{'tag': 'RED', 'time': {TIMES['RED']!r}, "
+              "'reason': f'Presence of RED TAG symptom: {s}', 'diagnoses': list(RED[s]), 'rules_version': VERSION}"]
+    lines += _vital_checks(ordered, "YELLOW", "    ")
+    for tag in ("YELLOW", "GREEN"):
+        lines += [f"    found = [s for s in patient.get('symptoms', []) if s in {tag}]",
+                  "    if found:",
+                  f"        return {{'tag': {tag!r}, 'time': {TIMES[tag]!r}, "
+                  f"'reason': '{tag} TAG conditions: ' + ', '.join(found), "
+                  f"'diagnoses': [d for s in found for d in {tag}[s]], 'rules_version': VERSION}}"]
+    lines.append(f"    return {{'tag': 'GREEN', 'time': {TIMES['GREEN']!r}, "
+                 "'reason': 'No urgent symptoms or abnormal vital signs detected', "
+                 f"'diagnoses': {DEFAULT_DIAGNOSES!r}, 'rules_version': VERSION}}")
+    namespace = {"RED": symptoms["RED"], "YELLOW": symptoms["YELLOW"], "GREEN": symptoms["GREEN"],
+                 "VERSION": version}
+    exec(compile("\n".join(lines), f"<rules v{version}>", "exec"), namespace)
+    return namespace["assess"]
+
+
+class RuleSet:
+    """One immutable, compiled version of the triage rules."""
+
+    def __init__(self, vital_rules: Dict = None, symptoms: Dict = None, version: int = 0, label: str = "built-in"):
+        vital_rules = dict(VITAL_RULES if vital_rules is None else vital_rules)
+        validate_rules(vital_rules)
+        for rule, conditions in vital_rules.items():
+            for _, low, high, _ in conditions:
+                for bound in (low, high):
+                    # Thresholds are inlined into generated code: plain finite numbers only
+                    if bound is not None and (type(bound) not in (int, float) or bound != bound
+                                              or abs(bound) == float("inf")):
+                        raise ValueError(f"{rule}: thresholds must be finite numbers, got {bound!r}")
+        symptoms = copy.deepcopy(DEFAULT_SYMPTOMS if symptoms is None else symptoms)
+        for tag in TAGS:
+            for symptom, diagnoses in symptoms.get(tag, {}).items():
+                if not isinstance(symptom, str) or not isinstance(diagnoses, list) \
+                        or not all(isinstance(d, str) for d in diagnoses):
+                    raise ValueError(f"{tag} symptom {symptom!r}: diagnoses must be a list of strings")
+        self.vital_rules = {rule: tuple(tuple(c) for c in conditions) for rule, conditions in vital_rules.items()}
+        self.symptoms = {tag: symptoms.get(tag, {}) for tag in TAGS}
+        self.version = version
+        self.label = label
+        self.loaded_at = time.time()
+        self.document = {"vital_rules": {rule: [list(c) for c in conditions]
+                                         for rule, conditions in self.vital_rules.items()},
+                         "symptoms": self.symptoms}
+        self.digest = hashlib.sha256(json.dumps(self.document, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        # The batch and worker-pool paths hard-code the default symptom groups
+        self.default_symptoms = self.symptoms == DEFAULT_SYMPTOMS
+        self.default = self.default_symptoms and self.vital_rules == VITAL_RULES
+        self.assess = compile_rules(self.vital_rules, self.symptoms, version)
+
+    @classmethod
+    def from_document(cls, document: Dict, version: int) -> "RuleSet":
+        """A rules-file document (see the module docstring) applied on top of the built-in rules."""
+        if not isinstance(document, dict):
+            raise ValueError("rules document must be a JSON object")
+        unknown = set(document) - {"label", "vital_rules", "symptoms"}
+        if unknown:
+            raise ValueError(f"unknown keys in rules document: {', '.join(sorted(unknown))}")
+        if not isinstance(document.get("vital_rules") or {}, dict) or not isinstance(document.get("symptoms") or {}, dict):
+            raise ValueError("vital_rules and symptoms must be JSON objects")
+        vital_rules = dict(VITAL_RULES)
+        vital_rules.update(document.get("vital_rules") or {})
+        symptoms = copy.deepcopy(DEFAULT_SYMPTOMS)
+        for tag, changes in (document.get("symptoms") or {}).items():
+            if tag not in TAGS:
+                raise ValueError(f"symptom group must be one of {', '.join(TAGS)}, not {tag!r}")
+            if not isinstance(changes, dict):
+                raise ValueError(f"symptoms.{tag} must map symptom ids to diagnoses")
+            for symptom, diagnoses in changes.items():
+                for group in symptoms.values():
+                    group.pop(symptom, None)
+                if diagnoses is not None:
+                    symptoms[tag][symptom] = diagnoses
+        return cls(vital_rules, symptoms, version, document.get("label") or f"version {version}")
+
+    @classmethod
+    def from_published(cls, published: Dict) -> "RuleSet":
+        """The RuleSet a backend describes at GET /rules (describe() plus the complete rules document)."""
+        rules = published["rules"]
+        return cls(rules["vital_rules"], rules["symptoms"], published["version"], published["label"])
+
+    def assess_with_score(self, patient: Dict) -> Dict:
+        result = self.assess(patient)
+        result["ews"] = EarlyWarningScore(patient).as_dict()
+        return result
+
+    def assess_batch(self, patients: List[Dict]) -> List[Dict]:
+        """[{"tag", "rule"}] per patient, through batch_triage's columns when the symptom groups allow it."""
+        from batch_triage import allocate, assess_columns, fill, results_from
+        from triage_logic import rule_of
+        if self.default_symptoms:
+            columns = allocate(len(patients))
+            fill(patients, columns)
+            assess_columns(columns, self.vital_rules)
+            results = results_from(columns, len(patients))
+            for row, flagged in enumerate(columns["fallback"][:len(patients)].tolist()):
+                if flagged:
+                    results[row] = self._one(patients[row], rule_of)
+            return results
+        return [self._one(patient, rule_of) for patient in patients]
+
+    def _one(self, patient: Dict, rule_of) -> Dict:
+        try:
+            result = self.assess(patient)
+            return {"tag": result["tag"], "rule": rule_of(result)}
+        except Exception as e:
+            return {"tag": None, "rule": None, "error": str(e)}
+
+    def describe(self) -> Dict:
+        return {"version": self.version, "label": self.label, "digest": self.digest, "loaded_at": self.loaded_at,
+                "default": self.default}
+
+
+class RuleStore:
+    """The current RuleSet, swapped atomically on reload."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.current = RuleSet()
+        self._listeners: List[Callable[[RuleSet, RuleSet], None]] = []
+        self._lock = threading.Lock()  # serializes reloads; readers never take it
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="rules-reload")
+        self._mtime = None
+        if path and os.path.exists(path):
+            self._install(None)
+
+    def subscribe(self, listener: Callable[[RuleSet, RuleSet], None]) -> None:
+        """listener(old, new) runs after every swap."""
+        self._listeners.append(listener)
+
+    def reload(self, document: Optional[Dict] = None) -> concurrent.futures.Future:
+        """
+        Build and publish a new version in the background, from `document` or else
+        the rules file. The future holds the published RuleSet, or raises ValueError
+        if the rules are invalid (the current version then stays in place).
+        """
+        return self._executor.submit(self._install, document)
+
+    def _install(self, document: Optional[Dict]) -> RuleSet:
+        with self._lock:
+            if document is None:
+                if not self.path:
+                    raise ValueError("no rules file configured")
+                self._mtime = os.path.getmtime(self.path)
+                with open(self.path, encoding="utf-8") as f:
+                    try:
+                        document = json.load(f)
+                    except ValueError as e:
+                        raise ValueError(f"{self.path}: {e}") from e
+            old = self.current
+            new = RuleSet.from_document(document, old.version + 1)
+            if new.digest == old.digest:
+                return old
+            self.current = new
+        for listener in self._listeners:
+            listener(old, new)
+        return new
+
+    def watch(self, interval: float = 5.0) -> threading.Thread:
+        """Reload whenever the rules file's modification time changes."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if os.path.getmtime(self.path) != self._mtime:
+                        self.reload().result()
+                except (OSError, ValueError):
+                    pass  # keep serving the current version until the file is fixed
+        thread = threading.Thread(target=run, name="rules-watch", daemon=True)
+        thread.start()
+        return thread
+
+
+class RemoteRules:
+    """The backend's current rules, for a station: `current` is refreshed from GET /rules every `interval` seconds."""
+
+    def __init__(self, url: str, interval: float = 30.0, timeout: float = 5.0):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.current = RuleSet()
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> RuleSet:
+        """Fetch once; the current rules are kept when the backend is unreachable or sends something invalid."""
+        try:
+            with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+                published = json.load(response)
+            if published["digest"] != self.current.digest or published["version"] != self.current.version:
+                self.current = RuleSet.from_published(published)
+            self.last_error = None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.last_error = str(e)
+        return self.current
+
+    def start(self) -> threading.Thread:
+        def run():
+            self.refresh()
+            while not self._stop.wait(self.interval):
+                self.refresh()
+        thread = threading.Thread(target=run, name="rules-follow", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned triage rules")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check_parser = sub.add_parser("check", help="validate and compile a rules file")
+    check_parser.add_argument("path")
+    args = parser.parse_args(argv)
+    if args.command == "check":
+        with open(args.path, encoding="utf-8") as f:
+            rules = RuleSet.from_document(json.load(f), 1)
+        print(json.dumps(rules.describe(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from patient_index import normalize_id
+
+
+def triage_key(payload) -> Optional[Tuple[str, str]]:
+    """
+    (normalized patient id, digest of the rest of the form). Two submissions
+    with the same key get the same triage result and the same downstream
+    records, so a desk retry or a second desk sending the same form can share
+    one evaluation. Key order and id spelling ("p-1 " vs "P-1") do not matter;
+    anything else (values, symptom order, which fields are present) does.
+    None for a form without a patient id: two walk-ins with the same vitals
+    and symptoms are still two patients, and each must be recorded.
+    """
+    if not isinstance(payload, dict):
+        return None
+    patient_id = normalize_id(payload.get("patient_id"))
+    if not patient_id:
+        return None
+    rest = {k: v for k, v in payload.items() if k != "patient_id"}
+    digest = hashlib.sha1(json.dumps(rest, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+    return patient_id, digest
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, callers arriving while it runs wait and receive the same result
+    (or the same exception). Nothing is cached once the call finishes, so a
+    later identical request is evaluated again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """(fn's result, whether it was shared from another caller's execution)."""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalescing_ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+                "in_flight": len(self._calls),
+                "max_waiters": self.max_waiters,
+            }
@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+from admission import AdmissionGate, Overloaded, prescreen
+
+
+class TestPrescreen(unittest.TestCase):
+    def test_lanes(self):
+        self.assertEqual(prescreen({"ambulance_arrival": True}), "critical")
+        self.assertEqual(prescreen({"o2_saturation": "85"}), "critical")
+        self.assertEqual(prescreen({"systolic_bp": "230"}), "critical")
+        self.assertEqual(prescreen({"heart_rate": "35"}), "critical")
+        self.assertEqual(prescreen({"symptoms": ["chest_pain"]}), "critical")
+        self.assertEqual(prescreen({"heart_rate": "120", "symptoms": ["eye_problems"]}), "routine")
+        self.assertEqual(prescreen({"o2_saturation": "", "heart_rate": "0"}), "routine")
+        self.assertEqual(prescreen({"symptoms": "chest_pain", "temperature": "abc"}), "routine")
+        self.assertEqual(prescreen(None), "routine")
+        self.assertEqual(prescreen(["ambulance_arrival"]), "routine")
+        self.assertEqual(prescreen([{"heart_rate": "80"}, {"ambulance_arrival": True}]), "critical")
+        self.assertEqual(prescreen([{"heart_rate": "80"}]), "routine")
+
+
+class TestAdmissionGate(unittest.TestCase):
+    def hold(self, gate, lane, started, release, order=None):
+        def run():
+            try:
+                with gate.admit(lane):
+                    if order is not None:
+                        order.append(lane)
+                    started.release()
+                    release.wait()
+            except Overloaded:
+                started.release()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def wait_queued(self, gate, lane, n):
+        deadline = time.time() + 2
+        while gate.metrics()["queued"][lane] < n and time.time() < deadline:
+            time.sleep(0.001)
+
+    def test_critical_served_first(self):
+        gate = AdmissionGate(capacity=2, reserved=1)
+        started, release, order = threading.Semaphore(0), threading.Event(), []
+        threads = [self.hold(gate, "critical", started, release)]
+        threads.append(self.hold(gate, "critical", started, release))
+        started.acquire()
+        started.acquire()
+        threads.append(self.hold(gate, "routine", started, release, order))
+        self.wait_queued(gate, "routine", 1)
+        threads.append(self.hold(gate, "critical", started, release, order))
+        self.wait_queued(gate, "critical", 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["critical", "routine"])
+
+    def test_reserved_slot_for_critical(self):
+        gate = AdmissionGate(capacity=2, reserved=1)
+        started, release = threading.Semaphore(0), threading.Event()
+        threads = [self.hold(gate, "routine", started, release)]
+        started.acquire()
+        threads.append(self.hold(gate, "routine", started, release))
+        self.wait_queued(gate, "routine", 1)
+        # The second routine request queues, but a critical one still gets in
+        with gate.admit("critical"):
+            self.assertEqual(gate.running, 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(gate.metrics()["lanes"]["routine"]["admitted"], 2)
+
+    def test_sheds_when_queue_full(self):
+        gate = AdmissionGate(capacity=2, reserved=1, max_queue={"routine": 1})
+        started, release = threading.Semaphore(0), threading.Event()
+        threads = [self.hold(gate, "routine", started, release)]
+        started.acquire()
+        threads.append(self.hold(gate, "routine", started, release))
+        self.wait_queued(gate, "routine", 1)
+        with self.assertRaises(Overloaded) as raised:
+            with gate.admit("routine"):
+                pass
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        lanes = gate.metrics()["lanes"]
+        self.assertEqual((lanes["routine"]["admitted"], lanes["routine"]["shed"]), (2, 1))
+        self.assertIsNotNone(lanes["routine"]["latency"]["p99_ms"])
+
+    def test_queue_timeout(self):
+        gate = AdmissionGate(capacity=1, reserved=0, queue_timeout=0.01)
+        with gate.admit("routine"):
+            with self.assertRaises(Overloaded):
+                with gate.admit("routine"):
+                    pass
+        self.assertEqual(gate.metrics()["queued"]["routine"], 0)
+        with gate.admit("routine"):
+            pass
+
+    def test_invalid_reserved(self):
+        with self.assertRaises(ValueError):
+            AdmissionGate(capacity=2, reserved=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import glob
+import os
+import tempfile
+import threading
+import unittest
+from audit_log import AuditLog, AuditWriter, HEADER, RECORD_SIZE, read_segment, scan
+from triage_logic import assess_triage, RULES, TAGS
+
+
+class TestAuditLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, writer, patient_id, patient, ts=None):
+        return writer.append(patient_id, patient, assess_triage(patient), ts=ts)
+
+    def test_round_trip_and_filters(self):
+        w = AuditWriter(self.dir, segment_records=100)
+        self.write(w, "TH1", {"o2_saturation": "85", "symptoms": []}, ts=1000.0)
+        self.write(w, "TH2", {"heart_rate": "120", "symptoms": ["joint_pain"]}, ts=2000.0)
+        self.write(w, "TH3", {"symptoms": ["constipation"]}, ts=3000.0)
+        w.close()
+        records = read_segment(glob.glob(os.path.join(self.dir, "*.aud"))[0])
+        self.assertEqual(records["seq"].tolist(), [1, 2, 3])
+        self.assertEqual([TAGS[t] for t in records["tag"]], ["RED", "YELLOW", "GREEN"])
+        self.assertEqual(RULES[records["rule"][1]], "yellow_hr_high")
+        self.assertEqual(records["vitals"][1][5], 120.0)
+        self.assertNotEqual(records["vitals"][1][0], records["vitals"][1][0])  # blank -> NaN
+
+        def patients(**filters):
+            return [p for batch in scan(self.dir, **filters) for p in batch["patient_id"].tolist()]
+        self.assertEqual(patients(tag="RED"), [b"TH1"])
+        self.assertEqual(patients(rule="green_symptoms"), [b"TH3"])
+        self.assertEqual(patients(since=1500.0, until=3000.0), [b"TH2"])
+        self.assertEqual(patients(patient_id="TH3"), [b"TH3"])
+
+    def test_segments_rotate(self):
+        w = AuditWriter(self.dir, segment_records=4)
+        for i in range(10):
+            self.write(w, f"TH{i}", {"symptoms": []})
+        w.close()
+        self.assertEqual(len(glob.glob(os.path.join(self.dir, "*.aud"))), 3)
+        seqs = [s for batch in scan(self.dir) for s in batch["seq"].tolist()]
+        self.assertEqual(seqs, list(range(1, 11)))
+
+    def test_torn_last_record_is_dropped(self):
+        w = AuditWriter(self.dir, segment_records=10)
+        for i in range(3):
+            self.write(w, f"TH{i}", {"symptoms": []})
+        w.close()
+        path = glob.glob(os.path.join(self.dir, "*.aud"))[0]
+        # Simulate a crash after the body of record 3 was written but before its CRC
+        with open(path, "r+b") as f:
+            f.seek(HEADER.size + 2 * RECORD_SIZE + RECORD_SIZE - 6)
+            f.write(b"\x00\x00\x00\x00")
+        self.assertEqual(read_segment(path)["seq"].tolist(), [1, 2])
+
+    def test_threads_share_a_fixed_set_of_writers(self):
+        log = AuditLog(self.dir, segment_records=1000, stripes=4)
+
+        def work(n):
+            for i in range(200):
+                log.append(f"T{n}-{i}", {"symptoms": []}, assess_triage({"symptoms": []}))
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # One short-lived thread per request, as under a threaded server
+        for n in range(50):
+            t = threading.Thread(target=log.append, args=(f"R{n}", {"symptoms": []}, assess_triage({"symptoms": []})))
+            t.start()
+            t.join()
+        log.close()
+        self.assertEqual(len(glob.glob(os.path.join(self.dir, "*.aud"))), 4)
+        records = [r for b in scan(self.dir) for r in b]
+        self.assertEqual(len(records), 1650)
+        # Sequence numbers stay consecutive within each writer despite the sharing
+        for writer in {int(r["writer"]) for r in records}:
+            seqs = sorted(int(r["seq"]) for r in records if r["writer"] == writer)
+            self.assertEqual(seqs, list(range(1, len(seqs) + 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
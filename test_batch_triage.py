@@ -0,0 +1,56 @@
+import random
+import unittest
+from batch_triage import allocate, assess_batch, fill, fill_records
+from triage_logic import SYMPTOM_IDS, assess_triage, rule_of
+from wire_format import as_records, decode_patients, encode_patients
+
+
+def random_patient(rng):
+    patient = {"symptoms": rng.sample(SYMPTOM_IDS, rng.randint(0, 2))}
+    for field, low, high in (("o2_saturation", 80, 100), ("temperature", 33, 42), ("systolic_bp", 60, 240),
+                             ("diastolic_bp", 40, 130), ("heart_rate", 30, 170)):
+        roll = rng.random()
+        if roll < 0.8:
+            patient[field] = f"{rng.uniform(low, high):.1f}"
+        elif roll < 0.9:
+            patient[field] = rng.choice(["", "abc", None, 0])
+    patient["gcs_score"] = rng.choice(["15", "14", "11", "8", "14.0", "", 12.7, None])
+    patient["ambulance_arrival"] = rng.random() < 0.05
+    return patient
+
+
+class TestAssessBatch(unittest.TestCase):
+    def test_matches_assess_triage(self):
+        rng = random.Random(3)
+        patients = [random_patient(rng) for _ in range(5000)]
+        for patient, result in zip(patients, assess_batch(patients)):
+            expected = assess_triage(patient)
+            self.assertEqual((result["tag"], result["rule"]), (expected["tag"], rule_of(expected)), patient)
+
+    def test_conversion_quirks(self):
+        # A failed conversion stops the rest of its block; a missing GCS counts as 15
+        patients = [{"o2_saturation": "x", "gcs_score": "5"}, {"gcs_score": "5.0"}, {"gcs_score": 5.9},
+                    {"temperature": "", "systolic_bp": "60"}, {"o2_saturation": "95"}]
+        self.assertEqual([r["rule"] for r in assess_batch(patients)],
+                         ["default", "default", "red_gcs", "default", "default"])
+
+    def test_fallback_rows(self):
+        results = assess_batch([{"symptoms": 5}, {"symptoms": ["chest_pain"]}, {"symptoms": ["cough"], "x": 1}])
+        self.assertIsNone(results[0]["tag"])
+        self.assertIn("error", results[0])
+        self.assertEqual(results[1], {"tag": "RED", "rule": "red_symptom"})
+        self.assertEqual(assess_batch([]), [])
+
+    def test_records_match_decoded_dicts(self):
+        rng = random.Random(4)
+        patients = [random_patient(rng) for _ in range(2000)]
+        body = encode_patients(patients)
+        from_records, from_dicts = allocate(len(patients)), allocate(len(patients))
+        fill_records(as_records(body), from_records)
+        fill(decode_patients(body), from_dicts)
+        for name in ("vitals", "invalid", "ambulance", "symptoms", "fallback"):
+            self.assertEqual(from_records[name].tolist(), from_dicts[name].tolist(), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from complaint_matcher import ComplaintMatcher, strip_html_tags, tokenize
+from triage_logic import SYMPTOM_NAMES
+
+
+class TestComplaintMatcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.matcher = ComplaintMatcher()
+
+    def top(self, text):
+        matches = self.matcher.match(text)
+        return matches[0]["symptom"] if matches else None
+
+    def test_display_names_match_their_own_symptom(self):
+        for sid, name in SYMPTOM_NAMES.items():
+            with self.subTest(symptom=sid):
+                self.assertEqual(self.top(name), sid)
+
+    def test_english_free_text(self):
+        self.assertEqual(self.top("c/o chest pain since morning"), "chest_pain")
+        self.assertEqual(self.top("loose motion x3 days"), "mild_diarrhea")
+        self.assertEqual(self.top("BP high, no complaints"), "hypertension_without_symptoms")
+
+    def test_nepali_transliterations(self):
+        self.assertEqual(self.top("chhati dukhyo"), "chest_pain")
+        self.assertEqual(self.top("sas pherna garo"), "shortness_of_breath_severe")
+        self.assertEqual(self.top("pakhala"), "mild_diarrhea")
+        self.assertEqual(self.top("tauko dukhyo"), "headache_moderate")
+
+    def test_typos_resolve_through_trigrams(self):
+        self.assertEqual(self.top("constipaton"), "constipation")
+        self.assertEqual(self.top("diarhoea with blood"), "bloody_diarrhea")
+
+    def test_html_is_stripped(self):
+        self.assertEqual(strip_html_tags("<p>Chest <b>pain</b></p>"), "Chest pain")
+        self.assertEqual(self.top("<span>Vomiting blood</span>&nbsp;"), "vomiting_blood")
+
+    def test_negation_drops_next_word(self):
+        self.assertEqual(tokenize("Mild diarrhea (no blood)"), ["mild", "diarrhea"])
+
+    def test_constipation_phrasings(self):
+        self.assertEqual(self.top("unable to pass stool x4 days"), "constipation")
+        self.assertEqual(self.top("hard stool"), "constipation")
+
+    def test_phrase_without_content_tokens_is_refused(self):
+        with self.assertRaises(ValueError):
+            ComplaintMatcher(synonyms={"constipation": ["no stool"]})
+
+    def test_tie_prefers_more_specific_phrase(self):
+        self.assertEqual(self.top("severe headache"), "severe_headache")
+
+    def test_unrelated_text_has_no_match(self):
+        self.assertEqual(self.matcher.match("pain"), [])
+        self.assertEqual(self.matcher.match(""), [])
+
+    def test_batch_keeps_input_order(self):
+        batch = self.matcher.match_batch(["chest pain", "pakhala", "zzz"], limit=1)
+        self.assertEqual([m[0]["symptom"] if m else None for m in batch], ["chest_pain", "mild_diarrhea", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import random
+import unittest
+from dashboard import DashboardAggregates
+from triage_logic import assess_triage, determine_opd
+from waiting_room import TARGET_SECONDS, WaitingRoom
+
+RED = {"o2_saturation": "85", "symptoms": []}
+YELLOW = {"heart_rate": "120", "symptoms": []}
+GREEN_EYE = {"symptoms": ["eye_problems"]}
+GREEN_CHILD = {"age": "6", "symptoms": ["general_symptoms"]}
+
+
+class TestDashboardAggregates(unittest.TestCase):
+    def setUp(self):
+        self.room = WaitingRoom()
+        self.dash = DashboardAggregates()
+        self.room.subscribe(self.dash)
+
+    def triage(self, patient_id, patient, now):
+        return self.room.triage(patient_id, patient, assess_triage(patient), now=now)
+
+    def test_counts_oldest_and_overdue(self):
+        self.triage("A", RED, now=0)
+        self.triage("B", RED, now=600)
+        self.triage("C", YELLOW, now=100)
+        snap = self.dash.snapshot(now=1000)
+        self.assertEqual(snap["waiting"], {"RED": 2, "YELLOW": 1, "GREEN": 0})
+        self.assertEqual(snap["oldest_wait_seconds"]["RED"], 1000)
+        self.assertIsNone(snap["oldest_wait_seconds"]["GREEN"])
+        self.assertEqual(snap["overdue"]["RED"], 1)  # A passed its 15 minutes
+        self.assertEqual(self.dash.snapshot(now=1600)["total_overdue"], 2)
+        self.room.discharge("A")
+        snap = self.dash.snapshot(now=1600)
+        self.assertEqual(snap["overdue"]["RED"], 1)
+        self.assertEqual(snap["oldest_wait_seconds"]["RED"], 1000)
+
+    def test_retriage_moves_lane_and_same_tag_keeps_clock(self):
+        self.triage("A", YELLOW, now=0)
+        self.triage("A", YELLOW, now=500)
+        self.assertEqual(self.dash.snapshot(now=600)["oldest_wait_seconds"]["YELLOW"], 600)
+        self.triage("A", RED, now=700)
+        snap = self.dash.snapshot(now=800)
+        self.assertEqual(snap["waiting"], {"RED": 1, "YELLOW": 0, "GREEN": 0})
+        self.assertEqual(snap["oldest_wait_seconds"]["RED"], 100)
+
+    def test_opd_backlog(self):
+        self.triage("A", GREEN_EYE, now=0)
+        self.triage("B", GREEN_CHILD, now=0)
+        self.triage("C", GREEN_EYE, now=0)
+        self.assertEqual(self.dash.snapshot(now=0)["opd_backlog"], {"Ophthalmology": 2, "Pediatrics": 1})
+        self.triage("A", RED, now=10)
+        self.room.discharge("B")
+        self.assertEqual(self.dash.snapshot(now=10)["opd_backlog"], {"Ophthalmology": 1})
+
+    def test_deltas(self):
+        self.triage("A", RED, now=0)
+        version = self.dash.version
+        self.triage("B", GREEN_EYE, now=1)
+        self.room.discharge("A")
+        deltas = self.dash.deltas_since(version)
+        self.assertEqual([d["event"] for d in deltas], ["triage", "discharge"])
+        self.assertEqual(deltas[0]["opd_backlog"], {"Ophthalmology": 1})
+        self.assertEqual(deltas[1]["waiting"], {"RED": 0})
+        self.assertEqual(self.dash.deltas_since(self.dash.version), [])
+
+    def test_old_deltas_are_dropped(self):
+        dash = DashboardAggregates(history=2)
+        room = WaitingRoom()
+        room.subscribe(dash)
+        for i in range(5):
+            room.triage(f"P{i}", RED, assess_triage(RED), now=i)
+        self.assertIsNone(dash.deltas_since(0))
+        self.assertEqual(len(dash.deltas_since(3)), 2)
+
+    def test_backdated_entries_keep_order(self):
+        # A /sync entry tagged offline arrives after patients tagged later
+        self.triage("B", RED, now=10000)
+        self.triage("A", RED, now=1000)
+        snap = self.dash.snapshot(now=10060)
+        self.assertEqual(snap["overdue"]["RED"], 1)
+        self.assertEqual(snap["oldest_wait_seconds"]["RED"], 9060)
+        # Slotted in ahead of patients already counted overdue, without counting them twice
+        self.triage("C", RED, now=11000)
+        self.dash.snapshot(now=12000)
+        self.triage("D", RED, now=10500)
+        snap = self.dash.snapshot(now=12000)
+        self.assertEqual(snap["overdue"]["RED"], 4)
+        self.room.discharge("A")
+        self.room.discharge("D")
+        self.assertEqual(self.dash.snapshot(now=12000)["overdue"]["RED"], 2)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        patients = [RED, YELLOW, GREEN_EYE, GREEN_CHILD, {"symptoms": ["joint_pain"]}]
+        now = 0.0
+        for _ in range(2000):
+            now += rng.uniform(0, 60)
+            patient_id = f"P{rng.randint(0, 80)}"
+            if rng.random() < 0.3:
+                self.room.discharge(patient_id)
+            else:
+                # Some entries are backdated, as /sync replays them
+                tagged = now - rng.uniform(0, 3600) if rng.random() < 0.1 else now
+                self.triage(patient_id, rng.choice(patients), tagged)
+            if rng.random() < 0.1:
+                snap = self.dash.snapshot(now)
+                entries = self.room.entries()
+                for tag in TARGET_SECONDS:
+                    lane = [e for e in entries if e["tag"] == tag]
+                    self.assertEqual(snap["waiting"][tag], len(lane))
+                    self.assertEqual(snap["overdue"][tag], sum(e["deadline"] <= now for e in lane))
+                    if lane:
+                        self.assertEqual(snap["oldest_wait_seconds"][tag], now - min(e["tagged_at"] for e in lane))
+                opd = {}
+                for e in entries:
+                    if e["opd"]:
+                        opd[e["opd"]] = opd.get(e["opd"], 0) + 1
+                self.assertEqual(snap["opd_backlog"], opd)
+
+
+class TestDetermineOpd(unittest.TestCase):
+    def test_routing(self):
+        self.assertEqual(determine_opd({"age": "5", "symptoms": ["eye_problems"]}), "Pediatrics")
+        self.assertEqual(determine_opd({"gender": "Female", "symptoms": ["gynecological"]}), "OB/GYN")
+        self.assertEqual(determine_opd({"gender": "Male", "symptoms": ["gynecological"]}), "Internal Medicine")
+        self.assertEqual(determine_opd({"symptoms": ["joint_pain", "eye_problems"]}), "Ophthalmology")
+        self.assertEqual(determine_opd({"symptoms": ["psychiatric_issues"]}), "Psychiatry")
+        self.assertEqual(determine_opd({"age": "abc", "symptoms": ["eye_problems"]}), "Internal Medicine")
+
+
+if __name__ == "__main__":
+    unittest.main()
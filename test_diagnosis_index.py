@@ -0,0 +1,61 @@
+import unittest
+from diagnosis_index import DiagnosisIndex, parse_query
+from early_warning import assess_with_score
+from waiting_room import WaitingRoom
+
+
+def triage(room, patient_id, **form):
+    form.setdefault("symptoms", [])
+    return room.triage(patient_id, form, assess_with_score(form), now=0)
+
+
+class TestParseQuery(unittest.TestCase):
+    def test_groups(self):
+        self.assertEqual(parse_query("sepsis"), [[(None, "sepsis")]])
+        self.assertEqual(parse_query('tag:RED and diagnosis:"Early  Sepsis" OR rule:red_o2'),
+                         [[("tag", "red"), ("diagnosis", "early sepsis")], [("rule", "red_o2")]])
+        self.assertEqual(parse_query("pulmonary embolism"), [[(None, "pulmonary embolism")]])
+        self.assertEqual(parse_query("  "), [])
+        with self.assertRaises(ValueError):
+            parse_query("ward:3")
+
+
+class TestDiagnosisIndex(unittest.TestCase):
+    def setUp(self):
+        self.room = WaitingRoom()
+        self.index = DiagnosisIndex()
+        self.room.subscribe(self.index)
+        triage(self.room, "A", temperature="40.5")                    # RED: Severe Sepsis, Heat Stroke
+        triage(self.room, "B", temperature="38.5")                    # YELLOW: Early Sepsis
+        triage(self.room, "C", symptoms=["chest_pain"])               # RED symptom
+        triage(self.room, "D", symptoms=["eye_problems", "joint_pain"])
+
+    def test_queries(self):
+        self.assertEqual(self.index.search("sepsis"), {"A", "B"})
+        self.assertEqual(self.index.search('diagnosis:"early sepsis"'), {"B"})
+        self.assertEqual(self.index.search("sepsis AND tag:RED"), {"A"})
+        self.assertEqual(self.index.search("sepsis AND tag:red OR symptom:chest_pain"), {"A", "C"})
+        self.assertEqual(self.index.search("rule:green_symptoms AND joint_pain"), {"D"})
+        self.assertEqual(self.index.search("Myocardial infarction"), {"C"})
+        self.assertEqual(self.index.search("opd:ophthalmology"), {"D"})
+        self.assertEqual(self.index.search("sepsis AND symptom:chest_pain"), set())
+        self.assertEqual(self.index.search("unheard of"), set())
+
+    def test_retriage_and_discharge_update_postings(self):
+        triage(self.room, "B", temperature="37")
+        self.assertEqual(self.index.search("sepsis"), {"A"})
+        self.room.discharge("A")
+        self.assertEqual(self.index.search("sepsis"), set())
+        self.assertNotIn("early sepsis", self.index.counts())
+        self.assertEqual(self.index.counts("tag"), {"red": 1, "green": 2})
+        self.assertEqual(len(self.index), 3)
+
+    def test_reset_matches_incremental(self):
+        rebuilt = DiagnosisIndex()
+        rebuilt.reset(self.room.entries())
+        for kind in ("diagnosis", "rule", "symptom", "tag", "opd"):
+            self.assertEqual(rebuilt.counts(kind), self.index.counts(kind))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+import numpy as np
+from early_warning import (EarlyWarningScore, PARAMETERS, assess_with_score, parameter_score,
+                           rank_by_risk, score_patients)
+
+
+class TestEarlyWarningScore(unittest.TestCase):
+    def test_band_edges(self):
+        self.assertEqual(parameter_score("o2_saturation", 91), 3)
+        self.assertEqual(parameter_score("o2_saturation", 92), 2)
+        self.assertEqual(parameter_score("o2_saturation", 96), 0)
+        self.assertEqual(parameter_score("systolic_bp", 219), 0)
+        self.assertEqual(parameter_score("systolic_bp", 220), 3)
+        self.assertEqual(parameter_score("heart_rate", 131), 3)
+        self.assertEqual(parameter_score("gcs_score", 14), 3)
+        self.assertEqual(parameter_score("gcs_score", 15), 0)
+        self.assertEqual(parameter_score("temperature", 38.0), 0)
+        self.assertEqual(parameter_score("temperature", 38.1), 1)
+        self.assertEqual(parameter_score("blood_glucose", 2.5), 3)
+        self.assertEqual(parameter_score("pain_score", 8), 2)
+
+    def test_form_strings_and_missing_values(self):
+        ews = EarlyWarningScore({"o2_saturation": "90", "heart_rate": "", "temperature": "abc",
+                                 "systolic_bp": "0", "pain_score": "0"})
+        self.assertEqual(ews.total, 3)
+        self.assertEqual(ews.band, "low-medium")
+
+    def test_glucose_and_pain_count(self):
+        ews = EarlyWarningScore({"blood_glucose": "2.1", "pain_score": "9", "heart_rate": "125"})
+        self.assertEqual(ews.total, 7)
+        self.assertEqual(ews.band, "high")
+
+    def test_incremental_update_matches_full_rescore(self):
+        ews = EarlyWarningScore({"o2_saturation": "97", "heart_rate": "80", "temperature": "37"})
+        self.assertEqual(ews.total, 0)
+        self.assertEqual(ews.update("heart_rate", "135"), 3)
+        self.assertEqual(ews.update("o2_saturation", "92"), 5)
+        self.assertEqual(ews.update("heart_rate", "80"), 2)
+        full = EarlyWarningScore({"o2_saturation": "92", "heart_rate": "80", "temperature": "37"})
+        self.assertEqual(ews.as_dict(), full.as_dict())
+
+    def test_assess_with_score_keeps_tag(self):
+        result = assess_with_score({"o2_saturation": "85", "symptoms": []})
+        self.assertEqual(result["tag"], "RED")
+        self.assertEqual(result["ews"]["points"]["o2_saturation"], 3)
+
+    def test_vectorized_batch_matches_scalar(self):
+        rng = random.Random(7)
+        patients = []
+        for _ in range(500):
+            patients.append({
+                "o2_saturation": str(rng.choice([0, 85, 91, 92, 93.5, 95, 96, 99])),
+                "systolic_bp": rng.choice(["", "75", "90", "101", "219", "220", "x"]),
+                "heart_rate": str(rng.randint(30, 170)),
+                "gcs_score": str(rng.randint(3, 15)),
+                "temperature": str(round(rng.uniform(34, 41), 1)),
+                "blood_glucose": str(round(rng.uniform(1, 25), 1)),
+                "pain_score": str(rng.randint(0, 10)),
+            })
+        batch = score_patients(patients)
+        expected = [EarlyWarningScore(p) for p in patients]
+        self.assertEqual(batch["score"].tolist(), [e.total for e in expected])
+        self.assertEqual(batch["band"].tolist(), [e.band for e in expected])
+
+    def test_rank_by_risk_is_stable(self):
+        order = rank_by_risk(np.array([2, 7, 2, 9, 0]))
+        self.assertEqual(order.tolist(), [3, 1, 0, 2, 4])
+
+    def test_every_parameter_is_scored_in_batch(self):
+        self.assertEqual(set(score_patients([{}])), {"score", "any_three", "band"})
+        self.assertEqual(len(PARAMETERS), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
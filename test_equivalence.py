@@ -0,0 +1,76 @@
+import csv
+import os
+import tempfile
+import unittest
+from batch_triage import assess_batch
+from equivalence import (REPORT_HEADER, BoundarySpace, differs, generate, load_engine, minimize, reference, run,
+                         write_report)
+
+
+def lenient_o2(patients):
+    # A broken engine: O2 of exactly 90 is already "critical"
+    results = assess_batch(patients)
+    for patient, result in zip(patients, results):
+        try:
+            if float(patient.get("o2_saturation")) == 90 and result["rule"] == "yellow_o2":
+                result.update(tag="RED", rule="red_o2")
+        except (TypeError, ValueError):
+            pass
+    return results
+
+
+class TestCases(unittest.TestCase):
+    def test_boundary_space_covers_every_threshold(self):
+        space = BoundarySpace()
+        cases = [space.case(i) for i in range(len(space))]
+        o2 = {p.get("o2_saturation") for p in cases}
+        self.assertTrue({"89.999", "90", 90, 90.0, "90.001", "94", "93.9", "", "abc"} <= o2)
+        self.assertTrue(any("o2_saturation" not in p for p in cases))
+        self.assertEqual(space.case(len(space) - 1)["heart_rate"], space.values["heart_rate"][-1])
+
+    def test_generation_is_deterministic(self):
+        self.assertEqual(generate("malformed", 0, 500, 3), generate("malformed", 0, 500, 3))
+        self.assertNotEqual(generate("random", 0, 50, 3), generate("random", 0, 50, 4))
+
+
+class TestHarness(unittest.TestCase):
+    def test_batch_engine_matches(self):
+        result = run(["batch"], ("random", "malformed"), 10000, 10000, processes=1)
+        self.assertEqual({row["mismatches"] for row in result["summary"].values()}, {0})
+        self.assertEqual(result["summary"][("batch", "malformed")]["cases"], 10000)
+
+    def test_broken_engine_is_caught_and_minimized(self):
+        result = run(["test_equivalence:lenient_o2"], ("random",), 5000, processes=1, keep=2)
+        self.assertGreater(result["summary"][("test_equivalence:lenient_o2", "random")]["mismatches"], 0)
+        smallest = min(result["mismatches"]["test_equivalence:lenient_o2"], key=lambda case: len(case["input"]))
+        self.assertEqual(list(smallest["input"]), ["o2_saturation"])
+        self.assertEqual((smallest["expected"], smallest["actual"]), (("YELLOW", "yellow_o2"), ("RED", "red_o2")))
+        self.assertEqual(minimize(lenient_o2, {"o2_saturation": "90", "symptoms": ["eye_problems"]}),
+                         {"o2_saturation": "90"})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.csv")
+            write_report(result, path)
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], REPORT_HEADER)
+        self.assertEqual(rows[1][4], "FAIL")
+        self.assertTrue(all(row[4] == "FAIL" and row[2] == "YELLOW" for row in rows[2:]))
+
+    def test_reference_errors_count_as_an_outcome(self):
+        self.assertEqual(reference({"symptoms": None}), ("ERROR", ""))
+        self.assertEqual(reference({"o2_saturation": "abc"}, "backend"), ("ERROR", ""))
+
+    def test_records_engine_models_the_backend(self):
+        result = run(["records"], ("random",), 3000, processes=1, reference_spec="backend")
+        self.assertEqual(result["summary"][("records", "random")]["mismatches"], 0)
+        # Well-formed forms the backend reads differently from raw assess_triage
+        records = load_engine("records")
+        for form in ({"gcs_score": "9.0"}, {"o2_saturation": "", "temperature": "38"}):
+            with self.subTest(form=form):
+                self.assertTrue(differs(records, form))
+                self.assertFalse(differs(records, form, "backend"))
+
+
+if __name__ == "__main__":
+    unittest.main()
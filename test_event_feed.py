@@ -0,0 +1,98 @@
+import json
+import unittest
+from event_feed import EventFeed
+from triage_logic import assess_triage
+from waiting_room import WaitingRoom
+
+RED = {"o2_saturation": "85", "symptoms": []}
+GREEN = {"symptoms": ["eye_problems"]}
+
+
+def parse(chunk):
+    """(event, id, data) for each SSE message in a chunk of stream text."""
+    messages = []
+    for block in chunk.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith(":"))
+        if fields:
+            messages.append((fields["event"], int(fields["id"].rpartition("-")[2]), json.loads(fields["data"])))
+    return messages
+
+
+class TestEventFeed(unittest.TestCase):
+    def setUp(self):
+        self.room = WaitingRoom()
+        self.feed = EventFeed(self.room, history=4)
+
+    def triage(self, patient_id, patient):
+        self.room.triage(patient_id, patient, assess_triage(patient), now=0)
+
+    def test_sequence_and_since(self):
+        self.triage("A", RED)
+        self.triage("A", GREEN)
+        self.room.discharge("A")
+        events = [json.loads(data) for _, data in self.feed.since(0)]
+        self.assertEqual([e["seq"] for e in events], [1, 2, 3])
+        self.assertEqual([e["event"] for e in events], ["triage", "retriage", "discharge"])
+        self.assertEqual(events[1]["entry"]["tag"], "GREEN")
+        self.assertIsNone(events[2]["entry"])
+        self.assertEqual([seq for seq, _ in self.feed.since(2)], [3])
+        self.assertEqual(self.feed.since(3), [])
+
+    def test_dropped_history(self):
+        for i in range(6):
+            self.triage(f"P{i}", RED)
+        self.assertIsNone(self.feed.since(1))
+        self.assertEqual([seq for seq, _ in self.feed.since(2)], [3, 4, 5, 6])
+
+    def test_wait_times_out(self):
+        self.assertEqual(self.feed.wait(0, timeout=0.01), [])
+
+    def test_stream_snapshot_then_deltas(self):
+        self.triage("A", RED)
+        stream = self.feed.stream()
+        event, seq, data = parse(next(stream))[0]
+        self.assertEqual((event, seq), ("snapshot", 1))
+        self.assertEqual([e["patient_id"] for e in data["entries"]], ["A"])
+        self.triage("B", GREEN)
+        self.room.discharge("A")
+        deltas = parse(next(stream))
+        self.assertEqual([(e, s) for e, s, _ in deltas], [("delta", 2), ("delta", 3)])
+
+    def test_resume_skips_snapshot(self):
+        self.triage("A", RED)
+        self.triage("B", RED)
+        messages = parse(next(self.feed.stream(last_seq=1)))
+        self.assertEqual([(e, s) for e, s, _ in messages], [("delta", 2)])
+
+    def test_resume_too_old_gets_snapshot(self):
+        for i in range(6):
+            self.triage(f"P{i}", RED)
+        event, seq, data = parse(next(self.feed.stream(last_seq=0)))[0]
+        self.assertEqual((event, seq, len(data["entries"])), ("snapshot", 6, 6))
+
+    def test_resume_across_restart_gets_snapshot(self):
+        for i in range(3):
+            self.triage(f"P{i}", RED)
+        event_id = self.feed.event_id(3)
+        self.assertEqual(self.feed.resume_seq(event_id), 3)
+        # The backend restarts and reaches the same sequence number with different events
+        room = WaitingRoom()
+        restarted = EventFeed(room, epoch="restarted")
+        for i in range(4):
+            room.triage(f"Q{i}", RED, assess_triage(RED), now=0)
+        for last in (event_id, "3", "junk"):
+            self.assertIsNone(restarted.resume_seq(last))
+        event, seq, data = parse(next(restarted.stream(restarted.resume_seq(event_id))))[0]
+        self.assertEqual((event, seq, data["epoch"], len(data["entries"])), ("snapshot", 4, "restarted", 4))
+        # A sequence number the feed never reached also resynchronises rather than waiting for it
+        self.assertIsNone(self.feed.since(10))
+        self.assertIsNone(self.feed.wait(10, timeout=5))
+
+    def test_keepalive(self):
+        stream = self.feed.stream(heartbeat=0.01)
+        next(stream)
+        self.assertEqual(next(stream), ": keepalive\n\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
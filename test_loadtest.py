@@ -0,0 +1,58 @@
+import threading
+import unittest
+from werkzeug.serving import make_server
+from backend_testing import started_backend
+from loadtest import LatencyHistogram, Workload, load_corpus, run
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_within_bucket_precision(self):
+        histogram = LatencyHistogram()
+        for us in range(1, 100001):
+            histogram.record(us / 1e6)
+        for p in (50, 90, 99, 99.9):
+            self.assertAlmostEqual(histogram.percentile(p), p, delta=p * 0.02)
+        self.assertEqual(histogram.percentile(100), 100.0)
+        self.assertLess(len(histogram.counts), 800)
+
+    def test_buckets_round_trip(self):
+        histogram = LatencyHistogram()
+        for us in (3, 127, 128, 129, 5000, 5001, 10 ** 7):
+            histogram.record(us / 1e6)
+        edges = [lower for lower, _ in histogram.to_dict()["buckets"]]
+        self.assertEqual(edges, sorted(edges))
+        self.assertEqual(sum(n for _, n in histogram.to_dict()["buckets"]), 7)
+        for us in (3, 128, 5000, 10 ** 7):
+            index = histogram._index(us)
+            self.assertLessEqual(histogram._lower(index), us)
+            self.assertGreater(histogram._lower(index + 1), us)
+
+
+class TestLoadRun(unittest.TestCase):
+    def test_corpus_and_mix(self):
+        corpus = load_corpus()
+        self.assertTrue(corpus and all(isinstance(form, dict) for form in corpus))
+        workload = Workload(corpus, "triage=1,dashboard=1")
+        self.assertEqual({workload.next()[0] for _ in range(50)}, {"triage", "dashboard"})
+        with self.assertRaises(ValueError):
+            Workload(corpus, "nope=1")
+
+    def test_closed_and_open_runs_against_backend(self):
+        backend = started_backend()
+        server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            closed = run(url, "closed", connections=4, duration=0.5, warmup=0.1, mix="dashboard=1")
+            opened = run(url, "open", connections=4, rate=40, duration=0.5, warmup=0.1, mix="dashboard=1")
+        finally:
+            server.shutdown()
+        for report in (closed, opened):
+            self.assertGreater(report["requests"], 0)
+            self.assertEqual(report["error_rate"], 0.0)
+            self.assertEqual(list(report["endpoints"]), ["dashboard"])
+            self.assertLessEqual(report["latency_ms"]["p50"], report["latency_ms"]["max"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import os
+import tempfile
+import time
+import unittest
+import requests
+from backend_testing import started_backend
+from local_journal import JournalSyncer, LocalJournal, SeenEntries, decode_batch, encode_batch
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status_code = status
+        self.body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def json(self):
+        return self.body
+
+
+class FakeBackend:
+    """Acknowledges every entry, applying each id once; can be switched offline."""
+
+    def __init__(self):
+        self.online = True
+        self.requests = 0
+        self.seen = SeenEntries()
+        self.applied = []
+
+    def post(self, url, data, timeout, headers):
+        self.requests += 1
+        if not self.online:
+            raise requests.ConnectionError("backend unreachable")
+        entries = decode_batch(data)
+        self.applied += [e["payload"] for e in entries if self.seen.claim(e["entry_id"])]
+        return FakeResponse(200, {"acknowledged": [e["entry_id"] for e in entries]})
+
+
+class TestLocalJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "journal.sqlite3")
+        self.journal = LocalJournal(self.path)
+
+    def tearDown(self):
+        self.journal.close()
+        self.dir.cleanup()
+
+    def test_pending_in_order_and_mark_synced(self):
+        ids = [self.journal.record("triage", {"patient_id": f"P{i}"}) for i in range(5)]
+        pending = self.journal.pending(3)
+        self.assertEqual([e["entry_id"] for e in pending], ids[:3])
+        self.assertEqual(pending[0]["payload"], {"patient_id": "P0"})
+        self.journal.mark_synced(ids[:3])
+        self.assertEqual(self.journal.backlog(), 2)
+        self.assertEqual([e["entry_id"] for e in self.journal.pending()], ids[3:])
+
+    def test_survives_reopen(self):
+        self.journal.record("discharge", {"patient_id": "P1"})
+        self.journal.close()
+        self.journal = LocalJournal(self.path)
+        self.assertEqual(self.journal.pending()[0]["kind"], "discharge")
+
+    def test_backlog_drains_in_few_round_trips(self):
+        for i in range(5000):
+            self.journal.record("triage", {"patient_id": f"P{i}"})
+        backend = FakeBackend()
+        syncer = JournalSyncer(self.journal, "http://backend/sync", batch_size=2000, post=backend.post)
+        while syncer.sync_once()[0]:
+            pass
+        self.assertEqual(backend.requests, 3)
+        self.assertEqual(len(backend.applied), 5000)
+        self.assertEqual(self.journal.backlog(), 0)
+
+    def test_retransmitted_batch_applied_once(self):
+        self.journal.record("triage", {"patient_id": "P1"})
+        backend = FakeBackend()
+
+        def ack_lost(*args, **kwargs):
+            # Applied by the backend, but the acknowledgement never arrives
+            backend.post(*args, **kwargs)
+            return FakeResponse(503, {})
+        syncer = JournalSyncer(self.journal, "http://backend/sync", post=ack_lost)
+        with self.assertRaises(requests.HTTPError):
+            syncer.sync_once()
+        syncer.post = backend.post
+        syncer.sync_once()
+        self.assertEqual(backend.applied, [{"patient_id": "P1"}])
+        self.assertEqual(self.journal.backlog(), 0)
+
+    def test_syncer_thread_recovers_after_outage(self):
+        backend = FakeBackend()
+        backend.online = False
+        syncer = JournalSyncer(self.journal, "http://backend/sync", idle_interval=0.05,
+                               max_backoff=0.05, post=backend.post)
+        syncer.start()
+        self.journal.record("triage", {"patient_id": "P1"})
+        syncer.notify()
+        deadline = time.time() + 2
+        while backend.requests < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(syncer.online)
+        self.assertEqual(syncer.backlog, 1)
+        backend.online = True
+        while syncer.backlog and time.time() < deadline + 2:
+            time.sleep(0.01)
+        syncer.stop()
+        syncer.join(1)
+        self.assertEqual(backend.applied, [{"patient_id": "P1"}])
+        self.assertTrue(syncer.online)
+
+
+class TestBackendSync(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        backend = started_backend()
+        cls.backend = backend
+        cls.client = backend.app.test_client()
+
+    def post(self, url, data, timeout, headers):
+        response = self.client.post("/sync", data=data, headers=headers)
+        self.last = response.json
+        return FakeResponse(response.status_code, response.json)
+
+    def test_journal_drains_into_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = LocalJournal(os.path.join(directory, "journal.sqlite3"))
+            recorded_at = time.time() - 600
+            # As the desk journals it: strings, blanks for empty boxes
+            journal.record("triage", {"patient_id": "S-1", "o2_saturation": "", "heart_rate": "160",
+                                      "symptoms": []}, recorded_at)
+            journal.record("triage", {"patient_id": "S-2", "o2_saturation": "abc", "symptoms": []}, recorded_at)
+            journal.record("discharge", {"patient_id": "S-1", "seen": True}, recorded_at + 60)
+            journal.record("triage", {"patient_id": "S-3", "heart_rate": "8", "symptoms": []}, recorded_at)
+            batch = encode_batch(journal.pending())
+            syncer = JournalSyncer(journal, "http://backend/sync", post=self.post)
+            self.assertEqual(syncer.sync_once(), (4, 0))
+            journal.close()
+        record = self.backend.patient_index.get("S-1")
+        # Blank O2 dropped as on /triage, so the heart rate is checked
+        self.assertEqual(record["tag"], "RED")
+        self.assertIsNone(self.backend.patient_index.get("S-2"))
+        self.assertEqual(self.last["rejected"][0]["errors"][0]["field"], "o2_saturation")
+        self.assertEqual(len(self.last["rejected"]), 1)
+        # An extreme vital is a critical patient, not a rejected entry
+        self.assertEqual(self.backend.patient_index.get("S-3")["tag"], "RED")
+        # Retransmitting the same batch applies nothing twice
+        response = self.client.post("/sync", data=batch, headers={"Content-Type": "application/json",
+                                                                  "Content-Encoding": "deflate"})
+        self.assertEqual((response.status_code, response.json["applied"]), (200, 0))
+
+    def test_malformed_batches_are_rejected_whole(self):
+        for body, headers, field in [
+                (b"[{", {}, ""),
+                (b'{"entry_id": "E1"}', {}, "entries"),
+                (b'[{"entry_id": "E1", "kind": "triage", "payload": {}}, 7]', {}, "entries[1]"),
+                (b'[{"kind": "triage", "payload": {}}]', {}, "entries[0].entry_id"),
+                (b'[{"entry_id": "E1", "kind": "admit", "payload": {}}]', {}, "entries[0].kind"),
+                (b'[{"entry_id": "E1", "kind": "discharge", "payload": {}}]', {}, "entries[0].payload.patient_id"),
+                (b'[{"entry_id": "E1", "kind": "triage", "payload": {}, "recorded_at": "now"}]', {},
+                 "entries[0].recorded_at")]:
+            with self.subTest(field=field):
+                response = self.client.post("/sync", data=body, headers=headers)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json["errors"][0]["field"], field)
+        response = self.client.post("/sync", data=b"not deflate", headers={"Content-Encoding": "deflate"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("deflate", response.json["error"])
+
+    def test_entry_that_fails_to_apply_is_applied_on_resend(self):
+        batch = encode_batch([{"entry_id": "RETRY-1", "kind": "triage", "payload": {"patient_id": "S-R"},
+                               "recorded_at": time.time()}])
+        headers = {"Content-Type": "application/json", "Content-Encoding": "deflate"}
+        record_triage = self.backend.record_triage
+
+        def failing(*args, **kwargs):
+            raise OSError("disk full")
+        self.backend.record_triage = failing
+        try:
+            self.assertEqual(self.client.post("/sync", data=batch, headers=headers).status_code, 500)
+        finally:
+            self.backend.record_triage = record_triage
+        response = self.client.post("/sync", data=batch, headers=headers)
+        self.assertEqual((response.status_code, response.json["applied"]), (200, 1))
+        self.assertIsNotNone(self.backend.patient_index.get("S-R"))
+
+
+class TestSeenEntries(unittest.TestCase):
+    def test_claim_and_capacity(self):
+        seen = SeenEntries(capacity=2)
+        self.assertTrue(seen.claim("a"))
+        self.assertFalse(seen.claim("a"))
+        seen.claim("b")
+        seen.claim("c")
+        self.assertTrue(seen.claim("a"))  # evicted as the oldest
+        seen.release("a")
+        self.assertTrue(seen.claim("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
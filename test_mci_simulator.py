@@ -0,0 +1,40 @@
+import random
+import unittest
+from mci_simulator import PatientGenerator, Simulation
+from triage_logic import SYMPTOM_IDS, TAGS, assess_triage
+
+
+def run(**settings):
+    report = Simulation(speed=0, **settings).run()
+    report.pop("engine")
+    return report
+
+
+class TestPatientGenerator(unittest.TestCase):
+    def test_covers_every_tag_and_valid_symptoms(self):
+        generator = PatientGenerator(random.Random(3))
+        patients = [generator.patient() for _ in range(2000)]
+        tags = {assess_triage(p)["tag"] for p in patients}
+        self.assertEqual(tags, set(TAGS))
+        self.assertTrue(all(s in SYMPTOM_IDS for p in patients for s in p["symptoms"]))
+        o2 = [float(p["o2_saturation"]) for p in patients if p["o2_saturation"]]
+        self.assertTrue(min(o2) < 90 < 94 < max(o2))
+        self.assertTrue(any(p["o2_saturation"] == "" for p in patients))
+
+
+class TestSimulation(unittest.TestCase):
+    def test_reproducible(self):
+        settings = dict(seed=5, hours=1.0, rate=40, surge_rate=200, surge_start=0.25, surge_hours=0.25)
+        first = run(**settings)
+        self.assertEqual(first, run(**settings))
+        self.assertNotEqual(first["outcome_digest"], run(**dict(settings, seed=6))["outcome_digest"])
+
+    def test_every_arrival_is_accounted_for(self):
+        report = run(seed=2, hours=1.0, rate=60, surge_rate=0, physicians=3)
+        self.assertEqual(sum(report["seen"].values()) + sum(report["still_waiting"].values()), report["arrivals"])
+        self.assertGreater(report["queue_length"]["GREEN"]["max"], 0)
+        self.assertEqual(sum(report["opd"].values()), report["seen"]["GREEN"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from patient_index import PatientIndex, normalize_name
+
+
+class TestPatientIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PatientIndex()
+        self.index.upsert({"patient_id": "th001", "name": "Ram Bahadur Thapa", "tag": "GREEN"})
+        self.index.upsert({"patient_id": "TH002", "name": "Sita Thapa", "tag": "YELLOW"})
+        self.index.upsert({"patient_id": "TH010", "name": "Hari Gurung", "tag": "RED"})
+
+    def ids(self, records):
+        return [r["patient_id"] for r in records]
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("  Ram  Bahadur-Thapá "), "ram bahadur thapa")
+
+    def test_lookup_by_id_is_case_insensitive(self):
+        self.assertEqual(self.index.get("TH001")["name"], "Ram Bahadur Thapa")
+        self.assertEqual(self.index.get(" th002 ")["tag"], "YELLOW")
+        self.assertIsNone(self.index.get("TH999"))
+
+    def test_id_prefix(self):
+        self.assertEqual(self.ids(self.index.search_id("th00")), ["TH001", "TH002"])
+        self.assertEqual(self.ids(self.index.search_id("TH01")), ["TH010"])
+
+    def test_name_prefix_matches_any_word(self):
+        self.assertEqual(self.ids(self.index.search_name("ram b")), ["TH001"])
+        self.assertEqual(sorted(self.ids(self.index.search_name("THA"))), ["TH001", "TH002"])
+        self.assertEqual(self.index.search_name(""), [])
+
+    def test_upsert_updates_in_place_and_reindexes_name(self):
+        self.index.upsert({"patient_id": "TH002", "name": "Sita Karki", "tag": "RED"})
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.get("TH002")["tag"], "RED")
+        self.assertEqual(self.ids(self.index.search_name("thapa")), ["TH001"])
+        self.assertEqual(self.ids(self.index.search_name("karki")), ["TH002"])
+
+    def test_search_puts_id_matches_first(self):
+        self.index.upsert({"patient_id": "HA100", "name": "Bikash Rai"})
+        self.assertEqual(self.ids(self.index.search("ha")), ["HA100", "TH010"])
+
+    def test_limit(self):
+        for i in range(50):
+            self.index.upsert({"patient_id": f"X{i:03d}", "name": f"Maya {i}"})
+        self.assertEqual(len(self.index.search("x", limit=7)), 7)
+        self.assertEqual(len(self.index.search_name("maya", limit=7)), 7)
+
+    def test_requires_patient_id(self):
+        with self.assertRaises(ValueError):
+            self.index.upsert({"name": "No Id"})
+
+
+if __name__ == "__main__":
+    unittest.main()
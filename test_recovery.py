@@ -0,0 +1,115 @@
+import glob
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from dashboard import DashboardAggregates
+from early_warning import assess_with_score
+from patient_index import PatientIndex
+from recovery import LiveState, StateLog, _synthetic_triage
+from vitals_history import VitalsHistory
+from waiting_room import WaitingRoom
+
+
+def fresh_state():
+    room = WaitingRoom()
+    dashboard = DashboardAggregates()
+    room.subscribe(dashboard)
+    return LiveState(room, PatientIndex(), VitalsHistory()), dashboard
+
+
+class TestRecovery(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.state, self.dashboard = fresh_state()
+        self.log = StateLog(self.directory, self.state.capture)
+        self.rng = random.Random(2)
+
+    def triage(self, i, at):
+        patient = _synthetic_triage(self.rng, i)
+        change = LiveState.triage_change(patient["patient_id"], patient, assess_with_score(patient), at)
+        return self.log.record("triage", change, self.state.apply)
+
+    def restart(self):
+        self.log.close()
+        state, dashboard = fresh_state()
+        stats = StateLog(self.directory, state.capture).recover(state.restore, state.apply)
+        return state, dashboard, stats
+
+    def assert_same(self, state, dashboard):
+        self.assertEqual(state.waiting_room.entries(), self.state.waiting_room.entries())
+        self.assertEqual(dashboard.snapshot(2000.0), self.dashboard.snapshot(2000.0))
+        self.assertEqual(state.patient_index.search("ram", 50), self.state.patient_index.search("ram", 50))
+        for i in range(0, 60, 7):
+            patient_id = f"P{i:07d}"
+            self.assertEqual(state.vitals_history.summary(patient_id), self.state.vitals_history.summary(patient_id))
+
+    def test_snapshot_plus_tail(self):
+        for i in range(40):
+            self.triage(i, 100.0 + i)
+        self.log.checkpoint()
+        for i in range(20):
+            self.triage(i, 500.0 + i)  # re-measurements after the snapshot
+        for i in range(40, 60):
+            self.triage(i, 600.0 + i)
+        self.log.record("discharge", LiveState.discharge_change("P0000003"), self.state.apply)
+        state, dashboard, stats = self.restart()
+        self.assertEqual(stats["replayed"], 41)
+        self.assertIsNotNone(stats["snapshot"])
+        self.assertEqual(len(state.waiting_room), 59)
+        self.assert_same(state, dashboard)
+        # Old segments are gone once the snapshot covers them
+        self.assertEqual(len(glob.glob(os.path.join(self.directory, "*"))), 2)
+
+    def test_wal_only_with_torn_tail(self):
+        for i in range(10):
+            self.triage(i, 100.0 + i)
+        self.log.close()
+        (segment,) = glob.glob(os.path.join(self.directory, "wal-*.log"))
+        with open(segment, "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x01\x02")  # a record cut short by a crash
+        state, dashboard, stats = self.restart()
+        self.assertEqual((stats["snapshot"], stats["replayed"]), (None, 10))
+        self.assert_same(state, dashboard)
+        # New changes go to a new segment, never after the torn record
+        log = StateLog(self.directory, state.capture)
+        log.record("discharge", LiveState.discharge_change("P0000001"), state.apply)
+        log.close()
+        self.assertEqual(len(glob.glob(os.path.join(self.directory, "wal-*.log"))), 2)
+
+    def test_restored_patient_keeps_trend(self):
+        for minute, o2 in enumerate(["97", "95", "93", "91"]):
+            patient = {"patient_id": "T1", "name": "Trend", "o2_saturation": o2}
+            change = LiveState.triage_change("T1", patient, assess_with_score(patient), 600.0 * minute)
+            self.log.record("triage", change, self.state.apply)
+        self.log.checkpoint()
+        state, _, _ = self.restart()
+        self.assertEqual(state.vitals_history.summary("T1"), self.state.vitals_history.summary("T1"))
+        patient = {"patient_id": "T1", "name": "Trend", "o2_saturation": "89"}
+        self.assertEqual(state.apply("triage", LiveState.triage_change("T1", patient, assess_with_score(patient), 2400.0)),
+                         self.state.apply("triage", LiveState.triage_change("T1", patient, assess_with_score(patient), 2400.0)))
+
+
+class TestBackendImport(unittest.TestCase):
+    def test_import_opens_nothing(self):
+        # As a spawn pool worker or the debug reloader's parent does: the module is imported, nothing is served
+        here = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory() as cwd:
+            os.makedirs(os.path.join(cwd, "state"))
+            with open(os.path.join(cwd, "state", "wal-00000001.log"), "wb"):
+                pass
+            env = {k: v for k, v in os.environ.items() if not k.startswith("TRIAGE_")}
+            code = "import threading, backend; print(threading.active_count(), backend.state_log)"
+            out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=dict(env, PYTHONPATH=here),
+                                 capture_output=True, text=True, check=True).stdout
+            self.assertEqual(out.split(), ["1", "None"])
+            self.assertEqual(sorted(os.listdir(cwd)), ["state"])
+            self.assertEqual(os.listdir(os.path.join(cwd, "state")), ["wal-00000001.log"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from dashboard import DashboardAggregates
+from early_warning import assess_with_score
+from regional import RegionalAggregator, SiteReporter, diff, get_json, post_json, site_summary, spawn_region
+from waiting_room import WaitingRoom
+from wire_format import JSON, dumps, loads
+
+
+class Site:
+    """A waiting room and dashboard with a reporter pushing straight into an aggregator."""
+
+    def __init__(self, name, aggregator):
+        self.room = WaitingRoom()
+        self.dashboard = DashboardAggregates()
+        self.room.subscribe(self.dashboard)
+        self.aggregator = aggregator
+        self.lose_replies = False
+        self.reporter = SiteReporter(name, self.summary, self.send, media_type=JSON)
+
+    def summary(self):
+        return site_summary(self.dashboard.snapshot(1000.0), 1000.0)
+
+    def send(self, body, media_type):
+        status, ack = self.aggregator.merge(loads(body, media_type), len(body), now=1000.0)
+        if self.lose_replies:
+            raise OSError("link down")
+        return status, dumps(ack, media_type)
+
+    def triage(self, patient_id, **form):
+        form.setdefault("symptoms", [])
+        self.room.triage(patient_id, form, assess_with_score(form), now=900.0)
+
+
+class TestSummaries(unittest.TestCase):
+    def test_diff(self):
+        self.assertEqual(diff({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": 4}), {"b": 3, "c": 4})
+        self.assertEqual(diff({"a": 1, "opd.ENT": 2}, {"a": 1}), {"opd.ENT": None})
+
+    def test_merged_view(self):
+        aggregator = RegionalAggregator()
+        one, two = Site("one", aggregator), Site("two", aggregator)
+        one.triage("A", symptoms=["chest_pain"])
+        one.triage("B", temperature="38.5")
+        two.triage("C", symptoms=["eye_problems"])
+        self.assertEqual((one.reporter.push(), two.reporter.push()), (200, 200))
+        view = aggregator.view(now=1000.0)
+        self.assertEqual(view["waiting"], {"RED": 1, "YELLOW": 1, "GREEN": 1})
+        self.assertEqual(view["opd_backlog"], {"Ophthalmology": 1})
+        self.assertEqual(view["oldest_wait_seconds"]["RED"], 100)
+        self.assertEqual(view["sites"]["two"]["waiting"], {"RED": 0, "YELLOW": 0, "GREEN": 1})
+
+        two.room.discharge("C")
+        two.reporter.push()
+        view = aggregator.view(now=1000.0)
+        self.assertEqual(view["waiting"]["GREEN"], 0)
+        self.assertEqual(view["opd_backlog"], {})
+        self.assertTrue(aggregator.view(now=1000.0 + 3600)["sites"]["one"]["stale"])
+
+
+class TestDeltaPushes(unittest.TestCase):
+    def test_bytes_follow_changes_not_queue_length(self):
+        sizes = []
+        for waiting in (10, 2000):
+            site = Site("s", RegionalAggregator())
+            for i in range(waiting):
+                site.triage(f"P{i}", heart_rate="105")
+            site.reporter.push()
+            self.assertIsNone(site.reporter.push())   # nothing changed, nothing sent
+            site.triage("X", symptoms=["chest_pain"])
+            site.reporter.push()
+            sizes.append(site.reporter.metrics["last_bytes"])
+        # The same two keys changed (RED count and oldest RED) whether 10 or 2000 patients were waiting
+        self.assertEqual(sizes[0], sizes[1])
+        self.assertLess(sizes[1], 120)
+
+    def test_duplicate_push_is_acknowledged_once(self):
+        aggregator = RegionalAggregator()
+        site = Site("s", aggregator)
+        site.triage("A", symptoms=["chest_pain"])
+        push = {"site": "s", "epoch": 1, "seq": 1, "base": 0, "changes": {"waiting.RED": 1}}
+        self.assertEqual(aggregator.merge(push), (200, {"epoch": 1, "seq": 1}))
+        status, ack = aggregator.merge(dict(push))
+        self.assertEqual((status, ack.get("duplicate")), (200, True))
+        self.assertEqual(aggregator.view()["waiting"]["RED"], 1)
+        self.assertEqual(aggregator.metrics["duplicates"], 1)
+        self.assertEqual(aggregator.merge({"site": "s", "seq": 1})[0], 400)
+
+    def test_lost_reply_and_node_restart_resync(self):
+        aggregator = RegionalAggregator()
+        site = Site("s", aggregator)
+        site.triage("A", symptoms=["chest_pain"])
+        site.reporter.push()
+        # Applied by the node, but the site never hears back: its next delta is on a base the node moved past
+        site.lose_replies = True
+        site.triage("B", symptoms=["chest_pain"])
+        self.assertIsNone(site.reporter.push())
+        site.lose_replies = False
+        site.triage("C", temperature="38.5")
+        self.assertEqual(site.reporter.push(), 200)
+        self.assertEqual(site.reporter.metrics["resyncs"], 1)
+        self.assertEqual(aggregator.view()["waiting"], {"RED": 2, "YELLOW": 1, "GREEN": 0})
+
+        # The regional node restarts empty
+        site.aggregator = restarted = RegionalAggregator()
+        site.room.discharge("A")
+        self.assertEqual(site.reporter.push(), 200)
+        self.assertEqual(restarted.view()["waiting"], {"RED": 1, "YELLOW": 1, "GREEN": 0})
+
+    def test_reporter_survives_an_undecodable_reply(self):
+        site = Site("s", RegionalAggregator())
+        replies = [(200, b"<html>Bad gateway</html>"), None]
+
+        def send(body, media_type):
+            reply = replies.pop(0) if replies else None
+            return reply or site.send(body, media_type)
+        site.triage("A", symptoms=["chest_pain"])
+        reporter = SiteReporter("s", site.summary, send, interval=0.01, media_type=JSON)
+        thread = reporter.start()
+        try:
+            deadline = time.time() + 10
+            while time.time() < deadline and reporter.seq < 2:
+                time.sleep(0.01)
+            self.assertTrue(thread.is_alive())
+        finally:
+            reporter.stop()
+        self.assertEqual(reporter.metrics["failures"], 1)
+        self.assertIn("Error", reporter.last_error)
+        self.assertEqual(site.aggregator.view()["waiting"]["RED"], 1)
+
+
+class TestRegionalProcesses(unittest.TestCase):
+    def test_importing_backend_starts_no_reporter(self):
+        # Spawn pool workers run backend.py as __mp_main__; only the serving process may push
+        backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend.py")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(backend), TRIAGE_MODE="site",
+                   TRIAGE_REGIONAL_URL="http://127.0.0.1:9")
+        with tempfile.TemporaryDirectory() as cwd:
+            for run_name in ("backend", "__mp_main__"):
+                code = (f"import runpy, threading; ns = runpy.run_path({backend!r}, run_name={run_name!r}); "
+                        "print(threading.active_count(), ns['site_reporter'])")
+                out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True,
+                                     check=True).stdout
+                self.assertEqual(out.split(), ["1", "None"])
+
+    def test_sites_push_to_regional_node(self):
+        processes, regional_url, site_urls = spawn_region(2, interval=0.2)
+        try:
+            post_json(site_urls["site1"] + "/triage/batch",
+                      {"patients": [{"patient_id": f"A{i}", "symptoms": ["chest_pain"]} for i in range(30)]})
+            post_json(site_urls["site2"] + "/triage", {"patient_id": "B1", "temperature": "38.5"})
+            deadline = time.time() + 20
+            while time.time() < deadline:
+                view = get_json(regional_url + "/regional/view")
+                if view["waiting"] == {"RED": 30, "YELLOW": 1, "GREEN": 0}:
+                    break
+                time.sleep(0.2)
+            self.assertEqual(view["waiting"], {"RED": 30, "YELLOW": 1, "GREEN": 0})
+            self.assertEqual(sorted(view["sites"]), ["site1", "site2"])
+            self.assertGreater(get_json(site_urls["site1"] + "/regional/metrics")["pushes"], 0)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(10)
+
+
+if __name__ == "__main__":
+    unittest.main()
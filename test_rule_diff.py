@@ -0,0 +1,99 @@
+import math
+import os
+import tempfile
+import unittest
+import numpy as np
+from rule_diff import changed_regions, diff_archive, load_rules, validate_rules
+from triage_archive import ArchiveWriter, days, encounter_row, value_index
+from triage_logic import VITAL_RULES, assess_triage
+
+T0 = 1_780_000_000.0 - 1_780_000_000.0 % 86400.0
+
+
+def with_rule(rule, *conditions):
+    rules = dict(VITAL_RULES)
+    rules[rule] = conditions
+    return rules
+
+
+class TestChangedRegions(unittest.TestCase):
+    def test_one_threshold(self):
+        new = with_rule("yellow_bp_high", ("systolic_bp", 170, 220, "(]"), ("diastolic_bp", 100, 120, "(]"))
+        self.assertEqual(changed_regions(VITAL_RULES, new), {"systolic_bp": [(160, 170)]})
+        self.assertEqual(changed_regions(VITAL_RULES, VITAL_RULES), {})
+
+    def test_bounds_and_open_ends(self):
+        self.assertEqual(changed_regions(VITAL_RULES, with_rule("red_gcs", ("gcs_score", None, 10, "(]"))),
+                         {"gcs_score": [(10, 10)]})
+        self.assertEqual(changed_regions(VITAL_RULES, with_rule("red_hr_high", ("heart_rate", 140, None, "()"))),
+                         {"heart_rate": [(140, 150)]})
+        self.assertEqual(changed_regions(VITAL_RULES, with_rule("red_hr_high")),
+                         {"heart_rate": [(150, math.inf)]})
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            validate_rules(with_rule("red_o2", ("o2", 0, 90, "()")))
+        with self.assertRaises(ValueError):
+            validate_rules(with_rule("red_o2", ("o2_saturation", 0, 90, "<>")))
+        with self.assertRaises(ValueError):
+            validate_rules({"red_symptom": ()})
+
+
+class TestDiffArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        rng = np.random.default_rng(7)
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        for i in range(3000):
+            patient = {"systolic_bp": f"{rng.normal(140, 30):.0f}", "heart_rate": f"{rng.normal(90, 20):.0f}",
+                       "temperature": f"{rng.normal(37.5, 1):.1f}"}
+            if i % 10 == 0:
+                patient["temperature"] = ""
+            writer.append(encounter_row(f"P{i}", patient, assess_triage(patient), T0 + i * 60, T0 + i * 60, None))
+        writer.flush()
+
+    def test_selective_matches_full_rescore(self):
+        new = with_rule("yellow_bp_high", ("systolic_bp", 170, 220, "(]"), ("diastolic_bp", 100, 120, "(]"))
+        selective = diff_archive(self.root, VITAL_RULES, new)
+        full = diff_archive(self.root, VITAL_RULES, new, full=True)
+        self.assertEqual((selective["moved"], selective["tags"], selective["rules"]),
+                         (full["moved"], full["tags"], full["rules"]))
+        self.assertGreater(selective["moved"], 0)
+        self.assertLess(selective["rescored"], full["rescored"] / 4)
+        # Only blank temperatures (which stop assess_triage's vitals block, but are archived as missing) disagree
+        self.assertLessEqual(selective["stored_disagreements"], 300)
+        for example in selective["examples"]:
+            self.assertTrue(160 < example["vitals"]["systolic_bp"] <= 170)
+
+    def test_missing_values_count_as_the_default(self):
+        # Blank temperatures are archived as NaN and scored as 0, which is in this changed region
+        new = with_rule("red_temp_low", ("temperature", None, 35, "()"))
+        selective = diff_archive(self.root, VITAL_RULES, new)
+        self.assertEqual(selective["moved"], diff_archive(self.root, VITAL_RULES, new, full=True)["moved"])
+        self.assertGreaterEqual(selective["moved"], 300)
+
+    def test_index_is_rebuilt_after_appends(self):
+        day = days(self.root)[0]
+        values, _ = value_index(self.root, day, "heart_rate")
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        patient = {"heart_rate": "300"}
+        writer.append(encounter_row("X", patient, assess_triage(patient), T0 + 10, T0 + 10, None))
+        writer.flush()
+        values2, rows = value_index(self.root, day, "heart_rate")
+        self.assertEqual(len(values2), len(values) + 1)
+        self.assertEqual(values2[-1], 300.0)
+        self.assertTrue(np.all(np.diff(values2) >= 0))
+
+    def test_load_rules(self):
+        path = os.path.join(self.root, "rules.json")
+        with open(path, "w") as f:
+            f.write('{"red_o2": [["o2_saturation", 0, 92, "()"]]}')
+        rules = load_rules(path)
+        self.assertEqual(rules["red_o2"], (("o2_saturation", 0, 92, "()"),))
+        self.assertEqual(rules["red_gcs"], VITAL_RULES["red_gcs"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+import http.server
+import json
+import os
+import tempfile
+import threading
+import unittest
+from backend_testing import started_backend
+from equivalence import generate
+from rule_set import RemoteRules, RuleSet, RuleStore
+from triage_logic import assess_triage
+
+
+def outcome(assess, patient):
+    try:
+        result = assess(patient)
+    except Exception as e:
+        return type(e).__name__
+    result.pop("rules_version", None)
+    return result
+
+
+class TestRuleSet(unittest.TestCase):
+    def test_default_rules_match_assess_triage(self):
+        rules = RuleSet()
+        self.assertTrue(rules.default)
+        for family in ("boundary", "random", "malformed"):
+            for patient in generate(family, 0, 3000, seed=7):
+                self.assertEqual(outcome(rules.assess, patient), outcome(assess_triage, patient), patient)
+        self.assertEqual(rules.assess({})["rules_version"], 0)
+
+    def test_threshold_override(self):
+        patient = {"o2_saturation": "91", "symptoms": []}
+        self.assertEqual(RuleSet().assess(patient)["tag"], "YELLOW")
+        rules = RuleSet.from_document({"vital_rules": {"red_o2": [["o2_saturation", 0, 92, "()"]]}}, 3)
+        result = rules.assess(patient)
+        self.assertEqual((result["tag"], result["reason"], result["rules_version"]),
+                         ("RED", "Critical O₂ saturation: 91.0%", 3))
+        self.assertFalse(rules.default)
+        self.assertEqual(rules.assess_batch([patient, {"o2_saturation": "abc"}]),
+                         [{"tag": "RED", "rule": "red_o2"}, {"tag": "GREEN", "rule": "default"}])
+
+    def test_symptom_changes(self):
+        rules = RuleSet.from_document({"symptoms": {"RED": {"stridor": ["Airway Obstruction"],
+                                                            "eye_problems": ["Acute Glaucoma"]},
+                                                    "GREEN": {"joint_pain": None}}}, 1)
+        self.assertEqual(rules.assess({"symptoms": ["stridor"]})["diagnoses"], ["Airway Obstruction"])
+        self.assertEqual(rules.assess({"symptoms": ["eye_problems"]})["tag"], "RED")
+        self.assertEqual(rules.assess({"symptoms": ["joint_pain"]})["reason"],
+                         "No urgent symptoms or abnormal vital signs detected")
+        self.assertEqual(rules.assess_batch([{"symptoms": ["stridor"]}]), [{"tag": "RED", "rule": "red_symptom"}])
+
+    def test_invalid_documents(self):
+        for document in ([], {"vital_rules": {"red_o2": [["o2", 0, 90, "()"]]}},
+                         {"vital_rules": {"red_o2": [["o2_saturation", 0, "__import__('os')", "()"]]}},
+                         {"symptoms": {"BLUE": {}}}, {"symptoms": {"RED": {"stridor": "Airway"}}},
+                         {"threshold": 1}):
+            with self.assertRaises(ValueError):
+                RuleSet.from_document(document, 1)
+
+
+class TestRuleStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "rules.json")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, document):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+
+    def test_reload_swaps_and_notifies(self):
+        store = RuleStore(self.path)
+        self.assertEqual(store.current.version, 0)
+        swaps = []
+        store.subscribe(lambda old, new: swaps.append((old.version, new.version)))
+        before = store.current
+        self.write({"label": "winter", "vital_rules": {"yellow_temp_high": [["temperature", 37.5, 40, "[]"]]}})
+        rules = store.reload().result()
+        self.assertIs(store.current, rules)
+        self.assertEqual((rules.version, rules.label, swaps), (1, "winter", [(0, 1)]))
+        self.assertEqual(rules.assess({"temperature": "37.6"})["tag"], "YELLOW")
+        # A reader holding the old version keeps its rules
+        self.assertEqual(before.assess({"temperature": "37.6"})["tag"], "GREEN")
+
+        # Same content again: no new version, no notification
+        self.assertIs(store.reload().result(), rules)
+        self.assertEqual(swaps, [(0, 1)])
+
+    def test_invalid_reload_keeps_current(self):
+        self.write({"vital_rules": {"red_hr_high": [["heart_rate", 140, None, "()"]]}})
+        store = RuleStore(self.path)
+        self.assertEqual(store.current.version, 1)
+        with self.assertRaises(ValueError):
+            store.reload({"vital_rules": {"red_hr_high": [["heart_rate", 140, None, "<>"]]}}).result()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{not json")
+        with self.assertRaises(ValueError):
+            store.reload().result()
+        self.assertEqual(store.current.version, 1)
+        self.assertEqual(store.current.assess({"heart_rate": "145"})["tag"], "RED")
+
+    def test_readers_during_reloads(self):
+        store = RuleStore()
+        documents = [{"vital_rules": {"yellow_hr_high": [["heart_rate", 101 + i, 150, "(]"]]}} for i in range(20)]
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                rules = store.current
+                result = rules.assess({"heart_rate": "110"})
+                if result["rules_version"] != rules.version:
+                    errors.append(result)
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for document in documents:
+            store.reload(document).result()
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(store.current.version, 20)
+
+
+class TestRemoteRules(unittest.TestCase):
+    def test_follows_published_rules(self):
+        published = RuleSet.from_document({"label": "district", "symptoms": {"RED": {"stridor": ["Croup"]},
+                                                                             "GREEN": {"joint_pain": None}}}, 4)
+        body = {}
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            remote = RemoteRules(f"http://127.0.0.1:{server.server_port}/rules")
+            body.update(published.describe(), rules=published.document)
+            rules = remote.refresh()
+            self.assertEqual((rules.version, rules.label, rules.digest), (4, "district", published.digest))
+            self.assertEqual(rules.assess({"symptoms": ["stridor"]})["tag"], "RED")
+            self.assertEqual(rules.assess({"symptoms": ["joint_pain"]})["diagnoses"],
+                             ["Routine Check-up", "Minor Ailment"])
+            self.assertIs(remote.refresh(), rules)
+            body.clear()
+            self.assertIs(remote.refresh(), rules)   # unusable answer: keep the rules we have
+            self.assertIsNotNone(remote.last_error)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestAdminRoutes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        backend = started_backend()
+        cls.client = backend.app.test_client()
+
+    def tearDown(self):
+        os.environ.pop("TRIAGE_ADMIN_TOKEN", None)
+
+    def test_reload_needs_a_configured_token(self):
+        document = {"label": "admin test", "vital_rules": {"yellow_o2": [["o2_saturation", 90, 96, "[)"]]}}
+        headers = {"Origin": "http://evil.example"}
+        response = self.client.post("/admin/rules/reload", json=document, headers=headers)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("Access-Control-Allow-Origin", response.headers)
+        os.environ["TRIAGE_ADMIN_TOKEN"] = "s3cret"
+        response = self.client.post("/admin/rules/reload", json=document,
+                                    headers={"Origin": "http://evil.example", "X-Admin-Token": "nope"})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post("/admin/rules/reload", json=document, headers={"X-Admin-Token": "s3cret"})
+        self.assertEqual((response.status_code, response.json["label"]), (200, "admin test"))
+        self.assertEqual(self.client.get("/rules").json["label"], "admin test")
+        self.assertIn("Access-Control-Allow-Origin", self.client.get("/rules", headers=headers).headers)
+        # Back to the built-in rules for the other backend tests
+        self.client.post("/admin/rules/reload", json={}, headers={"X-Admin-Token": "s3cret"})
+
+    def test_discharge_archives_the_tag_given(self):
+        import backend
+        from triage_archive import TAGS, chunks
+        os.environ["TRIAGE_ADMIN_TOKEN"] = "s3cret"
+        self.client.post("/triage", json={"patient_id": "RV-1", "o2_saturation": "93", "symptoms": []})
+        response = self.client.post("/admin/rules/reload", headers={"X-Admin-Token": "s3cret"},
+                                    json={"vital_rules": {"red_o2": [["o2_saturation", 0, 95, "()"]]}})
+        version = response.json["version"]
+        try:
+            self.assertEqual(self.client.post("/patients/RV-1/discharge", json={}).status_code, 200)
+            backend.archive_writer.flush()
+            rows = [row for chunk in chunks(backend.archive_writer.root, ["patient_id", "tag"])
+                    for row in zip(chunk["patient_id"].tolist(), chunk["tag"].tolist())]
+            self.assertEqual(TAGS[dict(rows)[b"RV-1"]], "YELLOW")
+            self.assertEqual(backend.patient_index.get("RV-1")["result"]["rules_version"], version - 1)
+        finally:
+            self.client.post("/admin/rules/reload", json={}, headers={"X-Admin-Token": "s3cret"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from audit_log import scan
+from backend_testing import started_backend
+from single_flight import SingleFlight, triage_key
+
+
+class TestTriageKey(unittest.TestCase):
+    def test_normalization(self):
+        form = {"patient_id": " p-1", "o2_saturation": "92", "symptoms": ["chest_pain", "joint_pain"]}
+        same = {"symptoms": ["chest_pain", "joint_pain"], "o2_saturation": "92", "patient_id": "P-1 "}
+        self.assertEqual(triage_key(form), triage_key(same))
+        self.assertEqual(triage_key(form)[0], "P-1")
+        self.assertNotEqual(triage_key(form), triage_key(dict(form, o2_saturation="93")))
+        self.assertNotEqual(triage_key(form), triage_key(dict(form, patient_id="P-2")))
+        self.assertNotEqual(triage_key(form), triage_key(dict(form, symptoms=["joint_pain", "chest_pain"])))
+        # Walk-ins without an id are never merged
+        self.assertIsNone(triage_key(dict(form, patient_id="  ")))
+        self.assertIsNone(triage_key({"o2_saturation": "92"}))
+        self.assertIsNone(triage_key(["o2_saturation"]))
+
+
+class TestSingleFlight(unittest.TestCase):
+    def burst(self, flight, keys, fn):
+        start = threading.Barrier(len(keys))
+        results = [None] * len(keys)
+
+        def call(i):
+            start.wait()
+            try:
+                results[i] = flight.do(keys[i], fn)
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(keys))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_duplicate_burst_runs_once(self):
+        flight = SingleFlight()
+        runs = []
+
+        def evaluate():
+            runs.append(1)
+            time.sleep(0.2)
+            return {"tag": "RED"}
+        results = self.burst(flight, [("P-1", "x")] * 32, evaluate)
+        self.assertLess(len(runs), 4)
+        self.assertEqual(len({id(result) for result, _ in results}), len(runs))
+        self.assertEqual(sum(not shared for _, shared in results), len(runs))
+        metrics = flight.metrics()
+        self.assertEqual((metrics["calls"], metrics["executions"]), (32, len(runs)))
+        self.assertGreater(metrics["coalescing_ratio"], 0.85)
+        self.assertEqual(metrics["in_flight"], 0)
+
+        # Nothing is cached once the burst is over
+        flight.do(("P-1", "x"), evaluate)
+        self.assertEqual(flight.metrics()["executions"], len(runs))
+
+    def test_distinct_keys_are_not_coalesced(self):
+        flight = SingleFlight()
+        results = self.burst(flight, [("P-%d" % i, "x") for i in range(8)], lambda: time.sleep(0.05))
+        self.assertFalse(any(shared for _, shared in results))
+        self.assertEqual(flight.metrics()["coalesced"], 0)
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError("bad form")
+        results = self.burst(flight, ["k"] * 8, fail)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.do("k", lambda: 1), (1, False))
+
+
+class TestBackendCoalescing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        backend = started_backend()
+        cls.backend = backend
+
+    def burst(self, forms):
+        """POST the forms to /triage at once, with evaluation slowed so the requests overlap."""
+        backend = self.backend
+        record_triage = backend.record_triage
+
+        def slow(*args, **kwargs):
+            time.sleep(0.2)
+            return record_triage(*args, **kwargs)
+        start = threading.Barrier(len(forms))
+        responses = [None] * len(forms)
+
+        def post(i):
+            client = backend.app.test_client()
+            start.wait()
+            responses[i] = client.post("/triage", json=forms[i])
+        with mock.patch.object(backend, "record_triage", slow), \
+                mock.patch.object(backend.state_log, "record", wraps=backend.state_log.record) as state_writes:
+            threads = [threading.Thread(target=post, args=(i,)) for i in range(len(forms))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return responses, state_writes
+
+    def audited(self, patient_id):
+        return sum(len(batch) for batch in scan(self.backend.audit_log.directory, patient_id=patient_id))
+
+    def test_burst_with_a_patient_id_is_recorded_once(self):
+        before = self.client_metrics()
+        form = {"patient_id": "SF-1", "o2_saturation": "85", "symptoms": []}
+        responses, state_writes = self.burst([form] * 16)
+        self.assertEqual({(r.status_code, r.json["tag"]) for r in responses}, {(200, "RED")})
+        after = self.client_metrics()
+        executions = after["executions"] - before["executions"]
+        self.assertEqual(after["calls"] - before["calls"], 16)
+        self.assertLess(executions, 4)
+        self.assertEqual(after["coalesced"] - before["coalesced"], 16 - executions)
+        self.assertEqual(self.audited("SF-1"), executions)
+        self.assertEqual(state_writes.call_count, executions)
+
+    def test_walk_ins_without_an_id_are_not_merged(self):
+        before = self.client_metrics()
+        anonymous = self.audited("")
+        responses, state_writes = self.burst([{"o2_saturation": "85", "symptoms": []}] * 4)
+        self.assertEqual([r.status_code for r in responses], [200] * 4)
+        self.assertEqual(self.audited("") - anonymous, 4)
+        self.assertEqual(state_writes.call_count, 0)   # nothing to index without an id
+        self.assertEqual(self.client_metrics()["calls"], before["calls"])
+
+    def client_metrics(self):
+        return self.backend.app.test_client().get("/coalescing/metrics").json
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+from backend_testing import started_backend
+from triage_archive import ArchiveFlusher, ArchiveWriter, chunks, encounter_row, open_chunk, days, synthesize
+from triage_analytics import rule_frequency, tag_distribution_by_hour, wait_compliance
+from triage_logic import assess_triage
+
+DAY = 86400.0
+T0 = 1_780_000_000.0 - 1_780_000_000.0 % DAY  # midnight UTC
+
+
+class TestTriageArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def encounter(self, writer, patient, assessed_at, wait_minutes):
+        result = assess_triage(patient)
+        seen = None if wait_minutes is None else assessed_at + wait_minutes * 60
+        writer.append(encounter_row("TH1", patient, result, assessed_at, assessed_at, seen))
+
+    def test_rows_land_in_day_chunks(self):
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        self.encounter(writer, {"o2_saturation": "85"}, T0 + 3600, 10)
+        self.encounter(writer, {"heart_rate": "120"}, T0 + DAY + 7200, 45)
+        self.encounter(writer, {"symptoms": []}, T0 + DAY + 7300, None)
+        writer.flush()
+        self.assertEqual(len(days(self.root)), 2)
+        chunk = open_chunk(self.root, days(self.root)[1])
+        self.assertEqual(chunk["tag"].tolist(), [1, 2])
+        self.assertEqual(chunk["heart_rate"][0], 120.0)
+        self.assertTrue(np.isnan(chunk["seen_at"][1]))
+
+    def test_analytics(self):
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        self.encounter(writer, {"o2_saturation": "85"}, T0 + 3600, 10)        # RED on time
+        self.encounter(writer, {"o2_saturation": "85"}, T0 + 3700, 20)        # RED late
+        self.encounter(writer, {"heart_rate": "120"}, T0 + 5 * 3600, 29)     # YELLOW on time
+        self.encounter(writer, {"symptoms": ["joint_pain"]}, T0 + 5 * 3600, None)  # GREEN left unseen
+        writer.flush()
+        by_hour = tag_distribution_by_hour(self.root, utc_offset=0)
+        self.assertEqual(by_hour.shape, (24, 3))
+        self.assertEqual(by_hour[1].tolist(), [2, 0, 0])
+        self.assertEqual(by_hour[5].tolist(), [0, 1, 1])
+        compliance = wait_compliance(self.root)
+        self.assertEqual(compliance["RED"]["seen"], 2)
+        self.assertEqual(compliance["RED"]["compliance"], 0.5)
+        self.assertEqual(compliance["YELLOW"]["compliance"], 1.0)
+        self.assertIsNone(compliance["GREEN"]["compliance"])
+        self.assertEqual(compliance["RED"]["median_wait_minutes"], 10)
+        rules = rule_frequency(self.root)
+        self.assertEqual(rules["red_o2"], 2)
+        self.assertEqual(rules["green_symptoms"], 1)
+
+    def test_wait_of_exactly_the_target_is_on_time(self):
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        self.encounter(writer, {"o2_saturation": "85"}, T0 + 3600, 15)           # RED at 15:00
+        self.encounter(writer, {"o2_saturation": "85"}, T0 + 3700, 15 + 1 / 60)  # RED at 15:01
+        self.encounter(writer, {"heart_rate": "120"}, T0 + 3800, 30)             # YELLOW at 30:00
+        self.encounter(writer, {"symptoms": ["joint_pain"]}, T0 + 3900, 60)      # GREEN at 60:00
+        writer.flush()
+        compliance = wait_compliance(self.root)
+        self.assertEqual(compliance["RED"]["within_target"], 1)
+        self.assertEqual(compliance["RED"]["p90_wait_minutes"], 16)
+        self.assertEqual(compliance["YELLOW"]["compliance"], 1.0)
+        self.assertEqual(compliance["GREEN"]["compliance"], 1.0)
+
+    def test_flusher_writes_a_part_filled_buffer(self):
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        flusher = ArchiveFlusher(writer, interval=0.01)
+        flusher.start()
+        self.encounter(writer, {"o2_saturation": "85"}, T0 + 3600, 10)
+        deadline = time.time() + 2
+        while not days(self.root) and time.time() < deadline:
+            time.sleep(0.01)
+        flusher.stop()
+        flusher.join(1)
+        self.assertEqual(len(open_chunk(self.root, days(self.root)[0])["tag"]), 1)
+        self.assertIsNone(flusher.last_error)
+
+    def test_uneven_columns_after_interrupted_flush(self):
+        writer = ArchiveWriter(self.root, utc_offset=0)
+        self.encounter(writer, {"symptoms": []}, T0, 5)
+        writer.flush()
+        with open(os.path.join(self.root, days(self.root)[0], "tag.col"), "ab") as f:
+            f.write(b"\x00")
+        self.assertEqual(len(open_chunk(self.root, days(self.root)[0])["tag"]), 1)
+
+    def test_synthetic_archive_matches_naive_counts(self):
+        synthesize(self.root, 5000, 3, seed=1, utc_offset=0, start=T0)
+        tags = np.concatenate([open_chunk(self.root, d)["tag"] for d in days(self.root)])
+        by_hour = tag_distribution_by_hour(self.root, utc_offset=0)
+        self.assertEqual(by_hour.sum(), 5000)
+        self.assertEqual(by_hour.sum(axis=0).tolist(), np.bincount(tags, minlength=3).tolist())
+        self.assertEqual(sum(rule_frequency(self.root).values()), 5000)
+
+
+class TestBackendDischarge(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        backend = started_backend()
+        cls.backend = backend
+        cls.client = backend.app.test_client()
+
+    def archived(self, patient_id):
+        self.backend.archive_writer.flush()
+        return [arrived for chunk in chunks(self.backend.archive_writer.root, ["patient_id", "arrived_at"])
+                for pid, arrived in zip(chunk["patient_id"].tolist(), chunk["arrived_at"].tolist())
+                if pid == patient_id.encode()]
+
+    def test_one_archive_row_per_visit(self):
+        self.assertEqual(self.client.post("/patients/DC-0/discharge", json={}).status_code, 404)
+        self.client.post("/triage", json={"patient_id": "DC-1", "heart_rate": "120"})
+        self.assertEqual(self.client.post("/patients/DC-1/discharge", json={"seen": True}).status_code, 200)
+        response = self.client.post("/patients/DC-1/discharge", json={"seen": True})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(self.archived("DC-1")), 1)
+        # Back for a new visit: a new arrival time and a second row
+        first_arrival = self.backend.patient_index.get("DC-1")["arrived_at"]
+        self.client.post("/triage", json={"patient_id": "DC-1", "heart_rate": "120"})
+        self.assertGreater(self.backend.patient_index.get("DC-1")["arrived_at"], first_arrival)
+        self.assertEqual(self.client.post("/patients/DC-1/discharge", json={"seen": False}).status_code, 200)
+        self.assertEqual(len(self.archived("DC-1")), 2)
+
+    def test_seen_must_be_a_boolean(self):
+        self.client.post("/triage", json={"patient_id": "DC-2", "heart_rate": "120"})
+        response = self.client.post("/patients/DC-2/discharge", json={"seen": "false"})
+        self.assertEqual((response.status_code, response.json["errors"][0]["field"]), (400, "seen"))
+        self.assertIn("DC-2", self.backend.waiting_room.patients)
+
+
+if __name__ == "__main__":
+    unittest.main()
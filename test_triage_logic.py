@@ -1,5 +1,5 @@
 import unittest
-from triage_logic import assess_triage
+from triage_logic import assess_triage, rule_of, RULES
 import csv
 import sys
 from functools import wraps
@@ -467,5 +467,26 @@ class TestTriageLogic(unittest.TestCase):
         self.result = assess_triage(self.patient)
         self.assertEqual(self.result["tag"], "YELLOW")
 
+    # --- Rule ids ---
+    def test_rule_of_every_path(self):
+        cases = {
+            "ambulance": {"ambulance_arrival": True},
+            "red_o2": {"o2_saturation": 85}, "red_gcs": {"gcs_score": 8},
+            "red_temp_high": {"temperature": 41}, "red_temp_low": {"temperature": 34},
+            "red_bp_high": {"systolic_bp": 230}, "red_bp_low": {"systolic_bp": 70},
+            "red_hr_low": {"heart_rate": 35}, "red_hr_high": {"heart_rate": 160},
+            "red_symptom": {"symptoms": ["chest_pain"]},
+            "yellow_o2": {"o2_saturation": 92}, "yellow_gcs": {"gcs_score": 12},
+            "yellow_temp_low": {"temperature": 35.5}, "yellow_temp_high": {"temperature": 39},
+            "yellow_bp_low": {"systolic_bp": 85}, "yellow_bp_high": {"systolic_bp": 180},
+            "yellow_hr_low": {"heart_rate": 45}, "yellow_hr_high": {"heart_rate": 120},
+            "yellow_symptoms": {"symptoms": ["headache_moderate"]},
+            "green_symptoms": {"symptoms": ["constipation"]}, "default": {"symptoms": []},
+        }
+        self.assertEqual(set(cases), set(RULES))
+        for rule, patient in cases.items():
+            with self.subTest(rule=rule):
+                self.assertEqual(rule_of(assess_triage(patient)), rule)
+
 if __name__ == "__main__":
     unittest.main(testRunner=CSVTestRunner(), verbosity=2) 
\ No newline at end of file
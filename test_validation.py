@@ -0,0 +1,159 @@
+import json
+import unittest
+from backend_testing import started_backend
+from triage_logic import assess_triage
+from validation import ValidationError, batch_of, loads, validate_batch, validate_patient, validate_records
+from wire_format import RECORD, as_records, decode_patients, encode_patients, decode_results
+
+
+def fields(error):
+    return [e["field"] for e in error.exception.errors]
+
+
+class TestValidatePatient(unittest.TestCase):
+    def test_normalization(self):
+        form = {"patient_id": "P-1", "ambulance_arrival": False, "o2_saturation": "93", "gcs_score": "14",
+                "temperature": " 38.5 ", "systolic_bp": "", "diastolic_bp": None, "heart_rate": 0,
+                "age": 35.0, "symptoms": ["fever_cough"], "notes": "kept"}
+        self.assertEqual(validate_patient(form), {
+            "patient_id": "P-1", "ambulance_arrival": False, "o2_saturation": 93.0, "gcs_score": 14,
+            "temperature": 38.5, "heart_rate": 0.0, "age": 35, "symptoms": ["fever_cough"], "notes": "kept"})
+        self.assertEqual(validate_patient({}), {})
+
+    def test_blank_vital_no_longer_skips_later_checks(self):
+        form = {"o2_saturation": "", "heart_rate": "160", "symptoms": []}
+        self.assertEqual(assess_triage(form)["tag"], "GREEN")
+        self.assertEqual(assess_triage(validate_patient(form))["tag"], "RED")
+        # Values that were already usable give the same result and reason
+        form = {"o2_saturation": "91", "gcs_score": "15", "systolic_bp": "170", "diastolic_bp": "95"}
+        self.assertEqual(assess_triage(validate_patient(form)), assess_triage(form))
+
+    def test_critical_extremes_are_triaged(self):
+        # Each was RED before validation existed; none may be turned away as implausible
+        for form in ({"temperature": "24"}, {"temperature": "12.5"}, {"heart_rate": "8"}, {"heart_rate": "320"},
+                     {"systolic_bp": "25"}, {"o2_saturation": "15"}, {"diastolic_bp": "5", "systolic_bp": "40"}):
+            with self.subTest(form=form):
+                self.assertEqual(assess_triage(validate_patient(dict(form, symptoms=[])))["tag"], "RED")
+
+    def test_every_bad_field_is_named(self):
+        with self.assertRaises(ValidationError) as error:
+            validate_patient({"o2_saturation": "9O", "gcs_score": "14.5", "temperature": 380,
+                              "ambulance_arrival": "false", "gender": "M", "symptoms": ["chest_pain", 7],
+                              "heart_rate": [80]})
+        self.assertEqual(fields(error), ["ambulance_arrival", "o2_saturation", "gcs_score", "temperature",
+                                         "heart_rate", "gender", "symptoms[1]"])
+        self.assertEqual(error.exception.errors[1], {"field": "o2_saturation", "message": "must be a number",
+                                                     "value": "9O"})
+        for bad in ({"gcs_score": 0}, {"pain_score": "11"}, {"systolic_bp": "nan"}, {"symptoms": "chest_pain"},
+                    {"patient_id": "x" * 65}):
+            with self.assertRaises(ValidationError):
+                validate_patient(bad)
+        with self.assertRaises(ValidationError) as error:
+            validate_patient(["o2_saturation"])
+        self.assertEqual(error.exception.errors[0]["message"], "must be a JSON object")
+
+    def test_batches(self):
+        patients = [{"o2_saturation": "95"}, {"o2_saturation": "95"}, {"o2_saturation": "950"}, {"o2_saturation": "x"}]
+        self.assertEqual(validate_batch(patients[:2]), [{"o2_saturation": 95.0}] * 2)
+        with self.assertRaises(ValidationError) as error:
+            validate_batch({"patients": patients})
+        self.assertEqual(fields(error), ["patients[2].o2_saturation"])
+        self.assertEqual(batch_of({"patients": patients}), patients)
+        for payload in ({"patients": {}}, "x", None):
+            with self.assertRaises(ValidationError):
+                batch_of(payload)
+        with self.assertRaises(ValidationError):
+            loads(b'{"o2_saturation": ')
+        self.assertEqual(loads(b'{"gcs_score": "15"}'), {"gcs_score": "15"})
+
+    def test_records_are_checked_like_forms(self):
+        forms = [{"gcs_score": "12.5"}, {"o2_saturation": "150"}, {"age": "7.5"}, {"heart_rate": "0"},
+                 {"temperature": "inf"}, {"pain_score": "0"}, {"blood_glucose": "0.05"}, {"systolic_bp": "400"}]
+        for form in forms:
+            records = as_records(encode_patients([{"heart_rate": "80"}, form]))
+            expected = None
+            try:
+                validate_patient(decode_patients(records.tobytes())[1], "patients[1].")
+            except ValidationError as e:
+                expected = e.errors
+            with self.subTest(form=form):
+                if expected is None:
+                    validate_records(records)
+                else:
+                    with self.assertRaises(ValidationError) as error:
+                        validate_records(records)
+                    self.assertEqual(error.exception.errors, expected)
+
+
+class TestBackendValidation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        backend = started_backend()
+        cls.backend = backend
+        cls.client = backend.app.test_client()
+
+    def test_structured_errors(self):
+        response = self.client.post("/triage", json={"patient_id": "V-1", "o2_saturation": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["errors"][0]["field"], "o2_saturation")
+        response = self.client.post("/triage", data=b"{not json", content_type="application/json")
+        self.assertEqual((response.status_code, response.json["errors"][0]["field"]), (400, ""))
+        response = self.client.post("/triage/batch", json={"patients": [{"patient_id": "V-2"},
+                                                                       {"patient_id": "V-3", "gcs_score": "20"}]})
+        self.assertEqual(response.json["errors"][0]["field"], "patients[1].gcs_score")
+        # Nothing from a rejected batch is recorded
+        self.assertIsNone(self.backend.patient_index.get("V-2"))
+
+    def test_complaint_matching_input(self):
+        response = self.client.post("/complaints/match", json={"complaints": ["chhati dukhyo"], "limit": 1})
+        self.assertEqual(response.json["matches"], [[{"symptom": "chest_pain", "score": 1.0}]])
+        for body, field in [(b"{not json", ""), (b"[]", ""), (b'{"complaints": "chest pain"}', "complaints"),
+                            (b'{"complaints": ["chest pain", 7]}', "complaints[1]"),
+                            (b'{"complaints": [], "limit": "three"}', "limit"),
+                            (b'{"complaints": [], "limit": 0}', "limit")]:
+            with self.subTest(body=body):
+                response = self.client.post("/complaints/match", data=body, content_type="application/json")
+                self.assertEqual((response.status_code, response.json["errors"][0]["field"]), (400, field))
+
+    def test_critical_extremes_come_back_red(self):
+        for i, form in enumerate(({"temperature": "24"}, {"heart_rate": "8"}, {"systolic_bp": "25"},
+                                  {"o2_saturation": "15"})):
+            with self.subTest(form=form):
+                response = self.client.post("/triage", json=dict(form, patient_id=f"X-{i}", symptoms=[]))
+                self.assertEqual((response.status_code, response.json["tag"]), (200, "RED"))
+
+    def test_json_and_binary_records_agree(self):
+        forms = [{"gcs_score": "12.5"}, {"o2_saturation": "150"}, {"heart_rate": "8"}, {"gcs_score": "9"},
+                 {"temperature": "38.5", "symptoms": ["fever_cough"]}, {"systolic_bp": "500"}]
+        for i, form in enumerate(forms):
+            form = dict(form, patient_id=f"WF-{i}")
+            as_json = self.client.post("/triage", json=form)
+            as_record = self.client.post("/triage", data=encode_patients([form]), content_type=RECORD,
+                                         headers={"Accept": "application/json"})
+            with self.subTest(form=form):
+                self.assertEqual(as_record.status_code, as_json.status_code)
+                if as_json.status_code == 200:
+                    self.assertEqual(as_record.json["tag"], as_json.json["tag"])
+                else:
+                    self.assertEqual(as_record.json["errors"], as_json.json["errors"])
+        batch = encode_patients([{"patient_id": "WF-B1"}, {"patient_id": "WF-B2", "gcs_score": "12.5"}])
+        response = self.client.post("/triage/batch", data=batch, content_type=RECORD)
+        self.assertEqual((response.status_code, response.json["errors"][0]["field"]), (400, "patients[1].gcs_score"))
+        self.assertIsNone(self.backend.patient_index.get("WF-B1"))
+        response = self.client.post("/triage/batch", data=batch[:len(batch) // 2], content_type=RECORD,
+                                    headers={"Accept": RECORD})
+        self.assertEqual(decode_results(response.data)[0]["patient_id"], "WF-B1")
+
+    def test_valid_requests_and_metrics(self):
+        response = self.client.post("/triage", json={"patient_id": "V-4", "o2_saturation": "", "heart_rate": "160"})
+        self.assertEqual((response.status_code, response.json["tag"]), (200, "RED"))
+        response = self.client.post("/triage/classify", data=json.dumps([{"heart_rate": "45"}]),
+                                    content_type="application/json")
+        self.assertEqual(response.json["results"], [{"tag": "YELLOW", "rule": "yellow_hr_low"}])
+        metrics = self.client.get("/validation/metrics").json
+        self.assertGreaterEqual(metrics["requests"], 2)
+        self.assertIn(metrics["json_library"], ("orjson", "json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
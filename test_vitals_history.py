@@ -0,0 +1,101 @@
+import unittest
+from vitals_history import RollingSeries, PatientVitals, VitalsHistory, trend_arrow
+
+
+class TestRollingSeries(unittest.TestCase):
+    def test_slope_delta_min_max(self):
+        s = RollingSeries(capacity=8)
+        for minute, value in enumerate([96, 95, 94, 93]):
+            s.push(minute * 600, value)
+        self.assertAlmostEqual(s.slope_per_hour, -6.0)
+        self.assertEqual(s.delta, -3)
+        self.assertEqual((s.minimum, s.maximum), (93, 96))
+        self.assertEqual(trend_arrow(s), "↓")
+
+    def test_window_evicts_but_first_reading_is_kept(self):
+        s = RollingSeries(capacity=3)
+        for i, value in enumerate([100, 50, 60, 70, 80]):
+            s.push(i * 60.0, value)
+        self.assertEqual(s.count, 3)
+        self.assertEqual([v for _, v in s.readings()], [60, 70, 80])
+        self.assertEqual((s.minimum, s.maximum), (60, 80))
+        self.assertEqual(s.delta, -20)
+        self.assertAlmostEqual(s.slope_per_hour, 600.0)
+        self.assertEqual(s.span, 120.0)
+
+    def test_incremental_sums_match_recomputation(self):
+        s = RollingSeries(capacity=5)
+        values = [120, 118, 131, 125, 110, 104, 99, 101, 95]
+        for i, value in enumerate(values):
+            s.push(1000 + i * 300.0, value)
+        window = s.readings()
+        n = len(window)
+        mean_t = sum(t for t, _ in window) / n
+        mean_v = sum(v for _, v in window) / n
+        expected = (sum((t - mean_t) * (v - mean_v) for t, v in window)
+                    / sum((t - mean_t) ** 2 for t, _ in window) * 3600)
+        self.assertAlmostEqual(s.slope_per_hour, expected, places=6)
+        self.assertEqual((s.minimum, s.maximum), (min(values[-5:]), max(values[-5:])))
+
+    def test_flat_series(self):
+        s = RollingSeries()
+        s.push(0, 37.0)
+        self.assertEqual(s.slope_per_hour, 0.0)
+        self.assertEqual(trend_arrow(s), "→")
+
+
+class TestDeteriorationDetection(unittest.TestCase):
+    def test_falling_o2_is_flagged_before_red_threshold(self):
+        p = PatientVitals()
+        self.assertEqual(p.add({"o2_saturation": "97"}, t=0), [])
+        self.assertEqual(p.add({"o2_saturation": "96"}, t=900), [])
+        alerts = p.add({"o2_saturation": "94"}, t=1800)
+        self.assertEqual(len(alerts), 1)
+        self.assertIn("o2_saturation", alerts[0])
+        self.assertTrue(p.summary()["o2_saturation"]["worsening"])
+
+    def test_improvement_is_not_flagged(self):
+        p = PatientVitals()
+        p.add({"heart_rate": "130"}, t=0)
+        self.assertEqual(p.add({"heart_rate": "95"}, t=1800), [])
+        self.assertEqual(p.summary()["heart_rate"]["trend"], "↓")
+
+    def test_temperature_flags_either_direction(self):
+        p = PatientVitals()
+        p.add({"temperature": "36.8"}, t=0)
+        self.assertTrue(p.add({"temperature": "35.5"}, t=1800))
+        p = PatientVitals()
+        p.add({"temperature": "38.2"}, t=0)
+        self.assertTrue(p.add({"temperature": "39.4"}, t=1800))
+
+    def test_returning_to_normal_is_not_flagged(self):
+        p = PatientVitals()
+        for i, (temperature, diastolic) in enumerate([("39.5", "115"), ("39.0", "105"), ("38.6", "98"),
+                                                      ("38.0", "88")]):
+            self.assertEqual(p.add({"temperature": temperature, "diastolic_bp": diastolic}, t=i * 900), [])
+        self.assertFalse(p.summary()["temperature"]["worsening"])
+        # Drifting within the normal range is not deterioration either
+        p = PatientVitals()
+        p.add({"diastolic_bp": "62"}, t=0)
+        self.assertEqual(p.add({"diastolic_bp": "88"}, t=1800), [])
+
+    def test_blank_zero_and_bad_values_are_skipped(self):
+        p = PatientVitals()
+        p.add({"o2_saturation": "", "heart_rate": "0", "temperature": "abc", "systolic_bp": None})
+        self.assertEqual(p.summary(), {})
+
+
+class TestVitalsHistory(unittest.TestCase):
+    def test_memory_bounded_and_discard(self):
+        history = VitalsHistory(capacity=4)
+        for i in range(100):
+            history.add("TH001", {"heart_rate": 80 + i}, t=i * 60.0)
+        self.assertEqual(history.get("TH001").series["heart_rate"].count, 4)
+        self.assertEqual(history.summary("TH001")["heart_rate"]["max"], 179)
+        history.discard("TH001")
+        self.assertIsNone(history.summary("TH001"))
+        self.assertEqual(len(history), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import random
+import unittest
+import wire_format
+from early_warning import assess_with_score
+from triage_logic import SYMPTOM_IDS, assess_triage, rule_of
+from wire_format import (JSON, MSGPACK, RECORD, WireFormatError, decode_patients, decode_results, encode_patients,
+                         encode_results, negotiate)
+
+
+def random_patient(rng, i):
+    patient = {"patient_id": f"p{i}", "symptoms": rng.sample(SYMPTOM_IDS, rng.randint(0, 3))}
+    for field, low, high in (("o2_saturation", 80, 100), ("temperature", 34, 41.5), ("systolic_bp", 70, 230),
+                             ("diastolic_bp", 40, 130), ("heart_rate", 30, 160)):
+        if rng.random() < 0.8:
+            patient[field] = f"{rng.uniform(low, high):.1f}"
+    if rng.random() < 0.8:
+        patient["gcs_score"] = str(rng.randint(3, 15))
+    if rng.random() < 0.1:
+        patient["ambulance_arrival"] = True
+    return patient
+
+
+class TestRecords(unittest.TestCase):
+    def test_patient_round_trip(self):
+        patient = {"patient_id": " abc-1 ", "o2_saturation": "92", "temperature": "37.8", "gcs_score": "",
+                   "symptoms": ["chest_pain", "eye_problems", "not_a_symptom"], "gender": "Female",
+                   "ambulance_arrival": True, "age": "30"}
+        body = encode_patients([patient])
+        self.assertEqual(len(body), wire_format.PATIENT.size)
+        self.assertEqual(decode_patients(body), [{
+            "patient_id": "ABC-1", "symptoms": ["chest_pain", "eye_problems"], "o2_saturation": "92",
+            "temperature": "37.8", "age": "30", "ambulance_arrival": True, "gender": "Female"}])
+
+    def test_same_triage_after_round_trip(self):
+        rng = random.Random(5)
+        patients = [random_patient(rng, i) for i in range(2000)]
+        for original, decoded in zip(patients, decode_patients(encode_patients(patients))):
+            # A bitmask keeps the symptom set but not the order they were ticked in
+            original = dict(original, symptoms=sorted(original["symptoms"], key=SYMPTOM_IDS.index))
+            self.assertEqual(assess_triage(decoded), assess_triage(original))
+
+    def test_result_round_trip(self):
+        patients = [{"patient_id": "A", "o2_saturation": "85"}, {"patient_id": "B", "symptoms": ["eye_problems"]}]
+        results = [dict(assess_with_score(p), patient_id=p["patient_id"]) for p in patients]
+        decoded = decode_results(encode_results(results))
+        self.assertEqual([(r["patient_id"], r["tag"], r["rule"]) for r in decoded],
+                         [("A", "RED", "red_o2"), ("B", "GREEN", "green_symptoms")])
+        self.assertEqual([r["ews"] for r in decoded], [r["ews"]["score"] for r in results])
+        self.assertEqual(rule_of(results[0]), decoded[0]["rule"])
+
+    def test_errors(self):
+        with self.assertRaises(WireFormatError):
+            decode_patients(b"\0" * 59)
+        with self.assertRaises(WireFormatError):
+            decode_results(b"\0" * 21)
+        with self.assertRaises(WireFormatError):
+            encode_patients([{"patient_id": "X" * 17}])
+        with self.assertRaises(WireFormatError):
+            wire_format.loads(b"{not json", JSON)
+        self.assertEqual(decode_patients(b""), [])
+
+
+class TestNegotiate(unittest.TestCase):
+    def test_accept(self):
+        self.assertEqual(negotiate(None), JSON)
+        self.assertEqual(negotiate(RECORD), RECORD)
+        self.assertEqual(negotiate(f"{JSON};q=0.5, {RECORD}"), RECORD)
+        self.assertEqual(negotiate(f"{RECORD};q=0.1, {JSON}"), JSON)
+        self.assertEqual(negotiate("*/*"), JSON)
+        self.assertEqual(negotiate("text/html"), JSON)
+        self.assertEqual(negotiate(f"{RECORD};q=0"), JSON)
+
+    @unittest.skipUnless(wire_format.msgpack, "msgpack not installed")
+    def test_msgpack(self):
+        self.assertEqual(negotiate(MSGPACK), MSGPACK)
+        document = {"patients": [{"patient_id": "A", "symptoms": ["chest_pain"]}]}
+        self.assertEqual(wire_format.loads(wire_format.dumps(document, MSGPACK), MSGPACK), document)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from batch_triage import assess_batch
+from patient_index import PatientIndex
+from recovery import LiveState, StateLog
+from vitals_history import VitalsHistory
+from waiting_room import WaitingRoom
+from wire_format import decode_patients, encode_patients
+from worker_pool import TriagePool, _synthetic_patients
+
+
+class TestTriagePool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = TriagePool(workers=2, min_chunk=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_same_results_as_one_process(self):
+        patients = _synthetic_patients(1000) + [{"symptoms": "not a list"}]
+        self.assertEqual(self.pool.assess(patients), assess_batch(patients))
+        # A larger batch after a smaller one moves to a new segment
+        patients = _synthetic_patients(3000, seed=2)
+        self.assertEqual(self.pool.assess(patients), assess_batch(patients))
+        self.assertEqual(self.pool.assess([]), [])
+
+    def test_records(self):
+        body = encode_patients(_synthetic_patients(500, seed=3))
+        self.assertEqual(self.pool.assess_records(body), assess_batch(decode_patients(body)))
+
+
+# Shaped like backend.py: imports the service, opens its state only when run as the script.
+# The report line is written by every process that executes the module, workers included
+MAIN = """
+import json, os, sys, threading
+sys.path.insert(0, {repo!r})
+import backend
+from worker_pool import TriagePool, _synthetic_patients
+
+with open(os.path.join({scratch!r}, "ran-%d" % os.getpid()), "w") as f:
+    json.dump([__name__, threading.active_count(), backend.state_log is not None], f)
+if __name__ == "__main__":
+    backend.start(state_dir=os.path.join({scratch!r}, "state"), audit_dir=os.path.join({scratch!r}, "audit"),
+                  archive_dir=os.path.join({scratch!r}, "archive"))
+    backend.record_triage({{"patient_id": "LIVE1", "o2_saturation": "85"}})
+    with TriagePool(workers=2, min_chunk=10) as pool:
+        pool.assess(_synthetic_patients(100))
+    backend.state_log.checkpoint()
+"""
+
+
+class TestWorkersFromAServiceScript(unittest.TestCase):
+    def test_workers_do_not_start_the_service(self):
+        repo = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory() as scratch:
+            script = os.path.join(scratch, "service.py")
+            with open(script, "w") as f:
+                f.write(MAIN.format(repo=repo, scratch=scratch))
+            subprocess.run([sys.executable, script], cwd=scratch, check=True, timeout=120,
+                           env={k: v for k, v in os.environ.items() if not k.startswith("TRIAGE_")})
+            reports = []
+            for name in os.listdir(scratch):
+                if name.startswith("ran-"):
+                    with open(os.path.join(scratch, name)) as f:
+                        reports.append(json.load(f))
+            self.assertEqual(sorted(r[0] for r in reports), ["__main__", "__mp_main__", "__mp_main__"])
+            # The workers re-imported the script but opened nothing and started no threads
+            for name, threads, started in reports:
+                if name == "__mp_main__":
+                    self.assertEqual((threads, started), (1, False))
+            # and the service's own state recovers whole
+            state = LiveState(WaitingRoom(), PatientIndex(), VitalsHistory())
+            StateLog(os.path.join(scratch, "state"), state.capture).recover(state.restore, state.apply)
+            self.assertEqual(list(state.waiting_room.patients), ["LIVE1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Monthly reporting over the columnar triage archive.
+
+Every query walks the archive one memory-mapped day chunk at a time, reads only
+the columns it needs and reduces them with numpy (bincount/histograms), so the
+cost is a few sequential column scans regardless of archive size.
+
+    python triage_analytics.py archive --from 2026-09-01 --to 2026-09-30
+    python triage_analytics.py archive --json
+"""
+import argparse
+import json
+import time
+from typing import Dict
+
+import numpy as np
+
+from triage_archive import TARGET_MINUTES, chunks, local_utc_offset
+from triage_logic import RULES, TAGS
+
+# Waits are histogrammed per minute up to this many minutes (longer waits go in the last bin)
+MAX_WAIT_MINUTES = 24 * 60
+
+
+def tag_distribution_by_hour(root: str, start: str = None, end: str = None, utc_offset: float = None) -> np.ndarray:
+    """Counts of assessments per local hour of day and tag, shape (24, len(TAGS))."""
+    offset = local_utc_offset() if utc_offset is None else utc_offset
+    counts = np.zeros(24 * len(TAGS), dtype=np.int64)
+    for chunk in chunks(root, ("assessed_at", "tag"), start, end):
+        hour = ((chunk["assessed_at"] + offset) // 3600 % 24).astype(np.int64)
+        counts += np.bincount(hour * len(TAGS) + chunk["tag"], minlength=len(counts))
+    return counts.reshape(24, len(TAGS))
+
+
+def rule_frequency(root: str, start: str = None, end: str = None) -> Dict[str, int]:
+    """How often each rule produced the final tag."""
+    counts = np.zeros(len(RULES), dtype=np.int64)
+    for chunk in chunks(root, ("rule",), start, end):
+        counts += np.bincount(chunk["rule"], minlength=len(RULES))[:len(RULES)]
+    return {rule: int(n) for rule, n in zip(RULES, counts)}
+
+
+def wait_histogram(root: str, start: str = None, end: str = None) -> np.ndarray:
+    """
+    Per tag, counts of patients seen within 0, 1, 2, ... minutes (bin m holds waits over m - 1 and up to m
+    minutes, so a cumulative sum at m counts waits <= m); shape (len(TAGS), MAX_WAIT_MINUTES + 1).
+    """
+    bins = MAX_WAIT_MINUTES + 1
+    histogram = np.zeros(len(TAGS) * bins, dtype=np.int64)
+    for chunk in chunks(root, ("assessed_at", "seen_at", "tag"), start, end):
+        seen = ~np.isnan(chunk["seen_at"])
+        minutes = np.clip(np.ceil((chunk["seen_at"][seen] - chunk["assessed_at"][seen]) / 60), 0, MAX_WAIT_MINUTES)
+        histogram += np.bincount(chunk["tag"][seen].astype(np.int64) * bins + minutes.astype(np.int64),
+                                 minlength=len(histogram))
+    return histogram.reshape(len(TAGS), bins)
+
+
+def wait_compliance(root: str, start: str = None, end: str = None) -> Dict[str, Dict]:
+    """
+    Share of patients seen within their tag's 15/30/60 minute target (a wait of exactly the target is on
+    time), plus median and p90 wait in whole minutes, rounded up.
+    """
+    histogram = wait_histogram(root, start, end)
+    report = {}
+    for i, tag in enumerate(TAGS):
+        counts = histogram[i]
+        total = int(counts.sum())
+        cumulative = np.cumsum(counts)
+        within = int(cumulative[TARGET_MINUTES[i]]) if total else 0
+        report[tag] = {
+            "seen": total,
+            "target_minutes": int(TARGET_MINUTES[i]),
+            "within_target": within,
+            "compliance": within / total if total else None,
+            "median_wait_minutes": int(np.searchsorted(cumulative, total * 0.5)) if total else None,
+            "p90_wait_minutes": int(np.searchsorted(cumulative, total * 0.9)) if total else None,
+        }
+    return report
+
+
+def monthly_report(root: str, start: str = None, end: str = None, utc_offset: float = None) -> Dict:
+    by_hour = tag_distribution_by_hour(root, start, end, utc_offset)
+    return {
+        "records": int(by_hour.sum()),
+        "tags": {tag: int(n) for tag, n in zip(TAGS, by_hour.sum(axis=0))},
+        "tags_by_hour": {tag: by_hour[:, i].tolist() for i, tag in enumerate(TAGS)},
+        "wait_compliance": wait_compliance(root, start, end),
+        "rule_frequency": rule_frequency(root, start, end),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triage archive analytics")
+    parser.add_argument("root")
+    parser.add_argument("--from", dest="start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="last day, YYYY-MM-DD")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    report = monthly_report(args.root, args.start, args.end)
+    elapsed = time.perf_counter() - began
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['records']} assessments ({elapsed:.2f} s)")
+    print("Tags:", ", ".join(f"{tag} {n}" for tag, n in report["tags"].items()))
+    print("\nHour  " + "  ".join(f"{tag:>7}" for tag in TAGS))
+    for hour in range(24):
+        print(f"{hour:02d}    " + "  ".join(f"{report['tags_by_hour'][tag][hour]:>7}" for tag in TAGS))
+    print("\nWait-time compliance:")
+    for tag, row in report["wait_compliance"].items():
+        if row["seen"]:
+            print(f"  {tag:<6} {row['compliance']:.1%} seen within {row['target_minutes']} min "
+                  f"(median {row['median_wait_minutes']} min, p90 {row['p90_wait_minutes']} min, n={row['seen']})")
+    print("\nRules fired:")
+    for rule, n in sorted(report["rule_frequency"].items(), key=lambda item: -item[1]):
+        if n:
+            print(f"  {rule:<18} {n}")
+
+
+if __name__ == "__main__":
+    main()
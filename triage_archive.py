@@ -0,0 +1,226 @@
+"""
+Columnar archive of completed triage encounters.
+
+Each field is stored as its own raw little-endian column file, one directory
+per day (archive/2026-10-19/tag.col, ...). Readers memory-map the columns they
+need with numpy, one day at a time, so analytics never load the whole archive.
+
+    python triage_archive.py synth archive --records 10000000 --days 365
+"""
+import argparse
+import datetime
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from triage_logic import RULES, TAGS, VITAL_FIELDS, rule_of, symptom_mask, vital_value
+
+COLUMNS = {
+    "assessed_at": "<f8",   # epoch seconds the current tag was assigned
+    "arrived_at": "<f8",    # epoch seconds of first triage
+    "seen_at": "<f8",       # epoch seconds seen by a physician, NaN if the patient left unseen
+    "tag": "u1",            # index into TAGS
+    "rule": "u1",           # index into RULES
+    "ews": "u1",            # early-warning score, 255 if unknown
+    "flags": "u1",          # bit 0: ambulance arrival
+    "symptoms": "<u4",      # symptom_mask()
+    "patient_id": "S16",
+}
+COLUMNS.update({field: "<f4" for field in VITAL_FIELDS})
+DTYPES = {name: np.dtype(dtype) for name, dtype in COLUMNS.items()}
+
+# Assessment target per tag, in minutes (as in assess_triage)
+TARGET_MINUTES = np.array([15, 30, 60])
+_TAG_CODES = {tag: i for i, tag in enumerate(TAGS)}
+_RULE_CODES = {rule: i for i, rule in enumerate(RULES)}
+
+
+def local_utc_offset() -> float:
+    """Seconds east of UTC for this machine (used for day chunks and hour-of-day)."""
+    return datetime.datetime.now().astimezone().utcoffset().total_seconds()
+
+
+def day_of(ts: float, utc_offset: float) -> str:
+    return datetime.datetime.fromtimestamp(ts + utc_offset, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def encounter_row(patient_id: str, patient: Dict, result: Dict, assessed_at: float, arrived_at: float,
+                  seen_at: Optional[float], ews: Optional[int] = None) -> Dict:
+    """One archive row from a triage form and its assess_triage result."""
+    row = {
+        "assessed_at": assessed_at, "arrived_at": arrived_at,
+        "seen_at": float("nan") if seen_at is None else seen_at,
+        "tag": _TAG_CODES[result["tag"]], "rule": _RULE_CODES[rule_of(result)],
+        "ews": 255 if ews is None else min(ews, 254),
+        "flags": 1 if patient.get("ambulance_arrival") else 0,
+        "symptoms": symptom_mask(patient.get("symptoms")),
+        "patient_id": str(patient_id or "").encode("utf-8")[:16],
+    }
+    for field in VITAL_FIELDS:
+        row[field] = vital_value(patient, field)
+    return row
+
+
+class ArchiveWriter:
+    """Buffers rows and appends them to the per-day column files on flush()."""
+
+    def __init__(self, root: str, utc_offset: float = None, flush_every: int = 1024):
+        self.root = root
+        self.utc_offset = local_utc_offset() if utc_offset is None else utc_offset
+        self.flush_every = flush_every
+        self._rows: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def append(self, row: Dict) -> None:
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        rows, self._rows = self._rows, []
+        by_day: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_day.setdefault(day_of(row["assessed_at"], self.utc_offset), []).append(row)
+        for day, day_rows in by_day.items():
+            write_columns(self.root, day, {name: [r[name] for r in day_rows] for name in COLUMNS})
+
+
+class ArchiveFlusher(threading.Thread):
+    """Background thread that flushes an ArchiveWriter every `interval` seconds, so a quiet night's
+    discharges reach the archive (and the reports) without waiting for a full buffer or for exit."""
+
+    def __init__(self, writer: ArchiveWriter, interval: float = 60.0):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.writer.flush()
+                self.last_error = None
+            except OSError as e:
+                # The rows of a failed flush are lost either way; keep flushing the ones that follow
+                self.last_error = str(e)
+
+
+def write_columns(root: str, day: str, columns: Dict) -> None:
+    """Append equally long column arrays to one day chunk."""
+    directory = os.path.join(root, day)
+    os.makedirs(directory, exist_ok=True)
+    for name, dtype in DTYPES.items():
+        with open(os.path.join(directory, f"{name}.col"), "ab") as f:
+            f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+
+
+def days(root: str, start: str = None, end: str = None) -> List[str]:
+    """Day chunks in the archive, optionally limited to start <= day <= end (YYYY-MM-DD)."""
+    if not os.path.isdir(root):
+        return []
+    found = sorted(d for d in os.listdir(root) if os.path.isfile(os.path.join(root, d, "tag.col")))
+    return [d for d in found if (start is None or d >= start) and (end is None or d <= end)]
+
+
+def open_chunk(root: str, day: str, columns=None) -> Dict[str, np.ndarray]:
+    """Memory-map the requested columns of one day (zero-copy, read-only)."""
+    names = list(columns or COLUMNS)
+    directory = os.path.join(root, day)
+    # Columns are appended one after another, so an interrupted flush can leave them uneven
+    rows = min(os.path.getsize(os.path.join(directory, f"{n}.col")) // DTYPES[n].itemsize for n in names)
+    if rows == 0:
+        return {n: np.empty(0, dtype=DTYPES[n]) for n in names}
+    return {n: np.memmap(os.path.join(directory, f"{n}.col"), dtype=DTYPES[n], mode="r", shape=(rows,))
+            for n in names}
+
+
+def chunks(root: str, columns=None, start: str = None, end: str = None) -> Iterator[Dict[str, np.ndarray]]:
+    for day in days(root, start, end):
+        yield open_chunk(root, day, columns)
+
+
+def value_index(root: str, day: str, field: str):
+    """
+    (sorted values, row numbers) of one numeric column of a day, for range lookups with
+    np.searchsorted; NaNs sort last. Kept in <day>/index/ and rebuilt when rows were appended.
+    """
+    directory = os.path.join(root, day, "index")
+    values_path = os.path.join(directory, f"{field}.val")
+    rows_path = os.path.join(directory, f"{field}.row")
+    rows = os.path.getsize(os.path.join(root, day, f"{field}.col")) // DTYPES[field].itemsize
+    if not (os.path.isfile(values_path) and os.path.isfile(rows_path)
+            and os.path.getsize(values_path) == rows * DTYPES[field].itemsize
+            and os.path.getsize(rows_path) == rows * 4):
+        column = open_chunk(root, day, [field])[field]
+        order = np.argsort(column, kind="stable").astype("<u4")
+        os.makedirs(directory, exist_ok=True)
+        # Rows first: a crash between the two leaves a size mismatch, which forces a rebuild
+        for path, array in ((rows_path, order), (values_path, np.asarray(column)[order])):
+            with open(path + ".tmp", "wb") as f:
+                f.write(array.tobytes())
+            os.replace(path + ".tmp", path)
+    if rows == 0:
+        return np.empty(0, DTYPES[field]), np.empty(0, "<u4")
+    return (np.memmap(values_path, dtype=DTYPES[field], mode="r", shape=(rows,)),
+            np.memmap(rows_path, dtype="<u4", mode="r", shape=(rows,)))
+
+
+def _synthetic_rules(rng, tag: np.ndarray) -> np.ndarray:
+    """A random rule consistent with each tag (RULES is ordered RED, YELLOW, GREEN)."""
+    first = np.array([RULES.index("ambulance"), RULES.index("yellow_o2"), RULES.index("green_symptoms")])
+    last = np.array([RULES.index("red_symptom"), RULES.index("yellow_symptoms"), RULES.index("default")])
+    return first[tag] + (rng.random(len(tag)) * (last[tag] - first[tag] + 1)).astype(np.int64)
+
+
+def synthesize(root: str, records: int, n_days: int, seed: int = 0, utc_offset: float = 0.0,
+               start: float = None) -> None:
+    """Fill an archive with plausible random encounters (for benchmarks and demos)."""
+    rng = np.random.default_rng(seed)
+    start = time.time() - n_days * 86400 if start is None else start
+    per_day = np.bincount(rng.integers(0, n_days, records), minlength=n_days)
+    for d, n in enumerate(per_day):
+        day_start = start - (start + utc_offset) % 86400 + d * 86400
+        assessed = day_start + np.sort(rng.uniform(0, 86400, n))
+        tag = rng.choice(3, n, p=[0.1, 0.3, 0.6]).astype(np.uint8)
+        waits = rng.exponential(TARGET_MINUTES[tag] * 60 * 0.7)
+        seen = np.where(rng.random(n) < 0.97, assessed + waits, np.nan)
+        columns = {
+            "assessed_at": assessed, "arrived_at": assessed - rng.exponential(300, n), "seen_at": seen,
+            "tag": tag, "rule": _synthetic_rules(rng, tag), "ews": rng.integers(0, 12, n),
+            "flags": (rng.random(n) < 0.05), "symptoms": rng.integers(0, 1 << 23, n),
+            "patient_id": np.char.add(b"TH", rng.integers(0, 10 ** 8, n).astype("S8")),
+            "o2_saturation": rng.normal(95, 3, n), "gcs_score": rng.choice([15, 14, 12, 8], n, p=[.9, .05, .04, .01]),
+            "temperature": rng.normal(37.2, 0.9, n), "systolic_bp": rng.normal(125, 25, n),
+            "diastolic_bp": rng.normal(80, 12, n), "heart_rate": rng.normal(88, 20, n),
+        }
+        write_columns(root, day_of(day_start, utc_offset), columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar triage archive tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    synth = commands.add_parser("synth", help="generate a synthetic archive")
+    synth.add_argument("root")
+    synth.add_argument("--records", type=int, default=1_000_000)
+    synth.add_argument("--days", type=int, default=30)
+    synth.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    synthesize(args.root, args.records, args.days, args.seed, utc_offset=local_utc_offset())
+    print(f"Wrote {args.records} records over {args.days} days in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from typing import Dict, List, Optional
+
+import requests
+
+from wire_format import JSON, MSGPACK, RECORD, decode_results, dumps, encode_patients, loads
+
+
+class TriageClient:
+    """
+    Python client for /triage and /triage/batch in any of the backend's wire formats.
+    With RECORD (the default) requests and responses are fixed binary records
+    and each result is {"patient_id", "tag", "rule", "ews", "band"}; with JSON or
+    MSGPACK results are the full assess_with_score dicts.
+    """
+
+    def __init__(self, base_url: str = "http://127.0.0.1:5000", media_type: str = RECORD,
+                 session: Optional[requests.Session] = None, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.media_type = media_type
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def _post(self, path: str, patients: List[Dict], batch: bool) -> List[Dict]:
+        if self.media_type == RECORD:
+            body = encode_patients(patients)
+        else:
+            body = dumps({"patients": patients} if batch else patients[0], self.media_type)
+        response = self.session.post(self.base_url + path, data=body, timeout=self.timeout,
+                                     headers={"Content-Type": self.media_type, "Accept": self.media_type})
+        response.raise_for_status()
+        media_type = response.headers.get("Content-Type", JSON).split(";")[0]
+        if media_type == RECORD:
+            return decode_results(response.content)
+        document = loads(response.content, MSGPACK if media_type == MSGPACK else JSON)
+        return document["results"] if batch else [document]
+
+    def triage(self, patient: Dict) -> Dict:
+        return self._post("/triage", [patient], batch=False)[0]
+
+    def triage_batch(self, patients: List[Dict]) -> List[Dict]:
+        return self._post("/triage/batch", patients, batch=True) if patients else []
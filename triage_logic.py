@@ -1,41 +1,187 @@
 from typing import Dict, List
 
+# Define symptom groups and diagnoses (copied from TTS_V1.py)
+RED_SYMPTOMS = {
+    "shortness_of_breath_severe": ["Acute Pulmonary Edema", "Severe Asthma", "Pulmonary Embolism"],
+    "vomiting_blood": ["Upper GI Bleeding", "Gastric Ulcer", "Esophageal Varices"],
+    "hypertension_with_symptoms": ["Hypertensive Emergency", "End Organ Damage", "Malignant Hypertension"],
+    "chest_pain": ["Acute Coronary Syndrome", "Myocardial Infarction", "Aortic Dissection"],
+    "severe_headache": ["Subarachnoid Hemorrhage", "Meningitis", "Cerebral Aneurysm"],
+    "major_trauma": ["Internal Bleeding", "Organ Injury", "Neurological Trauma"],
+    "abdominal_pain_severe": ["Acute Appendicitis", "Perforated Viscus", "Acute Pancreatitis"]
+}
+YELLOW_SYMPTOMS = {
+    "shortness_of_breath_mild": ["COPD Exacerbation", "Bronchitis", "Anxiety-induced Dyspnea"],
+    "hypertension_without_symptoms": ["Essential Hypertension", "White Coat Hypertension"],
+    "vomiting_nausea": ["Gastroenteritis", "Food Poisoning", "Viral Infection"],
+    "headache_moderate": ["Migraine", "Tension Headache", "Sinusitis"],
+    "bloody_diarrhea": ["Inflammatory Bowel Disease", "Infectious Colitis", "Diverticulitis"],
+    "unexplained_tachycardia": ["Anxiety", "Dehydration", "Thyrotoxicosis"]
+}
+GREEN_SYMPTOMS = {
+    "eye_problems": ["Conjunctivitis", "Dry Eyes", "Minor Eye Trauma"],
+    "psychiatric_issues": ["Anxiety", "Depression", "Stress"],
+    "joint_pain": ["Osteoarthritis", "Minor Sprain", "Chronic Joint Pain"],
+    "gynecological": ["Menstrual Issues", "Minor Vaginal Discharge", "Pregnancy Check"],
+    "pediatric_routine": ["Growth Check", "Vaccination", "Minor Pediatric Ailments"],
+    "general_symptoms": ["Minor Infections", "Chronic Disease Follow-up", "Medication Review"],
+    "constipation": ["Functional Constipation", "Diet-related", "Medication Side Effect"],
+    "medication_request": ["Medication Refill", "Prescription Review"],
+    "dressing_change": ["Wound Care", "Post-operative Care"],
+    "mild_diarrhea": ["Viral Gastroenteritis", "Dietary Indiscretion", "IBS"]
+}
+
+# Checkbox display names (copied from TTS_V1.py)
+SYMPTOM_NAMES = {
+    "shortness_of_breath_severe": "Shortness of breath / Moderate respiratory distress",
+    "vomiting_blood": "Vomiting blood",
+    "hypertension_with_symptoms": "Hypertension with symptoms",
+    "chest_pain": "Chest Pain",
+    "severe_headache": "Severe/sudden headache",
+    "major_trauma": "Major Trauma - blunt, no obvious injury",
+    "abdominal_pain_severe": "Abdominal pain (severe - 8-10/10)",
+    "shortness_of_breath_mild": "Shortness of breath / Mild respiratory distress",
+    "hypertension_without_symptoms": "Hypertension without symptoms",
+    "vomiting_nausea": "Vomiting / nausea (mild dehydration)",
+    "headache_moderate": "Headache (moderate pain 4-7/10)",
+    "bloody_diarrhea": "Uncontrolled Diarrhea (bloody)",
+    "unexplained_tachycardia": "Unexplained tachycardia (HR >100)",
+    "eye_problems": "Eye problems (redness/irritation)",
+    "psychiatric_issues": "Mental health concerns",
+    "joint_pain": "Joint/bone pain (chronic)",
+    "gynecological": "Gynecological issues",
+    "pediatric_routine": "Routine pediatric issues",
+    "general_symptoms": "General medical issues",
+    "constipation": "Constipation",
+    "medication_request": "Medication request",
+    "dressing_change": "Dressing change",
+    "mild_diarrhea": "Mild diarrhea (no blood)"
+}
+# Bit position of each symptom in compact records (symptom_mask)
+SYMPTOM_IDS = tuple(SYMPTOM_NAMES)
+_SYMPTOM_BITS = {sid: 1 << i for i, sid in enumerate(SYMPTOM_IDS)}
+
+TAGS = ("RED", "YELLOW", "GREEN")
+VITAL_FIELDS = ("o2_saturation", "gcs_score", "temperature", "systolic_bp", "diastolic_bp", "heart_rate")
+
+# Stable rule ids, in the order assess_triage checks them
+RULES = (
+    "ambulance", "red_o2", "red_gcs", "red_temp_high", "red_temp_low", "red_bp_high", "red_bp_low",
+    "red_hr_low", "red_hr_high", "red_symptom",
+    "yellow_o2", "yellow_gcs", "yellow_temp_low", "yellow_temp_high", "yellow_bp_low", "yellow_bp_high",
+    "yellow_hr_low", "yellow_hr_high", "yellow_symptoms", "green_symptoms", "default"
+)
+BOUNDS = ("()", "[)", "(]", "[]")
+# The vital-sign thresholds of assess_triage as data (batch_triage and rule_diff evaluate these):
+# rule id -> conditions, any of which fires the rule. A condition is (vital, low, high, bounds),
+# None for an open end, bounds in interval notation: "()", "[)", "(]" or "[]".
+VITAL_RULES = {
+    "red_o2": (("o2_saturation", 0, 90, "()"),),
+    "red_gcs": (("gcs_score", None, 10, "()"),),
+    "red_temp_high": (("temperature", 40, None, "()"),),
+    "red_temp_low": (("temperature", 0, 35, "()"),),
+    "red_bp_high": (("systolic_bp", 220, None, "()"), ("diastolic_bp", 120, None, "()")),
+    "red_bp_low": (("systolic_bp", 0, 80, "()"),),
+    "red_hr_low": (("heart_rate", 0, 40, "()"),),
+    "red_hr_high": (("heart_rate", 150, None, "()"),),
+    "yellow_o2": (("o2_saturation", 90, 94, "[)"),),
+    "yellow_gcs": (("gcs_score", 10, 13, "[]"),),
+    "yellow_temp_low": (("temperature", 35, 36, "[)"),),
+    "yellow_temp_high": (("temperature", 38, 40, "[]"),),
+    "yellow_bp_low": (("systolic_bp", 80, 90, "[)"),),
+    "yellow_bp_high": (("systolic_bp", 160, 220, "(]"), ("diastolic_bp", 100, 120, "(]")),
+    "yellow_hr_low": (("heart_rate", 40, 50, "[)"),),
+    "yellow_hr_high": (("heart_rate", 100, 150, "(]"),),
+}
+
+
+def validate_rules(rules: Dict) -> None:
+    """Raise ValueError unless `rules` is a well-formed VITAL_RULES-style table."""
+    for rule, conditions in rules.items():
+        if rule not in VITAL_RULES:
+            raise ValueError(f"{rule!r} is not a vital-sign rule (one of {', '.join(VITAL_RULES)})")
+        for condition in conditions:
+            if len(condition) != 4:
+                raise ValueError(f"{rule}: conditions are [vital, low, high, bounds], got {condition!r}")
+            vital, low, high, bounds = condition
+            if vital not in VITAL_FIELDS:
+                raise ValueError(f"{rule}: unknown vital {vital!r}")
+            if bounds not in BOUNDS:
+                raise ValueError(f"{rule}: bounds must be one of {', '.join(BOUNDS)}, got {bounds!r}")
+            if low is None and high is None:
+                raise ValueError(f"{rule}: {vital} needs a low or a high threshold")
+
+
+def in_interval(x, low, high, bounds: str):
+    """Whether x (a number or numpy array) lies in one VITAL_RULES interval."""
+    inside = True
+    if low is not None:
+        inside = (x >= low) if bounds[0] == "[" else (x > low)
+    if high is not None:
+        inside = inside & ((x <= high) if bounds[1] == "]" else (x < high))
+    return inside
+
+
+# Reason text (up to the first ":") -> rule id
+_REASON_RULES = {
+    "Patient arrived by ambulance": "ambulance",
+    "Critical O₂ saturation": "red_o2",
+    "Critical GCS Score": "red_gcs",
+    "Critical High Temperature": "red_temp_high",
+    "Critical Low Temperature": "red_temp_low",
+    "Critical High Blood Pressure": "red_bp_high",
+    "Critical Low Blood Pressure": "red_bp_low",
+    "Critical Low Heart Rate": "red_hr_low",
+    "Critical High Heart Rate": "red_hr_high",
+    "Presence of RED TAG symptom": "red_symptom",
+    "Concerning O₂ saturation": "yellow_o2",
+    "Concerning GCS Score": "yellow_gcs",
+    "Concerning Low Temperature": "yellow_temp_low",
+    "Concerning High Temperature": "yellow_temp_high",
+    "Concerning Low Blood Pressure": "yellow_bp_low",
+    "Concerning High Blood Pressure": "yellow_bp_high",
+    "Concerning Low Heart Rate": "yellow_hr_low",
+    "Concerning High Heart Rate": "yellow_hr_high",
+    "YELLOW TAG conditions": "yellow_symptoms",
+    "GREEN TAG conditions": "green_symptoms",
+    "No urgent symptoms or abnormal vital signs detected": "default"
+}
+
+
+def rule_of(result: Dict) -> str:
+    """Rule id that produced an assess_triage result."""
+    return _REASON_RULES[result["reason"].split(":", 1)[0]]
+
+
+def symptom_mask(symptoms) -> int:
+    """Symptom ids as a bitmask; unknown ids are ignored."""
+    mask = 0
+    for s in symptoms or ():
+        mask |= _SYMPTOM_BITS.get(s, 0)
+    return mask
+
+
+def symptoms_from_mask(mask: int) -> List[str]:
+    return [sid for i, sid in enumerate(SYMPTOM_IDS) if mask >> i & 1]
+
+
+def vital_value(patient: Dict, field: str) -> float:
+    """Numeric form value, NaN when blank or unparseable. Zero is kept (assess_triage treats it as missing)."""
+    try:
+        return float(patient.get(field))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
 def assess_triage(patient: Dict) -> Dict:
     """
     Assess triage based on patient data.
     patient: dict with keys: o2_saturation, gcs_score, temperature, systolic_bp, diastolic_bp, heart_rate, symptoms (list of symptom ids)
     Returns: dict with keys: tag, time, reason, diagnoses
     """
-    # Define symptom groups and diagnoses (copied from TTS_V1.py)
-    red_symptoms = {
-        "shortness_of_breath_severe": ["Acute Pulmonary Edema", "Severe Asthma", "Pulmonary Embolism"],
-        "vomiting_blood": ["Upper GI Bleeding", "Gastric Ulcer", "Esophageal Varices"],
-        "hypertension_with_symptoms": ["Hypertensive Emergency", "End Organ Damage", "Malignant Hypertension"],
-        "chest_pain": ["Acute Coronary Syndrome", "Myocardial Infarction", "Aortic Dissection"],
-        "severe_headache": ["Subarachnoid Hemorrhage", "Meningitis", "Cerebral Aneurysm"],
-        "major_trauma": ["Internal Bleeding", "Organ Injury", "Neurological Trauma"],
-        "abdominal_pain_severe": ["Acute Appendicitis", "Perforated Viscus", "Acute Pancreatitis"]
-    }
-    yellow_symptoms = {
-        "shortness_of_breath_mild": ["COPD Exacerbation", "Bronchitis", "Anxiety-induced Dyspnea"],
-        "hypertension_without_symptoms": ["Essential Hypertension", "White Coat Hypertension"],
-        "vomiting_nausea": ["Gastroenteritis", "Food Poisoning", "Viral Infection"],
-        "headache_moderate": ["Migraine", "Tension Headache", "Sinusitis"],
-        "bloody_diarrhea": ["Inflammatory Bowel Disease", "Infectious Colitis", "Diverticulitis"],
-        "unexplained_tachycardia": ["Anxiety", "Dehydration", "Thyrotoxicosis"]
-    }
-    green_symptoms = {
-        "eye_problems": ["Conjunctivitis", "Dry Eyes", "Minor Eye Trauma"],
-        "psychiatric_issues": ["Anxiety", "Depression", "Stress"],
-        "joint_pain": ["Osteoarthritis", "Minor Sprain", "Chronic Joint Pain"],
-        "gynecological": ["Menstrual Issues", "Minor Vaginal Discharge", "Pregnancy Check"],
-        "pediatric_routine": ["Growth Check", "Vaccination", "Minor Pediatric Ailments"],
-        "general_symptoms": ["Minor Infections", "Chronic Disease Follow-up", "Medication Review"],
-        "constipation": ["Functional Constipation", "Diet-related", "Medication Side Effect"],
-        "medication_request": ["Medication Refill", "Prescription Review"],
-        "dressing_change": ["Wound Care", "Post-operative Care"],
-        "mild_diarrhea": ["Viral Gastroenteritis", "Dietary Indiscretion", "IBS"]
-    }
+    red_symptoms = RED_SYMPTOMS
+    yellow_symptoms = YELLOW_SYMPTOMS
+    green_symptoms = GREEN_SYMPTOMS
     # Ambulance arrival
     if patient.get("ambulance_arrival"):
         return {
@@ -73,7 +219,7 @@ def assess_triage(patient: Dict) -> Dict:
     # RED symptoms
     for s in patient.get("symptoms", []):
         if s in red_symptoms:
-            return {"tag": "RED", "time": "15 minutes", "reason": f"Presence of RED TAG symptom: {s}", "diagnoses": red_symptoms[s]}
+            return {"tag": "RED", "time": "15 minutes", "reason": f"Presence of RED TAG symptom: {s}", "diagnoses": list(red_symptoms[s])}
     # YELLOW vital signs
     try:
         o2 = float(patient.get("o2_saturation", 0))
@@ -121,4 +267,43 @@ def assess_triage(patient: Dict) -> Dict:
             diagnoses.extend(green_symptoms[s])
         return {"tag": "GREEN", "time": "60 minutes", "reason": f"GREEN TAG conditions: {', '.join(green_found)}", "diagnoses": diagnoses}
     # Default
-    return {"tag": "GREEN", "time": "60 minutes", "reason": "No urgent symptoms or abnormal vital signs detected", "diagnoses": ["Routine Check-up", "Minor Ailment"]} 
\ No newline at end of file
+    return {"tag": "GREEN", "time": "60 minutes", "reason": "No urgent symptoms or abnormal vital signs detected", "diagnoses": ["Routine Check-up", "Minor Ailment"]} 
+
+def determine_opd(patient: Dict) -> str:
+    """
+    Recommended OPD for a GREEN patient (same rules as the TTS_V1.py form).
+    patient: dict with keys: age, gender, symptoms (list of symptom ids)
+    """
+    try:
+        age = int(patient.get("age") or 0)
+    except (TypeError, ValueError):
+        return "Internal Medicine"  # Default if age is not properly set
+    gender = patient.get("gender")
+    symptoms = set(patient.get("symptoms") or ())
+
+    # Check pediatric cases first
+    if age < 18 and age > 0:
+        return "Pediatrics"
+
+    # Check symptoms against each department
+    for symptom_id in GREEN_SYMPTOMS:
+        if symptom_id not in symptoms:
+            continue
+        symptom_name = SYMPTOM_NAMES[symptom_id].lower()
+        if gender == "Female" and (
+            symptom_id == "gynecological" or
+            "gynecological" in symptom_name or
+            "pregnancy" in symptom_name or
+            "menstrual" in symptom_name or
+            "vaginal" in symptom_name
+        ):
+            return "OB/GYN"
+        if symptom_id == "eye_problems" or "eye" in symptom_name or "vision" in symptom_name:
+            return "Ophthalmology"
+        if symptom_id == "joint_pain" or any(word in symptom_name for word in ["joint", "bone", "fracture", "sprain"]):
+            return "Orthopedics"
+        if symptom_id == "psychiatric_issues" or any(word in symptom_name for word in ["mental", "psychiatric", "anxiety", "depression"]):
+            return "Psychiatry"
+
+    # Default to internal medicine
+    return "Internal Medicine"
@@ -0,0 +1,355 @@
+"""
+Request-body decoding and validation for the triage form.
+
+JSON bodies are decoded with orjson when it is installed and the standard
+library otherwise. A triage form is then checked against PATIENT_SCHEMA by
+one function generated from the schema (no per-field loop or lookups at run
+time) that converts and range-checks every field in a single pass and returns
+the normalized form:
+
+    numbers     "92", 92 -> 92.0; gcs_score, age -> int; 0 kept ("not measured")
+    blanks      "", "  ", null -> field removed, so a skipped box no longer
+                stops the later vital checks in assess_triage
+    booleans    ambulance_arrival must be true/false ("false" is not true)
+
+Every problem is reported with the exact field, for a 400 response:
+
+    {"error": "Invalid patient data",
+     "errors": [{"field": "patients[3].o2_saturation", "message": "must be a number", "value": "9O"}]}
+
+Fields not in the schema pass through unchanged. validate_batch() checks a
+batch in the same single pass per patient and stops at the first invalid one,
+before the endpoint does any work (batch endpoints record, index or vectorize
+whole lists, so none of them could act on a partly read batch). Binary
+records (wire_format) get the same checks: decoded ones go through
+validate_batch, and validate_records() checks record batches that are never
+decoded, so a form is accepted or refused the same way in every format.
+ValidationStats keeps the per-request parse and validation cost
+(GET /validation/metrics in backend.py).
+
+    python validation.py bench --repeat 20000
+"""
+import argparse
+import ast
+import csv
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library decoder is used instead
+    orjson = None
+
+from wire_format import GENDERS, VITALS, decode_patients
+
+JSON_LIBRARY = "orjson" if orjson else "json"
+
+# field -> (kind, low, high); inclusive ranges, 0 also allowed where the form uses it for "not measured".
+# Vital ranges are what a living patient can physically present with, not what is plausible: an extreme
+# value is the patient triage exists for (RED), and only typing slips far outside them are turned away
+PATIENT_SCHEMA = {
+    "patient_id": ("id", None, 64),
+    "ambulance_arrival": ("bool", None, None),
+    "o2_saturation": ("number", 1, 100),
+    "gcs_score": ("int", 3, 15),
+    "temperature": ("number", 10, 47),
+    "systolic_bp": ("number", 1, 400),
+    "diastolic_bp": ("number", 1, 300),
+    "heart_rate": ("number", 1, 400),
+    "blood_glucose": ("number", 0.1, 200),
+    "pain_score": ("number", 0, 10),
+    "age": ("int", 0, 130),
+    "gender": ("choice", GENDERS, None),
+    "symptoms": ("strings", None, None),
+    "medications": ("strings", None, None),
+}
+# Vitals where the form sends 0 for "not entered" (GCS has no such value: 0 is rejected)
+ZERO_IS_BLANK = ("o2_saturation", "temperature", "systolic_bp", "diastolic_bp", "heart_rate", "blood_glucose", "age")
+
+
+class ValidationError(ValueError):
+    def __init__(self, errors: List[Dict]):
+        super().__init__("; ".join(f"{e['field'] or 'body'}: {e['message']}" for e in errors))
+        self.errors = errors
+
+    def as_dict(self) -> Dict:
+        return {"error": "Invalid patient data", "errors": self.errors}
+
+
+def loads(body: bytes):
+    """Decoded JSON body; ValidationError for malformed JSON."""
+    try:
+        return orjson.loads(body) if orjson else json.loads(body)
+    except ValueError as e:
+        raise ValidationError([{"field": "", "message": f"malformed JSON: {e}"}]) from None
+
+
+def _shown(value):
+    return value[:64] if isinstance(value, str) else value
+
+
+def _field_code(field: str, kind: str, low, high) -> List[str]:
+    """Straight-line checks for one field; `value` is its raw value, `out` the normalized form."""
+    name = repr(field)
+
+    def error(message):
+        return f"errors.append({{'field': path + {name}, 'message': {message!r}, 'value': _shown(value)}})"
+    lines = [f"    value = patient.get({name})"]
+    if kind in ("number", "int"):
+        zero = field in ZERO_IS_BLANK
+        word = "a whole number" if kind == "int" else "a number"
+        lines += [
+            "    if value is None or (type(value) is str and not value.strip()):",
+            f"        out.pop({name}, None)",
+            "    else:",
+            "        t = type(value)",
+            "        if t is str:",
+            "            try:",
+            "                number = float(value)",
+            "            except ValueError:",
+            "                number = None",
+            "        elif t is int or t is float:",
+            "            number = float(value)",
+            "        else:",
+            "            number = None",
+            "        if number is None:",
+            "            " + error(f"must be {word}"),
+            f"        elif {'number == 0.0 or ' if zero else ''}{low!r} <= number <= {high!r}"
+            + (" and number.is_integer()" if kind == "int" else "") + ":",
+            f"            out[{name}] = {'int(number)' if kind == 'int' else 'number'}",
+            "        else:",
+            "            " + error(f"must be {word} from {low} to {high}"
+                                  + (" (0 = not measured)" if zero else "")),
+        ]
+    elif kind == "bool":
+        lines += [
+            "    if value is None:",
+            f"        out.pop({name}, None)",
+            "    elif value is True or value is False or (type(value) is int and (value == 0 or value == 1)):",
+            f"        out[{name}] = bool(value)",
+            "    else:",
+            "        " + error("must be true or false"),
+        ]
+    elif kind == "choice":
+        lines += [
+            "    if value is None:",
+            f"        out.pop({name}, None)",
+            f"    elif type(value) is not str or value not in {set(low)!r}:",
+            "        " + error("must be one of " + ", ".join(repr(c) for c in low)),
+        ]
+    elif kind == "strings":
+        lines += [
+            "    if value is None:",
+            f"        out.pop({name}, None)",
+            "    elif type(value) is not list:",
+            "        " + error("must be a list of strings"),
+            "    else:",
+            "        for i, item in enumerate(value):",
+            "            if type(item) is not str:",
+            f"                errors.append({{'field': f'{{path}}{field}[{{i}}]', 'message': 'must be a string', "
+            "'value': _shown(item)})",
+        ]
+    elif kind == "id":
+        lines += [
+            "    if value is None:",
+            f"        out.pop({name}, None)",
+            f"    elif not ((type(value) is str and len(value) <= {high}) or type(value) is int):",
+            "        " + error(f"must be a string of at most {high} characters"),
+        ]
+    else:
+        raise ValueError(f"{field}: unknown kind {kind!r}")
+    return lines
+
+
+def compile_schema(schema: Dict):
+    """validate(patient, path) -> (normalized copy, [errors]) for this schema."""
+    lines = ["def validate(patient, path=''):",
+             "    if type(patient) is not dict:",
+             "        return None, [{'field': path.rstrip('.'), 'message': 'must be a JSON object', "
+             "'value': _shown(patient) if type(patient) is not list else '[...]'}]",
+             "    out = dict(patient)",
+             "    errors = []"]
+    for field, (kind, low, high) in schema.items():
+        lines += _field_code(field, kind, low, high)
+    lines.append("    return out, errors")
+    namespace = {"_shown": _shown}
+    exec(compile("\n".join(lines), "<patient schema>", "exec"), namespace)
+    return namespace["validate"]
+
+
+_validate = compile_schema(PATIENT_SCHEMA)
+
+
+def validate_patient(patient, path: str = "") -> Dict:
+    """The normalized form, or ValidationError listing every bad field."""
+    out, errors = _validate(patient, path)
+    if errors:
+        raise ValidationError(errors)
+    return out
+
+
+def batch_of(payload, path: str = "patients") -> List:
+    """The patient list of a batch body: a bare list or {"patients": [...]}."""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        patients = payload.get("patients", [])
+        if isinstance(patients, list):
+            return patients
+    raise ValidationError([{"field": path, "message": "must be a list of patients"}])
+
+
+def validate_batch(payload, path: str = "patients") -> List[Dict]:
+    """Normalized forms of a batch body; ValidationError naming the first invalid patient's fields."""
+    validate = _validate
+    validated = []
+    for i, patient in enumerate(batch_of(payload, path)):
+        out, errors = validate(patient, f"{path}[{i}].")
+        if errors:
+            raise ValidationError(errors)
+        validated.append(out)
+    return validated
+
+
+def validate_records(records: np.ndarray, path: str = "patients") -> None:
+    """
+    The schema's checks over wire_format records in one vectorized pass (the worker pool's batches are never
+    decoded). The first bad record is decoded and validated as a form, so it is reported exactly as the same
+    patient sent as JSON would be.
+    """
+    # Rounded as decode_patients does, so both paths see the same numbers
+    vitals = np.round(records["vitals"].astype(np.float64), 3)
+    bad = np.zeros(len(records), dtype=bool)
+    for i, field in enumerate(VITALS):
+        kind, low, high = PATIENT_SCHEMA[field]
+        values = vitals[:, i]
+        blank = np.isnan(values)
+        if field in ZERO_IS_BLANK:
+            blank |= values == 0
+        ok = (values >= low) & (values <= high)
+        if kind == "int":
+            ok &= values == np.floor(values)
+        bad |= ~(blank | ok)
+    if bad.any():
+        i = int(np.flatnonzero(bad)[0])
+        validate_patient(decode_patients(records[i:i + 1].tobytes())[0], f"{path}[{i}].")
+
+
+JOURNAL_KINDS = ("triage", "discharge")
+
+
+def journal_entries(payload, path: str = "entries") -> List[Dict]:
+    """
+    The entries of a /sync batch, each checked for the shape local_journal.encode_batch gives it. Payloads are
+    left to the per-kind checks, which reject a single entry rather than the batch.
+    """
+    if not isinstance(payload, list):
+        raise ValidationError([{"field": path, "message": "must be a list of journal entries"}])
+    errors = []
+    for i, entry in enumerate(payload):
+        where = f"{path}[{i}]"
+        if not isinstance(entry, dict):
+            errors.append({"field": where, "message": "must be an object", "value": _shown(entry)})
+            continue
+        entry_id, kind, recorded_at = entry.get("entry_id"), entry.get("kind"), entry.get("recorded_at")
+        if not isinstance(entry_id, str) or not entry_id:
+            errors.append({"field": f"{where}.entry_id", "message": "must be a non-empty string",
+                           "value": _shown(entry_id)})
+        if kind not in JOURNAL_KINDS:
+            errors.append({"field": f"{where}.kind", "message": f"must be one of {', '.join(JOURNAL_KINDS)}",
+                           "value": _shown(kind)})
+        if not isinstance(entry.get("payload"), dict):
+            errors.append({"field": f"{where}.payload", "message": "must be an object"})
+        elif kind == "discharge" and not isinstance(entry["payload"].get("patient_id"), str):
+            errors.append({"field": f"{where}.payload.patient_id", "message": "must be a string",
+                           "value": _shown(entry["payload"].get("patient_id"))})
+        if recorded_at is not None and (type(recorded_at) not in (int, float) or recorded_at != recorded_at):
+            errors.append({"field": f"{where}.recorded_at", "message": "must be a number",
+                           "value": _shown(recorded_at)})
+    if errors:
+        raise ValidationError(errors)
+    return payload
+
+
+class ValidationStats:
+    """Per-request decode and validation time (ns), and how many requests were rejected."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = self.rejected = self.parse_ns = self.validate_ns = self.max_ns = self.patients = 0
+
+    def record(self, parse_ns: int, validate_ns: int, patients: int = 1, rejected: bool = False) -> None:
+        with self._lock:
+            self.requests += 1
+            self.rejected += rejected
+            self.patients += patients
+            self.parse_ns += parse_ns
+            self.validate_ns += validate_ns
+            self.max_ns = max(self.max_ns, parse_ns + validate_ns)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            n = self.requests or 1
+            return {
+                "json_library": JSON_LIBRARY,
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "patients": self.patients,
+                "mean_parse_us": round(self.parse_ns / n / 1e3, 2),
+                "mean_validate_us": round(self.validate_ns / n / 1e3, 2),
+                "max_total_us": round(self.max_ns / 1e3, 2),
+                "validate_us_per_patient": round(self.validate_ns / (self.patients or 1) / 1e3, 3),
+            }
+
+
+def _per_call_us(fn, arg, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def bench(repeat: int) -> None:
+    from triage_logic import assess_triage
+    corpus = os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_test_report.csv")
+    with open(corpus, newline="", encoding="utf-8") as f:
+        forms = [ast.literal_eval(row["Input"]) for row in csv.DictReader(f)]
+    # As the desk sends them: every vital as a string, blanks for the boxes left empty
+    form = {"patient_id": "P-104233", "ambulance_arrival": False, "o2_saturation": "93", "gcs_score": "15",
+            "temperature": "38.2", "systolic_bp": "", "diastolic_bp": "", "heart_rate": "104",
+            "blood_glucose": "", "pain_score": "4", "symptoms": ["fever_cough", "joint_pain"]}
+    body = json.dumps(form).encode("utf-8")
+    batch = json.dumps({"patients": [dict(form, patient_id=f"P{i}") for i in range(1000)]}).encode("utf-8")
+    print(f"one triage form ({len(body)} bytes), {JSON_LIBRARY} decoder:")
+    rows = [("json.loads", _per_call_us(json.loads, body, repeat))]
+    if orjson:
+        rows.append(("orjson.loads", _per_call_us(orjson.loads, body, repeat)))
+    rows.append(("validate_patient", _per_call_us(validate_patient, form, repeat)))
+    rows.append(("assess_triage (for scale)", _per_call_us(assess_triage, form, repeat)))
+    for name, us in rows:
+        print(f"  {name:<28} {us:8.2f} us")
+    decoded = loads(batch)
+    per_batch = _per_call_us(lambda b: validate_batch(loads(b)), batch, max(1, repeat // 1000))
+    print(f"1000-patient batch ({len(batch)} bytes): decode + validation {per_batch / 1e3:.2f} ms,"
+          f" {per_batch / len(decoded['patients']):.2f} us per patient")
+    rejected = sum(1 for f in forms if _validate(f, "")[1])
+    print(f"test corpus: {len(forms)} forms, {rejected} rejected")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Triage request validation")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="time JSON decode and validation of a typical form")
+    bench_parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        bench(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+VITALS = ("o2_saturation", "gcs_score", "temperature", "systolic_bp", "diastolic_bp", "heart_rate")
+
+# Per vital: direction of deterioration (-1 falling, +1 rising, 0 away from NORMAL_RANGE
+# either way), change since the first reading that is worth flagging, and change per hour.
+WORSENING = {
+    "o2_saturation": (-1, 3.0, 2.0),
+    "gcs_score": (-1, 2.0, 2.0),
+    "temperature": (0, 0.5, 1.0),
+    "systolic_bp": (-1, 20.0, 20.0),
+    "diastolic_bp": (0, 10.0, 20.0),
+    "heart_rate": (1, 20.0, 20.0),
+}
+# Direction-0 vitals are measured as distance outside this range, so a fever coming
+# down is an improvement (temperature: the EWS zero-score band, see early_warning.py)
+NORMAL_RANGE = {
+    "temperature": (36.0, 38.0),
+    "diastolic_bp": (60.0, 90.0),
+}
+
+# One reading of one patient's vital, for snapshots (see VitalsHistory.export)
+READING_DTYPE = np.dtype([("patient", "<u4"), ("vital", "u1"), ("first", "<f8"), ("t", "<f8"), ("value", "<f8")])
+
+# Slopes from two readings or over very short spans are mostly measurement noise
+MIN_SLOPE_READINGS = 3
+MIN_SLOPE_SPAN_SECONDS = 5 * 60
+FLAT_SLOPE_PER_HOUR = 0.5
+
+
+class RollingSeries:
+    """
+    Fixed-size ring buffer of (time, value) readings with running statistics.
+    Least-squares slope, window min/max (monotonic deques) and delta since the
+    very first reading are all maintained in O(1) (amortized) per push, so memory
+    stays at `capacity` readings however long the patient waits.
+    """
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self._times = [0.0] * capacity
+        self._values = [0.0] * capacity
+        self._head = 0
+        self.count = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self._t0 = None
+        # Sums over the window, with time measured from the first reading to keep them small
+        self._st = self._sv = self._stt = self._stv = 0.0
+        self._min = deque()
+        self._max = deque()
+        self._seq = 0
+
+    def push(self, t: float, value: float) -> None:
+        if self._t0 is None:
+            self._t0 = t
+            self.first = value
+        x = t - self._t0
+        if self.count == self.capacity:
+            old_x, old_v = self._times[self._head], self._values[self._head]
+            self._st -= old_x
+            self._sv -= old_v
+            self._stt -= old_x * old_x
+            self._stv -= old_x * old_v
+            evicted = self._seq - self.capacity
+            if self._min and self._min[0][0] == evicted:
+                self._min.popleft()
+            if self._max and self._max[0][0] == evicted:
+                self._max.popleft()
+        else:
+            self.count += 1
+        self._times[self._head] = x
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self._st += x
+        self._sv += value
+        self._stt += x * x
+        self._stv += x * value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((self._seq, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((self._seq, value))
+        self._seq += 1
+        self.last = value
+
+    @property
+    def minimum(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+    @property
+    def maximum(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+    @property
+    def delta(self) -> float:
+        return 0.0 if self.first is None else self.last - self.first
+
+    @property
+    def span(self) -> float:
+        """Seconds between the oldest and newest reading in the window."""
+        if self.count < 2:
+            return 0.0
+        oldest = self._head if self.count == self.capacity else 0
+        return self._times[(self._head - 1) % self.capacity] - self._times[oldest]
+
+    @property
+    def slope_per_hour(self) -> float:
+        n = self.count
+        denominator = n * self._stt - self._st * self._st
+        if n < 2 or denominator <= 0:
+            return 0.0
+        return (n * self._stv - self._st * self._sv) / denominator * 3600.0
+
+    def readings(self) -> List[tuple]:
+        """Window contents, oldest first, as (epoch seconds, value)."""
+        start = self._head if self.count == self.capacity else 0
+        return [(self._times[(start + i) % self.capacity] + self._t0, self._values[(start + i) % self.capacity])
+                for i in range(self.count)]
+
+    @classmethod
+    def from_readings(cls, readings: List[tuple], first: float, capacity: int = 32) -> "RollingSeries":
+        """Rebuild a series from its readings() and `first` (which may have left the window)."""
+        series = cls(capacity)
+        for t, value in readings:
+            series.push(t, value)
+        series.first = first
+        return series
+
+
+def _worsening(vital: str, series: RollingSeries) -> Optional[str]:
+    direction, delta_limit, slope_limit = WORSENING[vital]
+    delta = series.delta
+    trusted = series.count >= MIN_SLOPE_READINGS and series.span >= MIN_SLOPE_SPAN_SECONDS
+    slope = series.slope_per_hour if trusted else 0.0
+    if direction == 0:
+        low, high = NORMAL_RANGE[vital]
+        outside = max(low - series.last, series.last - high, 0.0)
+        delta = outside - max(low - series.first, series.first - high, 0.0)
+        # Only a trend carrying an abnormal reading further out counts
+        slope = (slope if series.last > high else -slope) if outside else 0.0
+    else:
+        delta, slope = delta * direction, slope * direction
+    if delta >= delta_limit:
+        return f"{vital} changed by {series.delta:+g} since first reading"
+    if slope >= slope_limit:
+        return f"{vital} trending {series.slope_per_hour:+.1f}/hour"
+    return None
+
+
+def trend_arrow(series: RollingSeries) -> str:
+    slope = series.slope_per_hour
+    if series.count < 2 or abs(slope) < FLAT_SLOPE_PER_HOUR:
+        return "→"
+    return "↑" if slope > 0 else "↓"
+
+
+class PatientVitals:
+    """Vitals history of one patient: one RollingSeries per vital."""
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self.series: Dict[str, RollingSeries] = {}
+
+    def add(self, reading: Dict, t: float = None) -> List[str]:
+        """
+        Record the vitals present in a triage form and return deterioration alerts.
+        Blank, zero and unparseable values are skipped, as in assess_triage.
+        """
+        t = time.time() if t is None else t
+        alerts = []
+        for vital in VITALS:
+            try:
+                value = float(reading.get(vital) or 0)
+            except (TypeError, ValueError):
+                continue
+            if value <= 0:
+                continue
+            series = self.series.get(vital)
+            if series is None:
+                series = self.series[vital] = RollingSeries(self.capacity)
+            series.push(t, value)
+            alert = _worsening(vital, series)
+            if alert:
+                alerts.append(alert)
+        return alerts
+
+    def summary(self) -> Dict:
+        return {
+            vital: {
+                "last": s.last, "first": s.first, "delta": s.delta,
+                "slope_per_hour": round(s.slope_per_hour, 3),
+                "min": s.minimum, "max": s.maximum, "count": s.count,
+                "trend": trend_arrow(s), "worsening": _worsening(vital, s) is not None,
+            }
+            for vital, s in self.series.items()
+        }
+
+
+class VitalsHistory:
+    """Per-patient vitals histories for everyone currently waiting."""
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self._patients: Dict[str, PatientVitals] = {}
+        # Restored from a snapshot and not used since: patient id -> [(vital code, first, t, value)]
+        self._restored: Dict[str, List[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._patients) + len(self._restored)
+
+    def add(self, patient_id: str, reading: Dict, t: float = None) -> List[str]:
+        with self._lock:
+            history = self._history(patient_id)
+            if history is None:
+                history = self._patients[patient_id] = PatientVitals(self.capacity)
+            return history.add(reading, t)
+
+    def get(self, patient_id: str) -> Optional[PatientVitals]:
+        with self._lock:
+            return self._history(patient_id)
+
+    def summary(self, patient_id: str) -> Optional[Dict]:
+        with self._lock:
+            history = self._history(patient_id)
+            return None if history is None else history.summary()
+
+    def export(self) -> Tuple[List[str], bytes]:
+        """Everyone's readings as (patient ids, READING_DTYPE records indexing into them)."""
+        with self._lock:
+            ids, rows = [], []
+            for patient_id, history in self._patients.items():
+                number = len(ids)
+                ids.append(patient_id)
+                for vital, series in history.series.items():
+                    code = VITALS.index(vital)
+                    rows.extend((number, code, series.first, t, value) for t, value in series.readings())
+            for patient_id, readings in self._restored.items():
+                number = len(ids)
+                ids.append(patient_id)
+                rows.extend((number,) + reading for reading in readings)
+            return ids, np.array(rows, dtype=READING_DTYPE).tobytes()
+
+    def restore(self, ids: List[str], body: bytes) -> None:
+        """
+        Load an export(). Histories are rebuilt per patient on first use, so a
+        restart with thousands waiting does not rebuild thousands of series up front.
+        """
+        with self._lock:
+            for row in np.frombuffer(body, dtype=READING_DTYPE).tolist():
+                self._restored.setdefault(ids[row[0]], []).append(row[1:])
+
+    def _history(self, patient_id: str) -> Optional[PatientVitals]:
+        history = self._patients.get(patient_id)
+        if history is None and patient_id in self._restored:
+            history = self._patients[patient_id] = PatientVitals(self.capacity)
+            readings, first = {}, {}
+            for code, first_value, t, value in self._restored.pop(patient_id):
+                first[VITALS[code]] = first_value
+                readings.setdefault(VITALS[code], []).append((t, value))
+            history.series = {vital: RollingSeries.from_readings(series, first[vital], self.capacity)
+                              for vital, series in readings.items()}
+        return history
+
+    def discard(self, patient_id: str) -> None:
+        with self._lock:
+            self._patients.pop(patient_id, None)
+            self._restored.pop(patient_id, None)
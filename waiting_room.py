@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from triage_logic import determine_opd, rule_of
+
+# Physician assessment target per tag, in seconds (the "time" of assess_triage)
+TARGET_SECONDS = {"RED": 15 * 60, "YELLOW": 30 * 60, "GREEN": 60 * 60}
+
+# Listener signature: (event, entry, previous entry or None)
+Listener = Callable[[str, Optional[Dict], Optional[Dict]], None]
+
+
+class WaitingRoom:
+    """
+    Patients triaged and not yet discharged.
+    Every change is published to subscribed listeners as ("triage" | "retriage" |
+    "discharge", entry, previous) while the room's lock is held, so listeners see
+    events in order and can keep their own aggregates incrementally.
+    """
+
+    def __init__(self):
+        self.patients: Dict[str, Dict] = {}
+        self._listeners: List[Listener] = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.patients)
+
+    def subscribe(self, listener: Listener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _publish(self, event: str, entry: Optional[Dict], previous: Optional[Dict]) -> None:
+        for listener in self._listeners:
+            listener(event, entry, previous)
+
+    def triage(self, patient_id: str, patient: Dict, result: Dict, now: float = None) -> Dict:
+        """Add or re-triage a patient. The wait clock restarts only when the tag changes."""
+        now = time.time() if now is None else now
+        with self._lock:
+            previous = self.patients.get(patient_id)
+            tag = result["tag"]
+            if previous is not None and previous["tag"] == tag:
+                tagged_at = previous["tagged_at"]
+            else:
+                tagged_at = now
+            entry = {
+                "patient_id": patient_id,
+                "name": patient.get("name", previous["name"] if previous else ""),
+                "tag": tag,
+                "rule": rule_of(result),
+                "reason": result["reason"],
+                "diagnoses": list(result["diagnoses"]),
+                "symptoms": list(patient.get("symptoms") or ()),
+                "ews": result.get("ews", {}).get("score"),
+                "opd": determine_opd(patient) if tag == "GREEN" else None,
+                "arrived_at": previous["arrived_at"] if previous else now,
+                "tagged_at": tagged_at,
+                "deadline": tagged_at + TARGET_SECONDS[tag],
+                "updated_at": now,
+            }
+            self.patients[patient_id] = entry
+            self._publish("retriage" if previous else "triage", entry, previous)
+            return entry
+
+    def discharge(self, patient_id: str) -> Optional[Dict]:
+        with self._lock:
+            previous = self.patients.pop(patient_id, None)
+            if previous is not None:
+                self._publish("discharge", None, previous)
+            return previous
+
+    def restore(self, entries: List[Dict]) -> None:
+        """Reload entries saved from entries() after a restart; listeners see them as triage events."""
+        with self._lock:
+            for entry in sorted(entries, key=lambda e: e["tagged_at"]):
+                previous = self.patients.get(entry["patient_id"])
+                self.patients[entry["patient_id"]] = entry
+                self._publish("retriage" if previous else "triage", entry, previous)
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            return list(self.patients.values())
+
+    def consistent(self, fn: Callable):
+        """Call fn() with no event in flight, e.g. to read listener state that matches entries()."""
+        with self._lock:
+            return fn()
@@ -0,0 +1,181 @@
+"""
+Compact encodings for high-volume /triage traffic.
+
+application/x-triage-record
+    Patients are fixed 60-byte little-endian records, concatenated:
+        patient_id   16s   upper-cased, NUL padded
+        symptoms     I     bitmask over triage_logic.SYMPTOM_IDS (decoded in that order)
+        vitals       9f    VITALS below, NaN = not measured
+        flags        B     bit 0 ambulance arrival, bits 1-2 gender (GENDERS)
+        (3 pad bytes)
+    Results are 20-byte records: patient_id 16s, tag B (TAGS), rule B (RULES),
+    ews B (255 = not scored), band B (EWS_BANDS). Reason and diagnosis text are
+    not sent; both follow from the rule and the symptoms.
+
+application/msgpack
+    The same dicts as the JSON API, MessagePack-encoded. Only offered when the
+    optional msgpack package is installed.
+"""
+import json
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from triage_logic import RULES, TAGS, rule_of, symptom_mask, symptoms_from_mask
+
+try:
+    import msgpack
+except ImportError:  # optional: the struct format needs nothing beyond the stdlib
+    msgpack = None
+
+JSON = "application/json"
+RECORD = "application/x-triage-record"
+MSGPACK = "application/msgpack"
+
+VITALS = ("o2_saturation", "gcs_score", "temperature", "systolic_bp", "diastolic_bp", "heart_rate",
+          "blood_glucose", "pain_score", "age")
+GENDERS = ("", "Male", "Female", "Other")
+EWS_BANDS = ("low", "low-medium", "medium", "high")
+
+PATIENT = struct.Struct("<16sI9fB3x")
+RESULT = struct.Struct("<16sBBBB")
+# The same layouts for whole batches at once
+PATIENT_DTYPE = np.dtype([("patient_id", "S16"), ("symptoms", "<u4"), ("vitals", "<f4", (len(VITALS),)),
+                          ("flags", "u1"), ("pad", "V3")])
+RESULT_DTYPE = np.dtype([("patient_id", "S16"), ("tag", "u1"), ("rule", "u1"), ("ews", "u1"), ("band", "u1")])
+assert PATIENT_DTYPE.itemsize == PATIENT.size and RESULT_DTYPE.itemsize == RESULT.size
+
+_GENDER_CODES = {g: i for i, g in enumerate(GENDERS)}
+_TAG_CODES = {t: i for i, t in enumerate(TAGS)}
+_RULE_CODES = {r: i for i, r in enumerate(RULES)}
+_BAND_CODES = {b: i for i, b in enumerate(EWS_BANDS)}
+_NAN = float("nan")
+_PAD = b"\0\0\0"
+
+
+class WireFormatError(ValueError):
+    """Body cannot be decoded in the declared content type."""
+
+
+def available_types() -> List[str]:
+    return [JSON, RECORD] + ([MSGPACK] if msgpack else [])
+
+
+def negotiate(accept: Optional[str], default: str = JSON) -> str:
+    """Best supported media type for an Accept header (q-values honoured, */* gives the default)."""
+    if not accept:
+        return default
+    offers = []
+    for position, part in enumerate(accept.split(",")):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        offers.append((-q, position, media.lower()))
+    for negative_q, _, media in sorted(offers):
+        if negative_q == 0:
+            break
+        if media in ("*/*", "application/*"):
+            return default
+        if media in available_types():
+            return media
+    return default
+
+
+def _number(raw) -> float:
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def encode_patients(patients: List[Dict]) -> bytes:
+    """Patient dicts (the JSON /triage body) as concatenated fixed records."""
+    rows = []
+    for patient in patients:
+        patient_id = str(patient.get("patient_id") or "").strip().upper().encode("utf-8")
+        if len(patient_id) > 16:
+            raise WireFormatError(f"patient_id longer than 16 bytes: {patient_id!r}")
+        flags = (1 if patient.get("ambulance_arrival") else 0) | _GENDER_CODES.get(patient.get("gender") or "", 3) << 1
+        rows.append((patient_id, symptom_mask(patient.get("symptoms")),
+                     [_number(patient.get(field)) for field in VITALS], flags, _PAD))
+    return np.array(rows, dtype=PATIENT_DTYPE).tobytes()
+
+
+def as_records(body: bytes) -> np.ndarray:
+    """Patient records as a read-only structured array over `body` (no copy)."""
+    if len(body) % PATIENT.size:
+        raise WireFormatError(f"body is not a whole number of {PATIENT.size}-byte records")
+    return np.frombuffer(body, dtype=PATIENT_DTYPE)
+
+
+def decode_patients(body: bytes) -> List[Dict]:
+    """
+    Inverse of encode_patients. Vitals come back as the text a form would hold
+    ("92", "37.8"), the same as the JSON API, and unmeasured ones are left out.
+    """
+    records = as_records(body)
+    # float32 -> the decimal the form held (3 places is well inside float32 precision here)
+    vitals = np.round(records["vitals"].astype(np.float64), 3).tolist()
+    patients = []
+    symptoms = {}
+    for patient_id, mask, values, flags in zip(records["patient_id"].tolist(), records["symptoms"].tolist(),
+                                               vitals, records["flags"].tolist()):
+        if mask not in symptoms:
+            symptoms[mask] = symptoms_from_mask(mask)
+        patient = {"patient_id": patient_id.decode("utf-8"), "symptoms": list(symptoms[mask])}
+        for field, value in zip(VITALS, values):
+            if value == value:  # not NaN
+                patient[field] = str(int(value)) if value.is_integer() else repr(value)
+        if flags & 1:
+            patient["ambulance_arrival"] = True
+        if flags >> 1 & 3:
+            patient["gender"] = GENDERS[flags >> 1 & 3]
+        patients.append(patient)
+    return patients
+
+
+def encode_results(results: List[Dict]) -> bytes:
+    """assess_with_score results (each with its "patient_id") as concatenated result records."""
+    rows = []
+    for result in results:
+        ews = result.get("ews") or {}
+        score = ews.get("score")
+        rows.append((str(result.get("patient_id") or "").encode("utf-8"), _TAG_CODES[result["tag"]],
+                     _RULE_CODES[rule_of(result)], 255 if score is None else min(score, 254),
+                     _BAND_CODES.get(ews.get("band"), 0)))
+    return np.array(rows, dtype=RESULT_DTYPE).tobytes()
+
+
+def decode_results(body: bytes) -> List[Dict]:
+    if len(body) % RESULT.size:
+        raise WireFormatError(f"body is not a whole number of {RESULT.size}-byte records")
+    records = np.frombuffer(body, dtype=RESULT_DTYPE)
+    return [{"patient_id": patient_id.decode("utf-8"), "tag": TAGS[tag], "rule": RULES[rule],
+             "ews": None if ews == 255 else ews, "band": EWS_BANDS[band]}
+            for patient_id, tag, rule, ews, band in zip(*(records[name].tolist() for name in RESULT_DTYPE.names))]
+
+
+def dumps(obj, media_type: str) -> bytes:
+    """JSON or MessagePack document (for RECORD use encode_patients/encode_results)."""
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise WireFormatError("msgpack is not installed")
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def loads(body: bytes, media_type: str):
+    try:
+        if media_type == MSGPACK:
+            if msgpack is None:
+                raise WireFormatError("msgpack is not installed")
+            return msgpack.unpackb(body, raw=False)
+        return json.loads(body)
+    except (ValueError, TypeError) as e:
+        raise WireFormatError(str(e)) from e
@@ -0,0 +1,219 @@
+"""
+Persistent worker processes for large triage batches, fed through shared memory.
+
+The caller converts a batch into batch_triage's numeric columns directly inside
+one multiprocessing.shared_memory segment; workers (started once, rules already
+imported) are sent only (segment, start, stop) and write tag and rule ids back
+into the same segment. Nothing per patient is pickled in either direction.
+
+    python worker_pool.py bench --patients 200000 --workers 4
+"""
+import argparse
+import math
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from batch_triage import COLUMNS, assess_batch, assess_columns, fill, fill_records, results_from
+from triage_logic import SYMPTOM_IDS, assess_triage
+from wire_format import as_records, decode_patients, encode_patients
+
+ALIGN = 64
+
+
+def layout(capacity: int):
+    """({name: (offset, dtype, shape)}, total bytes) for `capacity` rows of every column."""
+    offsets, size = {}, 0
+    for name, (dtype, shape) in COLUMNS.items():
+        offsets[name] = (size, np.dtype(dtype), (capacity,) + shape)
+        size += -(-np.dtype(dtype).itemsize * capacity * max(1, math.prod(shape)) // ALIGN) * ALIGN
+    return offsets, size
+
+
+def column_views(buffer, capacity: int) -> Dict[str, np.ndarray]:
+    offsets, _ = layout(capacity)
+    return {name: np.ndarray(shape, dtype, buffer=buffer, offset=offset)
+            for name, (offset, dtype, shape) in offsets.items()}
+
+
+def _worker(tasks, done) -> None:
+    name, segment, columns = None, None, None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        segment_name, capacity, start, stop = task
+        if segment_name != name:
+            # The pool grew: drop our views of the old segment before closing it
+            columns = None
+            if segment is not None:
+                segment.close()
+            # Workers share the parent's resource tracker, so the parent's unlink() covers this attach too
+            segment = shared_memory.SharedMemory(name=segment_name)
+            name, columns = segment_name, column_views(segment.buf, capacity)
+        assess_columns({column: values[start:stop] for column, values in columns.items()})
+        done.put(stop - start)
+    columns = None
+    if segment is not None:
+        segment.close()
+
+
+class TriagePool:
+    """
+    Tags and rule ids for large patient batches, computed by `workers` persistent processes.
+    Usable from library code (with TriagePool() as pool: pool.assess(patients))
+    and from backend.py. One batch runs at a time; concurrent callers queue on a lock.
+    Workers are spawned, so each one imports the caller's main script again (as
+    __mp_main__): it must keep files, threads and servers behind its
+    `if __name__ == "__main__"` block, as backend.py does with start().
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_chunk: int = 4096):
+        context = mp.get_context("spawn")
+        self.workers = workers or os.cpu_count() or 1
+        self.min_chunk = min_chunk
+        self._tasks = context.SimpleQueue()
+        self._done = context.Queue()
+        self._processes = [context.Process(target=_worker, args=(self._tasks, self._done), daemon=True)
+                           for _ in range(self.workers)]
+        for process in self._processes:
+            process.start()
+        self._segment = None
+        self._columns = None
+        self._capacity = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, 2 * self._capacity, self.min_chunk)
+        segment = shared_memory.SharedMemory(create=True, size=layout(capacity)[1])
+        self._release()
+        self._segment, self._capacity = segment, capacity
+        self._columns = column_views(segment.buf, capacity)
+
+    def _release(self) -> None:
+        self._columns = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment, self._capacity = None, 0
+
+    def assess(self, patients: List[Dict]) -> List[Dict]:
+        """[{"tag", "rule"}] per patient, in order (malformed patients are handled as in batch_triage)."""
+        if not patients:
+            return []
+        with self._lock:
+            self._reserve(len(patients))
+            fill(patients, self._columns)
+            self._dispatch(len(patients))
+            return results_from(self._columns, len(patients), patients)
+
+    def assess_records(self, body: bytes) -> List[Dict]:
+        """The same for a wire_format record body, without building patient dicts."""
+        records = as_records(body)
+        if not len(records):
+            return []
+        with self._lock:
+            self._reserve(len(records))
+            fill_records(records, self._columns)
+            self._dispatch(len(records))
+            return results_from(self._columns, len(records))
+
+    def _dispatch(self, n: int) -> None:
+        chunk = max(self.min_chunk, -(-n // self.workers))
+        ranges = [(start, min(n, start + chunk)) for start in range(0, n, chunk)]
+        for start, stop in ranges:
+            self._tasks.put((self._segment.name, self._capacity, start, stop))
+        for _ in ranges:
+            while True:
+                try:
+                    self._done.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if not all(process.is_alive() for process in self._processes):
+                        raise RuntimeError("a triage worker process died")
+
+    def close(self) -> None:
+        with self._lock:
+            for _ in self._processes:
+                self._tasks.put(None)
+            for process in self._processes:
+                process.join(5)
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _synthetic_patients(n: int, seed: int = 1) -> List[Dict]:
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(n):
+        patient = {"symptoms": rng.sample(SYMPTOM_IDS, rng.randint(0, 2))}
+        for field, low, high in (("o2_saturation", 84, 100), ("temperature", 34, 41), ("systolic_bp", 70, 230),
+                                 ("diastolic_bp", 40, 125), ("heart_rate", 35, 160)):
+            patient[field] = f"{rng.uniform(low, high):.0f}" if rng.random() < 0.9 else ""
+        patient["gcs_score"] = str(rng.choice([15, 15, 15, 14, 12, 8]))
+        patient["ambulance_arrival"] = rng.random() < 0.03
+        patients.append(patient)
+    return patients
+
+
+def bench(patients: int, workers: int) -> None:
+    batch = _synthetic_patients(patients)
+    print(f"{patients} patients, {workers} worker(s), {os.cpu_count()} CPU(s)")
+
+    started = time.perf_counter()
+    expected = [assess_triage(p)["tag"] for p in batch]
+    print(f"  assess_triage loop, one process:      {time.perf_counter() - started:7.3f} s")
+
+    started = time.perf_counter()
+    assert [r["tag"] for r in assess_batch(batch)] == expected
+    print(f"  batch_triage columns, one process:    {time.perf_counter() - started:7.3f} s")
+
+    with ProcessPoolExecutor(workers) as executor:
+        list(executor.map(assess_triage, batch[:workers]))  # start the workers outside the timing
+        started = time.perf_counter()
+        tags = [r["tag"] for r in executor.map(assess_triage, batch, chunksize=max(1, patients // (workers * 4)))]
+        print(f"  ProcessPoolExecutor.map(assess_triage): {time.perf_counter() - started:5.3f} s")
+    assert tags == expected
+
+    body = encode_patients(batch)
+    with TriagePool(workers) as pool:
+        pool.assess(batch)  # start-up and segment allocation outside the timing
+        started = time.perf_counter()
+        results = pool.assess(batch)
+        print(f"  TriagePool, patient dicts:            {time.perf_counter() - started:7.3f} s")
+        assert [r["tag"] for r in results] == expected
+        started = time.perf_counter()
+        results = pool.assess_records(body)
+        print(f"  TriagePool, wire_format records:      {time.perf_counter() - started:7.3f} s")
+    # Records carry no blank fields (a blank becomes "not measured"), so compare with their decoded dicts
+    assert [r["tag"] for r in results] == [assess_triage(p)["tag"] for p in decode_patients(body)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared-memory triage worker pool")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="compare with ProcessPoolExecutor.map over assess_triage")
+    bench_parser.add_argument("--patients", type=int, default=200000)
+    bench_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    if args.command == "bench":
+        bench(args.patients, args.workers)
+
+
+if __name__ == "__main__":
+    main()